@@ -0,0 +1,271 @@
+"""
+Stockage des fichiers binaires (documents, livrables générés, historiques, modèles)
+hors de Postgres, adressé par contenu : la clé d'un blob est le SHA-256 hex de ses
+octets, seule cette clé est stockée en base.
+
+Backends :
+  - LocalBlobStore : système de fichiers (BLOB_DIR, défaut backend/app/blobs)
+  - S3BlobStore    : tout stockage compatible S3 (AWS, MinIO, R2…) via boto3
+
+Sélection par variables d'environnement :
+  BLOB_STORE=local|s3, BLOB_DIR, S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL
+
+Le store local par défaut (app/blobs, disque éphémère du conteneur) est refusé :
+BLOB_STORE=s3, ou BLOB_STORE=local avec un BLOB_DIR persistant explicite.
+BLOB_ALLOW_EPHEMERAL=1 l'autorise en développement.
+"""
+
+import abc
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 64 * 1024
+
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobNotFound(KeyError):
+    pass
+
+
+class BlobStore(abc.ABC):
+    """Interface commune : écriture idempotente, lecture complète ou par plage d'octets."""
+
+    @abc.abstractmethod
+    def put(self, data: bytes) -> str:
+        ...
+
+    @abc.abstractmethod
+    def get(self, key: str) -> bytes:
+        ...
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Octets [start, end] (bornes incluses, comme l'en-tête Range) par blocs."""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Supprime le blob ; sans effet s'il n'existe pas."""
+
+    @abc.abstractmethod
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        """(clé, date de dernière écriture en secondes epoch) de chaque blob stocké."""
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / key
+
+    def put(self, data: bytes) -> str:
+        key = blob_key(data)
+        path = self._path(key)
+        if path.exists():
+            path.touch()   # réutilisé : le balayage (app.sweep_blobs) compte à partir de maintenant
+            return key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # écriture atomique : un lecteur ne voit jamais un blob partiel
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return key
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def size(self, key: str) -> int:
+        try:
+            return self._path(key).stat().st_size
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        for path in self.root.glob("??/??/*"):
+            if not path.name.startswith(".tmp-"):
+                try:
+                    yield path.name, path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+        def _gen():
+            with f:
+                f.seek(start)
+                remaining = None if end is None else end - start + 1
+                while remaining is None or remaining > 0:
+                    chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+        return _gen()
+
+
+class S3BlobStore(BlobStore):
+    """Backend S3 ; `client` est un client boto3 "s3" (ou tout objet de même interface)."""
+
+    def __init__(self, bucket: str, prefix: str = "", client: Any = None, endpoint_url: Optional[str] = None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError("BLOB_STORE=s3 nécessite boto3 (pip install boto3)") from e
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @staticmethod
+    def _is_missing(exc: Exception) -> bool:
+        code = str(getattr(exc, "response", {}).get("Error", {}).get("Code", ""))
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def put(self, data: bytes) -> str:
+        key = blob_key(data)
+        if not self.exists(key):
+            self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+        return key
+
+    def get(self, key: str) -> bytes:
+        return b"".join(self.iter_range(key))
+
+    def size(self, key: str) -> int:
+        try:
+            return int(self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"])
+        except Exception as e:
+            if self._is_missing(e):
+                raise BlobNotFound(key)
+            raise
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.size(key)
+            return True
+        except BlobNotFound:
+            return False
+
+    def delete(self, key: str) -> None:
+        # DeleteObject ne signale pas une clé absente
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        token = None
+        while True:
+            kwargs = {"Bucket": self.bucket, "Prefix": prefix}
+            if token:
+                kwargs["ContinuationToken"] = token
+            page = self.client.list_objects_v2(**kwargs)
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(prefix):], obj["LastModified"].timestamp()
+            if not page.get("IsTruncated"):
+                return
+            token = page["NextContinuationToken"]
+
+    def iter_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        kwargs = {"Bucket": self.bucket, "Key": self._key(key)}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            body = self.client.get_object(**kwargs)["Body"]
+        except Exception as e:
+            if self._is_missing(e):
+                raise BlobNotFound(key)
+            raise
+
+        def _gen():
+            try:
+                while True:
+                    chunk = body.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                body.close()
+        return _gen()
+
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def durable_store_configured() -> bool:
+    """Faux pour le store local par défaut : app/blobs est effacé au redémarrage du conteneur."""
+    backend = os.environ.get("BLOB_STORE", "local").lower()
+    return backend != "local" or bool(os.environ.get("BLOB_DIR"))
+
+
+def _ephemeral_allowed() -> bool:
+    return os.environ.get("BLOB_ALLOW_EPHEMERAL", "").lower() in ("1", "true", "yes")
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.environ.get("BLOB_STORE", "local").lower()
+            if backend == "s3":
+                _store = S3BlobStore(
+                    bucket=os.environ["S3_BUCKET"],
+                    prefix=os.environ.get("S3_PREFIX", "blobs"),
+                    endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None,
+                )
+            elif backend == "local":
+                if not durable_store_configured() and not _ephemeral_allowed():
+                    raise RuntimeError(
+                        "BLOB_STORE=local sans BLOB_DIR : les fichiers iraient dans app/blobs, sur le disque "
+                        "éphémère du conteneur, et seraient perdus au redéploiement. Configurer BLOB_STORE=s3 "
+                        "(S3_BUCKET…) ou un BLOB_DIR persistant ; BLOB_ALLOW_EPHEMERAL=1 en développement."
+                    )
+                _store = LocalBlobStore(Path(os.environ.get("BLOB_DIR") or Path(__file__).parent / "blobs"))
+            else:
+                raise RuntimeError(f"BLOB_STORE inconnu : {backend!r} (local|s3)")
+        return _store
+
+
+def set_blob_store(store: Optional[BlobStore]) -> None:
+    """Remplace le backend (tests, scripts de migration)."""
+    global _store
+    with _store_lock:
+        _store = store
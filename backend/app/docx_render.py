@@ -0,0 +1,114 @@
+"""
+Rendu en mémoire des modèles Word (docxtpl) avec pré-traitement partagé.
+
+Un rendu docxtpl coûte surtout le nettoyage du XML (`patch_xml`, ~0,3 s sur le
+modèle rapport) et la compilation Jinja du document.xml, refaits à chaque appel
+alors qu'ils ne dépendent que du modèle. `PreparedDocxTemplate` garde les octets
+du modèle, le XML pré-traité et les templates Jinja compilés (corps, en-têtes,
+pieds de page) : un rendu ne fait plus que recharger le paquet depuis la mémoire,
+appliquer le contexte et sérialiser. Aucun passage par le disque.
+"""
+
+import io
+import re
+import threading
+from typing import Any, Callable, Dict
+
+from docx.oxml import parse_xml
+from docxtpl import DocxTemplate
+from jinja2 import Environment, Template
+from lxml import etree
+
+from .xlsx_zip import ZipSkeleton
+
+# en-tête du corps rendu : ses déclarations xmlns doublonnent celles de <w:document>
+_BODY_OPEN_RE = re.compile(r"^<w:body\b[^>]*>")
+_FIXED_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _CompilingEnvironment(Environment):
+    """Environnement Jinja qui mémorise les templates compilés, par source XML."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._compiled: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+
+    def from_string(self, source, globals=None, template_class=None):   # noqa: A002 - signature Jinja
+        if globals is not None or template_class is not None:
+            return super().from_string(source, globals, template_class)
+        with self._lock:
+            template = self._compiled.get(source)
+        if template is None:
+            template = super().from_string(source)
+            with self._lock:
+                template = self._compiled.setdefault(source, template)
+        return template
+
+
+class PreparedDocxTemplate:
+    """Modèle .docx chargé une fois ; `render` produit un DocxTemplate rendu, prêt à compléter puis sauver."""
+
+    def __init__(self, data: bytes):
+        self.data = bytes(data)
+        self.env = _CompilingEnvironment()
+        self._patched: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def patched_xml(self, src_xml: str, patch: Callable[[str], str]) -> str:
+        with self._lock:
+            out = self._patched.get(src_xml)
+        if out is None:
+            out = patch(src_xml)
+            with self._lock:
+                self._patched[src_xml] = out
+        return out
+
+    def render(self, context: Dict[str, Any]) -> DocxTemplate:
+        doc = _PreparedRenderer(self)
+        doc.render(context, jinja_env=self.env)
+        return doc
+
+    def render_bytes(self, context: Dict[str, Any]) -> bytes:
+        return to_bytes(self.render(context))
+
+
+class _PreparedRenderer(DocxTemplate):
+    def __init__(self, prepared: PreparedDocxTemplate):
+        super().__init__(io.BytesIO(prepared.data))
+        self._prepared = prepared
+
+    def patch_xml(self, src_xml):
+        return self._prepared.patched_xml(src_xml, super().patch_xml)
+
+    def map_tree(self, tree):
+        """
+        Greffe du corps rendu. Détacher ou insérer un sous-arbre lxml de ~10⁴ nœuds coûte
+        ~0,3 s (réconciliation des namespaces) : on substitue plutôt le corps dans le XML
+        sérialisé du document et on le réanalyse, en repli sur docxtpl si le résultat
+        n'est pas bien formé (préfixe du corps non déclaré à la racine).
+        """
+        part = self.docx.part
+        doc_xml = etree.tostring(part.element, encoding="unicode")
+        start, end = doc_xml.find("<w:body"), doc_xml.rfind("</w:body>")
+        body_xml = _BODY_OPEN_RE.sub("<w:body>", etree.tostring(tree, encoding="unicode"), count=1)
+        try:
+            if start == -1 or end == -1:
+                raise ValueError("corps introuvable")
+            new_root = parse_xml(doc_xml[:start] + body_xml + doc_xml[end + len("</w:body>"):])
+        except (ValueError, etree.XMLSyntaxError):
+            super().map_tree(tree)
+            return
+        part._element = new_root
+        self.docx = part.document
+
+
+def to_bytes(doc: DocxTemplate) -> bytes:
+    """
+    Sérialise un document rendu (DocxTemplate ou python-docx) sans fichier intermédiaire.
+    python-docx horodate chaque membre à l'instant de l'écriture : les dates sont fixées
+    (membres recopiés bruts) pour qu'un même rendu donne les mêmes octets, donc le même ETag.
+    """
+    buf = io.BytesIO()
+    doc.save(buf)
+    return ZipSkeleton(buf.getvalue(), date_time=_FIXED_DATE_TIME).patch({})
@@ -0,0 +1,420 @@
+"""
+Fonctions exécutées dans le pool de calcul (app/work_pool.py) : lecture openpyxl des
+classeurs téléversés, parsing pandas des résultats LCIA, patch des classeurs AMUREBA,
+rendu du rapport docx.
+
+Chaque worker spawn importe ce module, et seulement lui : aucune dépendance à FastAPI,
+à la base ou aux clients Claude (app.main, ~3 s et ~150 Mo par processus). Les entrées
+et sorties sont des valeurs simples (octets, dicts, chemins), jamais des objets ORM.
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from openpyxl import load_workbook
+from openpyxl.reader import workbook as _wb_reader
+
+from . import docx_render, logs
+from .amureba_mapper import AmurebaMappingService
+from .xlsx_patch import WorkbookSkeleton
+
+logs.configure()
+log = logging.getLogger(__name__)
+
+
+# Patch openpyxl: ignore corrupted pivot caches in AMUREBA template
+_orig_pivot_caches = _wb_reader.WorkbookParser.pivot_caches.fget
+
+
+def _safe_pivot_caches(self):
+    try:
+        return _orig_pivot_caches(self)
+    except Exception:
+        return {}
+
+
+_wb_reader.WorkbookParser.pivot_caches = property(_safe_pivot_caches)
+
+
+def ready() -> bool:
+    """Tâche de préchauffage : démarre un worker (import de ce module) sans autre travail."""
+    return True
+
+
+_file_digests: Dict[Path, Tuple[Tuple[float, int], str]] = {}
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 d'un modèle officiel sur disque, recalculé seulement si le fichier a changé (mtime, taille)."""
+    st = path.stat()
+    cached = _file_digests.get(path)
+    if cached is None or cached[0] != (st.st_mtime, st.st_size):
+        cached = ((st.st_mtime, st.st_size), hashlib.sha256(path.read_bytes()).hexdigest())
+        _file_digests[path] = cached
+    return cached[1]
+
+
+def to_number(v: Any):
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return v
+    s = str(v).strip()
+    if s == "":
+        return None
+    s = s.replace(" ", "").replace(",", ".")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Patch des classeurs AMUREBA
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Squelettes des modèles sur disque, par processus : clé (chemin, empreinte du contenu)
+_SKELETON_CACHE_SIZE = 4
+_skeletons: "OrderedDict[Tuple[str, str], WorkbookSkeleton]" = OrderedDict()
+_skeletons_lock = threading.Lock()
+
+
+def _skeleton_for(path: Path) -> WorkbookSkeleton:
+    key = (str(path), file_digest(path))
+    with _skeletons_lock:
+        skeleton = _skeletons.get(key)
+        if skeleton is not None:
+            _skeletons.move_to_end(key)
+            return skeleton
+    skeleton = WorkbookSkeleton(path)
+    with _skeletons_lock:
+        skeleton = _skeletons.setdefault(key, skeleton)
+        while len(_skeletons) > _SKELETON_CACHE_SIZE:
+            _skeletons.popitem(last=False)
+    return skeleton
+
+
+def patch_workbook(source: Union[Path, bytes], sheet_changes: Dict[str, Dict[str, Any]]) -> bytes:
+    """
+    Applique sheet_changes à un classeur. Un chemin (modèle officiel) est analysé une
+    fois par worker ; des octets (classeur déjà modifié) le sont à chaque appel.
+    """
+    skeleton = _skeleton_for(source) if isinstance(source, Path) else WorkbookSkeleton(source)
+    return skeleton.patch(sheet_changes)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Lecture des classeurs AMUREBA (fiches AA1..AA9)
+# ──────────────────────────────────────────────────────────────────────────────
+
+_IMPROVEMENT_TYPE_MAP = [
+    (["ser ", "pv", "éolien", "eolien", "géothermie", "geothermie", "solaire"], "SER_PV"),
+    (["electrif", "électrif"], "ELECTRIFICATION"),
+    (["efficac"], "EFFICACITE_ENERGETIQUE"),
+    (["ccu"], "CCU"),
+    (["ppa"], "PPA"),
+    (["fluide", "frigorif"], "FLUIDE_FRIGORIGENE"),
+]
+
+
+def _normalize_improvement_type(raw: str) -> Optional[str]:
+    if not raw:
+        return None
+    lower = raw.lower()
+    for keywords, enum_val in _IMPROVEMENT_TYPE_MAP:
+        if any(k in lower for k in keywords):
+            return enum_val
+    return raw  # keep raw string if nothing matched
+
+
+def _parse_aa_sheet(ws) -> Optional[Dict[str, Any]]:
+    """Extrait les données d'une feuille AAx. Retourne None si la feuille est vide."""
+    intitule = ws["B9"].value
+    if not intitule or not str(intitule).strip():
+        return None
+
+    def _oui_non(v) -> Optional[bool]:
+        if v is None:
+            return None
+        return str(v).strip().upper() == "OUI"
+
+    # Conditions préalables (C31, C33, C35)
+    conds = []
+    for r in [31, 33, 35]:
+        v = ws[f"C{r}"].value
+        if v and str(v).strip() and str(v).strip().upper() not in ("NA", "N/A", ""):
+            conds.append(str(v).strip())
+
+    ref = ws["F5"].value
+    type_raw = ws["B13"].value
+    classif = ws["F27"].value
+    duree_raw = to_number(ws["K18"].value)
+
+    return {
+        "reference": str(ref).strip() if ref else None,
+        "intitule": str(intitule).strip(),
+        "type_amelioration": _normalize_improvement_type(str(type_raw) if type_raw else ""),
+        "classification": str(classif).strip() if classif else None,
+        "conditions_prealables": "\n".join(conds) if conds else None,
+        "investissement": to_number(ws["G61"].value),
+        "economie_energie": to_number(ws["G77"].value),
+        "economie_co2": to_number(ws["G87"].value),
+        "duree_amortissement": int(duree_raw) if duree_raw is not None else None,
+        "irr_avant_impot": to_number(ws["N10"].value),
+        "pbt_avant_impot": to_number(ws["N15"].value),
+        "irr_apres_impot": to_number(ws["N17"].value),
+        "pbt_apres_impot": to_number(ws["N18"].value),
+        "entreprise_ets": _oui_non(ws["K22"].value),
+        "deduction_fiscale": _oui_non(ws["K23"].value),
+        "description": None,
+        "situation_existante": None,
+    }
+
+
+# Mapping field → cell used to detect conflicts in existing Excel
+AA_FIELD_CELL = {
+    "intitule":               "B9",
+    "type_amelioration":      "B13",
+    "classification":         "F27",
+    "investissement_k_eur":   "G61",
+    "economie_energie_mwh_an":"G77",
+    "economie_co2_kg_an":     "G87",
+    "duree_amortissement":    "K18",
+}
+
+
+def read_aa_existing_values(excel_bytes: bytes) -> Dict[str, Dict[str, Any]]:
+    """
+    Read an existing AMUREBA Excel (bytes) and return a dict:
+      { "AA1": { "B9": "some value", ... }, "AA2": { ... }, ... }
+    Only the cells listed in AA_FIELD_CELL are checked.
+    Uses openpyxl data_only=True (read-only, no writing).
+    """
+    try:
+        wb = load_workbook(io.BytesIO(excel_bytes), data_only=True, keep_links=False)
+    except Exception as exc:
+        log.warning("conflict-check: cannot read Excel for conflict detection: %s", exc)
+        return {}
+
+    result: Dict[str, Dict[str, Any]] = {}
+    for i in range(1, 10):
+        sheet_name = f"AA{i}"
+        if sheet_name not in wb.sheetnames:
+            continue
+        ws = wb[sheet_name]
+        sheet_vals: Dict[str, Any] = {}
+        for field, cell_ref in AA_FIELD_CELL.items():
+            cell = ws[cell_ref]
+            val = cell.value
+            if val is not None and str(val).strip() != "":
+                sheet_vals[field] = val
+        if sheet_vals:
+            result[sheet_name] = sheet_vals
+    return result
+
+
+def parse_aa_workbook(content: bytes) -> List[Dict[str, Any]]:
+    """Actions des feuilles AA1..AA9 d'un classeur AMUREBA (exécuté dans le pool de calcul)."""
+    wb = load_workbook(io.BytesIO(content), data_only=True, keep_links=False)
+    parsed: List[Dict[str, Any]] = []
+    for i in range(1, 10):
+        sheet_name = f"AA{i}"
+        if sheet_name not in wb.sheetnames:
+            continue
+        try:
+            data = _parse_aa_sheet(wb[sheet_name])
+        except Exception:
+            continue
+        if data:
+            parsed.append(data)
+    return parsed
+
+
+def missing_aa_sheets(content: bytes) -> List[str]:
+    wb = load_workbook(io.BytesIO(content), read_only=True, keep_links=False)
+    try:
+        return [f"AA{i}" for i in range(1, 10) if f"AA{i}" not in wb.sheetnames]
+    finally:
+        wb.close()
+
+
+def map_uploaded_workbook(content: bytes) -> Dict[str, Any]:
+    """Load an .xlsx and map all its sheets (runs in the work pool)."""
+    wb = load_workbook(io.BytesIO(content), data_only=True, keep_links=False)
+    return AmurebaMappingService().map_workbook(wb)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Parseur LCIA-results.xlsx → dict d'impacts EF v3.0
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Patterns ordonnés du plus spécifique au plus général.
+# On cherche chaque sous-chaîne dans le nom de colonne normalisé (lowercase, espaces normalisés).
+# Les sous-catégories (biogenic, fossil…) doivent précéder leur catégorie parente (climate change).
+EF_COLUMN_PATTERNS: list = [
+    # GWP total EF v3.0 explicite - avant les sous-catégories pour qu'EN 15804+A2
+    # avec colonnes v3.0 ET v3.1 mappe correctement la bonne valeur vers gwp100.
+    ("climate change: total (ef v3.0",                 "gwp100"),
+    # Climate change - sous-catégories d'abord
+    ("climate change: biogenic",                        "climate_biogenic"),
+    ("climate change: fossil",                          "climate_fossil"),
+    ("climate change: land use",                        "climate_landuse"),
+    # Human toxicity - carcinogène avant non-carcinogène (évite faux positif sur "non")
+    ("human toxicity: carcinogenic",                    "human_tox_carc"),
+    ("human toxicity: non-carcinogenic",                "human_tox_noncarc"),
+    # Ecotoxicity freshwater
+    ("ecotoxicity: freshwater",                         "ecotoxicity_fw"),
+    # Eutrophication
+    ("eutrophication: freshwater",                      "eutrophication_fw"),
+    ("eutrophication: marine",                          "eutrophication_marine"),
+    ("eutrophication: terrestrial",                     "eutrophication_terrestrial"),
+    # Autres indicateurs spécifiques
+    ("ionising radiation",                              "ionising_radiation"),
+    ("ionizing radiation",                              "ionising_radiation"),
+    ("photochemical oxidant",                           "photochemical_oxidant"),
+    ("particulate matter",                              "particulate_matter"),
+    ("ozone depletion",                                 "ozone_depletion"),
+    ("energy resources: non-renewable",                 "energy_nonrenewable"),
+    ("material resources: metals/minerals",             "material_resources"),
+    ("material resources",                              "material_resources"),
+    ("| land use |",                                    "land_use"),   # pipes pour éviter collision avec "climate change: land use"
+    ("water use",                                       "water_use"),
+    ("acidification",                                   "acidification"),
+    # Climate change général (GWP100) - en dernier pour ne pas écraser les sous-catégories
+    ("climate change",                                  "gwp100"),
+]
+
+
+def _normalize_col(name: str) -> str:
+    """Normalise un nom de colonne : lowercase + espaces multiples → un seul espace."""
+    import re as _re
+    return _re.sub(r"\s+", " ", name.lower().strip())
+
+
+def _is_impact_col(col_name: str) -> bool:
+    """Vrai si la colonne est une colonne d'impact EF v3.0 ou EN 15804+A2."""
+    col_lower = col_name.lower()
+    return "EF v3.0" in col_name or "en15804+a2" in col_lower or "en 15804" in col_lower
+
+
+def parse_lcia_xlsx(file_bytes: bytes) -> Dict[str, float]:
+    """Lit un fichier LCIA-results.xlsx (format EF v3.0 ou EN 15804+A2) et retourne {clé_ef: valeur}."""
+    import math
+    import io
+    import pandas as pd
+
+    impacts: Dict[str, float] = {}
+    xl = pd.ExcelFile(io.BytesIO(file_bytes))
+
+    for sheet_name in xl.sheet_names:
+        # Essaie de trouver la ligne d'en-tête contenant des colonnes EF v3.0 ou EN 15804+A2
+        df = None
+        for header_row in range(6):
+            candidate = xl.parse(sheet_name, header=header_row)
+            ef_cols = [
+                c for c in candidate.columns
+                if isinstance(c, str) and _is_impact_col(c)
+            ]
+            if ef_cols:
+                df = candidate
+                break
+
+        if df is None or df.empty:
+            continue
+
+        ef_cols = [c for c in df.columns if isinstance(c, str) and _is_impact_col(c)]
+
+        for col in ef_cols:
+            col_norm = _normalize_col(col)
+            key = None
+            for substr, k in EF_COLUMN_PATTERNS:
+                if substr in col_norm:
+                    key = k
+                    break
+            if not key:
+                continue
+
+            # Première valeur numérique valide dans la colonne
+            for val in df[col]:
+                if isinstance(val, (int, float)) and not (
+                    isinstance(val, float) and math.isnan(val)
+                ):
+                    impacts[key] = float(val)
+                    break
+
+    return impacts
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Rendu du rapport docx
+# ──────────────────────────────────────────────────────────────────────────────
+
+_EXTRA_SECTIONS_META = [
+    ("description_batiment", "Description du bâtiment", [
+        ("batiment_usage",       "Usage"),
+        ("batiment_surface",     "Surface"),
+        ("batiment_description", "Description"),
+    ]),
+    ("synthese_energetique", "Situation énergétique", [
+        ("energie_electricite_kwh", "Électricité"),
+        ("energie_gaz_kwh",         "Gaz"),
+        ("energie_synthese",        "Synthèse"),
+    ]),
+    ("plan_amelioration", "Plan d'amélioration", [
+        ("actions_nb",                   "Nombre d'actions"),
+        ("actions_investissement_total",  "Investissement total"),
+        ("actions_economie_energie",      "Économie d'énergie"),
+        ("actions_synthese",             "Synthèse"),
+    ]),
+]
+
+
+# Modèle rapport pré-traité (XML nettoyé + Jinja compilé), clé (chemin du modèle, empreinte du contenu)
+_report_templates: Dict[Tuple[str, str], docx_render.PreparedDocxTemplate] = {}
+_report_templates_lock = threading.Lock()
+
+
+def _get_report_template(path: Path) -> docx_render.PreparedDocxTemplate:
+    key = (str(path), file_digest(path))
+    with _report_templates_lock:
+        prepared = _report_templates.get(key)
+    if prepared is None:
+        prepared = docx_render.PreparedDocxTemplate(path.read_bytes())
+        with _report_templates_lock:
+            for stale in [k for k in _report_templates if k[0] == key[0] and k != key]:
+                del _report_templates[stale]
+            prepared = _report_templates.setdefault(key, prepared)
+    return prepared
+
+
+def render_report_docx(template_path: Path, context: Dict[str, Any], extra: Dict[str, Any]) -> bytes:
+    """Render the report .docx template in memory (single pass, cached template); runs in the work pool."""
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("docx context keys: %s, extra_sections: %s", list(context),
+                  {k: list(v) for k, v in extra.items()}, extra=logs.SAMPLED)
+
+    doc = _get_report_template(template_path).render(context)
+
+    # Append extra sections using python-docx since the template has no Jinja placeholders for them
+    d2 = doc.docx
+    appended_any = False
+    for sec_id, sec_label, fields in _EXTRA_SECTIONS_META:
+        sec_data = extra.get(sec_id, {})
+        non_empty = [(fk, fl, sec_data[fk]) for fk, fl in fields if sec_data.get(fk)]
+        if not non_empty:
+            continue
+        if not appended_any:
+            d2.add_paragraph()
+            appended_any = True
+        d2.add_heading(sec_label, level=1)
+        for fk, fl, val in non_empty:
+            p = d2.add_paragraph()
+            p.add_run(f"{fl} : ").bold = True
+            p.add_run(val)
+        log.debug("docx section %r: %d champ(s)", sec_id, len(non_empty), extra=logs.SAMPLED)
+    return docx_render.to_bytes(doc)
@@ -0,0 +1,166 @@
+"""
+Calcul natif des indices AMUREBA (feuille '2023' du modèle audit_template.xlsx).
+
+Transcription directe des formules de la feuille, sans LibreOffice :
+
+  IEE  = B43 = H35 / T17        AEE  = B49 = 1 - IEE
+  IC   = B44 = H36 / H35        iCO2 = B50 = H36 / U17
+  iSER = B45 = F35 / H35        ACO2 = B51 = 1 - iCO2
+
+  H35 = Σ (facture - export - Δstock) × facteur énergie finale / 1000   (MWhf)
+  H36 = Σ (facture - export - Δstock) × facteur CO2 + émissions process (kgCO2)
+  T17 = Σ Pᵣ × Mᵣ (consommation de référence × facteur d'influence), lignes 6..13
+  U17 = Σ Qᵣ × Mᵣ (émissions de référence × facteur d'influence),    lignes 6..13
+
+Les valeurs d'erreur Excel sont reproduites : un facteur d'influence vide sur une
+ligne de référence (P6/P7 = "") donne #VALUE!, une division par zéro #DIV/0! ;
+dans les deux cas l'indice vaut None, comme après recalcul LibreOffice.
+"""
+
+from typing import Any, Dict, List, Optional
+
+# Paramètres!C10:F10 - facteur de conversion en énergie finale (kWhf/unité)
+FINAL_ENERGY_FACTORS = {"electricity": 1.0, "gas": 1.0, "fuel": 10.6, "biogas": 1.0}
+# Paramètres!C12:F12 - facteur de conversion CO2 (kgCO2/unité)
+CO2_FACTORS = {"electricity": 0.216, "gas": 0.218, "fuel": 3.2569, "biogas": 0.0}
+
+SUPPLIED = ("electricity", "gas", "fuel", "biogas")   # colonnes C..F
+SECTIONS = ("operational", "buildings", "transport", "utility")
+
+# Lignes de la feuille (cf. SECTION_START_ROW / INFLUENCE_START_ROW dans main.py)
+_SECTION_START_ROW = {"operational": 6, "buildings": 9, "transport": 12, "utility": 15}
+_ROWS_PER_SECTION = 2
+_INFLUENCE_START_ROW = 6
+_INFLUENCE_MAX_ROWS = 8
+_REFERENCE_ROWS = (6, 7)        # P/Q = AF/AU (référence calculée)
+_UTILITY_ROWS = {"util1": 15, "util2": 16}
+
+
+class _XlError(Exception):
+    """Valeur d'erreur Excel (#VALUE!, #DIV/0!) propagée jusqu'à l'indice."""
+
+
+def _num(v: Any) -> Optional[float]:
+    """Même conversion que main._to_number (cellule vide → None)."""
+    if v is None:
+        return None
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip().replace(" ", "").replace(",", ".")
+    if not s:
+        return None
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def _z(v: Optional[float]) -> float:
+    """Cellule vide utilisée dans un calcul : 0."""
+    return 0.0 if v is None else v
+
+
+def _div(a: float, b: float) -> float:
+    if b == 0:
+        raise _XlError("#DIV/0!")
+    return a / b
+
+
+def _sheet_rows(year: Dict[str, Any]) -> Dict[int, Dict[str, Optional[float]]]:
+    """{ligne: {electricity, gas, …, process}} pour les lignes de données 6..16."""
+    rows: Dict[int, Dict[str, Optional[float]]] = {}
+    for section in SECTIONS:
+        entries: List[Dict[str, Any]] = year.get(section) or []
+        for idx, entry in enumerate(entries[:_ROWS_PER_SECTION]):
+            rows[_SECTION_START_ROW[section] + idx] = {
+                k: _num((entry or {}).get(k))
+                for k in (*SUPPLIED, "util1", "util2", "process")
+            }
+    return rows
+
+
+def _influence_values(year: Dict[str, Any]) -> Dict[int, Optional[float]]:
+    """{ligne: M} - les facteurs d'influence occupent L6:N13, indépendamment des sections."""
+    factors = year.get("influence_factors") or []
+    return {
+        _INFLUENCE_START_ROW + i: _num((f or {}).get("value"))
+        for i, f in enumerate(factors[:_INFLUENCE_MAX_ROWS])
+    }
+
+
+def _utility_factors(rows, factors: Dict[str, float]) -> Dict[str, float]:
+    """G30/H30 (ou G31/H31) : facteur moyen d'une utilité, pondéré par ses intrants ligne 15/16."""
+    out = {}
+    for util, row in _UTILITY_ROWS.items():
+        total = sum(_z(r.get(util)) for r in rows.values())   # G17 / H17
+        inputs = rows.get(row, {})
+        weighted = sum(_z(inputs.get(k)) * factors[k] for k in SUPPLIED)
+        out[util] = weighted / total if total else 0.0          # IFERROR(…, 0)
+    return out
+
+
+def _reference_total(rows, influence, per_row) -> float:
+    """T17 / U17 = Σ Pᵣ×Mᵣ ; per_row(r) renvoie AD/AS (somme de la ligne)."""
+    total = 0.0
+    for r in _REFERENCE_ROWS:
+        m = influence.get(r)
+        if m is None:
+            # P6 = AF6 = "" quand M6 est vide, puis "" × M6 → #VALUE!
+            raise _XlError("#VALUE!")
+        # AF = IF(M=0, 0, AD/M) ; T = AF × M
+        total += 0.0 if m == 0 else per_row(rows.get(r, {})) / m * m
+    # lignes 9..13 : P/Q vides dans le modèle → T = U = 0 (rien à ajouter)
+    return total
+
+
+def compute_indices(audit_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Indices AMUREBA à partir du dict audit_data (cf. main._audit_to_data).
+    Renvoie la même structure que main.read_indices_from_excel.
+    """
+    year = (audit_data or {}).get("year2023") or {}
+    rows = _sheet_rows(year)
+    influence = _influence_values(year)
+    invoice = {k: _num(v) for k, v in (year.get("invoice_meter") or {}).items()}
+
+    util_energy = _utility_factors(rows, FINAL_ENERGY_FACTORS)   # G30, H30
+    util_co2 = _utility_factors(rows, CO2_FACTORS)               # G31, H31
+
+    def final_energy(r):   # AD = Σ W..AB (MWh)
+        return (sum(_z(r.get(k)) * FINAL_ENERGY_FACTORS[k] / 1000 for k in SUPPLIED)
+                + sum(_z(r.get(u)) * util_energy[u] / 1000 for u in _UTILITY_ROWS))
+
+    def emissions(r):      # AS = Σ AK..AQ (kgCO2)
+        return (sum(_z(r.get(k)) * CO2_FACTORS[k] for k in SUPPLIED)
+                + sum(_z(r.get(u)) * util_co2[u] for u in _UTILITY_ROWS)
+                + _z(r.get("process")))
+
+    # ligne 25 : total du périmètre (export / Δstock non saisis → 0)
+    perimeter = {k: _z(invoice.get(k)) for k in SUPPLIED}
+    energy_by_carrier = {k: perimeter[k] * FINAL_ENERGY_FACTORS[k] / 1000 for k in SUPPLIED}   # C35:F35
+    h35 = sum(energy_by_carrier.values())
+    h36 = sum(perimeter[k] * CO2_FACTORS[k] for k in SUPPLIED) + _z(invoice.get("process"))
+
+    def cell(fn):
+        try:
+            return fn()
+        except _XlError:
+            return None
+
+    iee = cell(lambda: _div(h35, _reference_total(rows, influence, final_energy)))
+    ico2 = cell(lambda: _div(h36, _reference_total(rows, influence, emissions)))
+    primary = {
+        "IEE": iee,
+        "IC": cell(lambda: _div(h36, h35)),
+        "iSER": cell(lambda: _div(energy_by_carrier["biogas"], h35)),
+    }
+    secondary = {
+        "AEE": None if iee is None else 1 - iee,
+        "iCO2": ico2,
+        "ACO2": None if ico2 is None else 1 - ico2,
+    }
+    return {
+        "primary": primary,
+        "secondary": secondary,
+        "formulas_calculated": any(v is not None for v in (*primary.values(), *secondary.values())),
+    }
@@ -0,0 +1,1838 @@
+"""Moteur d'optimisation ACV 2.0 (côté serveur).
+
+Portage Python de `buildCombinations`, `computePhares` et des helpers de calcul
+(`calcParoiStats`, `calcBatimentStats`, `computeConfigHash`) de
+frontend/src/pages/ProjectLCA2.jsx. Les formules, filtres et profils phares sont
+repris à l'identique ; les combinaisons ne sont plus énumérées bâtiment par
+bâtiment mais évaluées par sommes de tables de contributions par paroi
+(`CombinationSpace`), sur l'espace complet et sans plafond de 50 000.
+
+Les bâtiments sont les dicts JSON stockés dans `LcaProject.batiments` et les
+matériaux les dicts sérialisés de `LcaMaterial` (cf. `material_to_dict`).
+Les conversions « à la JS » (parseFloat, `||`, Math.round, String(number))
+sont explicites pour garder le hash de configuration identique au frontend.
+"""
+import bisect
+import itertools
+import json
+import math
+import re
+import unicodedata
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Constantes (miroir de ProjectLCA2.jsx)
+# ──────────────────────────────────────────────────────────────────────────────
+
+CHAUFFAGE_OPTIONS = [
+    {"id": "gaz",        "co2": 0.205, "rendement": 0.90},  # IPCC 2006 Vol.2 Annex 1 Table 1.3
+    {"id": "mazout",     "co2": 0.265, "rendement": 0.85},
+    {"id": "bois",       "co2": 0.030, "rendement": 0.75},
+    {"id": "pac",        "co2": 0.132, "rendement": 3.0},   # AIB 2024 via VREG
+    {"id": "electrique", "co2": 0.132, "rendement": 1.0},   # AIB 2024 via VREG
+]
+
+PRIX_KWH_BY_CHAUFFAGE = {
+    "gaz":        0.095,
+    "mazout":     0.10,
+    "bois":       0.08,
+    "pac":        0.345,
+    "electrique": 0.345,
+}
+
+# Facteur déconstruction - EN 15978 Module C (valeurs PAR KG).
+DECON_IMPACTS_PER_KG = {
+    "gwp100":    0.007209,
+    "energy_nr": 0.093856,
+    "sante":     9.82e-8,
+}
+
+PER_SLOT = 5            # max candidats par slot opaque/vitrage/cadre
+MAX_COMBOS = 30_000_000  # taille maximale de l'espace évalué exhaustivement (~40 ns / combinaison)
+COMBOS_LIST_MAX = 2000  # au-delà, seules les meilleures combinaisons par axe sont renvoyées
+COMBOS_PER_AXIS = 500
+_CHUNK = 1 << 18        # combinaisons évaluées par bloc NumPy
+MAX_PARETO_CANDIDATES = 5_000_000  # solutions partielles examinées par paroi (front de Pareto)
+_MAX_INCUMBENTS = 256   # solutions complètes gardées pour l'élagage par bornes
+EP_ISO_STEP = 2.5       # pas des paliers d'épaisseur isolant (cm)
+EP_ISO_MAX_DEFAULT = 20.0
+ROI_HORIZON_YEARS = 20
+
+_GWP_KEYS = ("gwp100", "gwp_100")
+_ENERGY_KEYS = ("energy_nonrenewable_adp", "energy_nonrenewable", "energy_nr", "penrt")
+_SANTE_KEYS = ("photochemical_oxidant_hh", "photochemical_oxidant")
+_ACV_KEYS = ("gwp_brut", "gwp_amorti", "energy_brut", "energy_amorti", "sante_brut", "sante_amorti")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Conversions « à la JavaScript »
+# ──────────────────────────────────────────────────────────────────────────────
+
+_FLOAT_PREFIX_RE = re.compile(r"^[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+
+
+def _pf(v: Any) -> float:
+    """Équivalent de parseFloat() : NaN si non convertible."""
+    if v is None or isinstance(v, bool):
+        return math.nan
+    if isinstance(v, (int, float)):
+        return float(v)
+    s = str(v).strip()
+    if s.startswith(("Infinity", "+Infinity")):
+        return math.inf
+    if s.startswith("-Infinity"):
+        return -math.inf
+    m = _FLOAT_PREFIX_RE.match(s)
+    return float(m.group(0)) if m else math.nan
+
+
+def _fin(x: Any) -> bool:
+    return isinstance(x, (int, float)) and not isinstance(x, bool) and math.isfinite(x)
+
+
+def _or(x: float, default: Any) -> Any:
+    """Équivalent de `x || default` pour un nombre (0 et NaN sont falsy)."""
+    return x if (x == x and x != 0) else default
+
+
+def _js_round(x: float) -> float:
+    """Math.round : arrondi au demi supérieur (et non bancaire)."""
+    return float(math.floor(x + 0.5))
+
+
+def _ceil(x: float) -> float:
+    return float(math.ceil(x))
+
+
+def js_num_str(x: Any) -> str:
+    """String(number) selon ECMAScript Number::toString (sortie la plus courte)."""
+    if isinstance(x, bool):
+        return "true" if x else "false"
+    x = float(x)
+    if x != x:
+        return "NaN"
+    if math.isinf(x):
+        return "Infinity" if x > 0 else "-Infinity"
+    if x == 0:
+        return "0"
+    sign = "-" if x < 0 else ""
+    _, digit_tuple, exp = Decimal(repr(abs(x))).as_tuple()
+    digits = "".join(map(str, digit_tuple)).lstrip("0")
+    exp += len(digits) - len(digits.rstrip("0"))
+    digits = digits.rstrip("0")
+    # valeur = 0.d1d2…dk × 10^n
+    k = len(digits)
+    n = k + exp
+    if k <= n <= 21:
+        out = digits + "0" * (n - k)
+    elif 0 < n <= 21:
+        out = digits[:n] + "." + digits[n:]
+    elif -6 < n <= 0:
+        out = "0." + "0" * (-n) + digits
+    else:
+        e = n - 1
+        mant = digits[0] + ("." + digits[1:] if k > 1 else "")
+        out = f"{mant}e{'+' if e >= 0 else '-'}{abs(e)}"
+    return sign + out
+
+
+def _js_str(v: Any) -> str:
+    """Équivalent de String(v) pour les valeurs JSON."""
+    if v is None:
+        return "null"
+    if isinstance(v, (bool, int, float)):
+        return js_num_str(v)
+    return str(v)
+
+
+def _js_json(obj: Any) -> str:
+    """JSON.stringify compact (nombres formatés comme en JavaScript)."""
+    if obj is None:
+        return "null"
+    if isinstance(obj, bool):
+        return "true" if obj else "false"
+    if isinstance(obj, (int, float)):
+        return js_num_str(obj) if _fin(obj) else "null"
+    if isinstance(obj, str):
+        return json.dumps(obj, ensure_ascii=False)
+    if isinstance(obj, dict):
+        return "{" + ",".join(
+            f"{json.dumps(str(k), ensure_ascii=False)}:{_js_json(v)}" for k, v in obj.items()
+        ) + "}"
+    if isinstance(obj, (list, tuple)):
+        return "[" + ",".join(_js_json(v) for v in obj) + "]"
+    return json.dumps(str(obj), ensure_ascii=False)
+
+
+def _djb2_hash(s: str) -> str:
+    """Hash djb2 identique à `djb2Hash` du frontend (unités UTF-16, 6 hex majuscules)."""
+    h = 5381
+    data = s.encode("utf-16-le")
+    for i in range(0, len(data), 2):
+        code = data[i] | (data[i + 1] << 8)
+        h = (((h << 5) + h) & 0xFFFFFFFF) ^ code
+    return f"{h:08X}"[:6]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Helpers matériaux / catégories (miroir de utils/lca2-helpers.js)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def material_to_dict(m: Any) -> Dict[str, Any]:
+    """Sérialise un LcaMaterial comme GET /lca/materials (schemas.LcaMaterialOut)."""
+    return {
+        "id": m.id,
+        "name": m.name,
+        "category": m.category,
+        "impacts": m.impacts or {},
+        "prix": m.prix,
+        "valeur_r": m.valeur_r,
+        "is_fixed": bool(m.is_fixed),
+        "flux_reference": m.flux_reference,
+        "dvr_materiau": m.dvr_materiau,
+        "valeur_lambda": m.valeur_lambda,
+        "poids_unite": m.poids_unite,
+    }
+
+
+def _norm_str(s: Any) -> str:
+    s = unicodedata.normalize("NFD", s or "")
+    return "".join(c for c in s if not (0x300 <= ord(c) <= 0x36F)).lower()
+
+
+def _is_fenetre(cat: Any) -> bool:
+    return _norm_str(cat) == "fenetre"
+
+
+def _is_isolant(cat: Any) -> bool:
+    return (cat or "").lower() == "isolant"
+
+
+def extract_impact(impacts: Any, *keys: str) -> Optional[float]:
+    """Première clé présente (insensible à la casse), ou None."""
+    if not isinstance(impacts, dict):
+        return None
+    norm = {str(k).lower(): v for k, v in impacts.items()}
+    for k in keys:
+        val = norm.get(k.lower())
+        if val is not None:
+            return _pf(val)
+    return None
+
+
+def _nz(v: Optional[float], default: float = 0.0) -> float:
+    """Équivalent de `v ?? default`."""
+    return default if v is None else v
+
+
+def get_lambda(m: Optional[Dict[str, Any]]) -> Optional[float]:
+    m = m or {}
+    from_column = _pf(m.get("valeur_lambda"))
+    if _fin(from_column) and from_column > 0:
+        return from_column
+    from_impacts = _pf((m.get("impacts") or {}).get("valeur_lambda"))
+    if _fin(from_impacts) and from_impacts > 0:
+        return from_impacts
+    from_r = _pf(m.get("valeur_r"))
+    if _is_isolant(m.get("category")) and _fin(from_r) and 0 < from_r < 0.5:
+        return from_r
+    return None
+
+
+def is_paroi_exterieure(paroi: Dict[str, Any]) -> bool:
+    ptype = _norm_str(paroi.get("type") or "")
+    if ptype == "cloison":
+        return False
+    if ptype in ("mur", "toiture", "plancher"):
+        return True
+    nom = _norm_str(paroi.get("nom") or "")
+    if "intermediaire" in nom or "interieur" in nom:
+        return False
+    if "exterieur" in nom or nom.startswith("ext"):
+        return True
+    if "toit" in nom:
+        return True
+    if "plancher" in nom or "sol bas" in nom:
+        return True
+    return False
+
+
+def is_paroi_eligible_ajout_isolant(paroi: Dict[str, Any]) -> bool:
+    if not is_paroi_exterieure(paroi):
+        return False
+    opaques = paroi.get("composantsOpaques") or []
+    if not any(not _is_isolant(co.get("category")) for co in opaques):
+        return False
+    return not any(_is_isolant(co.get("category")) for co in opaques)
+
+
+def get_composant_r(comp: Dict[str, Any]) -> Optional[float]:
+    r_local = _pf(comp.get("r_local"))
+    if _fin(r_local) and r_local > 0:
+        return r_local
+    r_cible = _pf(comp.get("r_cible"))
+    if _is_isolant(comp.get("category")) and _fin(r_cible) and r_cible > 0:
+        return r_cible
+    if not _is_isolant(comp.get("category")):
+        r_lib = _pf(comp.get("lambda_lib"))
+        if _fin(r_lib) and r_lib > 0:
+            return r_lib
+    return None
+
+
+def get_composant_r_effectif(comp: Dict[str, Any]) -> Optional[float]:
+    """R_eff = R_theorique × (eff/100)."""
+    r = get_composant_r(comp)
+    if r is None:
+        return None
+    return r * (_or(_pf(comp.get("efficacite")), 100) / 100)
+
+
+def generate_epaisseur_paliers(ep_actuelle: float, ep_iso_max: float, step: float = EP_ISO_STEP) -> List[float]:
+    """[epMin, epMid, epMax] dédupliqués (cm), ou [] si epMin > epIsoMax."""
+    ep_min = _ceil(max(ep_actuelle, step) / step) * step
+    if ep_min > ep_iso_max:
+        return []
+    ep_mid = _js_round(((ep_min + ep_iso_max) / 2) / step) * step
+    return _dedupe_paliers([ep_min, ep_mid, ep_iso_max], ep_iso_max)
+
+
+def _dedupe_paliers(paliers: List[float], ep_max: float) -> List[float]:
+    out: List[float] = []
+    for ep in paliers:
+        v = _js_round(ep * 100) / 100
+        if v not in out:
+            out.append(v)
+    return [ep for ep in out if ep <= ep_max + 0.01]
+
+
+def _choice_key(c: Dict[str, Any]) -> str:
+    return (
+        f"{c['compId']}:{c['type']}:{_js_str(c['material_id'])}"
+        + (f":e{_js_str(c['epaisseur_cm'])}" if c.get("epaisseur_cm") is not None else "")
+    )
+
+
+def make_combo_key(choices: List[Dict[str, Any]]) -> str:
+    """Signature stable (indépendante de l'ordre) d'un tableau de choices."""
+    return "|".join(_choice_key(c) for c in sorted(choices, key=lambda c: f"{c['compId']}{c['type']}"))
+
+
+def _chauffage(bat: Dict[str, Any]) -> Dict[str, Any]:
+    return next((o for o in CHAUFFAGE_OPTIONS if o["id"] == bat.get("moyen_chauffage")), CHAUFFAGE_OPTIONS[0])
+
+
+def _dvr_batiment(bat: Dict[str, Any]) -> Any:
+    dvr = bat.get("dvr_batiment")
+    return 60 if dvr is None else dvr
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Calculs ACV 2.0 (paroi / bâtiment)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def calc_composant_acv(co: Dict[str, Any], dvr_batiment: Any, s_opaque: float = 0) -> Dict[str, Any]:
+    dvr_bat = _or(_pf(dvr_batiment), 60)
+    dvr_mat = _pf(co.get("dvr_materiau"))
+    if not _fin(dvr_mat) or dvr_mat <= 0:
+        return {"valid": False, "errorMsg": "DVR matériau manquante - calcul ACV impossible"}
+    nb_cycles = _ceil(dvr_bat / dvr_mat)
+    surface = s_opaque
+    masse_kg = None
+    if _is_isolant(co.get("category")):
+        r_cible = _pf(co.get("r_cible"))
+        if not _fin(r_cible) or r_cible <= 0:
+            return {"valid": False, "errorMsg": "R cible non défini - calcul ACV impossible"}
+        flux_ref = _pf(co.get("flux_reference"))
+        if not _fin(flux_ref) or flux_ref <= 0:
+            return {"valid": False, "errorMsg": "Flux de référence manquant - calcul ACV impossible"}
+        qty = r_cible * flux_ref * surface
+        masse_kg = qty
+    else:
+        qty = surface
+        pu = _pf(co.get("poids_unite"))
+        if _fin(pu) and pu > 0:
+            masse_kg = pu * surface
+    impacts = co.get("impacts")
+    gwp = _nz(extract_impact(impacts, *_GWP_KEYS))
+    energy = _nz(extract_impact(impacts, *_ENERGY_KEYS))
+    sante = _nz(extract_impact(impacts, *_SANTE_KEYS))
+    m = _nz(masse_kg)
+    return {
+        "valid": True, "errorMsg": None, "qty": qty, "nb_cycles": nb_cycles,
+        "decon_valid": masse_kg is not None,
+        "gwp_brut":      gwp * qty,
+        "gwp_amorti":    gwp * qty * nb_cycles + m * DECON_IMPACTS_PER_KG["gwp100"] * nb_cycles,
+        "energy_brut":   energy * qty,
+        "energy_amorti": energy * qty * nb_cycles + m * DECON_IMPACTS_PER_KG["energy_nr"] * nb_cycles,
+        "sante_brut":    sante * qty,
+        "sante_amorti":  sante * qty * nb_cycles + m * DECON_IMPACTS_PER_KG["sante"] * nb_cycles,
+    }
+
+
+def calc_bv_impact_acv(bv: Dict[str, Any], dvr_batiment: Any) -> Dict[str, Any]:
+    dvr_bat = _or(_pf(dvr_batiment), 60)
+    qty = _or(_pf(bv.get("quantite")), 1)
+    sv = _or(_pf(bv.get("s_vitrage_unit")), 0) * qty
+    res = {
+        "valid": True, "decon_valid": True, "errors": [], "errorMsg": None,
+        "gwp_brut": 0.0, "gwp_amorti": 0.0, "energy_brut": 0.0, "energy_amorti": 0.0,
+        "sante_brut": 0.0, "sante_amorti": 0.0,
+    }
+
+    dvr_v = _pf(bv.get("dvr_materiau_vitrage"))
+    nc_v = _ceil(dvr_bat / dvr_v) if (_fin(dvr_v) and dvr_v > 0) else None
+    if nc_v is None:
+        res["valid"] = False
+        res["errors"].append("DVR vitrage manquante")
+    ncv = _nz(nc_v, 1)
+    gwp_v = _or(_pf(bv.get("gwp100_unit_vitrage")), None)
+    if gwp_v is None:
+        gwp_v = _or(_nz(extract_impact(bv.get("impacts"), *_GWP_KEYS), math.nan), 0)
+    energy_v = _nz(extract_impact(bv.get("impacts"), *_ENERGY_KEYS))
+    sante_v = _nz(extract_impact(bv.get("impacts"), *_SANTE_KEYS))
+    res["gwp_brut"] += gwp_v * sv
+    res["gwp_amorti"] += gwp_v * sv * ncv
+    res["energy_brut"] += energy_v * sv
+    res["energy_amorti"] += energy_v * sv * ncv
+    res["sante_brut"] += sante_v * sv
+    res["sante_amorti"] += sante_v * sv * ncv
+
+    pu_v = _pf(bv.get("poids_unite_vitrage"))
+    if _fin(pu_v) and pu_v > 0:
+        m_v = pu_v * sv
+        res["gwp_amorti"] += m_v * DECON_IMPACTS_PER_KG["gwp100"] * ncv
+        res["energy_amorti"] += m_v * DECON_IMPACTS_PER_KG["energy_nr"] * ncv
+        res["sante_amorti"] += m_v * DECON_IMPACTS_PER_KG["sante"] * ncv
+    else:
+        res["decon_valid"] = False
+
+    if bv.get("cadre_id"):
+        sc = _or(_pf(bv.get("s_cadre_unit")), 0) * qty
+        dvr_c = _pf(bv.get("dvr_materiau_cadre"))
+        nc_c = _ceil(dvr_bat / dvr_c) if (_fin(dvr_c) and dvr_c > 0) else None
+        if nc_c is None:
+            res["valid"] = False
+            res["errors"].append("DVR cadre manquante")
+        ncc = _nz(nc_c, 1)
+        imp_c = bv.get("impacts_cadre") or {}
+        gwp_c = _nz(extract_impact(imp_c, *_GWP_KEYS))
+        energy_c = _nz(extract_impact(imp_c, *_ENERGY_KEYS))
+        sante_c = _nz(extract_impact(imp_c, *_SANTE_KEYS))
+        res["gwp_brut"] += gwp_c * sc
+        res["gwp_amorti"] += gwp_c * sc * ncc
+        res["energy_brut"] += energy_c * sc
+        res["energy_amorti"] += energy_c * sc * ncc
+        res["sante_brut"] += sante_c * sc
+        res["sante_amorti"] += sante_c * sc * ncc
+
+        pu_c = _pf(bv.get("poids_unite_cadre"))
+        if _fin(pu_c) and pu_c > 0:
+            m_c = pu_c * sc
+            res["gwp_amorti"] += m_c * DECON_IMPACTS_PER_KG["gwp100"] * ncc
+            res["energy_amorti"] += m_c * DECON_IMPACTS_PER_KG["energy_nr"] * ncc
+            res["sante_amorti"] += m_c * DECON_IMPACTS_PER_KG["sante"] * ncc
+        else:
+            res["decon_valid"] = False
+    if not res["valid"]:
+        res["errorMsg"] = ", ".join(res["errors"]) + " - amortissement approx. (nc=1)"
+    return res
+
+
+def get_r_superficiel(ptype: Any) -> float:
+    t = (ptype or "").lower()
+    if t == "toiture":
+        return 0.14   # Rsi=0.10 + Rse=0.04 flux ascendant (EN ISO 6946)
+    if t == "plancher":
+        return 0.21   # Rsi=0.17 + Rse=0.04 flux descendant
+    if t == "cloison":
+        return 0.26   # Rsi=0.13 + Rsi=0.13 paroi intérieure
+    return 0.17       # Rsi=0.13 + Rse=0.04 flux horizontal (mur, fallback)
+
+
+def _bv_terms(bv: Dict[str, Any], dvr_batiment: Any) -> Dict[str, Any]:
+    """Contribution d'une baie vitrée aux stats de sa paroi."""
+    qty = _or(_pf(bv.get("quantite")), 1)
+    sv = max(0.0, _or(_pf(bv.get("s_vitrage_unit")), 0)) * qty
+    sc = max(0.0, _or(_pf(bv.get("s_cadre_unit")), 0)) * qty
+    s_bv = sv + sc
+    r_v = _pf(bv.get("r_vitrage_local")) if _pf(bv.get("r_vitrage_local")) > 0 else _pf(bv.get("valeur_r_vitrage"))
+    r_c = _pf(bv.get("r_cadre_local")) if _pf(bv.get("r_cadre_local")) > 0 else _pf(bv.get("valeur_r_cadre"))
+    legacy_r = _pf(bv.get("r_local")) if _pf(bv.get("r_local")) > 0 else _pf(bv.get("valeur_r"))
+    r_fen = None
+    if _fin(r_v) and r_v > 0 and s_bv > 0:
+        ua_v = sv / r_v if sv > 0 else 0
+        ua_c = sc / r_c if (_fin(r_c) and r_c > 0 and sc > 0) else 0
+        r_fen = s_bv / (ua_v + ua_c)
+    elif _fin(legacy_r) and legacy_r > 0:
+        r_fen = legacy_r
+    bv_eff = _or(_pf(bv.get("efficacite")), 100) / 100
+    s_count = s_bv if s_bv > 0 else max(0.0, _or(_pf(bv.get("surface_par_unite")), 0)) * qty
+    ua = 0.0
+    if s_count > 0 and r_fen is not None and _fin(r_fen) and r_fen > 0:
+        ua = s_count * (1 / r_fen) / bv_eff
+    prix_vitrage = _or(_pf(bv.get("prix_unit_vitrage")), _or(_pf(bv.get("prix_unit")), 0))
+    prix_cadre = _or(_pf(bv.get("prix_unit_cadre")), 0) if bv.get("cadre_id") else 0
+
+    bv_acv = calc_bv_impact_acv(bv, dvr_batiment)
+    return {
+        "s_count": s_count if s_count > 0 else 0.0,
+        "ua": ua,
+        "cout": prix_vitrage * sv + prix_cadre * sc,
+        **{k: bv_acv[k] for k in _ACV_KEYS},
+        "error": None if bv_acv["valid"] else {
+            "id": bv.get("id"), "name": bv.get("vitrage_name") or "BV", "errorMsg": bv_acv["errorMsg"],
+        },
+    }
+
+
+def _opaque_terms(co: Dict[str, Any], dvr_batiment: Any, s_opaque: float) -> Dict[str, Any]:
+    """Contribution d'un composant opaque (R, coût, ACV) aux stats de sa paroi."""
+    prix = _or(_pf(co.get("prix_unit")), 0)
+    cout = 0.0
+    if _is_isolant(co.get("category")):
+        rc = _pf(co.get("r_cible"))
+        fr = _pf(co.get("flux_reference"))
+        if _fin(rc) and rc > 0 and _fin(fr) and fr > 0:
+            cout = prix * rc * fr * s_opaque
+    else:
+        cout = prix * s_opaque
+
+    co_acv = calc_composant_acv(co, dvr_batiment, s_opaque)
+    return {
+        "r": get_composant_r_effectif(co),
+        "cout": cout,
+        **{k: co_acv.get(k, 0.0) for k in _ACV_KEYS},
+        "error": None if co_acv["valid"] else {
+            "id": co.get("id"), "name": co.get("material_name"), "errorMsg": co_acv["errorMsg"],
+        },
+    }
+
+
+def calc_paroi_stats(paroi: Dict[str, Any], dvr_batiment: Any = 60) -> Optional[Dict[str, Any]]:
+    s_tot = _pf(paroi.get("surface_totale"))
+    if not _fin(s_tot) or s_tot <= 0:
+        return None
+
+    s_vitree = 0.0
+    ua_vitree = 0.0
+    cout_vitree = 0.0
+    acc = dict.fromkeys(_ACV_KEYS, 0.0)
+    acv_errors = []
+
+    for bv in paroi.get("baiesVitrees") or []:
+        t = _bv_terms(bv, dvr_batiment)
+        s_vitree += t["s_count"]
+        ua_vitree += t["ua"]
+        cout_vitree += t["cout"]
+        for k in _ACV_KEYS:
+            acc[k] += t[k]
+        if t["error"]:
+            acv_errors.append(t["error"])
+
+    s_opaque = max(0.0, s_tot - s_vitree)
+
+    opaques = paroi.get("composantsOpaques") or []
+    r_total = 0.0
+    has_all_r = len(opaques) > 0
+    cout_opaque = 0.0
+    for co in opaques:
+        t = _opaque_terms(co, dvr_batiment, s_opaque)
+        if t["r"] is None:
+            has_all_r = False
+        else:
+            r_total += t["r"]
+        cout_opaque += t["cout"]
+        for k in _ACV_KEYS:
+            acc[k] += t[k]
+        if t["error"]:
+            acv_errors.append(t["error"])
+
+    r_superficiel = get_r_superficiel(paroi.get("type"))
+    u_opaque = 1 / (r_total + r_superficiel) if has_all_r else None
+    ua_opaque = u_opaque * s_opaque if u_opaque is not None else None
+    ua_total = ua_opaque + ua_vitree if ua_opaque is not None else None
+    u_moyen = ua_total / s_tot if ua_total is not None else None
+    dep_wk = u_moyen * s_tot if u_moyen is not None else None
+    cout = cout_opaque + cout_vitree
+
+    return {
+        "r_total": r_total if (has_all_r and r_total > 0) else None,
+        "u_opaque": u_opaque,
+        "u_moyen": u_moyen,
+        "dep_wk": dep_wk,
+        "s_vitree": s_vitree,
+        "s_opaque": s_opaque,
+        "S_tot": s_tot,
+        "cout": cout if cout > 0 else None,
+        "gwp": acc["gwp_brut"] if acc["gwp_brut"] > 0 else None,
+        **acc,
+        "acv_errors": acv_errors,
+    }
+
+
+def calc_batiment_stats(
+    bat: Dict[str, Any],
+    paroi_stats: Optional[List[Optional[Dict[str, Any]]]] = None,
+) -> Dict[str, Any]:
+    """Agrégat bâtiment ; `paroi_stats` permet de fournir des stats de parois déjà calculées."""
+    dj = _or(_pf(bat.get("degres_jours")), 1950.7)
+    ch = _chauffage(bat)
+    dvr_bat = _dvr_batiment(bat)
+    parois = bat.get("parois") or []
+    if paroi_stats is None:
+        paroi_stats = [calc_paroi_stats(p, dvr_bat) for p in parois]
+
+    total_dep = 0.0
+    all_have_dep = len(parois) > 0
+    total_cout = 0.0
+    acc = dict.fromkeys(_ACV_KEYS, 0.0)
+    acv_errors_count = 0
+
+    for s in paroi_stats:
+        if not s or s["dep_wk"] is None:
+            all_have_dep = False
+        else:
+            total_dep += s["dep_wk"]
+        if s and s["cout"]:
+            total_cout += s["cout"]
+        if s:
+            for k in acc:
+                acc[k] += s[k]
+            acv_errors_count += len(s["acv_errors"])
+
+    dep_wk = total_dep if all_have_dep else None
+    energy_kwh = (dep_wk * dj * 24) / 1000 / ch["rendement"] if dep_wk is not None else None
+    co2_exploitation = energy_kwh * ch["co2"] if energy_kwh is not None else None
+
+    return {
+        "dep_wk": dep_wk,
+        "energy_kwh": energy_kwh,
+        "co2_exploitation": co2_exploitation,
+        "total_cout": total_cout if total_cout > 0 else None,
+        "total_gwp": acc["gwp_brut"] if acc["gwp_brut"] > 0 else None,
+        **acc,
+        "acv_errors_count": acv_errors_count,
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Hash de configuration (identique à computeConfigHash du frontend)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def compute_config_hash(bat: Dict[str, Any], materials: List[Dict[str, Any]]) -> str:
+    changeables = []
+    for paroi in bat.get("parois") or []:
+        if paroi.get("is_fixed"):
+            continue
+        for co in paroi.get("composantsOpaques") or []:
+            if not co.get("is_fixed"):
+                changeables.append({
+                    "id": co.get("material_id"),
+                    "q": _js_str(_nz(co.get("surface_m2"), "")),
+                    "e": _js_str(_nz(co.get("efficacite"), 100)),
+                })
+        for bv in paroi.get("baiesVitrees") or []:
+            bv_spu = _pf(bv.get("surface_par_unite"))
+            if _fin(bv_spu) and bv_spu > 0:
+                bv_qs = js_num_str(_or(_pf(bv.get("quantite")), 1) * bv_spu)
+            else:
+                bv_qs = _js_str(_nz(bv.get("surface_vitree_m2"), ""))
+            if not bv.get("is_fixed"):
+                changeables.append({
+                    "id": bv.get("material_id"),
+                    "cadreId": bv.get("cadre_id"),
+                    "q": bv_qs,
+                    "e": _js_str(_nz(bv.get("efficacite"), 100)),
+                })
+    changeables.sort(key=lambda c: c["id"] or "")
+
+    mat_lib = [{
+        "i": m["id"],
+        "p": m.get("prix"),
+        "r": m.get("valeur_r"),
+        "g": extract_impact(m.get("impacts"), "gwp100", "gwp_100"),
+        "en": extract_impact(m.get("impacts"), "energy_nonrenewable_adp", "energy_nonrenewable"),
+        "sa": extract_impact(m.get("impacts"), "photochemical_oxidant_hh", "photochemical_oxidant"),
+        "dvr": m.get("dvr_materiau"),
+        "pw": m.get("poids_unite"),
+    } for m in materials]
+    mat_lib.sort(key=lambda m: m["i"])
+
+    ch = _chauffage(bat)
+    energy = {"dj": bat.get("degres_jours"), "rdt": ch["rendement"], "co2": ch["co2"]}
+    return _djb2_hash(_js_json({"changeables": changeables, "matLib": mat_lib, "energy": energy}))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Génération des slots et énumération des combinaisons
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _prix(m: Dict[str, Any]) -> float:
+    return _or(_pf(m.get("prix")), 0)
+
+
+def _r_at_least(m: Dict[str, Any], r_min: float) -> bool:
+    """Filtre de non-dégradation thermique : R du candidat ≥ R actuel."""
+    r = _pf(m.get("valeur_r"))
+    return _fin(r) and r > 0 and r >= r_min
+
+
+def _first(*vals: Any) -> Any:
+    """Équivalent de `a ?? b ?? …`."""
+    for v in vals:
+        if v is not None:
+            return v
+    return None
+
+
+def build_slots(
+    bat: Dict[str, Any],
+    materials: List[Dict[str, Any]],
+    ep_iso_max: float,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Slots substituables du bâtiment et composants figés par contrainte thermique."""
+    by_id = {m["id"]: m for m in materials}
+    slots: List[Dict[str, Any]] = []
+    fixed_due_to_constraint: List[Dict[str, Any]] = []
+
+    for paroi in bat.get("parois") or []:
+        if paroi.get("is_fixed"):
+            continue
+        p_stats = calc_paroi_stats(paroi)
+        s_opaque_paroi = p_stats["s_opaque"] if p_stats else _pf(paroi.get("surface_totale"))
+
+        for co in paroi.get("composantsOpaques") or []:
+            if co.get("is_fixed"):
+                continue
+            cur_mat = by_id.get(co.get("material_id"))
+            cur_cat = (cur_mat.get("category") or "Autre") if cur_mat else "Autre"
+
+            all_cat = sorted(
+                (m for m in materials
+                 if not _is_fenetre(m.get("category") or "Autre") and (m.get("category") or "Autre") == cur_cat),
+                key=_prix,
+            )
+            had_alternatives = any(m["id"] != co.get("material_id") for m in all_cat)
+
+            # Filtre de non-dégradation thermique : U_alternatif ≤ U_effectif_actuel
+            r_current_eff = get_composant_r_effectif(co)
+            if r_current_eff is not None and r_current_eff > 0:
+                def _keep(m, co=co, r_cur=r_current_eff):
+                    if m["id"] == co.get("material_id"):
+                        return True
+                    if _is_isolant(co.get("category")):
+                        return m.get("flux_reference") is not None and m["flux_reference"] > 0
+                    r_cand = _pf(m.get("valeur_r"))
+                    return _fin(r_cand) and r_cand > 0 and r_cand >= r_cur
+                all_cat = [m for m in all_cat if _keep(m)]
+                if had_alternatives and not any(m["id"] != co.get("material_id") for m in all_cat):
+                    fixed_due_to_constraint.append({
+                        "compName": co.get("material_name") or (cur_mat.get("name") if cur_mat else "?"),
+                        "paroiNom": paroi.get("nom"),
+                    })
+
+            alt_mats = all_cat[:PER_SLOT]
+            if cur_mat and not any(m["id"] == co.get("material_id") for m in alt_mats):
+                alt_mats = ([cur_mat] + alt_mats)[:PER_SLOT]
+
+            original_ep = None
+            r_co = _pf(co.get("r_cible"))
+            if _is_isolant(co.get("category")):
+                lam = get_lambda(cur_mat)
+                if _fin(r_co) and r_co > 0 and lam is not None and lam > 0:
+                    original_ep = _js_round(r_co * lam * 100 * 10) / 10
+
+            candidates: List[Dict[str, Any]] = []
+            if _is_isolant(co.get("category")):
+                # Isolants : paliers d'épaisseur par matériau candidat (Approche C)
+                for m in alt_mats:
+                    lam = get_lambda(m)
+                    if lam is None or lam <= 0:
+                        continue
+                    sq_ep = _js_round(r_co * lam * 100 * 10) / 10 if (_fin(r_co) and r_co > 0) else None
+                    if r_current_eff is not None and r_current_eff > 0:
+                        ep_actuelle = r_current_eff * lam * 100
+                    else:
+                        ep_actuelle = _nz(sq_ep, EP_ISO_STEP)
+                    paliers = generate_epaisseur_paliers(ep_actuelle, ep_iso_max, EP_ISO_STEP)
+                    if not paliers:
+                        continue
+                    # Insertion forcée du statu quo si même matériau et pas déjà présent
+                    if m["id"] == co.get("material_id") and sq_ep is not None:
+                        if not any(abs(ep - sq_ep) < 0.01 for ep in paliers):
+                            paliers = _dedupe_paliers([sq_ep] + paliers, ep_iso_max)
+                    for ep_cm in paliers:
+                        candidates.append({
+                            **co,
+                            "material_id": m["id"],
+                            "material_name": m.get("name"),
+                            "lambda_lib": lam,
+                            "r_local": "",
+                            "lambda_local": "",
+                            "r_cible": js_num_str((ep_cm / 100) / lam),
+                            "epaisseur_cm": js_num_str(ep_cm),
+                            "prix_unit": _prix(m),
+                            "gwp100_unit": _or(_nz(extract_impact(m.get("impacts"), *_GWP_KEYS), math.nan), 0),
+                            "impacts": m.get("impacts") or {},
+                            "dvr_materiau": _first(m.get("dvr_materiau"), co.get("dvr_materiau")),
+                            "flux_reference": _first(m.get("flux_reference"), co.get("flux_reference")),
+                            "efficacite": 100,
+                        })
+            else:
+                # Non-isolants : 1 candidat par matériau
+                for m in alt_mats:
+                    m_r = _pf(m.get("valeur_r"))
+                    r_from_lib = m_r if (_fin(m_r) and m_r > 0) else None
+                    if m["id"] == co.get("material_id"):
+                        r_local_value = co.get("r_local") or (js_num_str(r_from_lib) if r_from_lib is not None else "")
+                    else:
+                        r_local_value = js_num_str(r_from_lib) if r_from_lib is not None else (co.get("r_local") or "")
+                    candidates.append({
+                        **co,
+                        "material_id": m["id"],
+                        "material_name": m.get("name"),
+                        "lambda_lib": m_r,
+                        "r_local": r_local_value,
+                        "lambda_local": "",
+                        "prix_unit": _prix(m),
+                        "gwp100_unit": _or(_nz(extract_impact(m.get("impacts"), *_GWP_KEYS), math.nan), 0),
+                        "impacts": m.get("impacts") or {},
+                        "dvr_materiau": _first(m.get("dvr_materiau"), co.get("dvr_materiau")),
+                        "flux_reference": _first(m.get("flux_reference"), co.get("flux_reference")),
+                        "poids_unite": _first(m.get("poids_unite"), co.get("poids_unite")),
+                        "efficacite": 100,
+                    })
+
+            if candidates:
+                slots.append({
+                    "paroiId": paroi.get("id"), "compId": co.get("id"), "type": "opaque",
+                    "candidates": candidates, "originalId": co.get("material_id"),
+                    "originalEp": original_ep, "sOpaque": s_opaque_paroi,
+                })
+
+        for bv in paroi.get("baiesVitrees") or []:
+            if bv.get("is_fixed"):
+                continue
+            bv_quantite = _or(_pf(bv.get("quantite")), 1)
+            bv_vit_id = _first(bv.get("material_id"), bv.get("vitrage_id"))
+            bv_vit_name = _first(bv.get("vitrage_name"), bv.get("material_name"))
+
+            # ── Slot vitrage ──
+            all_fen = sorted((m for m in materials if _is_fenetre(m.get("category") or "Autre")), key=_prix)
+            had_vit_alternatives = any(m["id"] != bv_vit_id for m in all_fen)
+
+            bv_r_local = _pf(bv.get("r_vitrage_local")) if _pf(bv.get("r_vitrage_local")) > 0 else _pf(bv.get("r_local"))
+            if _fin(bv_r_local) and bv_r_local > 0:
+                bv_r = bv_r_local
+            else:
+                bv_r = _or(_pf(bv.get("valeur_r_vitrage")), _or(_pf(bv.get("valeur_r")), 0))
+            bv_eff = _or(_pf(bv.get("efficacite")), 100) / 100
+            bv_r_eff = bv_r * bv_eff if (_fin(bv_r) and bv_r > 0) else None
+            if bv_r_eff is not None and bv_r_eff > 0:
+                all_fen = [
+                    m for m in all_fen
+                    if m["id"] == bv_vit_id or _r_at_least(m, bv_r_eff)
+                ]
+                if had_vit_alternatives and not any(m["id"] != bv_vit_id for m in all_fen):
+                    fixed_due_to_constraint.append({"compName": bv_vit_name, "paroiNom": paroi.get("nom")})
+
+            vit_alt = all_fen[:PER_SLOT]
+            if not any(m["id"] == bv_vit_id for m in vit_alt) and bv_vit_id in by_id:
+                vit_alt = ([by_id[bv_vit_id]] + vit_alt)[:PER_SLOT]
+
+            vit_candidates = [{
+                "material_id": m["id"],
+                "material_name": m.get("name"),
+                "valeur_r_vitrage": _or(_pf(m.get("valeur_r")), 0),
+                "impacts": m.get("impacts") or {},
+                "dvr_materiau_vitrage": _first(m.get("dvr_materiau"), bv.get("dvr_materiau_vitrage")),
+                "poids_unite_vitrage": _first(m.get("poids_unite"), bv.get("poids_unite_vitrage")),
+                "prix_unit": _prix(m),
+            } for m in vit_alt]
+            if vit_candidates:
+                slots.append({
+                    "paroiId": paroi.get("id"), "compId": bv.get("id"), "type": "vitree_vitrage",
+                    "candidates": vit_candidates, "originalId": bv.get("material_id"),
+                    "bvQuantite": bv_quantite, "sVitrageUnit": _or(_pf(bv.get("s_vitrage_unit")), 0),
+                })
+
+            # ── Slot cadre (seulement si le BV a déjà un cadre) ──
+            if bv.get("cadre_id"):
+                cadre_mats = sorted(
+                    (m for m in materials if (m.get("category") or "").lower() == "cadre"), key=_prix,
+                )
+                bv_r_cadre = _pf(bv.get("r_cadre_local")) if _pf(bv.get("r_cadre_local")) > 0 else _pf(bv.get("valeur_r_cadre"))
+                if _fin(bv_r_cadre) and bv_r_cadre > 0:
+                    cadre_mats = [
+                        m for m in cadre_mats
+                        if m["id"] == bv["cadre_id"] or _r_at_least(m, bv_r_cadre)
+                    ]
+                cadre_alt = cadre_mats[:PER_SLOT]
+                if not any(m["id"] == bv["cadre_id"] for m in cadre_alt) and bv["cadre_id"] in by_id:
+                    cadre_alt = ([by_id[bv["cadre_id"]]] + cadre_alt)[:PER_SLOT]
+
+                cadre_candidates = [{
+                    "material_id": m["id"],
+                    "material_name": m.get("name"),
+                    "valeur_r_cadre": _or(_pf(m.get("valeur_r")), None),
+                    "dvr_materiau_cadre": _first(m.get("dvr_materiau"), bv.get("dvr_materiau_cadre")),
+                    "poids_unite_cadre": _first(m.get("poids_unite"), bv.get("poids_unite_cadre")),
+                    "impacts_cadre": m.get("impacts") or {},
+                    "prix_unit": _prix(m),
+                } for m in cadre_alt]
+                if cadre_candidates:
+                    slots.append({
+                        "paroiId": paroi.get("id"), "compId": bv.get("id"), "type": "vitree_cadre",
+                        "candidates": cadre_candidates, "originalId": bv["cadre_id"],
+                        "bvQuantite": bv_quantite, "sCadreUnit": _or(_pf(bv.get("s_cadre_unit")), 0),
+                    })
+
+        # ── Ajout d'isolant sur parois extérieures sans isolant ──
+        if is_paroi_eligible_ajout_isolant(paroi):
+            added: List[Dict[str, Any]] = []
+            for m in materials:
+                if not (_is_isolant(m.get("category")) and (m.get("flux_reference") or 0) > 0):
+                    continue
+                lam = get_lambda(m)
+                if lam is None or lam <= 0:
+                    continue
+                ep_min, ep_max = EP_ISO_STEP, ep_iso_max
+                if ep_min > ep_max:
+                    continue
+                ep_mid = _js_round(((ep_min + ep_max) / 2) / EP_ISO_STEP) * EP_ISO_STEP
+                for ep_cm in _dedupe_paliers([ep_min, ep_mid, ep_max], ep_max):
+                    added.append({
+                        "material_id": m["id"],
+                        "material_name": m.get("name"),
+                        "category": "Isolant",
+                        "r_cible": js_num_str((ep_cm / 100) / lam),
+                        "epaisseur_cm": js_num_str(ep_cm),
+                        "surface_m2": paroi.get("surface_totale"),
+                        "efficacite": 100,
+                        "flux_reference": m.get("flux_reference"),
+                        "dvr_materiau": m.get("dvr_materiau"),
+                        "impacts": m.get("impacts") or {},
+                        "prix_unit": _prix(m),
+                        "lambda_lib": lam,
+                        "r_local": "",
+                        "lambda_local": "",
+                        "is_added": True,
+                    })
+            if added:
+                added.append({
+                    "material_id": None, "material_name": "Pas d'ajout", "is_added": True, "is_noop": True,
+                    "r_cible": None, "epaisseur_cm": None, "surface_m2": 0, "prix_unit": 0,
+                })
+                slots.append({
+                    "paroiId": paroi.get("id"), "compId": f"{paroi.get('id')}__ADDED_ISOLANT",
+                    "type": "opaque", "isAdded": True, "originalId": None, "originalEp": None,
+                    "candidates": added, "sOpaque": s_opaque_paroi,
+                })
+
+    return slots, fixed_due_to_constraint
+
+
+def _patch_bv(bv: Dict[str, Any], slot: Dict[str, Any], cand: Dict[str, Any]) -> Dict[str, Any]:
+    """Baie vitrée avec le candidat vitrage ou cadre du slot appliqué."""
+    if slot["type"] == "vitree_vitrage":
+        patch = {
+            "material_id": cand["material_id"],
+            "material_name": cand["material_name"],
+            "valeur_r_vitrage": cand["valeur_r_vitrage"],
+            "impacts": cand["impacts"],
+            "dvr_materiau_vitrage": cand["dvr_materiau_vitrage"],
+            "prix_unit_vitrage": cand["prix_unit"],
+            "gwp100_unit_vitrage": extract_impact(cand["impacts"], *_GWP_KEYS),
+        }
+    else:  # vitree_cadre
+        patch = {
+            "cadre_id": cand["material_id"],
+            "cadre_name": cand["material_name"],
+            "valeur_r_cadre": cand["valeur_r_cadre"],
+            "dvr_materiau_cadre": cand["dvr_materiau_cadre"],
+            "impacts_cadre": cand["impacts_cadre"],
+            "prix_unit_cadre": cand["prix_unit"],
+        }
+    return {**bv, **patch}
+
+
+def _added_composant(slot: Dict[str, Any], cand: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Composant isolant ajouté par l'optimisation (None pour l'option « Pas d'ajout »)."""
+    if cand.get("is_noop"):
+        return None
+    return {
+        "id": f"{slot['compId']}:{cand['material_id']}",
+        "material_id": cand["material_id"],
+        "material_name": cand["material_name"],
+        "category": "Isolant",
+        "r_cible": cand["r_cible"],
+        "epaisseur_cm": cand["epaisseur_cm"],
+        "surface_m2": cand["surface_m2"],
+        "efficacite": 100,
+        "flux_reference": cand["flux_reference"],
+        "dvr_materiau": cand["dvr_materiau"],
+        "impacts": cand["impacts"],
+        "prix_unit": cand["prix_unit"],
+        "lambda_lib": cand["lambda_lib"],
+        "r_local": "",
+        "lambda_local": "",
+        "is_added_by_optimisation": True,
+    }
+
+
+def _renovation_cost(slot: Dict[str, Any], cand: Dict[str, Any]) -> float:
+    """Coût de rénovation du candidat (0 si le matériau d'origine est conservé)."""
+    if cand.get("material_id") == slot.get("originalId"):
+        return 0.0
+    if slot["type"] == "opaque":
+        s = _nz(slot.get("sOpaque"), 0)
+        if _is_isolant(cand.get("category")):
+            rc = _pf(cand.get("r_cible"))
+            fr = _pf(cand.get("flux_reference"))
+            qty = rc * fr * s if (_fin(rc) and rc > 0 and _fin(fr) and fr > 0) else 0
+        else:
+            qty = s
+    elif slot["type"] == "vitree_vitrage":
+        qty = _nz(slot.get("sVitrageUnit"), 0) * _nz(slot.get("bvQuantite"), 1)
+    else:
+        qty = _nz(slot.get("sCadreUnit"), 0) * _nz(slot.get("bvQuantite"), 1)
+    return (cand.get("prix_unit") or 0) * qty
+
+
+def _choice(slot: Dict[str, Any], cand: Dict[str, Any]) -> Dict[str, Any]:
+    opaque = slot["type"] == "opaque"
+    return {
+        "paroiId": slot["paroiId"], "compId": slot["compId"], "type": slot["type"],
+        "material_id": cand.get("material_id"), "material_name": cand.get("material_name"),
+        "prix_unit": cand.get("prix_unit"),
+        "epaisseur_cm": cand.get("epaisseur_cm") if opaque else None,
+        "r_cible": cand.get("r_cible") if opaque else None,
+        "isAdded": bool(slot.get("isAdded")),
+        "is_noop": bool(cand.get("is_noop")),
+    }
+
+
+def _statu_quo_part(slot: Dict[str, Any]) -> str:
+    """Fragment de make_combo_key correspondant au matériau d'origine du slot."""
+    return (
+        f"{slot['compId']}:{slot['type']}:{_js_str(slot['originalId'])}"
+        + (f":e{js_num_str(slot['originalEp'])}" if slot.get("originalEp") is not None else "")
+    )
+
+
+def _wall_table(
+    paroi: Dict[str, Any],
+    slot_ids: List[int],
+    slots: List[Dict[str, Any]],
+    dvr_batiment: Any,
+) -> Dict[str, Any]:
+    """Stats d'une paroi pour chaque choix joint de ses slots.
+
+    R, coût et impacts sont additifs par composant ; seul U = 1/(ΣR + Rsi+Rse) est
+    non linéaire, d'où une table par paroi plutôt que par slot. Les additions suivent
+    l'ordre de calc_paroi_stats (baies vitrées puis composants opaques).
+    """
+    radices = [len(slots[j]["candidates"]) for j in slot_ids]
+    strides = _strides(radices)
+    size = math.prod(radices)
+    s_tot = _pf(paroi.get("surface_totale"))
+    if not _fin(s_tot) or s_tot <= 0:
+        # calc_paroi_stats → None : paroi ignorée, déperditions du bâtiment indéterminées
+        return {"slots": slot_ids, "strides": strides, "size": size, "u_moyen": None,
+                "dep_wk": np.full(size, math.nan), "cout": np.zeros(size),
+                **{k: np.zeros(size) for k in _ACV_KEYS}}
+    local = np.arange(size, dtype=np.int64)
+    digit = {j: (local // st) % k for j, st, k in zip(slot_ids, strides, radices)}
+
+    def unit(base, js, apply, terms):
+        """(indices par choix joint, termes par option) d'un composant piloté par les slots `js`."""
+        options = []
+        for picks in itertools.product(*(slots[j]["candidates"] for j in js)):
+            cur = base
+            for j, cand in zip(js, picks):
+                cur = apply(cur, slots[j], cand)
+            options.append(terms(cur))
+        ix = np.zeros(size, dtype=np.int64)
+        for j, k in zip(js, _strides([len(slots[j]["candidates"]) for j in js])):
+            ix = ix + digit[j] * k
+        return ix, options
+
+    def gather(ix, options, key, none=math.nan):
+        return np.array([none if o[key] is None else o[key] for o in options], dtype=float)[ix]
+
+    bv_units = [
+        unit(bv, [j for j in slot_ids if slots[j]["type"] != "opaque" and slots[j]["compId"] == bv.get("id")],
+             _patch_bv, lambda b: _bv_terms(b, dvr_batiment))
+        for bv in paroi.get("baiesVitrees") or []
+    ]
+    s_vitree = 0.0
+    for _ix, options in bv_units:
+        s_vitree += options[0]["s_count"]   # géométrie indépendante du vitrage/cadre retenu
+    s_opaque = max(0.0, s_tot - s_vitree)
+
+    zero = {"r": 0.0, "cout": 0.0, **dict.fromkeys(_ACV_KEYS, 0.0)}
+    opaque_terms = lambda co: zero if co is None else _opaque_terms(co, dvr_batiment, s_opaque)  # noqa: E731
+    opaques = paroi.get("composantsOpaques") or []
+    op_units = [
+        unit(co, [j for j in slot_ids
+                  if slots[j]["type"] == "opaque" and not slots[j].get("isAdded") and slots[j]["compId"] == co.get("id")],
+             lambda _cur, _slot, cand: cand, opaque_terms)
+        for co in opaques
+    ]
+    added = [j for j in slot_ids if slots[j].get("isAdded")]
+    add_units = [unit(None, [j], lambda _cur, slot, cand: _added_composant(slot, cand), opaque_terms) for j in added]
+
+    ua_vitree = np.zeros(size)
+    cout_vitree = np.zeros(size)
+    acc = {k: np.zeros(size) for k in _ACV_KEYS}
+    for ix, options in bv_units:
+        ua_vitree = ua_vitree + gather(ix, options, "ua")
+        cout_vitree = cout_vitree + gather(ix, options, "cout")
+        for k in _ACV_KEYS:
+            acc[k] = acc[k] + gather(ix, options, k)
+
+    r_total = np.zeros(size)
+    n_opaques = np.full(size, len(opaques))
+    cout_opaque = np.zeros(size)
+    for ix, options in op_units + add_units:
+        r_total = r_total + gather(ix, options, "r")
+        cout_opaque = cout_opaque + gather(ix, options, "cout")
+        for k in _ACV_KEYS:
+            acc[k] = acc[k] + gather(ix, options, k)
+    for j, (ix, _options) in zip(added, add_units):
+        n_opaques = n_opaques + np.array([0 if c.get("is_noop") else 1 for c in slots[j]["candidates"]])[ix]
+    r_total = np.where(n_opaques > 0, r_total, math.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u_opaque = 1 / (r_total + get_r_superficiel(paroi.get("type")))
+    u_moyen = (u_opaque * s_opaque + ua_vitree) / s_tot
+    cout = cout_opaque + cout_vitree
+    return {
+        "slots": slot_ids,
+        "strides": strides,
+        "size": size,
+        "u_moyen": u_moyen,
+        "dep_wk": u_moyen * s_tot,
+        "cout": np.where(cout > 0, cout, 0.0),
+        **acc,
+    }
+
+
+def _strides(radices: List[int]) -> List[int]:
+    """Poids de chaque position en base mixte (premier slot = poids fort, comme la récursion d'origine)."""
+    out = []
+    w = 1
+    for k in reversed(radices):
+        out.append(w)
+        w *= k
+    return out[::-1]
+
+
+def _opt(x: Any) -> Optional[float]:
+    x = float(x)
+    return None if math.isnan(x) else x
+
+
+class CombinationLimitError(ValueError):
+    """Espace de combinaisons (ou front de Pareto) trop grand pour être exploré."""
+
+    def __init__(self, size: int, reason: Optional[str] = None):
+        self.size = size
+        super().__init__(
+            f"{reason or f'{size} combinaisons à évaluer (maximum {MAX_COMBOS})'} : "
+            "fixez certaines parois ou réduisez l'épaisseur d'isolant maximale."
+        )
+
+
+class CombinationSpace:
+    """Ensemble des combinaisons de substitution d'un bâtiment.
+
+    Une combinaison est un entier en base mixte sur les slots (même ordre que la
+    récursion `enumerate` du frontend). Ses métriques s'obtiennent en sommant, paroi
+    par paroi, des lignes de tables précalculées (`_wall_table`) : l'évaluation se
+    fait par blocs NumPy, sans reconstruire de bâtiment, avec les mêmes additions
+    flottantes que calc_batiment_stats.
+    """
+
+    def __init__(self, bat: Dict[str, Any], slots: List[Dict[str, Any]]):
+        self.bat = bat
+        self.slots = slots
+        self.radices = [len(s["candidates"]) for s in slots]
+        self.strides = _strides(self.radices)
+        self.size = math.prod(self.radices)
+
+        dvr_bat = _dvr_batiment(bat)
+        self._dj = _or(_pf(bat.get("degres_jours")), 1950.7)
+        self._rendement = _chauffage(bat)["rendement"]
+        self._renov = [np.array([_renovation_cost(s, c) for c in s["candidates"]], dtype=float) for s in slots]
+        self._walls = [
+            _wall_table(p, [j for j, s in enumerate(slots) if s["paroiId"] == p.get("id")], slots, dvr_bat)
+            for p in bat.get("parois") or []
+        ]
+        # Cas nominal : chaque slot appartient à une seule paroi et les slots d'une paroi
+        # se suivent → indice = base mixte sur les choix joints des parois (broadcast).
+        self._by_wall = [j for w in self._walls for j in w["slots"]] == list(range(len(slots)))
+
+        # Statu quo : premier candidat de chaque slot reproduisant le matériau d'origine
+        sq_index = 0
+        for s, st in zip(slots, self.strides):
+            part = _statu_quo_part(s)
+            k = next((k for k, c in enumerate(s["candidates"]) if _choice_key(_choice(s, c)) == part), None)
+            if k is None:
+                sq_index = None
+                break
+            sq_index += k * st
+        self.statu_quo = sq_index
+
+    def digits(self, idx: np.ndarray) -> List[np.ndarray]:
+        """Indice de candidat retenu pour chaque slot."""
+        return [(idx // st) % k for st, k in zip(self.strides, self.radices)]
+
+    def _metrics(self, renov, dep, cout, acc) -> Dict[str, np.ndarray]:
+        return {
+            "cost": np.where(cout > 0, cout, 0.0),
+            "renovation_cost": renov,
+            "gwp": np.where(acc["gwp_brut"] > 0, acc["gwp_brut"], 0.0),
+            "gwp_amorti": acc["gwp_amorti"],
+            "energy_amorti": acc["energy_amorti"],
+            "sante_amorti": acc["sante_amorti"],
+            "energy_kwh": (dep * self._dj * 24) / 1000 / self._rendement,
+            "dep_wk": dep,
+        }
+
+    def evaluate(self, idx: np.ndarray, with_walls: bool = False) -> Dict[str, Any]:
+        """Métriques (tableaux) des combinaisons d'indices `idx`."""
+        dig = self.digits(idx)
+        n = len(idx)
+        renov = np.zeros(n)
+        for j, table in enumerate(self._renov):
+            renov = renov + table[dig[j]]
+
+        dep = np.zeros(n) if self._walls else np.full(n, math.nan)
+        cout = np.zeros(n)
+        acc = {k: np.zeros(n) for k in _ACV_KEYS}
+        u_moyens = []
+        for w in self._walls:
+            wi = np.zeros(n, dtype=np.int64)
+            for j, st in zip(w["slots"], w["strides"]):
+                wi = wi + dig[j] * st
+            dep = dep + w["dep_wk"][wi]
+            cout = cout + w["cout"][wi]
+            for k in _ACV_KEYS:
+                acc[k] = acc[k] + w[k][wi]
+            u_moyens.append(None if w["u_moyen"] is None else w["u_moyen"][wi])
+
+        out = self._metrics(renov, dep, cout, acc)
+        if with_walls:
+            out["u_moyens"] = u_moyens
+        return out
+
+    def chunks(self) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        """Parcourt tout l'espace : (indice du premier élément, métriques du bloc)."""
+        if self.size > MAX_COMBOS:
+            raise CombinationLimitError(self.size)
+        if not self._by_wall:
+            for start in range(0, self.size, _CHUNK):
+                yield start, self.evaluate(np.arange(start, min(self.size, start + _CHUNK), dtype=np.int64))
+            return
+
+        # Les dernières parois (≤ _CHUNK choix joints) forment les axes d'un bloc
+        # broadcasté ; les premières sont parcourues par lignes de ce bloc.
+        sizes = [w["size"] for w in self._walls]
+        split, tail = len(sizes), 1
+        while split > 0 and tail * sizes[split - 1] <= _CHUNK:
+            split -= 1
+            tail *= sizes[split]
+        if split == len(sizes) and split > 0:
+            split -= 1
+            tail = sizes[split]
+        head_strides = _strides(sizes[:split])
+        n_head = math.prod(sizes[:split])
+        rows = max(1, _CHUNK // tail)
+        n_axes = len(sizes) - split
+        renov_terms = [
+            (i, self._renov[j][(np.arange(w["size"]) // st) % self.radices[j]])
+            for i, w in enumerate(self._walls) for j, st in zip(w["slots"], w["strides"])
+        ]
+
+        for h0 in range(0, n_head, rows):
+            h = np.arange(h0, min(n_head, h0 + rows), dtype=np.int64)
+
+            def term(i, vec):
+                if i < split:
+                    return vec[(h // head_strides[i]) % sizes[i]].reshape((len(h),) + (1,) * n_axes)
+                shape = [1] * (1 + n_axes)
+                shape[1 + i - split] = sizes[i]
+                return vec.reshape(shape)
+
+            def total(terms):
+                acc = 0.0
+                for i, vec in terms:
+                    acc = acc + term(i, vec)
+                return np.broadcast_to(acc, (len(h), *sizes[split:])).reshape(-1)
+
+            renov = total(renov_terms)
+            dep = total([(i, w["dep_wk"]) for i, w in enumerate(self._walls)])
+            cout = total([(i, w["cout"]) for i, w in enumerate(self._walls)])
+            acc = {k: total([(i, w[k]) for i, w in enumerate(self._walls)]) for k in _ACV_KEYS}
+            yield h0 * tail, self._metrics(renov, dep, cout, acc)
+
+    def combos(self, idx: Any) -> List[Dict[str, Any]]:
+        """Combinaisons matérialisées (format historique de buildCombinations)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        m = self.evaluate(idx, with_walls=True)
+        dig = self.digits(idx)
+        out = []
+        for r in range(len(idx)):
+            out.append({
+                "cost": float(m["cost"][r]),
+                "renovation_cost": float(m["renovation_cost"][r]),
+                "gwp": float(m["gwp"][r]),
+                "gwp_amorti": float(m["gwp_amorti"][r]),
+                "energy_amorti": float(m["energy_amorti"][r]),
+                "sante_amorti": float(m["sante_amorti"][r]),
+                "energy_kwh": _opt(m["energy_kwh"][r]),
+                "dep_wk": _opt(m["dep_wk"][r]),
+                "choices": [_choice(s, s["candidates"][int(d[r])]) for s, d in zip(self.slots, dig)],
+                "paroi_u_moyens": [None if u is None else _opt(u[r]) for u in m["u_moyens"]],
+            })
+        return out
+
+
+class _Best:
+    """Minimum courant sur un flux de blocs.
+
+    Les ex aequo sont départagés dans l'ordre de présentation des combinaisons
+    (statu quo `sq` en tête, puis ordre d'énumération) : premier rencontré, ou
+    dernier si `last` (équivalent de reduce((a, b) => a < b ? a : b)).
+    """
+
+    def __init__(self, sq: Optional[int] = None, last: bool = False):
+        self.sq = sq
+        self.last = last
+        self.value = math.inf
+        self.index: Optional[int] = None
+        self.sq_value: Optional[float] = None
+
+    def update(self, start: int, values: np.ndarray, mask: np.ndarray) -> None:
+        """Bloc contigu commençant à l'indice `start` ; seuls les éléments de `mask` comptent."""
+        pos = np.flatnonzero(mask)
+        self.update_at(start + pos, values[pos])
+
+    def update_at(self, idx: np.ndarray, values: np.ndarray) -> None:
+        """Éléments d'indices `idx` (croissants)."""
+        if self.sq is not None:
+            at_sq = idx == self.sq
+            if at_sq.any():
+                self.sq_value = values[at_sq][0]
+                idx, values = idx[~at_sq], values[~at_sq]
+        if not idx.size:
+            return
+        v = values.min()
+        ties = idx[values == v]
+        i = int(ties[-1] if self.last else ties[0])
+        if self.index is None or v < self.value:
+            self.value, self.index = v, i
+        elif v == self.value:
+            self.index = max(i, self.index) if self.last else min(i, self.index)
+
+    def result(self) -> Optional[int]:
+        if self.sq_value is None:
+            return self.index
+        if self.index is None or self.sq_value < self.value:
+            return self.sq
+        if self.sq_value == self.value and not self.last:
+            return self.sq
+        return self.index
+
+
+class _TopK:
+    """k premières combinaisons selon (primary, secondary), ex aequo dans l'ordre d'énumération."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.idx = np.empty(0, dtype=np.int64)
+        self.primary = np.empty(0)
+        self.secondary = np.empty(0)
+
+    def update(self, start: int, primary: np.ndarray, secondary: np.ndarray, mask: Optional[np.ndarray] = None) -> None:
+        cand = np.arange(len(primary)) if mask is None else np.flatnonzero(mask)
+        if cand.size > self.k:
+            threshold = np.partition(primary[cand], self.k - 1)[self.k - 1]
+            cand = cand[primary[cand] <= threshold]
+        idx = np.concatenate([self.idx, start + cand])
+        p = np.concatenate([self.primary, primary[cand]])
+        s = np.concatenate([self.secondary, secondary[cand]])
+        keep = np.lexsort((idx, s, p))[:self.k]
+        self.idx, self.primary, self.secondary = idx[keep], p[keep], s[keep]
+
+
+class _DisplaySelection:
+    """Combinaisons renvoyées au client (filtres CSP de l'onglet), statu quo en tête.
+
+    Toutes si l'ensemble est petit ; sinon les meilleures par coût, par GWP et par
+    économie d'énergie. Les solutions phares, elles, portent sur l'ensemble complet.
+    Les indices sont des positions dans les blocs parcourus (`sq` : position du statu quo).
+    """
+
+    def __init__(self, bat: Dict[str, Any], size: int, sq: Optional[int]):
+        self.size = size
+        self.sq = sq
+        self.sq_energy = calc_batiment_stats(bat)["energy_kwh"]
+        self.axes = [_TopK(COMBOS_PER_AXIS) for _ in range(3)]
+
+    def update(self, start: int, m: Dict[str, np.ndarray]) -> None:
+        if self.size <= COMBOS_LIST_MAX:
+            return
+        by_cost, by_gwp, by_saving = self.axes
+        by_cost.update(start, m["cost"], m["gwp"])
+        by_gwp.update(start, m["gwp"], m["cost"])
+        if self.sq_energy is not None:
+            e = m["energy_kwh"]
+            by_saving.update(start, -(self.sq_energy - e), m["cost"], ~np.isnan(e))
+
+    def result(self) -> List[int]:
+        if self.size <= COMBOS_LIST_MAX:
+            order = list(range(self.size))
+        else:
+            order = list(dict.fromkeys(int(i) for t in self.axes for i in t.idx))
+        if self.sq is not None and self.sq in order and order[0] != self.sq:
+            order.remove(self.sq)
+            order.insert(0, self.sq)
+        return order
+
+
+def evaluate_combinations(
+    bat: Dict[str, Any],
+    materials: List[Dict[str, Any]],
+    ep_isolant_max: Any = None,
+) -> Tuple[Optional[CombinationSpace], List[Dict[str, Any]]]:
+    """Espace des combinaisons du bâtiment (None s'il n'y a aucun slot) et composants figés."""
+    ep = _pf(ep_isolant_max)
+    ep_iso_max = ep if (_fin(ep) and ep > 0) else EP_ISO_MAX_DEFAULT
+    slots, fixed = build_slots(bat, materials, ep_iso_max)
+    return (CombinationSpace(bat, slots) if slots else None), fixed
+
+
+def build_combinations(
+    bat: Dict[str, Any],
+    materials: List[Dict[str, Any]],
+    ep_isolant_max: Any = None,
+) -> Dict[str, Any]:
+    """Combinaisons de substitution renvoyées au client.
+
+    Retourne {"combos": [...], "fixed_components": [...]} ; le statu quo est
+    placé en position 0 lorsqu'il fait partie des combinaisons retenues.
+    """
+    space, fixed = evaluate_combinations(bat, materials, ep_isolant_max)
+    if space is None:
+        return {"combos": [], "fixed_components": fixed}
+    display = _DisplaySelection(bat, space.size, space.statu_quo)
+    if space.size > COMBOS_LIST_MAX:
+        for start, m in space.chunks():
+            display.update(start, m)
+    return {"combos": space.combos(display.result()), "fixed_components": fixed}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Front de Pareto (coût / GWP amorti / énergie)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _pareto_mask(points: np.ndarray) -> np.ndarray:
+    """Points non dominés (minimisation, 3 colonnes) ; entre doublons, le premier est gardé.
+
+    Balayage par coût croissant avec un escalier (GWP croissant, énergie
+    strictement décroissante) des points déjà retenus.
+    """
+    n = len(points)
+    order = np.lexsort((np.arange(n), points[:, 2], points[:, 1], points[:, 0]))
+    keep = np.zeros(n, dtype=bool)
+    gs: List[float] = []
+    es: List[float] = []
+    for i, g, e in zip(order.tolist(), points[order, 1].tolist(), points[order, 2].tolist()):
+        k = bisect.bisect_right(gs, g)
+        if k and es[k - 1] <= e:
+            continue
+        keep[i] = True
+        lo = k - 1 if (k and gs[k - 1] == g) else k
+        hi = k
+        while hi < len(gs) and es[hi] >= e:
+            hi += 1
+        gs[lo:hi] = [g]
+        es[lo:hi] = [e]
+    return keep
+
+
+def _strictly_dominated(points: np.ndarray, by: np.ndarray) -> np.ndarray:
+    """Points strictement dominés par au moins un point de `by`."""
+    out = np.zeros(len(points), dtype=bool)
+    for b in by:
+        out |= np.all(b <= points, axis=1) & np.any(b < points, axis=1)
+    return out
+
+
+def _pareto_indices(space: CombinationSpace) -> List[int]:
+    """Front de Pareto exact (coût, GWP amorti, énergie) de l'espace, trié par coût.
+
+    Le coût est le coût de rénovation pour un bâtiment en rénovation, le coût total
+    sinon (mêmes axes que les profils phares). Les trois objectifs sont additifs par
+    paroi : les choix dominés au sein d'une paroi sont écartés, puis les parois sont
+    combinées une à une en ne gardant que les solutions partielles non dominées.
+    Une solution partielle est aussi abandonnée (branch-and-bound) si sa borne
+    inférieure — somme partielle + minimum de chaque objectif sur les parois restantes —
+    est strictement dominée par une solution complète déjà connue.
+    """
+    renovation = space.bat.get("type_batiment") == "renovation"
+    if not space._by_wall:
+        # Slots partagés entre parois (identifiants dupliqués) : pas de décomposition
+        parts = []
+        for start, m in space.chunks():
+            pts = _objectives(m["renovation_cost"] if renovation else m["cost"], m["gwp_amorti"], m["dep_wk"])
+            keep = np.flatnonzero(_pareto_mask(pts))
+            parts.append((start + keep, pts[keep]))
+        idx = np.concatenate([p[0] for p in parts])
+        pts = np.concatenate([p[1] for p in parts])
+        keep = _pareto_mask(pts)
+        return _by_cost(idx[keep], pts[keep])
+
+    if space.size >= 1 << 62:
+        raise CombinationLimitError(space.size, "indices de combinaison hors de portée")
+
+    # Objectifs par choix joint de chaque paroi, choix dominés écartés
+    walls = []
+    for w in space._walls:
+        local = np.arange(w["size"])
+        renov = np.zeros(w["size"])
+        for j, st in zip(w["slots"], w["strides"]):
+            renov = renov + space._renov[j][(local // st) % space.radices[j]]
+        pts = _objectives(renov if renovation else w["cout"], w["gwp_amorti"], w["dep_wk"])
+        keep = np.flatnonzero(_pareto_mask(pts))
+        walls.append((keep, pts[keep]))
+
+    # Bornes sur les parois restantes (sommées dans l'ordre des parois, comme les totaux)
+    n = len(walls)
+    mins = [pts.min(axis=0) for _keep, pts in walls]
+    greedy = [[pts[np.argmin(pts[:, o])] for _keep, pts in walls] for o in range(3)]
+
+    def complete(vals, k, per_wall):
+        for w in range(k, n):
+            vals = vals + per_wall[w]
+        return vals
+
+    vals = np.zeros((1, 3))
+    picks = np.zeros((1, 0), dtype=np.int64)
+    incumbents = np.empty((0, 3))
+    for k, (options, pts) in enumerate(walls):
+        cand = (vals[:, None, :] + pts[None, :, :]).reshape(-1, 3)
+        if len(cand) > MAX_PARETO_CANDIDATES:
+            raise CombinationLimitError(
+                space.size, f"front de Pareto trop large ({len(cand)} solutions partielles, "
+                f"maximum {MAX_PARETO_CANDIDATES})",
+            )
+        keep = np.flatnonzero(_pareto_mask(cand))
+        if k + 1 < n and len(incumbents):
+            keep = keep[~_strictly_dominated(complete(cand[keep], k + 1, mins), incumbents)]
+        vals = cand[keep]
+        picks = np.concatenate([picks[keep // len(options)], options[keep % len(options)][:, None]], axis=1)
+        if k + 1 < n:
+            found = np.concatenate([incumbents] + [complete(vals, k + 1, g) for g in greedy])
+            incumbents = found[_pareto_mask(found)]
+            if len(incumbents) > _MAX_INCUMBENTS:
+                incumbents = incumbents[np.linspace(0, len(incumbents) - 1, _MAX_INCUMBENTS).astype(int)]
+
+    idx = np.zeros(len(vals), dtype=np.int64)
+    for w, wall in enumerate(space._walls):
+        for j, st in zip(wall["slots"], wall["strides"]):
+            idx = idx + ((picks[:, w] // st) % space.radices[j]) * space.strides[j]
+    return _by_cost(idx, vals)
+
+
+def _objectives(cost: np.ndarray, gwp: np.ndarray, dep: np.ndarray) -> np.ndarray:
+    """Matrice (n, 3) à minimiser ; déperditions indéterminées → +inf."""
+    return np.column_stack([cost, gwp, np.where(np.isnan(dep), math.inf, dep)])
+
+
+def _by_cost(idx: np.ndarray, pts: np.ndarray) -> List[int]:
+    return [int(i) for i in idx[np.lexsort((idx, pts[:, 2], pts[:, 1], pts[:, 0]))]]
+
+
+def pareto_front(
+    bat: Dict[str, Any],
+    materials: List[Dict[str, Any]],
+    ep_isolant_max: Any = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Combinaisons non dominées sur (coût, GWP amorti, énergie), sans énumérer l'espace.
+
+    Le front complet est calculé ; seule la page [offset, offset + limit) (par coût
+    croissant) est matérialisée.
+    """
+    space, fixed = evaluate_combinations(bat, materials, ep_isolant_max)
+    front = _pareto_indices(space) if space else []
+    page = front[offset:] if limit is None else front[offset:offset + limit]
+    return {
+        "hash": compute_config_hash(bat, materials),
+        "front": space.combos(page) if page else [],
+        "front_size": len(front),
+        "combos_total": space.size if space else 0,
+        "fixed_components": fixed,
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Solutions phares
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _efficiency_bits(e: np.ndarray) -> np.ndarray:
+    """16 bits de poids fort des flottants positifs (ordre préservé) pour l'histogramme du p75."""
+    return (e.view(np.uint64) >> np.uint64(48)).astype(np.int64)
+
+
+def _phares_indices(
+    chunks,
+    bat: Dict[str, Any],
+    prix_kwh: Optional[float] = None,
+    sq: Optional[int] = None,
+    on_chunk=None,
+) -> Dict[str, Optional[int]]:
+    """Indices des profils économique, écologique, ROI et TOPSIS 2.0.
+
+    `chunks()` parcourt les combinaisons par blocs (cf. CombinationSpace.chunks) ;
+    `sq` est l'indice du statu quo, présenté en tête pour départager les ex aequo ;
+    `on_chunk(start, m)` est appelé sur chaque bloc de la première passe.
+    Deux passes : la première pour les minima et les normes TOPSIS, la seconde pour
+    les scores TOPSIS (le p75 des efficacités est localisé par histogramme).
+    """
+    sq_st = calc_batiment_stats(bat)
+    is_renovation = bat.get("type_batiment") == "renovation"
+    sq_cost = 0 if is_renovation else _nz(sq_st["total_cout"])
+    sq_energy = sq_st["energy_kwh"]
+    sq_gwp_amorti = sq_st["gwp_amorti"]
+    price = _first(prix_kwh, PRIX_KWH_BY_CHAUFFAGE.get(bat.get("moyen_chauffage")), 0.20)
+    co2_dvr = (_chauffage(bat)["co2"], _dvr_batiment(bat))
+
+    economique = _Best(sq, last=is_renovation)
+    n_renov = 0
+    ecologique, eco_gwp = _Best(sq), {}
+    min_gwp = _Best(sq)
+    roi = _Best(sq)
+    first_valid = _Best(sq)
+    n_valid = 0
+    sumsq = np.zeros(5)
+    lo = np.full(5, math.inf)
+    hi = np.full(5, -math.inf)
+    hist = np.zeros(1 << 16, dtype=np.int64)
+
+    def columns(m, valid):
+        sel = slice(None) if valid.all() else valid
+        energy = m["energy_kwh"][sel]
+        invest = m["renovation_cost"][sel] if is_renovation else m["cost"][sel] - sq_cost
+        savings = (sq_energy - energy) * price if sq_energy is not None else np.zeros(len(energy))
+        cols = [invest, savings, m["gwp_amorti"][sel], m["energy_amorti"][sel], m["sante_amorti"][sel]]
+        delta_gwp = sq_gwp_amorti - cols[2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            eff = np.where(invest <= 0, math.inf, np.where(delta_gwp <= 0, 0.0, delta_gwp / invest))
+        return cols, eff
+
+    for start, m in chunks():
+        if on_chunk is not None:
+            on_chunk(start, m)
+        cost, renov, energy, gwp_am = m["cost"], m["renovation_cost"], m["energy_kwh"], m["gwp_amorti"]
+        every = np.ones(len(cost), dtype=bool)
+        valid = ~np.isnan(energy)
+
+        if is_renovation:
+            with_renov = renov > 0
+            n_renov += int(with_renov.sum())
+            economique.update(start, renov, with_renov)
+        else:
+            economique.update(start, cost, every)
+
+        # Profil Écologique : minimise GWP_amorti + CO₂_exploitation × DVR_bâtiment
+        score = gwp_am + energy * co2_dvr[0] * co2_dvr[1]
+        ecologique.update(start, score, valid)
+        min_gwp.update(start, gwp_am, every)
+        eco_gwp.update({i: gwp_am[i - start] for i in (ecologique.index, sq) if i is not None and start <= i < start + len(cost)})
+
+        if sq_energy is not None:
+            invest = renov if is_renovation else cost - sq_cost
+            if is_renovation:
+                cands = (renov > 0) & valid & ((sq_energy - energy) > 0)
+            else:
+                cands = (cost > sq_cost) & valid
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = (sq_energy - energy) * price * ROI_HORIZON_YEARS / invest
+            roi.update(start, -ratio, cands)
+
+        first_valid.update(start, np.zeros(len(cost)), valid)
+        n_valid += int(valid.sum())
+        if valid.any():
+            cols, eff = columns(m, valid)
+            for c, v in enumerate(cols):
+                sumsq[c] += float(np.sum(v * v))
+                lo[c] = min(lo[c], v.min())
+                hi[c] = max(hi[c], v.max())
+            pos = eff[np.isfinite(eff) & (eff > 0)]
+            hist += np.bincount(_efficiency_bits(pos), minlength=1 << 16)
+
+    if is_renovation and n_renov == 0:
+        economique_i = 0 if sq is None else sq
+    else:
+        economique_i = economique.result()
+
+    ecologique_i = min_gwp.result() if n_valid == 0 else ecologique.result()
+    # Garde-fou : si GWP construction amorti > statu quo → minimum GWP amorti
+    if n_valid and sq_gwp_amorti > 0 and eco_gwp[ecologique_i] > sq_gwp_amorti:
+        ecologique_i = min_gwp.result()
+
+    # ── TOPSIS 2.0 (5 critères : coût=1, économies=1, GWP=1, énergie NR=0,5, santé=0,5) ──
+    topsis2 = None
+    if n_valid == 1:
+        topsis2 = first_valid.result()
+    elif n_valid > 1:
+        weights = (1.0, 1.0, 1.0, 0.5, 0.5)
+        maximise = (False, True, False, False, False)
+        norms = [math.sqrt(x) for x in sumsq]
+        scale = lambda c, v: v * 0 if norms[c] == 0 else (v / norms[c]) * weights[c]  # noqa: E731
+        ideals = [(scale(c, hi[c]), scale(c, lo[c])) if maximise[c] else (scale(c, lo[c]), scale(c, hi[c]))
+                  for c in range(5)]
+
+        n_pos = int(hist.sum())
+        p75, p75_bin, p75_rank = 0, None, 0
+        if n_pos:
+            k = int((n_pos - 1) * 0.75)
+            cum = np.cumsum(hist)
+            p75_bin = int(np.searchsorted(cum, k, side="right"))
+            p75_rank = k - (int(cum[p75_bin - 1]) if p75_bin else 0)
+
+        best = _Best(sq)
+        pending = []   # efficacités dans le bin du p75 : départagées une fois le p75 connu
+        for start, m in chunks():
+            valid = ~np.isnan(m["energy_kwh"])
+            if not valid.any():
+                continue
+            vi = np.flatnonzero(valid)
+            cols, eff = columns(m, valid)
+            d_i = np.zeros(len(vi))
+            d_a = np.zeros(len(vi))
+            for c, v in enumerate(cols):
+                v = scale(c, v)
+                d_i = d_i + (v - ideals[c][0]) ** 2
+                d_a = d_a + (v - ideals[c][1]) ** 2
+            d_i, d_a = np.sqrt(d_i), np.sqrt(d_a)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scored = np.where(d_i + d_a > 0, d_a / (d_i + d_a), 0.0)
+            if p75_bin is None:
+                boosted = eff > p75
+                in_bin = np.zeros(len(vi), dtype=bool)
+            else:
+                finite_pos = np.isfinite(eff) & (eff > 0)
+                bits = np.where(finite_pos, _efficiency_bits(np.where(finite_pos, eff, 1.0)), -1)
+                in_bin = bits == p75_bin
+                boosted = np.isinf(eff) | (bits > p75_bin)
+                if in_bin.any():
+                    pending.append((start + vi[in_bin], scored[in_bin], eff[in_bin]))
+            final = np.where(boosted, scored * 1.15, scored)
+            best.update_at(start + vi[~in_bin], -final[~in_bin])
+
+        if pending:
+            idx = np.concatenate([p[0] for p in pending])
+            scored = np.concatenate([p[1] for p in pending])
+            eff = np.concatenate([p[2] for p in pending])
+            p75 = np.partition(eff, p75_rank)[p75_rank]
+            best.update_at(idx, -np.where(eff > p75, scored * 1.15, scored))
+        topsis2 = best.result()
+
+    return {"economique": economique_i, "ecologique": ecologique_i, "roi": roi.result(), "topsis2": topsis2}
+
+
+def _statu_quo_profile(bat: Dict[str, Any]) -> Dict[str, Any]:
+    sq_st = calc_batiment_stats(bat)
+    return {
+        "cost": 0 if bat.get("type_batiment") == "renovation" else _nz(sq_st["total_cout"]),
+        "renovation_cost": 0, "gwp": _nz(sq_st["total_gwp"]),
+        "gwp_amorti": sq_st["gwp_amorti"], "energy_amorti": sq_st["energy_amorti"],
+        "sante_amorti": sq_st["sante_amorti"], "energy_kwh": sq_st["energy_kwh"], "choices": [],
+    }
+
+
+_PHARE_METRICS = ("cost", "renovation_cost", "gwp_amorti", "energy_amorti", "sante_amorti", "energy_kwh")
+
+
+def compute_phares(
+    combos: List[Dict[str, Any]],
+    bat: Dict[str, Any],
+    prix_kwh: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Profils phares (statu quo, économique, écologique, ROI, TOPSIS 2.0) d'une liste de combinaisons."""
+    statu_quo = _statu_quo_profile(bat)
+    if not combos:
+        return {"statuQuo": statu_quo, "economique": None, "ecologique": None, "roi": None, "topsis2": None}
+    m = {k: np.array([math.nan if c.get(k) is None else c[k] for c in combos], dtype=float) for k in _PHARE_METRICS}
+    for k in ("gwp_amorti", "energy_amorti", "sante_amorti"):
+        m[k] = np.nan_to_num(m[k], nan=0.0)
+    picks = _phares_indices(lambda: iter([(0, m)]), bat, prix_kwh)
+    return {"statuQuo": statu_quo, **{k: (None if i is None else combos[i]) for k, i in picks.items()}}
+
+
+def optimise_batiment(
+    bat: Dict[str, Any],
+    materials: List[Dict[str, Any]],
+    ep_isolant_max: Any = None,
+    prix_kwh: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Optimisation complète d'un bâtiment : combinaisons, phares et hash de configuration.
+
+    Les solutions phares sont choisies sur l'espace complet des combinaisons
+    (search="exhaustive") ; au-delà de MAX_COMBOS, sur son front de Pareto
+    (search="pareto") : les profils économique, écologique et ROI y ont leur
+    optimum, TOPSIS est alors normalisé sur le front. `combos` n'en contient que
+    la sélection renvoyée au client.
+    """
+    space, fixed = evaluate_combinations(bat, materials, ep_isolant_max)
+    if space is None:
+        return {
+            "hash": compute_config_hash(bat, materials),
+            "combos": [],
+            "combos_evaluated": 0,
+            "search": "exhaustive",
+            "solutions": compute_phares([], bat, prix_kwh),
+            "fixed_components": fixed,
+        }
+
+    if space.size <= MAX_COMBOS:
+        search, positions, sq, size, chunks = "exhaustive", None, space.statu_quo, space.size, space.chunks
+    else:
+        front = _pareto_indices(space)
+        if space.statu_quo in front:
+            front.remove(space.statu_quo)
+            front.insert(0, space.statu_quo)
+        positions = np.array(front, dtype=np.int64)
+        m = space.evaluate(positions)
+        search, sq, size = "pareto", (0 if front[0] == space.statu_quo else None), len(front)
+        chunks = lambda: iter([(0, m)])  # noqa: E731
+
+    selection = _DisplaySelection(bat, size, sq)
+    picks = _phares_indices(chunks, bat, prix_kwh, sq, on_chunk=selection.update)
+    display = selection.result()
+    if positions is not None:
+        display = [int(positions[p]) for p in display]
+        picks = {k: (None if p is None else int(positions[p])) for k, p in picks.items()}
+    wanted = list(dict.fromkeys(display + [i for i in picks.values() if i is not None]))
+    by_index = dict(zip(wanted, space.combos(wanted)))
+    return {
+        "hash": compute_config_hash(bat, materials),
+        "combos": [by_index[i] for i in display],
+        "combos_evaluated": space.size if search == "exhaustive" else size,
+        "search": search,
+        "solutions": {
+            "statuQuo": _statu_quo_profile(bat),
+            **{k: (None if i is None else by_index[i]) for k, i in picks.items()},
+        },
+        "fixed_components": fixed,
+    }
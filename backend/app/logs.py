@@ -0,0 +1,145 @@
+"""
+Journalisation : niveaux, sortie JSON (une ligne par événement), identifiant de
+corrélation par requête HTTP, échantillonnage des lignes DEBUG volumineuses.
+
+- `configure()` (idempotent) branche le logger racine sur une QueueHandler : l'appelant
+  ne fait que poser l'enregistrement dans une file, un thread (QueueListener) formate et
+  écrit sur stderr. Plus de `print(flush=True)` sérialisé sur stdout sous concurrence.
+- `RequestIdMiddleware` : reprend `X-Request-ID` (ou en génère un), le place dans une
+  ContextVar ajoutée à chaque ligne, et le renvoie dans la réponse.
+- `log.debug(..., extra=logs.SAMPLED)` : ligne gardée avec la probabilité
+  LOG_DEBUG_SAMPLE. Les lignes par cellule / par champ sont de plus construites sous
+  `if log.isEnabledFor(logging.DEBUG)` : à INFO, leur coût est nul.
+
+Variables : LOG_LEVEL (INFO), LOG_FORMAT (json | text), LOG_DEBUG_SAMPLE (0.1).
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from typing import Optional
+from uuid import uuid4
+
+SAMPLED = {"sampled": True}
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# attributs d'un LogRecord : tout le reste vient de `extra=` et part dans le JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id", "sampled"}
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class _ContextFilter(logging.Filter):
+    """Côté appelant (la ContextVar n'existe pas dans le thread d'écriture) : request_id + échantillonnage."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            return False
+        record.request_id = _request_id.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # message figé ici (arguments éventuellement mutables), extras conservés pour le JSON
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS})
+        if record.exc_text or record.exc_info:
+            entry["exc"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        record.rid = f" [{record.request_id}]" if getattr(record, "request_id", None) else ""
+        return super().format(record)
+
+
+def configure() -> None:
+    """Configure le logger racine (idempotent : l'app et les workers spawn l'appellent à l'import)."""
+    global _listener
+    if _listener is not None:
+        return
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    stream = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        stream.setFormatter(_TextFormatter("%(asctime)s %(levelname)s %(name)s%(rid)s %(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    handler = _QueueHandler(queue.SimpleQueue())
+    handler.addFilter(_ContextFilter(float(os.getenv("LOG_DEBUG_SAMPLE", "0.1"))))
+    _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown)
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def shutdown() -> None:
+    """Vide la file puis arrête le thread d'écriture."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """Middleware ASGI : X-Request-ID entrant (ou généré) → ContextVar + en-tête de réponse."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")
+        rid = incoming[:64] if incoming.isprintable() and incoming else uuid4().hex[:16]
+        token = _request_id.set(rid)
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", rid.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _request_id.reset(token)
@@ -1,51 +1,65 @@
 from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Form, Query, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from uuid import uuid4
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
 from shutil import copyfile, move, which
-from zipfile import ZipFile, BadZipFile, ZIP_DEFLATED
-import xml.etree.ElementTree as ET
+from zipfile import ZipFile, BadZipFile
 from openpyxl import load_workbook
-from openpyxl.reader import workbook as _wb_reader
-from sqlalchemy import text as _sa_text
+from sqlalchemy import func, text as _sa_text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
 import bcrypt
 from jose import JWTError, jwt
 import io
-import subprocess
 import os
 import secrets
-import tempfile
 import json
 import base64
 import re
-import sys
-import traceback
+import logging
 import hashlib
+import subprocess
+import tempfile
 import time
 import threading
 import concurrent.futures
 import asyncio
 import unicodedata
+import random
 import anthropic
-import pdfplumber
+import httpx
+import anyio.to_thread
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from docxtpl import DocxTemplate
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from pydantic import BaseModel as _PydanticBase
+from . import logs
+logs.configure()
+log = logging.getLogger(__name__)
+
+from pydantic import BaseModel as _PydanticBase, Field
 from .database import get_db, SessionLocal
 from . import models, schemas
 from .amureba_mapper import AmurebaMappingService
+from . import lca_engine
+from . import indices as amureba_indices
+from . import metrics
+from . import query_stats
+from .blob_store import BlobNotFound, get_blob_store
+from .pdf_text import PdfText, PdfTextPool
+from .work_pool import WorkPool, WorkPoolBusy
+from .xlsx_patch import WorkbookSkeleton
+from . import heavy
 
 
 class _LcaMaterialEditPayload(_PydanticBase):
@@ -61,22 +75,114 @@ class _LcaMaterialEditPayload(_PydanticBase):
     impacts: Optional[Dict[str, Any]] = None
 
 
-# Patch openpyxl: ignore corrupted pivot caches in AMUREBA template
-_orig_pivot_caches = _wb_reader.WorkbookParser.pivot_caches.fget
+# Max 3 Claude calls in parallel for analyze-all
+_CLAUDE_CONCURRENCY = 3
+_claude_semaphore = threading.Semaphore(_CLAUDE_CONCURRENCY)
+_claude_slots = {"waiting": 0, "in_use": 0}   # comptés ici pour GET /metrics
+_claude_slots_lock = threading.Lock()
 
 
-def _safe_pivot_caches(self):
+@contextmanager
+def _claude_slot():
+    """Une des _CLAUDE_CONCURRENCY places d'appel Claude (threads d'analyse)."""
+    with _claude_slots_lock:
+        _claude_slots["waiting"] += 1
     try:
-        return _orig_pivot_caches(self)
-    except Exception:
-        return {}
+        _claude_semaphore.acquire()
+    finally:
+        with _claude_slots_lock:
+            _claude_slots["waiting"] -= 1
+    with _claude_slots_lock:
+        _claude_slots["in_use"] += 1
+    try:
+        yield
+    finally:
+        with _claude_slots_lock:
+            _claude_slots["in_use"] -= 1
+        _claude_semaphore.release()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Clients Claude partagés (pool de connexions HTTP réutilisé entre requêtes)
+# Async pour les routes async (l'event loop n'est jamais bloqué), sync pour les
+# threads d'analyse de documents. Retries gérés ici : backoff exponentiel avec
+# asyncio.sleep sur surcharge (529), rate limit (429) et erreurs réseau/5xx.
+# ──────────────────────────────────────────────────────────────────────────────
+CLAUDE_MODEL = "claude-sonnet-4-6"
+_CLAUDE_RETRY_STATUSES = {429, 500, 502, 503, 504, 529}
+_CLAUDE_MAX_ATTEMPTS = 4
+_CLAUDE_BACKOFF_BASE = 1.5   # secondes : 1.5, 3, 6 (+ jitter)
+
+_async_claude: Optional[anthropic.AsyncAnthropic] = None
+_sync_claude: Optional[anthropic.Anthropic] = None
+_sync_claude_lock = threading.Lock()
+
+
+def _get_async_claude() -> anthropic.AsyncAnthropic:
+    global _async_claude
+    if _async_claude is None:
+        _async_claude = anthropic.AsyncAnthropic(
+            api_key=os.environ.get("ANTHROPIC_API_KEY"),
+            max_retries=0,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            ),
+        )
+    return _async_claude
 
 
-_wb_reader.WorkbookParser.pivot_caches = property(_safe_pivot_caches)
+def _get_sync_claude() -> anthropic.Anthropic:
+    global _sync_claude
+    with _sync_claude_lock:
+        if _sync_claude is None:
+            _sync_claude = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+        return _sync_claude
 
 
-# Max 3 Claude calls in parallel for analyze-all
-_claude_semaphore = threading.Semaphore(3)
+def _claude_retry_delay(exc: Exception, attempt: int) -> Optional[float]:
+    """Délai avant nouvel essai, ou None si l'erreur n'est pas transitoire."""
+    if isinstance(exc, anthropic.APIStatusError):
+        if exc.status_code not in _CLAUDE_RETRY_STATUSES:
+            return None
+        retry_after = exc.response.headers.get("retry-after") if exc.response is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), 30.0)
+        except ValueError:
+            pass
+    elif not isinstance(exc, anthropic.APIConnectionError):
+        return None
+    return _CLAUDE_BACKOFF_BASE * (2 ** attempt) * (1 + random.random() * 0.25)
+
+
+def _record_claude_call(call_site: str, started: float, message) -> None:
+    """Durée et tokens d'un appel Claude : histogrammes /metrics + une ligne INFO structurée."""
+    elapsed = time.perf_counter() - started
+    usage = getattr(message, "usage", None)
+    metrics.observe_claude(call_site, elapsed, usage)
+    log.info("claude call", extra={
+        "call_site": call_site, "duration_ms": round(elapsed * 1000),
+        "input_tokens": getattr(usage, "input_tokens", None), "output_tokens": getattr(usage, "output_tokens", None),
+    })
+
+
+async def _claude_create(label: str, **kwargs):
+    """messages.create via le client async partagé, avec backoff sur erreurs transitoires."""
+    kwargs.setdefault("model", CLAUDE_MODEL)
+    client = _get_async_claude()
+    started = time.perf_counter()
+    for attempt in range(_CLAUDE_MAX_ATTEMPTS):
+        try:
+            message = await client.messages.create(**kwargs)
+            _record_claude_call(label, started, message)
+            return message
+        except (anthropic.APIStatusError, anthropic.APIConnectionError) as e:
+            delay = _claude_retry_delay(e, attempt)
+            if delay is None or attempt == _CLAUDE_MAX_ATTEMPTS - 1:
+                raise
+            log.warning("Claude indisponible (%s), retry %d/%d dans %.1fs", type(e).__name__,
+                        attempt + 1, _CLAUDE_MAX_ATTEMPTS - 1, delay, extra={"call_site": label})
+            await asyncio.sleep(delay)
 
 
 # ==============================
@@ -96,15 +202,15 @@ BASE_DIR = Path(__file__).parent
 TEMPLATE_FILE = BASE_DIR / "templates" / "audit_template.xlsx"
 EXCEL_DIR = BASE_DIR / "excel"
 EXCEL_DIR.mkdir(exist_ok=True)
+# Délai avant suppression d'une version périmée du classeur : un téléchargement en cours
+# (FileResponse ouvre le fichier après le retour de la route) peut encore la servir.
+EXCEL_STALE_GRACE_SECONDS = int(os.getenv("EXCEL_STALE_GRACE_SECONDS", "600"))
 
-print(f"[DEBUG] BASE_DIR: {BASE_DIR}", flush=True)
-print(f"[DEBUG] TEMPLATE_FILE: {TEMPLATE_FILE}", flush=True)
-print(f"[DEBUG] Template exists: {TEMPLATE_FILE.exists()}", flush=True)
-print(f"[DEBUG] Templates dir contents: {list((BASE_DIR / 'templates').iterdir()) if (BASE_DIR / 'templates').exists() else 'DIR NOT FOUND'}", flush=True)
+if not TEMPLATE_FILE.exists():
+    log.warning("template audit introuvable: %s", TEMPLATE_FILE)
+log.debug("BASE_DIR=%s TEMPLATE_FILE=%s", BASE_DIR, TEMPLATE_FILE)
 
 REPORT_TEMPLATE_FILE = BASE_DIR / "templates" / "report_template.docx"
-REPORT_DIR = BASE_DIR / "reports"
-REPORT_DIR.mkdir(exist_ok=True)
 
 # URL publique HTTPS du BACKEND (Render) - sert à composer les liens d'abonnement .ics.
 # DOIT être défini dans l'env Render (ex. https://heatsight-api.onrender.com), sinon les
@@ -160,211 +266,9 @@ def _sanitize_for_json(obj):
 
 
 # ──────────────────────────────────────────────────────────────────────────────
-# ZIPFILE-BASED XLSX WRITER (fixes named-range corruption from openpyxl)
+# PATCH XLSX (moteur : app/xlsx_patch.py ; dans le pool de calcul : app/heavy.py)
 # ──────────────────────────────────────────────────────────────────────────────
 
-_NS_MAIN  = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
-_NS_R     = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
-_NS_MC    = "http://schemas.openxmlformats.org/markup-compatibility/2006"
-_NS_RELS  = "http://schemas.openxmlformats.org/package/2006/relationships"
-_NS_X14AC = "http://schemas.microsoft.com/office/spreadsheetml/2009/9/ac"
-_NS_XR    = "http://schemas.microsoft.com/office/spreadsheetml/2014/revision"
-_NS_XR2   = "http://schemas.microsoft.com/office/spreadsheetml/2015/revision2"
-_NS_XR3   = "http://schemas.microsoft.com/office/spreadsheetml/2016/revision3"
-
-_NS_X14 = "http://schemas.microsoft.com/office/spreadsheetml/2009/9/main"
-_NS_XM  = "http://schemas.microsoft.com/office/excel/2006/main"
-
-for _pfx, _uri in [
-    ("",      _NS_MAIN),
-    ("r",     _NS_R),
-    ("mc",    _NS_MC),
-    ("x14ac", _NS_X14AC),
-    ("x14",   _NS_X14),
-    ("xm",    _NS_XM),
-    ("xr",    _NS_XR),
-    ("xr2",   _NS_XR2),
-    ("xr3",   _NS_XR3),
-]:
-    ET.register_namespace(_pfx, _uri)
-
-
-def _build_sheet_path_map(zf: ZipFile) -> Dict[str, str]:
-    """Return {sheet_name: 'xl/worksheets/sheetN.xml'} from workbook.xml + rels."""
-    wb_root = ET.fromstring(zf.read("xl/workbook.xml"))
-    name_to_rid: Dict[str, str] = {}
-    for el in wb_root.iter(f"{{{_NS_MAIN}}}sheet"):
-        name = el.get("name")
-        rid  = el.get(f"{{{_NS_R}}}id")
-        if name and rid:
-            name_to_rid[name] = rid
-
-    rels_root = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
-    rid_to_path: Dict[str, str] = {}
-    for rel in rels_root.iter(f"{{{_NS_RELS}}}Relationship"):
-        rid    = rel.get("Id")
-        target = rel.get("Target", "")
-        if rid:
-            path = target if target.startswith("xl/") else f"xl/{target}"
-            rid_to_path[rid] = path
-
-    return {n: rid_to_path[r] for n, r in name_to_rid.items() if r in rid_to_path}
-
-
-def _col_num(col: str) -> int:
-    """'A'→1, 'B'→2, 'AA'→27"""
-    n = 0
-    for c in col.upper():
-        n = n * 26 + (ord(c) - 64)
-    return n
-
-
-def _cell_col_num(ref: str) -> int:
-    m = re.match(r'([A-Z]+)', str(ref).upper())
-    return _col_num(m.group(1)) if m else 0
-
-
-def _patch_sheet_xml(xml_bytes: bytes, changes: Dict[str, Any]) -> bytes:
-    """
-    Write cell values into a worksheet XML.
-    Strategy: use ElementTree ONLY to modify <sheetData>, then splice the
-    new <sheetData> bytes back into the original XML bytes.  This preserves
-    every namespace declaration, mc:Ignorable, extLst, x14/xm inline-namespace
-    blocks, etc. untouched - avoiding the ET serialisation bug that mangles
-    namespace prefixes (x14→ns4, xm→ns5) and corrupts the worksheet.
-
-    - Numbers  → plain <v>N</v>, t attribute removed (default numeric type).
-    - Strings  → t="inlineStr" + <is><t>text</t></is>  (no sharedStrings.xml change).
-    - Formulas on targeted cells are removed so our constants are not overwritten.
-    - Style (s=) attribute on existing cells is preserved.
-    - ET auto-escapes &, <, > in text content.
-    """
-    root = ET.fromstring(xml_bytes)
-    NS = _NS_MAIN
-
-    sheet_data = root.find(f"{{{NS}}}sheetData")
-    if sheet_data is None:
-        return xml_bytes
-
-    # Build row_num → element map
-    row_map: Dict[int, ET.Element] = {}
-    for row_el in sheet_data:
-        try:
-            row_map[int(row_el.get("r", 0))] = row_el
-        except (ValueError, TypeError):
-            pass
-
-    patched_cells = []
-    for cell_ref, value in changes.items():
-        m = re.match(r'([A-Z]+)(\d+)', str(cell_ref).upper())
-        if not m:
-            continue
-        row_num = int(m.group(2))
-
-        # Find or create row
-        if row_num not in row_map:
-            row_el = ET.SubElement(sheet_data, f"{{{NS}}}row")
-            row_el.set("r", str(row_num))
-            row_map[row_num] = row_el
-        else:
-            row_el = row_map[row_num]
-
-        # Find or create cell
-        cell_el: Optional[ET.Element] = None
-        for c in row_el:
-            if c.get("r") == cell_ref:
-                cell_el = c
-                break
-        if cell_el is None:
-            cell_el = ET.SubElement(row_el, f"{{{NS}}}c")
-            cell_el.set("r", cell_ref)
-
-        # Remove ALL existing children (formulas + cached values)
-        for child in list(cell_el):
-            cell_el.remove(child)
-
-        if isinstance(value, (int, float)) and not isinstance(value, bool):
-            # Numeric constant - remove t so Excel treats cell as number
-            cell_el.attrib.pop("t", None)
-            ET.SubElement(cell_el, f"{{{NS}}}v").text = str(value)
-            patched_cells.append(f"{cell_ref}={value}")
-        elif value is not None and str(value).strip():
-            # String - inline string (no sharedStrings.xml involvement)
-            cell_el.set("t", "inlineStr")
-            is_el = ET.SubElement(cell_el, f"{{{NS}}}is")
-            ET.SubElement(is_el, f"{{{NS}}}t").text = str(value)
-            patched_cells.append(f"{cell_ref}={value!r}")
-        else:
-            # Empty cell - clear type, leave no value child
-            cell_el.attrib.pop("t", None)
-
-    if patched_cells:
-        print(f"[xlsx-patch] cells patched: {', '.join(patched_cells)}", flush=True)
-
-    # Re-sort rows by r, and cells within each row by column index
-    sorted_rows = sorted(list(sheet_data), key=lambda e: int(e.get("r") or 0))
-    for child in list(sheet_data):
-        sheet_data.remove(child)
-    for row_el in sorted_rows:
-        cells = sorted(list(row_el), key=lambda e: _cell_col_num(e.get("r") or "A0"))
-        for child in list(row_el):
-            row_el.remove(child)
-        for cell in cells:
-            row_el.append(cell)
-        sheet_data.append(row_el)
-
-    # ── Serialize ONLY <sheetData> and splice into original bytes ──────────
-    # Do NOT use ET.tostring(root) - it would move x14/xm namespace declarations
-    # from their original inline location (on <ext> child elements) to the root
-    # element, producing wrong prefixes (ns4/ns5) that corrupt the worksheet.
-    new_sd_bytes = ET.tostring(sheet_data, encoding="unicode").encode("utf-8")
-
-    sd_start = xml_bytes.find(b"<sheetData")
-    if sd_start == -1:
-        return xml_bytes
-
-    # Find end of the <sheetData ...> opening tag (the FIRST > after <sheetData)
-    # For OOXML, <sheetData> never has attribute values containing >, so this is safe.
-    tag_close = xml_bytes.find(b">", sd_start)
-    if tag_close == -1:
-        return xml_bytes
-
-    # Self-closing <sheetData.../> vs regular <sheetData...>...</sheetData>
-    if xml_bytes[tag_close - 1 : tag_close] == b"/":
-        # Self-closing: entire tag is sd_start … tag_close+1
-        sd_end = tag_close + 1
-    else:
-        # Regular: find the matching closing tag
-        closing_tag = xml_bytes.find(b"</sheetData>", tag_close)
-        if closing_tag == -1:
-            return xml_bytes
-        sd_end = closing_tag + len(b"</sheetData>")
-
-    return xml_bytes[:sd_start] + new_sd_bytes + xml_bytes[sd_end:]
-
-
-def _drop_calc_chain_from_rels(rels_xml: bytes) -> bytes:
-    """Remove the calcChain Relationship entry from workbook.xml.rels."""
-    return re.sub(rb'<Relationship\b[^>]*calcChain[^>]*/>', b'', rels_xml)
-
-
-def _drop_calc_chain_from_content_types(ct_xml: bytes) -> bytes:
-    """Remove the calcChain Override entry from [Content_Types].xml."""
-    return re.sub(rb'<Override\b[^>]*calcChain[^>]*/>', b'', ct_xml)
-
-
-def _force_full_calc_on_load(wb_xml: bytes) -> bytes:
-    """
-    Ensure <calcPr> has fullCalcOnLoad="1" so Excel rebuilds the calculation
-    chain on open instead of relying on the (now absent) calcChain.xml.
-    """
-    if b'<calcPr' not in wb_xml:
-        return wb_xml
-    if b'fullCalcOnLoad' in wb_xml:
-        return re.sub(rb'fullCalcOnLoad="[^"]*"', b'fullCalcOnLoad="1"', wb_xml)
-    return re.sub(rb'(<calcPr\b)', rb'\1 fullCalcOnLoad="1"', wb_xml)
-
-
 def _apply_changes_to_template(
     template_path: Path,
     sheet_changes: Dict[str, Dict[str, Any]],
@@ -375,70 +279,50 @@ def _apply_changes_to_template(
 
 def _apply_changes_to_source(source, sheet_changes: Dict[str, Dict[str, Any]]) -> bytes:
     """
-    Like _apply_changes_to_template but accepts either a Path or raw bytes as source.
-    Enables patching over an already-modified Excel (e.g. a manual upload) rather
-    than always starting from the blank template.
+    Like _apply_changes_to_template but accepts a Path, raw bytes or a cached
+    WorkbookSkeleton as source. Enables patching over an already-modified Excel
+    (e.g. a manual upload) rather than always starting from the blank template.
+
+    Only the patched sheets, workbook.xml, its rels and [Content_Types].xml are
+    re-encoded; every other member (pivot caches, images, styles…) is copied as
+    raw compressed bytes by xlsx_zip.
     """
-    if isinstance(source, (bytes, bytearray)):
-        source_io = io.BytesIO(source)
-        zf_source = ZipFile(source_io, "r")
-    else:
-        zf_source = ZipFile(source, "r")
+    with metrics.timed("xlsx_patch"):
+        skeleton = source if isinstance(source, WorkbookSkeleton) else WorkbookSkeleton(source)
+        return skeleton.patch(sheet_changes)
 
-    try:
-        sheet_path_map = _build_sheet_path_map(zf_source)
-        path_to_sheet  = {v: k for k, v in sheet_path_map.items()}
-
-        out_buf = io.BytesIO()
-        with ZipFile(out_buf, "w", compression=ZIP_DEFLATED) as zf_out:
-            for item in zf_source.infolist():
-                if item.filename == "xl/calcChain.xml":
-                    print("[xlsx-patch] dropping xl/calcChain.xml (stale after cell patching)", flush=True)
-                    continue
 
-                data = zf_source.read(item.filename)
+def _prefill_sheet_changes(
+    entity_name: str,
+    actions: List[Dict[str, Any]],
+    energy_record: Any = None,
+) -> Dict[str, Dict[str, Any]]:
+    """sheet_changes from entity_name + Claude actions list + optional energy accounting DB record."""
+    energy_changes = _build_energy_sheet_changes(energy_record) if energy_record else {}
+    return _build_prefill_sheet_changes(entity_name, actions, energy_changes)
 
-                if item.filename == "xl/_rels/workbook.xml.rels":
-                    data = _drop_calc_chain_from_rels(data)
-                elif item.filename == "[Content_Types].xml":
-                    data = _drop_calc_chain_from_content_types(data)
-                elif item.filename == "xl/workbook.xml":
-                    data = _force_full_calc_on_load(data)
-                else:
-                    sheet_name = path_to_sheet.get(item.filename)
-                    if sheet_name and sheet_name in sheet_changes:
-                        try:
-                            data = _patch_sheet_xml(data, sheet_changes[sheet_name])
-                            print(f"[xlsx-patch] sheet {sheet_name!r} ({item.filename}) patched OK ({len(data)} bytes)", flush=True)
-                        except Exception as exc:
-                            print(f"[WARN] _patch_sheet_xml({item.filename}): {exc}", flush=True)
-                            traceback.print_exc()
-
-                zf_out.writestr(item, data)
-    finally:
-        zf_source.close()
 
-    return out_buf.getvalue()
+async def _patch_workbook_async(source: Union[Path, bytes], sheet_changes: Dict[str, Dict[str, Any]]) -> bytes:
+    """Patch in the work pool: only the path (or bytes) and the sheet_changes cross the process boundary."""
+    with metrics.timed("xlsx_patch"):   # mesuré ici : le patch tourne dans un worker
+        return await run_heavy_async(heavy.patch_workbook, source, sheet_changes)
 
 
-def _write_template_zipfile(
+async def _write_template_zipfile_async(
     template_path: Path,
     entity_name: str,
     actions: List[Dict[str, Any]],
     energy_record: Any = None,
 ) -> bytes:
     """
-    High-level: build sheet_changes from entity_name + Claude actions list +
-    optional energy accounting DB record, then delegate to _apply_changes_to_source.
-    Both text (inlineStr) and numeric values are injected.
-    workbook.xml / sharedStrings.xml remain byte-identical to template.
+    High-level: build sheet_changes, then patch the template in the work pool
+    (skeleton cached in each worker). Both text (inlineStr) and numeric values
+    are injected. workbook.xml / sharedStrings.xml remain byte-identical to template.
     """
-    energy_changes = _build_energy_sheet_changes(energy_record) if energy_record else {}
-    sheet_changes  = _build_prefill_sheet_changes(entity_name, actions, energy_changes)
-    return _apply_changes_to_source(template_path, sheet_changes)
+    return await _patch_workbook_async(template_path, _prefill_sheet_changes(entity_name, actions, energy_record))
 
 
-def _patch_excel_bytes(
+async def _patch_excel_bytes_async(
     base_bytes: bytes,
     entity_name: str,
     actions: List[Dict[str, Any]],
@@ -449,9 +333,7 @@ def _patch_excel_bytes(
     Used when the user has previously uploaded a modified Excel: we patch
     over their file instead of starting from the blank template.
     """
-    energy_changes = _build_energy_sheet_changes(energy_record) if energy_record else {}
-    sheet_changes  = _build_prefill_sheet_changes(entity_name, actions, energy_changes)
-    return _apply_changes_to_source(base_bytes, sheet_changes)
+    return await _patch_workbook_async(base_bytes, _prefill_sheet_changes(entity_name, actions, energy_record))
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -480,12 +362,248 @@ def _assert_prefill_allowed(db: Session, project, ttype: str) -> None:
         )
 
 
-def _resolve_audit_template_source(db: Session, project):
-    """Source du modèle audit actif : Path (officiel, disque) ou bytes (custom, DB)."""
+def _resolve_audit_template_source(db: Session, project) -> "WorkbookSkeleton":
+    """Squelette du modèle audit actif (officiel sur disque ou custom en DB), depuis le cache."""
     tpl = _get_active_template(db, project, "audit")
+    if (tpl is None or tpl.is_official) and not TEMPLATE_FILE.exists():
+        raise HTTPException(status_code=500, detail="Template AMUREBA introuvable côté serveur")
+    skeleton = _get_template_skeleton(tpl)
+    if skeleton is None:
+        raise HTTPException(status_code=500, detail="Modèle personnalisé introuvable (fichier vide).")
+    return skeleton
+
+
+# Squelettes des modèles audit, clé (id du modèle | "official", empreinte du contenu) :
+# un modèle remplacé change de clé, l'ancienne entrée sort par LRU.
+_TEMPLATE_SKELETON_CACHE_SIZE = int(os.getenv("TEMPLATE_SKELETON_CACHE_SIZE", "8"))
+_template_skeletons: "OrderedDict[Tuple[str, str], WorkbookSkeleton]" = OrderedDict()
+_template_skeletons_lock = threading.Lock()
+
+
+def _official_template_digest() -> str:
+    return heavy.file_digest(TEMPLATE_FILE)
+
+
+def _get_template_skeleton(tpl=None) -> Optional["WorkbookSkeleton"]:
+    """
+    Squelette du modèle audit `tpl` (officiel si None), construit au premier usage.
+    Le blob d'un modèle custom n'est lu qu'à la construction ; None si le fichier est vide.
+    """
     if tpl is None or tpl.is_official:
-        return TEMPLATE_FILE
-    return tpl.file_bytes
+        key = ("official", _official_template_digest())
+        load = TEMPLATE_FILE.read_bytes
+    elif tpl.file_hash:
+        key = (tpl.id, tpl.file_hash)
+        load = lambda: _get_blob(tpl.file_hash, tpl.file_bytes)
+    else:
+        data = _get_blob(None, tpl.file_bytes)
+        if not data:
+            return None
+        key = (tpl.id, hashlib.sha256(data).hexdigest())
+        load = lambda: data
+
+    with _template_skeletons_lock:
+        skeleton = _template_skeletons.get(key)
+        if skeleton is not None:
+            _template_skeletons.move_to_end(key)
+            return skeleton
+    data = load()
+    if not data:
+        return None
+    skeleton = WorkbookSkeleton(data)
+    with _template_skeletons_lock:
+        skeleton = _template_skeletons.setdefault(key, skeleton)
+        while len(_template_skeletons) > _TEMPLATE_SKELETON_CACHE_SIZE:
+            _template_skeletons.popitem(last=False)
+    return skeleton
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Fichiers binaires : blob store (clé = SHA-256 du contenu, seule la clé en base).
+# Une colonne bytea legacy encore remplie (ligne pas encore migrée par
+# app.migrate_blobs) est prioritaire : sa clé peut exister sans blob associé.
+# ──────────────────────────────────────────────────────────────────────────────
+def _put_blob(data: bytes) -> str:
+    return get_blob_store().put(data)
+
+
+def _get_blob(key: Optional[str], legacy: Optional[bytes] = None) -> Optional[bytes]:
+    if legacy is not None:
+        return bytes(legacy)
+    if not key:
+        return None
+    try:
+        return get_blob_store().get(key)
+    except BlobNotFound:
+        # ligne pointant vers un blob absent (store local perdu, migration partielle)
+        log.warning("blob introuvable dans le store: %s", key)
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+
+
+# Endpoints `async def` : avec BLOB_STORE=s3, HEAD/PUT/GET boto3 sont bloquants
+async def _put_blob_async(data: bytes) -> str:
+    return await asyncio.to_thread(_put_blob, data)
+
+
+async def _get_blob_async(key: Optional[str], legacy: Optional[bytes] = None) -> Optional[bytes]:
+    return await asyncio.to_thread(_get_blob, key, legacy)
+
+
+def _has_blob(obj, key_attr: str, legacy_attr: str) -> bool:
+    """Fichier présent ? La colonne legacy (différée) n'est chargée que si la clé est absente."""
+    return bool(getattr(obj, key_attr)) or getattr(obj, legacy_attr) is not None
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[tuple]:
+    """Plage (début, fin incluse) d'un en-tête Range à plage unique ; None → fichier entier."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first == "":
+            start, end = max(size - int(last), 0), size - 1      # bytes=-N : N derniers octets
+        else:
+            start, end = int(first), (int(last) if last else size - 1)
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Range Not Satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    if end < start:
+        return None   # plage syntaxiquement invalide (bytes=5-2) : ignorée, fichier entier (RFC 9110 §14.2)
+    return start, min(end, size - 1)
+
+
+# Téléchargements authentifiés : cache navigateur privé, revalidé à chaque usage (ETag → 304)
+_DOWNLOAD_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (t.strip().removeprefix("W/") for t in header.split(","))
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": _DOWNLOAD_CACHE_CONTROL})
+
+
+def _blob_response(
+    request: Request,
+    key: Optional[str],
+    legacy: Optional[bytes],
+    media_type: str,
+    filename: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Réponse streamée d'un blob, avec support Range (206) ; ETag fort = hash du contenu,
+    304 si le client présente déjà ce contenu (If-None-Match).
+    """
+    if legacy is not None:
+        data = bytes(legacy)
+        key = hashlib.sha256(data).hexdigest()
+    elif not key:
+        raise HTTPException(status_code=404, detail="Aucun fichier disponible")
+    if _etag_matches(request, f'"{key}"'):
+        return _not_modified(f'"{key}"')
+
+    if legacy is not None:
+        size = len(data)
+        read = lambda start, end: iter([data[start:end + 1]])  # noqa: E731
+    else:
+        store = get_blob_store()
+        read = lambda start, end: store.iter_range(key, start, end)  # noqa: E731
+        try:
+            size = store.size(key)
+        except BlobNotFound:
+            log.warning("blob introuvable dans le store: %s", key)
+            raise HTTPException(status_code=404, detail="Fichier introuvable")
+
+    headers = {"Accept-Ranges": "bytes", "ETag": f'"{key}"', "Cache-Control": _DOWNLOAD_CACHE_CONTROL}
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    rng = _parse_range(request.headers.get("range"), size) if size else None
+    start, end = rng if rng is not None else (0, size - 1)
+    try:
+        body = read(start, end) if size else iter([b""])
+    except BlobNotFound:   # supprimé entre size() et l'ouverture
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+    if rng is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(body, media_type=media_type, headers=headers)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(body, status_code=206, media_type=media_type, headers=headers)
+
+
+# Version des générateurs : à incrémenter quand le rendu change à entrées égales
+# (mapping de cellules, mise en page des sections…) pour invalider les artefacts.
+_ARTIFACT_VERSION = {"report_docx": 1, "amureba_xlsx": 1}
+
+# Artefacts conservés par (projet, type) ; au-delà, les plus anciens sont supprimés
+# et leurs blobs, devenus orphelins, repris par app.sweep_blobs.
+ARTIFACT_KEEP_PER_PROJECT = int(os.getenv("ARTIFACT_KEEP_PER_PROJECT", "3"))
+
+
+def _artifact_key(kind: str, template_hash: str, inputs: Any) -> str:
+    """Empreinte déterministe des entrées d'un générateur (modèle + données utilisées)."""
+    payload = json.dumps(inputs, sort_keys=True, default=str, ensure_ascii=False)
+    raw = f"{kind}:{_ARTIFACT_VERSION[kind]}:{template_hash}:{payload}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _evict_artifacts(db: Session, project_id: str, kind: str) -> int:
+    """Supprime les artefacts (projet, type) au-delà des ARTIFACT_KEEP_PER_PROJECT plus récents."""
+    stale = [
+        h for (h,) in db.query(models.Artifact.input_hash)
+        .filter(models.Artifact.project_id == project_id, models.Artifact.kind == kind)
+        .order_by(models.Artifact.created_at.desc())
+        .offset(ARTIFACT_KEEP_PER_PROJECT)
+    ]
+    if stale:
+        db.query(models.Artifact).filter(models.Artifact.input_hash.in_(stale)).delete(synchronize_session=False)
+    return len(stale)
+
+
+def _artifact_response(
+    request: Request,
+    db: Session,
+    project_id: str,
+    kind: str,
+    input_hash: str,
+    build: Callable[[], bytes],
+    media_type: str,
+    filename: str,
+) -> Response:
+    """
+    Fichier généré servi depuis le cache d'artefacts : `build` n'est appelé que si
+    aucun blob n'est associé à ces entrées (ou s'il a disparu du store). Chaque
+    génération est rattachée au projet et évince ses artefacts les plus anciens.
+    """
+    row = db.get(models.Artifact, input_hash)
+    if row is not None and _etag_matches(request, f'"{row.blob_hash}"'):
+        return _not_modified(f'"{row.blob_hash}"')
+    if row is None or not get_blob_store().exists(row.blob_hash):
+        data = build()
+        blob_hash = _put_blob(data)
+        try:
+            with db.begin_nested():
+                db.merge(models.Artifact(
+                    input_hash=input_hash, project_id=project_id, kind=kind, blob_hash=blob_hash,
+                    size=len(data), created_at=datetime.now(timezone.utc).isoformat(),
+                ))
+                evicted = _evict_artifacts(db, project_id, kind)
+            db.commit()
+        except IntegrityError:
+            db.rollback()   # génération concurrente identique : même contenu, même blob
+            evicted = 0
+        log.info("artifact %s %s généré (%d o, %d évincé(s))", kind, input_hash[:12], len(data), evicted)
+    else:
+        blob_hash = row.blob_hash
+    return _blob_response(request, blob_hash, None, media_type, filename)
 
 
 def _touch_project(db: Session, project_id: str) -> None:
@@ -590,10 +708,10 @@ def _build_energy_sheet_changes(record: Any) -> Dict[str, Any]:
                 pass
 
     if patched:
-        src = "section breakdown" if section_used else "top-level totals"
-        print(f"[xlsx-patch] feuille '2023' ({src}): {', '.join(patched)}", flush=True)
+        log.debug("xlsx-patch feuille '2023' (%s): %s",
+                  "section breakdown" if section_used else "top-level totals", ", ".join(patched))
     else:
-        print("[xlsx-patch] feuille '2023': aucune donnée énergie disponible", flush=True)
+        log.info("xlsx-patch feuille '2023': aucune donnée énergie disponible")
 
     return changes
 
@@ -681,10 +799,7 @@ def _build_prefill_sheet_changes(
             for cond_cell, cond_text in zip(_AA_CONDITION_CELLS, conds):
                 _s(sh, cond_cell, cond_text)
 
-    # Log summary of sheets being patched
-    for sname, cells in sheet_changes.items():
-        n = len(cells)
-        print(f"[xlsx-patch] mapping: feuille '{sname}' → {n} cellule(s) à patcher", flush=True)
+    log.debug("xlsx-patch mapping: %s", {sname: len(cells) for sname, cells in sheet_changes.items()})
 
     return sheet_changes
 
@@ -741,6 +856,18 @@ limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
+def _work_pool_busy_handler(request: Request, exc: WorkPoolBusy) -> JSONResponse:
+    """Pool de calcul saturé : le client réessaie plus tard plutôt que d'attendre sans borne."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Serveur occupé, réessayez dans quelques secondes."},
+        headers={"Retry-After": os.getenv("WORK_RETRY_AFTER", "5")},
+    )
+
+
+app.add_exception_handler(WorkPoolBusy, _work_pool_busy_handler)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -755,6 +882,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Nombre de requêtes SQL et temps base par requête HTTP → en-tête Server-Timing
+query_stats.install()
+app.add_middleware(query_stats.ServerTimingMiddleware)
+# Latence par modèle de route (Prometheus, GET /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+# Identifiant de corrélation (X-Request-ID) porté par chaque ligne de log ; ajouté en dernier = exécuté en premier
+app.add_middleware(logs.RequestIdMiddleware)
+
 
 @app.on_event("startup")
 def _ensure_extra_project_columns():
@@ -772,6 +907,13 @@ def _ensure_extra_project_columns():
         "ALTER TABLE projects ADD COLUMN IF NOT EXISTS report_docx_source TEXT",
         "ALTER TABLE projects ADD COLUMN IF NOT EXISTS report_prefill_summary JSONB",
         "ALTER TABLE projects ADD COLUMN IF NOT EXISTS report_prefilled_at TEXT",
+        # Binaires hors Postgres : clés blob store (SHA-256), bytea legacy vidés par app.migrate_blobs
+        "ALTER TABLE projects ADD COLUMN IF NOT EXISTS prefilled_excel_hash TEXT",
+        "ALTER TABLE projects ADD COLUMN IF NOT EXISTS report_docx_hash TEXT",
+        "ALTER TABLE project_documents ADD COLUMN IF NOT EXISTS file_size INTEGER",
+        "ALTER TABLE project_documents ALTER COLUMN file_data DROP NOT NULL",
+        "ALTER TABLE project_documents ADD COLUMN IF NOT EXISTS pdf_text TEXT",
+        "ALTER TABLE project_documents ADD COLUMN IF NOT EXISTS pdf_text_status TEXT",
         # Dernière activité du projet (P9) - colonne puis backfill, dans cet ordre
         "ALTER TABLE projects ADD COLUMN IF NOT EXISTS updated_at TEXT",
         "UPDATE projects SET updated_at = created_at WHERE updated_at IS NULL",
@@ -812,6 +954,8 @@ def _ensure_extra_project_columns():
         "ALTER TABLE report_history ADD COLUMN IF NOT EXISTS file_name TEXT",
         "ALTER TABLE report_history ADD COLUMN IF NOT EXISTS file_mime_type TEXT",
         "ALTER TABLE report_history ADD COLUMN IF NOT EXISTS file_size INTEGER",
+        "ALTER TABLE report_history ADD COLUMN IF NOT EXISTS file_hash TEXT",
+        "ALTER TABLE plan_amelioration_history ADD COLUMN IF NOT EXISTS file_hash TEXT",
         # Table ACV projets (idempotent - peut être absente sur anciennes DB)
         """CREATE TABLE IF NOT EXISTS lca_projects (
             id TEXT PRIMARY KEY,
@@ -833,6 +977,43 @@ def _ensure_extra_project_columns():
             scope TEXT NOT NULL DEFAULT 'user',
             created_at TEXT NOT NULL
         )""",
+        # Tâches de fond (analyse groupée des documents, idempotent)
+        """CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+            owner_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            items JSONB NOT NULL DEFAULT '[]',
+            total INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            updated_at TEXT,
+            finished_at TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)",
+        # Cache des extractions Claude (clé composite = index de recherche, idempotent)
+        """CREATE TABLE IF NOT EXISTS extraction_cache (
+            file_hash TEXT NOT NULL,
+            prompt_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            extracted_data JSONB NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (file_hash, prompt_hash, model)
+        )""",
+        # Cache des fichiers générés (cf. migrations 029 et 032, idempotent)
+        """CREATE TABLE IF NOT EXISTS artifacts (
+            input_hash TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            blob_hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )""",
+        "ALTER TABLE artifacts ADD COLUMN IF NOT EXISTS project_id TEXT REFERENCES projects(id) ON DELETE CASCADE",
+        "CREATE INDEX IF NOT EXISTS ix_artifacts_project_kind ON artifacts (project_id, kind, created_at)",
+        "ALTER TABLE templates ADD COLUMN IF NOT EXISTS file_hash TEXT",
         "ALTER TABLE projects ADD COLUMN IF NOT EXISTS active_audit_template_id TEXT REFERENCES templates(id) ON DELETE SET NULL",
         "ALTER TABLE projects ADD COLUMN IF NOT EXISTS active_report_template_id TEXT REFERENCES templates(id) ON DELETE SET NULL",
         # Seed des modèles officiels (idempotent ; file_bytes NULL → résolus depuis le disque/image)
@@ -842,6 +1023,17 @@ def _ensure_extra_project_columns():
              ('official-audit',  'audit',  'Modèle officiel AMUREBA',    NULL, NULL, true, true, NULL, 'official', '2026-01-01T00:00:00+00:00'),
              ('official-report', 'report', 'Modèle officiel de rapport', NULL, NULL, true, true, NULL, 'official', '2026-01-01T00:00:00+00:00')
            ON CONFLICT (id) DO NOTHING""",
+        # Index des clés étrangères / recherches fréquentes (cf. migration 031, idempotent)
+        "CREATE INDEX IF NOT EXISTS ix_projects_owner_id ON projects (owner_id)",
+        "CREATE INDEX IF NOT EXISTS ix_projdoc_project_id ON project_documents (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_projdoc_file_hash_analyzed ON project_documents (file_hash) WHERE status = 'analyzed'",
+        "CREATE INDEX IF NOT EXISTS ix_events_owner_id_start ON events (owner_id, start)",
+        "CREATE INDEX IF NOT EXISTS ix_events_project_id ON events (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_improvement_actions_project_id ON improvement_actions (project_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_report_history_project_id ON report_history (project_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_plan_amelioration_history_project_id ON plan_amelioration_history (project_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_users_calendar_token ON users (calendar_token)",
+        "CREATE INDEX IF NOT EXISTS ix_lca_materials_category_name ON lca_materials (category, name)",
     ]
     with engine.begin() as conn:
         for stmt in stmts:
@@ -851,6 +1043,121 @@ def _ensure_extra_project_columns():
         seed_lca_reference_materials(conn)
 
 
+@app.on_event("startup")
+def _check_blob_store():
+    """Refuse de démarrer sur le store local éphémère par défaut (cf. app/blob_store.py)."""
+    get_blob_store()
+
+
+@app.on_event("startup")
+async def _init_claude_client():
+    _get_async_claude()
+
+
+@app.on_event("startup")
+def _warm_template_skeleton():
+    """Analyse le modèle officiel au démarrage : le premier export ne paie pas ce coût."""
+    try:
+        if TEMPLATE_FILE.exists():
+            skeleton = _get_template_skeleton()
+            skeleton.sheet(skeleton.sheet_paths[SHEET_NAME])
+    except Exception as e:
+        log.warning("xlsx-patch: préchauffage du modèle impossible: %s", e)
+
+
+@app.on_event("startup")
+def _warm_work_pool():
+    """Démarre les workers (spawn + import de app.heavy, sans FastAPI ni base) avant la première requête."""
+    pool = _get_work_pool()
+    for _ in range(pool.size):
+        try:
+            pool.submit(heavy.ready)
+        except WorkPoolBusy:
+            break
+
+
+@app.on_event("shutdown")
+def _stop_work_pool():
+    global _work_pool
+    with _work_pool_lock:
+        if _work_pool is not None:
+            _work_pool.shutdown()
+            _work_pool = None
+
+
+@app.on_event("shutdown")
+def _stop_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown()
+            _pdf_pool = None
+
+
+async def _require_metrics_token(request: Request) -> None:
+    """
+    /metrics et /health/* (files, durées, volumes) : Bearer METRICS_TOKEN exigé. Sans
+    token configuré ces routes sont fermées, sauf METRICS_PUBLIC=1 (réseau interne, dev).
+    """
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        if os.getenv("METRICS_PUBLIC", "").lower() in ("1", "true", "yes"):
+            return
+        raise HTTPException(status_code=403, detail="METRICS_TOKEN non configuré")
+    if not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Token métriques invalide")
+
+
+@app.get("/health/pdf", dependencies=[Depends(_require_metrics_token)])
+def pdf_pool_health():
+    """Santé du pool d'extraction PDF (timeouts, fichiers refusés, durées)."""
+    if _pdf_pool is None:
+        return {"started": False}
+    return {"started": True, **_pdf_pool.stats()}
+
+
+@app.get("/health/work-pool", dependencies=[Depends(_require_metrics_token)])
+def work_pool_health():
+    """Santé du pool de calcul (file, rejets, durées d'exécution et d'attente par tâche)."""
+    if _work_pool is None:
+        return {"started": False}
+    return _work_pool.stats()
+
+
+def _queue_depths() -> Dict[Tuple[str, str], float]:
+    """Jauge queue_depth{queue, state} ; appelée dans l'event loop (limiteur anyio)."""
+    threadpool = anyio.to_thread.current_default_thread_limiter().statistics()
+    with _claude_slots_lock:
+        depths = {("claude_semaphore", state): n for state, n in _claude_slots.items()}
+    depths[("threadpool", "waiting")] = threadpool.tasks_waiting
+    depths[("threadpool", "in_use")] = threadpool.borrowed_tokens
+    for name, executor in (("analysis_executor", _analysis_executor), ("job_executor", _job_executor)):
+        depths.update({(name, state): n for state, n in executor.counts().items()})
+    if _work_pool is not None:
+        depths[("work_pool", "in_flight")] = _work_pool.stats()["in_flight"]
+    return depths
+
+
+metrics.queue_depth.set_function(_queue_depths)
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(_require_metrics_token)])
+async def prometheus_metrics():
+    """
+    Métriques Prometheus (format texte). Async : les jauges lisent le limiteur du
+    threadpool depuis l'event loop.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.on_event("shutdown")
+async def _close_claude_client():
+    global _async_claude
+    if _async_claude is not None:
+        await _async_claude.close()
+        _async_claude = None
+
+
 # ==============================
 # ROUTES: AUTH
 # ==============================
@@ -1067,35 +1374,10 @@ def admin_set_user_role(
 # ==============================
 # HELPERS EXCEL
 # ==============================
-def _to_number(v: Any):
-    if v is None:
-        return None
-    if isinstance(v, (int, float)):
-        return v
-    s = str(v).strip()
-    if s == "":
-        return None
-    s = s.replace(" ", "").replace(",", ".")
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-
-def _set_cell(ws, addr: str, value: Any, numeric: bool = False):
-    if numeric:
-        n = _to_number(value)
-        ws[addr].value = n
-        if n is not None:
-            ws[addr].number_format = "0.00"
-    else:
-        ws[addr].value = value if value is not None else ""
-
-
 def _get_sheet(wb):
     if SHEET_NAME in wb.sheetnames:
         return wb[SHEET_NAME]
-    print(f"[WARN] Feuille '{SHEET_NAME}' introuvable. Feuilles: {wb.sheetnames}. Utilisation: '{wb.active.title}'.")
+    log.warning("feuille %r introuvable (feuilles: %s), utilisation de %r", SHEET_NAME, wb.sheetnames, wb.active.title)
     return wb.active
 
 
@@ -1107,137 +1389,173 @@ def is_valid_excel(path: Path) -> bool:
         return False
 
 
-def recalc_excel_in_place(excel_path: Path) -> None:
+_work_pool: Optional[WorkPool] = None
+_work_pool_lock = threading.Lock()
+
+
+def _get_work_pool() -> WorkPool:
+    global _work_pool
+    with _work_pool_lock:
+        if _work_pool is None:
+            _work_pool = WorkPool(
+                size=int(os.getenv("WORK_POOL_SIZE", "2")),
+                queue_size=int(os.getenv("WORK_QUEUE_SIZE", "8")),
+                start_method=os.getenv("WORK_POOL_START_METHOD", "spawn"),
+            )
+        return _work_pool
+
+
+def run_heavy(fn: Callable[..., Any], *args: Any) -> Any:
+    """Exécute fn(*args) (fonction module, arguments picklables) dans le pool de calcul."""
+    return _get_work_pool().run(fn, *args)
+
+
+async def run_heavy_async(fn: Callable[..., Any], *args: Any) -> Any:
+    """Variante pour les endpoints `async def` : la boucle n'est pas bloquée pendant le calcul."""
+    return await _get_work_pool().run_async(fn, *args)
+
+
+def recalc_excel_in_place(excel_path: Path, timeout: float = 120) -> None:
+    """
+    Recalcul LibreOffice hors ligne (parité des indices : scripts/regen_indices_fixtures.py).
+    L'application n'y fait plus appel (indices calculés par app/indices.py) : un soffice
+    par appel, profil UserInstallation jetable pour ne pas entrer en conflit avec une
+    instance déjà ouverte.
+    """
     if not excel_path.exists() or not is_valid_excel(excel_path):
         return
     if not SOFFICE:
         return
-
     with tempfile.TemporaryDirectory() as tmpdir:
         tmpdir = Path(tmpdir)
-        _kwargs = {}
-        if sys.platform == "win32":
-            _kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
         subprocess.run(
-            [SOFFICE, "--headless", "--nologo", "--nolockcheck", "--norestore",
-             "--convert-to", "xlsx", "--outdir", str(tmpdir), str(excel_path)],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            **_kwargs,
+            [SOFFICE, f"-env:UserInstallation={(tmpdir / 'profile').as_uri()}",
+             "--headless", "--nologo", "--nolockcheck", "--norestore",
+             "--convert-to", "xlsx", "--outdir", str(tmpdir / "out"), str(excel_path)],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout,
         )
-        generated = tmpdir / excel_path.name
-        if not generated.exists():
-            cands = list(tmpdir.glob("*.xlsx"))
-            if cands:
-                generated = cands[0]
+        generated = tmpdir / "out" / excel_path.name
         if generated.exists() and is_valid_excel(generated):
-            copyfile(str(generated), str(excel_path))
-            generated.unlink()
+            copyfile(generated, excel_path)
 
 
-def _ensure_excel(project, db: Session) -> None:
-    """Recrée le fichier Excel depuis le template + données audit si absent (filesystem éphémère sur Render)."""
-    excel_path = EXCEL_DIR / project.excel_file
-    print(f"[DEBUG] _ensure_excel: excel_path={excel_path}", flush=True)
-    print(f"[DEBUG] _ensure_excel: excel_path.exists()={excel_path.exists()}", flush=True)
-    print(f"[DEBUG] _ensure_excel: EXCEL_DIR exists={EXCEL_DIR.exists()}, writable={os.access(EXCEL_DIR, os.W_OK)}", flush=True)
-    if excel_path.exists() and is_valid_excel(excel_path):
-        return
-    if excel_path.exists():
-        print(f"[DEBUG] _ensure_excel: fichier corrompu, suppression...", flush=True)
-        excel_path.unlink()
-    print(f"[DEBUG] _ensure_excel: fichier absent ou corrompu, copie du template...", flush=True)
+def _audit_excel_hash(audit_data: Dict[str, Any]) -> str:
+    """Empreinte du classeur audit : données 2023 (hors field_sources) + version du template."""
+    payload = json.dumps((audit_data or {}).get("year2023") or {}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{_official_template_digest()}:{payload}".encode("utf-8")).hexdigest()[:16]
+
+
+def _materialize_excel(project, audit, audit_data: Dict[str, Any], data_hash: str) -> Path:
+    """
+    Classeur audit du projet, régénéré seulement si les données ont changé.
+    Les PATCH /audit n'écrivent que la base : le fichier est nommé par l'empreinte
+    des données (<project_id>-<data_hash>.xlsx, data_hash = _audit_excel_hash), un
+    fichier absent signifie « périmé » (modification depuis la dernière génération,
+    ou disque éphémère redémarré).
+    Les autres versions ne sont supprimées qu'après EXCEL_STALE_GRACE_SECONDS sans
+    être servies (mtime rafraîchi à chaque accès).
+    """
+    excel_path = EXCEL_DIR / f"{project.id}-{data_hash}.xlsx"
     try:
-        copyfile(TEMPLATE_FILE, excel_path)
-        print(f"[DEBUG] _ensure_excel: copie réussie, fichier créé={excel_path.exists()}", flush=True)
-    except Exception as e:
-        print(f"[DEBUG] _ensure_excel: ERREUR copyfile: {e}", flush=True)
-        raise
-    audit = db.query(models.Audit).filter(models.Audit.project_id == project.id).first()
-    if audit:
-        write_audit_to_excel(project, _audit_to_data(audit))
+        os.utime(excel_path)
+        return excel_path
+    except FileNotFoundError:
+        pass
 
+    tmp_path = excel_path.with_name(f".{excel_path.stem}.{uuid4().hex[:8]}.xlsx")   # openpyxl exige .xlsx
+    try:
+        if audit:
+            write_audit_to_excel(project, audit_data, excel_path=tmp_path)
+        else:
+            copyfile(TEMPLATE_FILE, tmp_path)
+        os.replace(tmp_path, excel_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
-def write_audit_to_excel(project, audit_data: Dict[str, Any]) -> None:
-    excel_path = EXCEL_DIR / project.excel_file
-    copyfile(TEMPLATE_FILE, excel_path)
+    cutoff = time.time() - EXCEL_STALE_GRACE_SECONDS
+    for stale in EXCEL_DIR.glob(f"{project.id}-*.xlsx"):
+        try:
+            if stale != excel_path and stale.stat().st_mtime < cutoff:
+                stale.unlink()
+        except FileNotFoundError:
+            pass   # supprimé par une requête concurrente
+    return excel_path
 
-    wb = load_workbook(excel_path, keep_links=False)
-    ws = _get_sheet(wb)
 
+def _build_audit_sheet_changes(audit_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Mapping audit → feuille '2023' exprimé en sheet_changes (cf. _apply_changes_to_source).
+    Les lignes de chaque section et les facteurs d'influence sont d'abord vidés,
+    puis remplis ; une valeur numérique invalide donne une cellule vide.
+    """
     year = (audit_data or {}).get("year2023", {}) or {}
+    changes: Dict[str, Any] = {}
 
-    if isinstance(year, dict) and "specifics" in year:
-        year = dict(year)
-        year.pop("specifics", None)
-
-    _set_cell(ws, f"B{TITLE_ROWS['operational']}", "Activité opérationnelle")
-    _set_cell(ws, f"B{TITLE_ROWS['buildings']}", "Bâtiments")
-    _set_cell(ws, f"B{TITLE_ROWS['transport']}", "Transport")
-    _set_cell(ws, f"B{TITLE_ROWS['utility']}", "Utilité")
+    changes[f"B{TITLE_ROWS['operational']}"] = "Activité opérationnelle"
+    changes[f"B{TITLE_ROWS['buildings']}"] = "Bâtiments"
+    changes[f"B{TITLE_ROWS['transport']}"] = "Transport"
+    changes[f"B{TITLE_ROWS['utility']}"] = "Utilité"
 
     headers = year.get("utility_headers", {}) or {}
-    _set_cell(ws, "G3", headers.get("util1_name", ""))
-    _set_cell(ws, "G4", headers.get("util1_unit", ""))
-    _set_cell(ws, "H3", headers.get("util2_name", ""))
-    _set_cell(ws, "H4", headers.get("util2_unit", ""))
+    changes["G3"] = headers.get("util1_name", "")
+    changes["G4"] = headers.get("util1_unit", "")
+    changes["H3"] = headers.get("util2_name", "")
+    changes["H4"] = headers.get("util2_unit", "")
 
     col_map = {
         "name": "B", "electricity": "C", "gas": "D", "fuel": "E",
         "biogas": "F", "util1": "G", "util2": "H", "process": "I",
     }
-    numeric_fields = {"electricity", "gas", "fuel", "biogas", "util1", "util2", "process"}
 
     for section_key in ["operational", "buildings", "transport", "utility"]:
         rows = year.get(section_key, []) or []
         start_row = SECTION_START_ROW[section_key]
 
         for r in range(MAX_ROWS_PER_SECTION):
-            excel_row = start_row + r
             for field, col in col_map.items():
-                _set_cell(ws, f"{col}{excel_row}", "" if field == "name" else None,
-                          numeric=(field in numeric_fields))
+                changes[f"{col}{start_row + r}"] = "" if field == "name" else None
 
         for idx, row in enumerate(rows[:MAX_ROWS_PER_SECTION]):
             excel_row = start_row + idx
-            _set_cell(ws, f"B{excel_row}", row.get("name", ""))
-            _set_cell(ws, f"C{excel_row}", row.get("electricity", None), numeric=True)
-            _set_cell(ws, f"D{excel_row}", row.get("gas", None), numeric=True)
-            _set_cell(ws, f"E{excel_row}", row.get("fuel", None), numeric=True)
-            _set_cell(ws, f"F{excel_row}", row.get("biogas", None), numeric=True)
-            _set_cell(ws, f"G{excel_row}", row.get("util1", None), numeric=True)
-            _set_cell(ws, f"H{excel_row}", row.get("util2", None), numeric=True)
-            _set_cell(ws, f"I{excel_row}", row.get("process", None), numeric=True)
+            for field, col in col_map.items():
+                if field == "name":
+                    changes[f"{col}{excel_row}"] = row.get("name", "")
+                else:
+                    changes[f"{col}{excel_row}"] = heavy.to_number(row.get(field))
 
     influence = year.get("influence_factors", []) or []
     for i in range(INFLUENCE_MAX_ROWS):
         excel_row = INFLUENCE_START_ROW + i
-        _set_cell(ws, f"L{excel_row}", "")
-        _set_cell(ws, f"M{excel_row}", None, numeric=True)
-        _set_cell(ws, f"N{excel_row}", "")
+        changes[f"L{excel_row}"] = ""
+        changes[f"M{excel_row}"] = None
+        changes[f"N{excel_row}"] = ""
 
     for i, row in enumerate(influence[:INFLUENCE_MAX_ROWS]):
         excel_row = INFLUENCE_START_ROW + i
-        _set_cell(ws, f"L{excel_row}", row.get("description", ""))
-        _set_cell(ws, f"M{excel_row}", row.get("value", None), numeric=True)
-        _set_cell(ws, f"N{excel_row}", row.get("unit", ""))
+        changes[f"L{excel_row}"] = row.get("description", "")
+        changes[f"M{excel_row}"] = heavy.to_number(row.get("value"))
+        changes[f"N{excel_row}"] = row.get("unit", "")
 
     invoice = year.get("invoice_meter", {}) or {}
-    _set_cell(ws, "C19", invoice.get("electricity", None), numeric=True)
-    _set_cell(ws, "D19", invoice.get("gas", None), numeric=True)
-    _set_cell(ws, "E19", invoice.get("fuel", None), numeric=True)
-    _set_cell(ws, "F19", invoice.get("biogas", None), numeric=True)
-    _set_cell(ws, "G19", invoice.get("util1", None), numeric=True)
-    _set_cell(ws, "H19", invoice.get("util2", None), numeric=True)
-    _set_cell(ws, "I19", invoice.get("process", None), numeric=True)
+    for field, col in (("electricity", "C"), ("gas", "D"), ("fuel", "E"), ("biogas", "F"),
+                       ("util1", "G"), ("util2", "H"), ("process", "I")):
+        changes[f"{col}19"] = heavy.to_number(invoice.get(field))
 
-    wb.calculation.calcMode = "auto"
-    wb.calculation.fullCalcOnLoad = True
-    wb.save(excel_path)
+    return {SHEET_NAME: changes}
+
+
+def write_audit_to_excel(project, audit_data: Dict[str, Any], excel_path: Optional[Path] = None) -> None:
+    """
+    Écrit le classeur audit par patch zip du template (comme le pré-remplissage AMUREBA) :
+    pas de load_workbook / wb.save, les noms définis et caches pivot restent intacts
+    et fullCalcOnLoad force le recalcul à l'ouverture.
+    """
+    excel_path = excel_path or EXCEL_DIR / project.excel_file
+    excel_path.write_bytes(_apply_changes_to_source(_get_template_skeleton(), _build_audit_sheet_changes(audit_data)))
 
 
 def read_indices_from_excel(excel_path: Path) -> Dict[str, Any]:
+    """Indices lus après recalcul LibreOffice - référence de parité pour app/indices.py."""
     recalc_excel_in_place(excel_path)
 
     wb = load_workbook(excel_path, data_only=True, keep_links=False)
@@ -1367,19 +1685,26 @@ def _to_float(val) -> Optional[float]:
 
 
 def _upsert_energy_year(
-    project_id: str, year_str: str, year_data: Dict[str, Any], db: Session
+    project_id: str, year_str: str, year_data: Dict[str, Any], db: Session,
+    existing: Optional[Dict[str, models.EnergyRecord]] = None,
 ) -> None:
-    """Crée ou met à jour une ligne energy_accounting pour une année."""
+    """
+    Crée ou met à jour une ligne energy_accounting pour une année. existing : lignes du
+    projet déjà chargées, par année (mise à jour de plusieurs années sans SELECT par année).
+    """
     totals = year_data.get("totals", {}) or {}
     details = year_data.get("details") or {}
     notes = year_data.get("notes", "") or ""
 
     incoming_fs = year_data.get("field_sources") or {}
 
-    record = db.query(models.EnergyRecord).filter(
-        models.EnergyRecord.project_id == project_id,
-        models.EnergyRecord.year == year_str,
-    ).first()
+    if existing is not None:
+        record = existing.get(year_str)
+    else:
+        record = db.query(models.EnergyRecord).filter(
+            models.EnergyRecord.project_id == project_id,
+            models.EnergyRecord.year == year_str,
+        ).first()
 
     if record:
         record.electricity = _to_float(totals.get("electricity"))
@@ -1437,13 +1762,10 @@ def list_projects(
 def create_project(payload: schemas.ProjectCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     project_id = str(uuid4())
     excel_name = f"{project_id}.xlsx"
-    excel_path = EXCEL_DIR / excel_name
 
     if not TEMPLATE_FILE.exists():
         raise HTTPException(status_code=500, detail="Excel template not found")
 
-    copyfile(TEMPLATE_FILE, excel_path)
-
     now = datetime.now(timezone.utc).isoformat()
     project = models.Project(
         id=project_id,
@@ -1480,9 +1802,9 @@ def delete_project(project_id: str, db: Session = Depends(get_db), current_user:
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    excel_path = EXCEL_DIR / project.excel_file
-    if excel_path.exists():
-        excel_path.unlink()
+    (EXCEL_DIR / project.excel_file).unlink(missing_ok=True)
+    for cached in EXCEL_DIR.glob(f"{project.id}-*.xlsx"):
+        cached.unlink(missing_ok=True)
 
     db.delete(project)
     db.commit()
@@ -1546,26 +1868,33 @@ def update_project_audit(project_id: str, payload: schemas.AuditUpdate, db: Sess
 
     audit = _upsert_audit(project_id, payload.audit_data, db, field_sources=payload.field_sources)
     audit_data = _audit_to_data(audit)
-
-    write_audit_to_excel(project, audit_data)
+    # Le classeur n'est plus réécrit ici : régénéré à la demande (cf. _materialize_excel)
 
     _touch_project(db, project_id)
     return {"status": "ok", "audit_data": audit_data}
 
 
 @app.get("/projects/{project_id}/excel")
-def download_project_excel(project_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def download_project_excel(project_id: str, request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     project = db.query(models.Project).filter(models.Project.id == project_id, models.Project.owner_id == current_user.id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    _ensure_excel(project, db)
-    excel_path = EXCEL_DIR / project.excel_file
+    # L'empreinte des données sert d'ETag fort : revalidée avant toute génération
+    audit = db.query(models.Audit).filter(models.Audit.project_id == project.id).first()
+    audit_data = _audit_to_data(audit)
+    data_hash = _audit_excel_hash(audit_data)
+    etag = f'"{data_hash}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    excel_path = _materialize_excel(project, audit, audit_data, data_hash)
 
     return FileResponse(
         path=str(excel_path),
         filename=f"{_safe_filename(project.project_name)}.xlsx",
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"ETag": etag, "Cache-Control": _DOWNLOAD_CACHE_CONTROL},
     )
 
 
@@ -1606,14 +1935,21 @@ async def extract_document(
         "Retourne UNIQUEMENT un JSON valide sans markdown."
     )
 
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    cached = _extraction_cache_get(db, file_hash, prompt)
+    if cached is not None:
+        log.info("extract-document: cache d'extraction (%s…)", file_hash[:12])
+        return cached
+
     if content_type == "application/pdf":
-        pdf_text = _extract_pdf_text(file_bytes)
+        pdf_text = await asyncio.to_thread(_extract_pdf_text, file_bytes)
         if _has_useful_text(pdf_text):
-            print(f"[extract-document] PDF natif ({len(pdf_text)} chars), envoi texte", flush=True)
+            log.info("extract-document: PDF natif (%d chars), envoi texte", len(pdf_text))
             messages = [{"role": "user", "content": f"{prompt}\n\nContenu du document :\n{pdf_text}"}]
         else:
-            print("[extract-document] PDF scanné, fallback vision", flush=True)
-            b64_data = base64.standard_b64encode(file_bytes).decode("utf-8")
+            log.info("extract-document: PDF scanné, fallback vision")
+            vision_pdf = await asyncio.to_thread(_vision_pdf, file_bytes, pdf_text)
+            b64_data = base64.standard_b64encode(vision_pdf).decode("utf-8")
             messages = [{"role": "user", "content": [
                 {"type": "document", "source": {"type": "base64", "media_type": "application/pdf", "data": b64_data}},
                 {"type": "text", "text": prompt},
@@ -1626,9 +1962,8 @@ async def extract_document(
         ]}]
 
     try:
-        client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-        message = client.messages.create(
-            model="claude-sonnet-4-6",
+        message = await _claude_create(
+            "extract-document",
             max_tokens=1024,
             messages=messages,
         )
@@ -1639,6 +1974,8 @@ async def extract_document(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    _extraction_cache_put(db, file_hash, prompt, extracted)
+    db.commit()
     return extracted
 
 
@@ -1651,10 +1988,9 @@ def get_indices(project_id: str, db: Session = Depends(get_db), current_user: mo
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    _ensure_excel(project, db)
-    excel_path = EXCEL_DIR / project.excel_file
-
-    return read_indices_from_excel(excel_path)
+    # Calcul natif (formules de la feuille '2023') : plus de recalcul LibreOffice par requête
+    audit = db.query(models.Audit).filter(models.Audit.project_id == project_id).first()
+    return amureba_indices.compute_indices(_audit_to_data(audit))
 
 
 # ==============================
@@ -1676,8 +2012,11 @@ def update_energy_accounting(project_id: str, payload: schemas.EnergyAccountingU
         raise HTTPException(status_code=404, detail="Project not found")
 
     years = (payload.energy_accounting or {}).get("years", {}) or {}
+    existing = {
+        r.year: r for r in db.query(models.EnergyRecord).filter(models.EnergyRecord.project_id == project_id).all()
+    }
     for year_str, year_data in years.items():
-        _upsert_energy_year(project_id, year_str, year_data, db)
+        _upsert_energy_year(project_id, year_str, year_data, db, existing)
 
     db.commit()
     _touch_project(db, project_id)
@@ -1851,31 +2190,8 @@ Sources :
 """
 
 
-_EXTRA_SECTIONS_META = [
-    ("description_batiment", "Description du bâtiment", [
-        ("batiment_usage",       "Usage"),
-        ("batiment_surface",     "Surface"),
-        ("batiment_description", "Description"),
-    ]),
-    ("synthese_energetique", "Situation énergétique", [
-        ("energie_electricite_kwh", "Électricité"),
-        ("energie_gaz_kwh",         "Gaz"),
-        ("energie_synthese",        "Synthèse"),
-    ]),
-    ("plan_amelioration", "Plan d'amélioration", [
-        ("actions_nb",                   "Nombre d'actions"),
-        ("actions_investissement_total",  "Investissement total"),
-        ("actions_economie_energie",      "Économie d'énergie"),
-        ("actions_synthese",             "Synthèse"),
-    ]),
-]
-
-
-def _generate_report_docx_bytes(project: models.Project, report: Optional[models.Report]) -> bytes:
-    """Render the report .docx template and return raw bytes."""
-    if not REPORT_TEMPLATE_FILE.exists():
-        raise HTTPException(status_code=500, detail="Template rapport introuvable")
-
+def _report_docx_inputs(project: models.Project, report: Optional[models.Report]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(contexte docxtpl, extra_sections) : tout ce dont dépend le rendu du rapport."""
     audit_type = (report.audit_type if report else None) or project.audit_type or ""
     audit_type = audit_type.strip()
 
@@ -1894,37 +2210,24 @@ def _generate_report_docx_bytes(project: models.Project, report: Optional[models
         **extra.get("synthese_energetique", {}),
         **extra.get("plan_amelioration", {}),
     }
+    return context, extra
 
-    print(f"[docx] context keys: {list(context.keys())}", flush=True)
-    print(f"[docx] extra_sections: { {k: list(v.keys()) for k, v in extra.items()} }", flush=True)
-
-    out_path = REPORT_DIR / f"{project.id}_report.docx"
-    doc = DocxTemplate(str(REPORT_TEMPLATE_FILE))
-    doc.render(context)
-    doc.save(str(out_path))
-
-    # Append extra sections using python-docx since the template has no Jinja placeholders for them
-    from docx import Document as _DocxDoc
-    d2 = _DocxDoc(str(out_path))
-    appended_any = False
-    for sec_id, sec_label, fields in _EXTRA_SECTIONS_META:
-        sec_data = extra.get(sec_id, {})
-        non_empty = [(fk, fl, sec_data[fk]) for fk, fl in fields if sec_data.get(fk)]
-        if not non_empty:
-            continue
-        if not appended_any:
-            d2.add_paragraph()
-            appended_any = True
-        d2.add_heading(sec_label, level=1)
-        for fk, fl, val in non_empty:
-            p = d2.add_paragraph()
-            p.add_run(f"{fl} : ").bold = True
-            p.add_run(val)
-        print(f"[docx] section '{sec_id}': {[fk for fk, _, _ in non_empty]}", flush=True)
-    d2.save(str(out_path))
 
-    with open(str(out_path), "rb") as f:
-        return f.read()
+def _generate_report_docx_bytes(project: models.Project, report: Optional[models.Report]) -> bytes:
+    """Render the report .docx in the work pool and return raw bytes."""
+    if not REPORT_TEMPLATE_FILE.exists():
+        raise HTTPException(status_code=500, detail="Template rapport introuvable")
+    inputs = _report_docx_inputs(project, report)
+    with metrics.timed("docx_render"):   # mesuré ici : le rendu tourne dans un worker
+        return run_heavy(heavy.render_report_docx, REPORT_TEMPLATE_FILE, *inputs)
+
+
+async def _generate_report_docx_bytes_async(project: models.Project, report: Optional[models.Report]) -> bytes:
+    if not REPORT_TEMPLATE_FILE.exists():
+        raise HTTPException(status_code=500, detail="Template rapport introuvable")
+    inputs = _report_docx_inputs(project, report)
+    with metrics.timed("docx_render"):
+        return await run_heavy_async(heavy.render_report_docx, REPORT_TEMPLATE_FILE, *inputs)
 
 
 async def _get_report_prefill_proposals(
@@ -2035,7 +2338,7 @@ async def _get_report_prefill_proposals(
                 "batiments": lca.batiments,
             }
     except Exception as lca_err:
-        print(f"[report-prefill] ACV indisponible, ignorée ({type(lca_err).__name__}: {lca_err})", flush=True)
+        log.warning("report-prefill: ACV indisponible, ignorée (%s: %s)", type(lca_err).__name__, lca_err)
         db.rollback()  # remettre la session dans un état propre après l'erreur SQL
 
     # Passer les valeurs déjà appliquées à Claude pour éviter les redondances
@@ -2058,10 +2361,11 @@ async def _get_report_prefill_proposals(
                 already_applied[sec_key] = sec_vals
     if already_applied:
         data["already_applied"] = already_applied
-        print(f"[report-prefill] {sum(len(v) for v in already_applied.values())} champs déjà appliqués transmis à Claude", flush=True)
+        log.debug("report-prefill: %d champs déjà appliqués transmis à Claude",
+                  sum(len(v) for v in already_applied.values()))
 
     # ── Claude call ─────────────────────────────────────────────────────────
-    print(f"[report-prefill] contexte construit pour projet {project_id}, appel Claude…", flush=True)
+    log.info("report-prefill: contexte construit, appel Claude", extra={"project_id": project_id})
     try:
         data_json = json.dumps(_sanitize_for_json(data), ensure_ascii=False, indent=2)
         user_msg = _REPORT_PREFILL_USER_TPL.format(
@@ -2073,14 +2377,12 @@ async def _get_report_prefill_proposals(
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY manquant dans les variables d'environnement")
 
-        claude_client = anthropic.Anthropic(api_key=api_key)
-        msg = claude_client.messages.create(
-            model="claude-sonnet-4-6",
+        msg = await _claude_create(
+            "report-prefill",
             max_tokens=4096,
             system=_REPORT_PREFILL_SYSTEM,
             messages=[{"role": "user", "content": user_msg}],
         )
-        print(f"[tokens] report-prefill in={msg.usage.input_tokens} out={msg.usage.output_tokens}", flush=True)
         raw_text = msg.content[0].text.strip()
         json_match = re.search(r"\{.*\}", raw_text, re.DOTALL)
         if not json_match:
@@ -2089,7 +2391,7 @@ async def _get_report_prefill_proposals(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[report-prefill] ERREUR: {type(e).__name__}: {e}", flush=True)
+        log.error("report-prefill: %s: %s", type(e).__name__, e, extra={"project_id": project_id})
         raise HTTPException(status_code=502, detail=f"Erreur lors du pré-remplissage IA : {e}")
 
     return project, report, proposed
@@ -2166,7 +2468,7 @@ def update_project_report(project_id: str, payload: schemas.ReportUpdate, db: Se
 
 
 @app.get("/projects/{project_id}/report/docx")
-def download_project_report_docx(project_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def download_project_report_docx(project_id: str, request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     project = db.query(models.Project).filter(models.Project.id == project_id, models.Project.owner_id == current_user.id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -2174,20 +2476,23 @@ def download_project_report_docx(project_id: str, db: Session = Depends(get_db),
     safe_name = _safe_filename(project.project_name)
 
     # Serve stored docx if available (from AI prefill or manual upload)
-    if project.report_docx:
-        return StreamingResponse(
-            io.BytesIO(project.report_docx),
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            headers={"Content-Disposition": f'attachment; filename="{safe_name}_rapport.docx"'},
+    if _has_blob(project, "report_docx_hash", "report_docx"):
+        return _blob_response(
+            request, project.report_docx_hash, project.report_docx,
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            f"{safe_name}_rapport.docx",
         )
 
-    # Regenerate from DB data + template
+    # Generate from DB data + template (artifact cache: regenerated only when inputs change)
+    if not REPORT_TEMPLATE_FILE.exists():
+        raise HTTPException(status_code=500, detail="Template rapport introuvable")
     report = db.query(models.Report).filter(models.Report.project_id == project_id).first()
-    docx_bytes = _generate_report_docx_bytes(project, report)
-    return StreamingResponse(
-        io.BytesIO(docx_bytes),
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": f'attachment; filename="{safe_name}_rapport.docx"'},
+    input_hash = _artifact_key("report_docx", heavy.file_digest(REPORT_TEMPLATE_FILE), _report_docx_inputs(project, report))
+    return _artifact_response(
+        request, db, project_id, "report_docx", input_hash,
+        lambda: _generate_report_docx_bytes(project, report),
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        f"{safe_name}_rapport.docx",
     )
 
 
@@ -2208,7 +2513,7 @@ def get_report_status(
     report = db.query(models.Report).filter(models.Report.project_id == project_id).first()
 
     return {
-        "has_report_docx":       project.report_docx is not None,
+        "has_report_docx":       _has_blob(project, "report_docx_hash", "report_docx"),
         "report_docx_source":    project.report_docx_source,
         "report_prefilled_at":   project.report_prefilled_at,
         "report_prefill_summary": project.report_prefill_summary,
@@ -2231,13 +2536,12 @@ async def report_prefill_preview(
     """
     Appelle Claude et retourne les propositions groupées par section, avec conflict_type par champ.
     """
-    print(f"[report-prefill-preview] début - project_id={project_id}", flush=True)
     try:
         project, report, proposed = await _get_report_prefill_proposals(project_id, db, current_user)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[report-prefill-preview] ERREUR non-catchée: {type(e).__name__}: {e}", flush=True)
+        log.exception("report-prefill-preview: erreur non gérée", extra={"project_id": project_id})
         raise HTTPException(status_code=500, detail=f"Erreur interne : {e}")
     _assert_prefill_allowed(db, project, "report")
 
@@ -2340,7 +2644,7 @@ async def report_prefill_preview(
 
     return {
         "sections":           sections_out,
-        "has_existing_docx":  project.report_docx is not None,
+        "has_existing_docx":  _has_blob(project, "report_docx_hash", "report_docx"),
         "report_docx_source": project.report_docx_source,
     }
 
@@ -2365,9 +2669,10 @@ async def report_apply_prefill(
 
     _assert_prefill_allowed(db, project, "report")
 
-    print(f"[apply-prefill] {len(payload.items)} items reçus", flush=True)
-    for item in payload.items:
-        print(f"  [{item.section}] {item.field} = {repr(str(item.value)[:80])}", flush=True)
+    log.info("apply-prefill: %d items reçus", len(payload.items), extra={"project_id": project_id})
+    if log.isEnabledFor(logging.DEBUG):   # une ligne par champ : rien n'est construit à INFO
+        for item in payload.items:
+            log.debug("apply-prefill [%s] %s = %r", item.section, item.field, str(item.value)[:80], extra=logs.SAMPLED)
 
     report = db.query(models.Report).filter(models.Report.project_id == project_id).first()
     if not report:
@@ -2406,13 +2711,16 @@ async def report_apply_prefill(
     db.commit()
     db.refresh(report)
 
-    print(f"[apply-prefill] sections DB: {list(sections_applied)}", flush=True)
-    print(f"[apply-prefill] extra_sections: { {k: list(v.keys()) for k, v in extra.items()} }", flush=True)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("apply-prefill sections DB: %s, extra_sections: %s", list(sections_applied),
+                  {k: list(v) for k, v in extra.items()})
 
     # Generate and persist docx
     now = datetime.now(timezone.utc).isoformat()
-    docx_bytes = _generate_report_docx_bytes(project, report)
-    project.report_docx         = docx_bytes
+    docx_bytes = await _generate_report_docx_bytes_async(project, report)
+    docx_hash = await _put_blob_async(docx_bytes)
+    project.report_docx_hash    = docx_hash
+    project.report_docx         = None
     project.report_docx_source  = "ai_prefill"
     project.report_prefilled_at = now
     project.report_prefill_summary = {
@@ -2445,7 +2753,7 @@ async def report_apply_prefill(
             ],
             "sections_applied": list(sections_applied),
         },
-        file_bytes=docx_bytes,
+        file_hash=docx_hash,
         file_name=docx_filename,
         file_mime_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         file_size=len(docx_bytes),
@@ -2482,7 +2790,9 @@ async def upload_report_docx(
 
     content = await file.read()
     now = datetime.now(timezone.utc).isoformat()
-    project.report_docx         = content
+    content_hash = await _put_blob_async(content)
+    project.report_docx_hash    = content_hash
+    project.report_docx         = None
     project.report_docx_source  = "manual_upload"
     project.report_prefilled_at = now
 
@@ -2493,7 +2803,7 @@ async def upload_report_docx(
         owner_id=current_user.id,
         action_type="MANUAL_UPLOAD",
         changes={"filename": file.filename, "size": len(content)},
-        file_bytes=content,
+        file_hash=content_hash,
         file_name=file.filename,
         file_mime_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         file_size=len(content),
@@ -2521,7 +2831,7 @@ def get_report_history(
         raise HTTPException(status_code=404, detail="Project not found")
 
     rows = (
-        db.query(models.ReportHistory)
+        db.query(models.ReportHistory, models.ReportHistory.file_bytes.isnot(None).label("has_legacy_file"))
         .filter(models.ReportHistory.project_id == project_id)
         .order_by(models.ReportHistory.created_at.desc())
         .all()
@@ -2531,12 +2841,12 @@ def get_report_history(
             "id":          r.id,
             "action_type": r.action_type,
             "changes":     r.changes,
-            "has_file":    r.file_bytes is not None,
+            "has_file":    bool(r.file_hash) or has_legacy_file,
             "file_name":   r.file_name,
             "file_size":   r.file_size,
             "created_at":  r.created_at,
         }
-        for r in rows
+        for r, has_legacy_file in rows
     ]
 
 
@@ -2544,6 +2854,7 @@ def get_report_history(
 def download_report_history_file(
     project_id: str,
     history_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
@@ -2561,16 +2872,12 @@ def download_report_history_file(
     ).first()
     if not entry:
         raise HTTPException(status_code=404, detail="History entry not found")
-    if not entry.file_bytes:
+    if not _has_blob(entry, "file_hash", "file_bytes"):
         raise HTTPException(status_code=404, detail="Aucun fichier disponible pour cette entrée")
 
     filename = entry.file_name or f"rapport_{history_id}.docx"
     mime = entry.file_mime_type or "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    return StreamingResponse(
-        io.BytesIO(entry.file_bytes),
-        media_type=mime,
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    return _blob_response(request, entry.file_hash, entry.file_bytes, mime, filename)
 
 
 # ==============================
@@ -2829,7 +3136,7 @@ async def import_client_file(
     file_bytes = await file.read()
     if not _check_file_magic(file_bytes, content_type):
         raise HTTPException(status_code=400, detail="Contenu du fichier invalide.")
-    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    file_hash = await _put_blob_async(file_bytes)   # SHA-256 du contenu
     now = datetime.now(timezone.utc).isoformat()
 
     doc = models.ProjectDocument(
@@ -2840,11 +3147,14 @@ async def import_client_file(
         original_name=file.filename or "document",
         file_type=content_type,
         doc_type=doc_type,
-        file_data=file_bytes,
         file_hash=file_hash,
+        file_size=len(file_bytes),
         status="pending",
         created_at=now,
     )
+    cached = _extraction_cache_get(db, file_hash, _ANALYZE_PROMPT)
+    if cached is not None:
+        _apply_extraction(doc, cached)
     db.add(doc)
 
     received = list(cr.received_files or [])
@@ -2911,23 +3221,113 @@ def _doc_to_dict(doc: models.ProjectDocument) -> Dict[str, Any]:
     }
 
 
-def _extract_pdf_text(file_bytes: bytes) -> str:
-    """Tente d'extraire le texte natif d'un PDF avec pdfplumber (timeout 10s). Retourne '' si échec."""
-    def _do_extract():
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-            pages_text = [page.extract_text() or "" for page in pdf.pages]
-        return "\n".join(pages_text).strip()
+def _prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def _extraction_cache_get(db: Session, file_hash: Optional[str], prompt: str) -> Optional[Dict[str, Any]]:
+    """Extraction déjà payée pour ce fichier, ce prompt et ce modèle (None sinon)."""
+    if not file_hash:
+        return None
+    row = db.get(models.ExtractionCache, (file_hash, _prompt_hash(prompt), CLAUDE_MODEL))
+    return row.extracted_data if row else None
+
 
+def _extraction_cache_put(db: Session, file_hash: Optional[str], prompt: str, extracted: Any) -> None:
+    """Enregistre une extraction (sans commit) ; une écriture concurrente identique est ignorée."""
+    if not file_hash or not isinstance(extracted, dict):
+        return
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-            future = ex.submit(_do_extract)
-            return future.result(timeout=10)
-    except concurrent.futures.TimeoutError:
-        print("[analyze] pdfplumber timeout (>10s), fallback vision", flush=True)
-        return ""
-    except Exception as e:
-        print(f"[analyze] pdfplumber échec: {e}", flush=True)
-        return ""
+        with db.begin_nested():
+            db.merge(models.ExtractionCache(
+                file_hash=file_hash,
+                prompt_hash=_prompt_hash(prompt),
+                model=CLAUDE_MODEL,
+                extracted_data=extracted,
+                created_at=datetime.now(timezone.utc).isoformat(),
+            ))
+    except IntegrityError:
+        pass
+
+
+_AI_TYPE_MAP = {
+    "facture_electricite": "facture_electricite",
+    "facture_gaz":         "facture_gaz",
+    "facture_fuel":        "facture_fuel",
+    "releve":              "releve_compteur",
+    "contrat":             "contrat",
+}
+
+
+def _apply_extraction(doc: models.ProjectDocument, extracted: Dict[str, Any]) -> None:
+    doc.extracted_data = extracted
+    doc.status = "analyzed"
+    flag_modified(doc, "extracted_data")
+    # Auto-classify doc_type if user left default "autre"
+    if doc.doc_type in ("autre", None):
+        mapped = _AI_TYPE_MAP.get((extracted or {}).get("type_document", ""))
+        if mapped:
+            doc.doc_type = mapped
+
+
+_pdf_pool: Optional[PdfTextPool] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> PdfTextPool:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = PdfTextPool(
+                size=int(os.getenv("PDF_POOL_SIZE", "2")),
+                timeout=float(os.getenv("PDF_TIMEOUT", "10")),
+                max_pages=int(os.getenv("PDF_MAX_PAGES", "50")),
+                max_bytes=int(os.getenv("PDF_MAX_BYTES", str(20 * 1024 * 1024))),
+            )
+        return _pdf_pool
+
+
+def _extract_pdf(file_bytes: bytes) -> PdfText:
+    """Texte natif d'un PDF (processus tuable, limites de taille et de pages)."""
+    with metrics.timed("pdf_extract"):
+        result = _get_pdf_pool().extract(file_bytes)
+    if result.status not in ("ok", "truncated"):
+        log.info("pdf-text: extraction %s, fallback vision", result.status)
+    elif result.status == "truncated":
+        log.info("pdf-text: PDF tronqué aux %d premières pages", result.pages)
+    return result
+
+
+def _extract_pdf_text(file_bytes: bytes) -> str:
+    """Tente d'extraire le texte natif d'un PDF. Retourne '' si échec."""
+    return _extract_pdf(file_bytes).text
+
+
+def _vision_pdf(file_bytes: bytes, pdf_text: str) -> bytes:
+    """PDF envoyé en vision : seules les PDF_VISION_PAGES pages les plus pertinentes (toutes si court)."""
+    selected = _get_pdf_pool().select_pages(file_bytes, pdf_text, int(os.getenv("PDF_VISION_PAGES", "3")))
+    if selected is not file_bytes:
+        log.info("pdf-text: PDF vision réduit %d → %d octets", len(file_bytes), len(selected))
+    return selected
+
+
+def _document_pdf_text(doc: models.ProjectDocument, file_data: bytes, db_session=None) -> str:
+    """
+    Texte natif du document, extrait au premier appel puis persisté (sans commit). Un même
+    fichier déjà analysé (autre projet, ré-upload) fournit son texte sans nouveau parsing.
+    """
+    if doc.pdf_text is None and db_session is not None and doc.file_hash:
+        twin = db_session.query(models.ProjectDocument.pdf_text, models.ProjectDocument.pdf_text_status).filter(
+            models.ProjectDocument.file_hash == doc.file_hash,
+            models.ProjectDocument.status == "analyzed",
+            models.ProjectDocument.pdf_text.isnot(None),
+        ).first()
+        if twin is not None:
+            doc.pdf_text, doc.pdf_text_status = twin
+    if doc.pdf_text is None:
+        result = _extract_pdf(file_data)
+        doc.pdf_text, doc.pdf_text_status = result.text, result.status
+    return doc.pdf_text
 
 
 def _has_useful_text(text: str) -> bool:
@@ -2936,7 +3336,7 @@ def _has_useful_text(text: str) -> bool:
         return False
     if not re.search(r'\d{3,}', text):   # facture = toujours des chiffres
         return False
-    printable = sum(1 for c in text if c.isprintable() or c == '\n')
+    printable = sum(1 for c in text if c.isprintable() or c in '\n\f')   # \f : séparateur de pages
     if printable / len(text) < 0.90:     # trop de garbage chars → OCR raté
         return False
     return True
@@ -2945,35 +3345,30 @@ def _has_useful_text(text: str) -> bool:
 def _analyze_one(doc: models.ProjectDocument, db_session=None) -> None:
     """Analyse un document avec Claude et met à jour doc.status / doc.extracted_data (sans commit)."""
 
-    # --- Déduplication par hash ---
-    if doc.file_hash and db_session is not None:
-        duplicate = db_session.query(models.ProjectDocument).filter(
-            models.ProjectDocument.file_hash == doc.file_hash,
-            models.ProjectDocument.status == "analyzed",
-            models.ProjectDocument.id != doc.id,
-        ).first()
-        if duplicate:
-            print(f"[analyze] Déduplication hash ({doc.file_hash[:12]}…), copie depuis doc_id={duplicate.id}, doc_id={doc.id}", flush=True)
-            doc.extracted_data = duplicate.extracted_data
-            doc.status = "analyzed"
-            flag_modified(doc, "extracted_data")
+    # --- Cache d'extraction (même fichier, même prompt, même modèle) ---
+    if db_session is not None:
+        cached = _extraction_cache_get(db_session, doc.file_hash, _ANALYZE_PROMPT)
+        if cached is not None:
+            log.info("analyze: cache d'extraction (%s…)", doc.file_hash[:12], extra={"doc_id": doc.id})
+            _apply_extraction(doc, cached)
             return
 
-    client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+    client = _get_sync_claude()
     use_vision = False
+    file_data = _get_blob(doc.file_hash, doc.file_data)
 
     if doc.file_type == "application/pdf":
-        pdf_text = _extract_pdf_text(doc.file_data)
+        pdf_text = _document_pdf_text(doc, file_data, db_session)
         if _has_useful_text(pdf_text):
-            print(f"[analyze] PDF natif ({len(pdf_text)} chars), envoi texte à Claude, doc_id: {doc.id}", flush=True)
+            log.info("analyze: PDF natif (%d chars), envoi texte", len(pdf_text), extra={"doc_id": doc.id})
             messages = [{
                 "role": "user",
                 "content": f"{_ANALYZE_PROMPT}\n\nContenu du document :\n{pdf_text}",
             }]
         else:
-            print(f"[analyze] PDF scanné (texte natif insuffisant), fallback vision, doc_id: {doc.id}", flush=True)
+            log.info("analyze: PDF scanné (texte natif insuffisant), fallback vision", extra={"doc_id": doc.id})
             use_vision = True
-            b64 = base64.standard_b64encode(doc.file_data).decode("utf-8")
+            b64 = base64.standard_b64encode(_vision_pdf(file_data, pdf_text)).decode("utf-8")
             messages = [{
                 "role": "user",
                 "content": [
@@ -2982,9 +3377,9 @@ def _analyze_one(doc: models.ProjectDocument, db_session=None) -> None:
                 ],
             }]
     else:
-        print(f"[analyze] image ({doc.file_type}), envoi vision à Claude, doc_id: {doc.id}", flush=True)
+        log.info("analyze: image (%s), envoi vision", doc.file_type, extra={"doc_id": doc.id})
         use_vision = True
-        b64 = base64.standard_b64encode(doc.file_data).decode("utf-8")
+        b64 = base64.standard_b64encode(file_data).decode("utf-8")
         messages = [{
             "role": "user",
             "content": [
@@ -2994,17 +3389,18 @@ def _analyze_one(doc: models.ProjectDocument, db_session=None) -> None:
         }]
 
     def _call_claude(msgs):
+        started = time.perf_counter()
         msg = client.messages.create(
-            model="claude-sonnet-4-6",
+            model=CLAUDE_MODEL,
             max_tokens=1024,
             messages=msgs,
         )
-        print(f"[tokens] in={msg.usage.input_tokens} out={msg.usage.output_tokens} doc_id={doc.id}", flush=True)
+        _record_claude_call("analyze", started, msg)
         return msg
 
     try:
         message = _call_claude(messages)
-        print(f"[analyze] réponse brute: {message.content}", flush=True)
+        log.debug("analyze: réponse brute %.2000s", message.content[0].text, extra={"doc_id": doc.id})
         raw = message.content[0].text.strip()
         if raw.startswith("```"):
             raw = raw.split("```")[1]
@@ -3015,8 +3411,8 @@ def _analyze_one(doc: models.ProjectDocument, db_session=None) -> None:
 
         # --- Retry vision si champs critiques manquants après extraction texte ---
         if not use_vision and extracted.get("consommation") is None and extracted.get("cout_total") is None:
-            print(f"[analyze] Retry vision (champs critiques manquants), doc_id: {doc.id}", flush=True)
-            b64 = base64.standard_b64encode(doc.file_data).decode("utf-8")
+            log.info("analyze: retry vision (champs critiques manquants)", extra={"doc_id": doc.id})
+            b64 = base64.standard_b64encode(_vision_pdf(file_data, pdf_text)).decode("utf-8")
             vision_messages = [{
                 "role": "user",
                 "content": [
@@ -3032,30 +3428,14 @@ def _analyze_one(doc: models.ProjectDocument, db_session=None) -> None:
                     raw2 = raw2[4:]
             extracted = json.loads(raw2.strip())
 
-        doc.extracted_data = extracted
-        doc.status = "analyzed"
-        flag_modified(doc, "extracted_data")
-
-        # Auto-classify doc_type if user left default "autre"
-        if doc.doc_type in ("autre", None):
-            _AI_TYPE_MAP = {
-                "facture_electricite": "facture_electricite",
-                "facture_gaz":         "facture_gaz",
-                "facture_fuel":        "facture_fuel",
-                "releve":              "releve_compteur",
-                "contrat":             "contrat",
-            }
-            ai_type = (extracted or {}).get("type_document", "")
-            mapped  = _AI_TYPE_MAP.get(ai_type)
-            if mapped:
-                doc.doc_type = mapped
+        _apply_extraction(doc, extracted)
+        if db_session is not None:
+            _extraction_cache_put(db_session, doc.file_hash, _ANALYZE_PROMPT, extracted)
     except json.JSONDecodeError as e:
-        print(f"[analyze] ERREUR JSONDecodeError: {str(e)}", flush=True)
-        traceback.print_exc()
+        log.warning("analyze: réponse non JSON: %s", e, extra={"doc_id": doc.id})
         doc.status = "error"
-    except Exception as e:
-        print(f"[analyze] ERREUR: {str(e)}", flush=True)
-        traceback.print_exc()
+    except Exception:
+        log.exception("analyze: échec", extra={"doc_id": doc.id})
         doc.status = "error"
 
 
@@ -3091,7 +3471,7 @@ async def upload_document(
     file_bytes = await file.read()
     if not _check_file_magic(file_bytes, content_type):
         raise HTTPException(status_code=400, detail="Contenu du fichier invalide.")
-    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    file_hash = await _put_blob_async(file_bytes)   # SHA-256 du contenu
     doc = models.ProjectDocument(
         id=str(uuid4()),
         project_id=project_id,
@@ -3100,8 +3480,8 @@ async def upload_document(
         original_name=file.filename or "document",
         file_type=content_type,
         doc_type=doc_type,
-        file_data=file_bytes,
         file_hash=file_hash,
+        file_size=len(file_bytes),
         status="pending",
         created_at=datetime.now(timezone.utc).isoformat(),
     )
@@ -3167,28 +3547,163 @@ def _analyze_one_by_id(doc_id: str) -> Dict[str, Any]:
         ).first()
         if not doc:
             return {"id": doc_id, "status": "error", "error": "not found"}
-        _claude_semaphore.acquire()
-        try:
+        with _claude_slot():
             _analyze_one(doc, db_session=db)
-        finally:
-            _claude_semaphore.release()
         db.commit()
         db.refresh(doc)
         return _doc_to_dict(doc)
     except Exception as e:
         db.rollback()
-        print(f"[analyze-all] ERREUR doc_id={doc_id}: {e}", flush=True)
+        log.error("analyze-all: %s", e, extra={"doc_id": doc_id})
         return {"id": doc_id, "status": "error", "error": str(e)}
     finally:
         db.close()
 
 
-@app.post("/projects/{project_id}/documents/analyze-all")
-async def analyze_all_documents(
+# ──────────────────────────────────────────────────────────────────────────────
+# Tâches de fond : analyse groupée des documents
+# Le job est persisté (table jobs) puis exécuté par un pool de threads du
+# processus ; la route rend la main immédiatement, le client suit GET /jobs/{id}.
+# ──────────────────────────────────────────────────────────────────────────────
+class _CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    """ThreadPoolExecutor qui compte ses tâches en file et en cours (GET /metrics)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counts = {"queued": 0, "in_use": 0}
+        self._counts_lock = threading.Lock()
+
+    def _add(self, state: str, delta: int) -> None:
+        with self._counts_lock:
+            self._counts[state] += delta
+
+    def counts(self) -> Dict[str, int]:
+        with self._counts_lock:
+            return dict(self._counts)
+
+    def submit(self, fn, /, *args, **kwargs):
+        def _run():
+            self._add("queued", -1)
+            self._add("in_use", 1)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._add("in_use", -1)
+
+        self._add("queued", 1)
+        try:
+            future = super().submit(_run)
+        except BaseException:
+            self._add("queued", -1)
+            raise
+        # annulée avant de démarrer (shutdown(cancel_futures=True)) : _run ne tournera jamais
+        future.add_done_callback(lambda f: f.cancelled() and self._add("queued", -1))
+        return future
+
+
+_job_executor = _CountingExecutor(max_workers=2, thread_name_prefix="job")
+_analysis_executor = _CountingExecutor(max_workers=3, thread_name_prefix="analyze")
+_JOB_STALE_AFTER = timedelta(minutes=10)   # job "running" sans progression → repris au démarrage
+
+
+def _job_to_dict(job: models.Job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "project_id": job.project_id,
+        "status": job.status,
+        "total": job.total,
+        "completed": job.completed,
+        "items": job.items or [],
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def _enqueue_job(job_id: str) -> None:
+    _job_executor.submit(_run_analysis_job, job_id)
+
+
+def _run_analysis_job(job_id: str) -> None:
+    """Exécute un job d'analyse : documents en parallèle, progression écrite après chacun.
+
+    Seul ce thread écrit la ligne jobs ; les documents déjà traités (reprise après
+    redémarrage) ne sont pas réanalysés.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.now(timezone.utc).isoformat()
+        claimed = db.query(models.Job).filter(
+            models.Job.id == job_id,
+            models.Job.status == "queued",
+        ).update({"status": "running", "started_at": now, "updated_at": now}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return   # déjà pris par un autre worker, ou annulé
+        job = db.get(models.Job, job_id)
+        items = [dict(it) for it in job.items or []]
+        futures = {
+            _analysis_executor.submit(_analyze_one_by_id, it["id"]): k
+            for k, it in enumerate(items) if it.get("status") not in ("done", "error")
+        }
+        for fut in concurrent.futures.as_completed(futures):
+            k = futures[fut]
+            res = fut.result()
+            items[k] = {
+                **items[k],
+                "status": "error" if res.get("status") == "error" else "done",
+                "error": res.get("error"),
+            }
+            job.items = list(items)
+            flag_modified(job, "items")
+            job.completed = sum(1 for it in items if it["status"] in ("done", "error"))
+            job.updated_at = datetime.now(timezone.utc).isoformat()
+            db.commit()
+        job.status = "done"
+        job.finished_at = job.updated_at = datetime.now(timezone.utc).isoformat()
+        db.commit()
+        _touch_project(db, job.project_id)
+    except Exception as e:
+        db.rollback()
+        log.exception("job en échec", extra={"job_id": job_id})
+        db.query(models.Job).filter(models.Job.id == job_id).update(
+            {"status": "error", "error": str(e), "finished_at": datetime.now(timezone.utc).isoformat()},
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def _resume_pending_jobs():
+    """Relance les jobs en file et ceux interrompus par un redémarrage (sans progression récente)."""
+    db = SessionLocal()
+    try:
+        stale = (datetime.now(timezone.utc) - _JOB_STALE_AFTER).isoformat()
+        db.query(models.Job).filter(
+            models.Job.status == "running",
+            models.Job.updated_at < stale,
+        ).update({"status": "queued"}, synchronize_session=False)
+        db.commit()
+        for (job_id,) in db.query(models.Job.id).filter(models.Job.status == "queued").all():
+            _enqueue_job(job_id)
+    except Exception as e:
+        db.rollback()
+        log.error("jobs: reprise impossible: %s", e)
+    finally:
+        db.close()
+
+
+@app.post("/projects/{project_id}/documents/analyze-all", status_code=202)
+def analyze_all_documents(
     project_id: str,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
+    """Met en file l'analyse des documents en attente ou en erreur ; renvoie le job à suivre."""
     project = db.query(models.Project).filter(
         models.Project.id == project_id,
         models.Project.owner_id == current_user.id,
@@ -3196,26 +3711,50 @@ async def analyze_all_documents(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    docs = db.query(models.ProjectDocument).filter(
+    docs = db.query(
+        models.ProjectDocument.id, models.ProjectDocument.original_name,
+    ).filter(
         models.ProjectDocument.project_id == project_id,
         models.ProjectDocument.status.in_(["pending", "error"]),
     ).all()
-    doc_ids = [d.id for d in docs]
 
-    loop = asyncio.get_running_loop()
-    results = await asyncio.gather(*[
-        loop.run_in_executor(None, _analyze_one_by_id, doc_id)
-        for doc_id in doc_ids
-    ])
+    job = models.Job(
+        id=str(uuid4()),
+        kind="analyze_documents",
+        project_id=project_id,
+        owner_id=current_user.id,
+        status="queued",
+        items=[{"id": d.id, "name": d.original_name, "status": "queued", "error": None} for d in docs],
+        total=len(docs),
+        completed=0,
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    db.add(job)
+    db.commit()
+    _enqueue_job(job.id)
+    return {"job_id": job.id, **_job_to_dict(job)}
+
 
-    _touch_project(db, project_id)
-    return {"analyzed": len(doc_ids), "documents": list(results)}
+@app.get("/jobs/{job_id}")
+def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    job = db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.owner_id == current_user.id,
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_to_dict(job)
 
 
 @app.get("/projects/{project_id}/documents/{doc_id}/file")
 def get_document_file(
     project_id: str,
     doc_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
@@ -3233,7 +3772,7 @@ def get_document_file(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    return Response(content=bytes(doc.file_data), media_type=doc.file_type)
+    return _blob_response(request, doc.file_hash, doc.file_data, doc.file_type)
 
 
 @app.post("/projects/{project_id}/documents/{doc_id}/analyze")
@@ -3367,74 +3906,6 @@ def delete_improvement_action(
     _touch_project(db, project_id)
 
 
-# ──────────────────────────────────────────────────────────────────────────────
-# HELPERS - Plan d'amélioration Excel
-# ──────────────────────────────────────────────────────────────────────────────
-
-_IMPROVEMENT_TYPE_MAP = [
-    (["ser ", "pv", "éolien", "eolien", "géothermie", "geothermie", "solaire"], "SER_PV"),
-    (["electrif", "électrif"], "ELECTRIFICATION"),
-    (["efficac"], "EFFICACITE_ENERGETIQUE"),
-    (["ccu"], "CCU"),
-    (["ppa"], "PPA"),
-    (["fluide", "frigorif"], "FLUIDE_FRIGORIGENE"),
-]
-
-
-def _normalize_improvement_type(raw: str) -> Optional[str]:
-    if not raw:
-        return None
-    lower = raw.lower()
-    for keywords, enum_val in _IMPROVEMENT_TYPE_MAP:
-        if any(k in lower for k in keywords):
-            return enum_val
-    return raw  # keep raw string if nothing matched
-
-
-def _parse_aa_sheet(ws) -> Optional[Dict[str, Any]]:
-    """Extrait les données d'une feuille AAx. Retourne None si la feuille est vide."""
-    intitule = ws["B9"].value
-    if not intitule or not str(intitule).strip():
-        return None
-
-    def _oui_non(v) -> Optional[bool]:
-        if v is None:
-            return None
-        return str(v).strip().upper() == "OUI"
-
-    # Conditions préalables (C31, C33, C35)
-    conds = []
-    for r in [31, 33, 35]:
-        v = ws[f"C{r}"].value
-        if v and str(v).strip() and str(v).strip().upper() not in ("NA", "N/A", ""):
-            conds.append(str(v).strip())
-
-    ref = ws["F5"].value
-    type_raw = ws["B13"].value
-    classif = ws["F27"].value
-    duree_raw = _to_number(ws["K18"].value)
-
-    return {
-        "reference": str(ref).strip() if ref else None,
-        "intitule": str(intitule).strip(),
-        "type_amelioration": _normalize_improvement_type(str(type_raw) if type_raw else ""),
-        "classification": str(classif).strip() if classif else None,
-        "conditions_prealables": "\n".join(conds) if conds else None,
-        "investissement": _to_number(ws["G61"].value),
-        "economie_energie": _to_number(ws["G77"].value),
-        "economie_co2": _to_number(ws["G87"].value),
-        "duree_amortissement": int(duree_raw) if duree_raw is not None else None,
-        "irr_avant_impot": _to_number(ws["N10"].value),
-        "pbt_avant_impot": _to_number(ws["N15"].value),
-        "irr_apres_impot": _to_number(ws["N17"].value),
-        "pbt_apres_impot": _to_number(ws["N18"].value),
-        "entreprise_ets": _oui_non(ws["K22"].value),
-        "deduction_fiscale": _oui_non(ws["K23"].value),
-        "description": None,
-        "situation_existante": None,
-    }
-
-
 # ──────────────────────────────────────────────────────────────────────────────
 # ROUTES - Export / Import / Prefill Excel AMUREBA
 # ──────────────────────────────────────────────────────────────────────────────
@@ -3627,7 +4098,7 @@ async def _get_prefill_actions(
             "type":     "comptabilite_energetique",
             "data":     energy_ctx,
         })
-        print(f"[prefill] energy_record year={energy_record.year} inclus dans le contexte Claude", flush=True)
+        log.debug("prefill: energy_record %s inclus dans le contexte Claude", energy_record.year)
 
     # ── Données d'audit (DB) ────────────────────────────────────────────────
     audit = (
@@ -3649,7 +4120,7 @@ async def _get_prefill_actions(
                 "type":     "donnees_audit",
                 "data":     audit_ctx,
             })
-            print("[prefill] audit data inclus dans le contexte Claude", flush=True)
+            log.debug("prefill: données d'audit incluses dans le contexte Claude")
 
     # ── Appel Claude ────────────────────────────────────────────────────────
     entity_name    = project.client_name or project.project_name or ""
@@ -3679,81 +4150,29 @@ async def _get_prefill_actions(
         doc_list=doc_list,
     )
 
-    print(f"[prefill] appel Claude - {len(extracted_parts)} sources, max {max_actions} actions", flush=True)
+    log.info("prefill: appel Claude, %d sources, max %d actions", len(extracted_parts), max_actions,
+             extra={"project_id": project_id})
 
-    claude_client = anthropic.Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-    for attempt in range(3):
-        try:
-            msg = claude_client.messages.create(
-                model="claude-sonnet-4-6",
-                max_tokens=8192,
-                system=_PREFILL_SYSTEM,
-                messages=[{"role": "user", "content": user_msg}],
-            )
-            print(f"[tokens] prefill in={msg.usage.input_tokens} out={msg.usage.output_tokens}", flush=True)
-            raw_text = msg.content[0].text.strip()
-            print(f"[prefill] raw_text={repr(raw_text[:600])}", flush=True)
-            raw_text = re.sub(r'^```(?:json)?\s*', '', raw_text)
-            raw_text = re.sub(r'\s*```$', '', raw_text).strip()
-            json_match = re.search(r"\[.*\]", raw_text, re.DOTALL)
-            if not json_match:
-                raise ValueError("Aucun tableau JSON trouvé dans la réponse Claude")
-            actions: List[Dict[str, Any]] = json.loads(json_match.group(0))
-            print(f"[prefill] Claude a proposé {len(actions)} action(s)", flush=True)
-            break
-        except anthropic.APIStatusError as e:
-            if e.status_code == 529 and attempt < 2:
-                print(f"[prefill] Claude surchargé (529), retry {attempt + 1}/3...", flush=True)
-                time.sleep(3)
-            else:
-                raise HTTPException(status_code=502, detail=f"Erreur lors de l'appel à Claude : {e}")
-        except Exception as e:
-            raise HTTPException(status_code=502, detail=f"Erreur lors de l'appel à Claude : {e}")
-
-    return project, entity_name, actions, energy_record, audit
-
-
-
-# Mapping field → cell used to detect conflicts in existing Excel
-_AA_FIELD_CELL = {
-    "intitule":               "B9",
-    "type_amelioration":      "B13",
-    "classification":         "F27",
-    "investissement_k_eur":   "G61",
-    "economie_energie_mwh_an":"G77",
-    "economie_co2_kg_an":     "G87",
-    "duree_amortissement":    "K18",
-}
-
-
-def _read_aa_existing_values(excel_bytes: bytes) -> Dict[str, Dict[str, Any]]:
-    """
-    Read an existing AMUREBA Excel (bytes) and return a dict:
-      { "AA1": { "B9": "some value", ... }, "AA2": { ... }, ... }
-    Only the cells listed in _AA_FIELD_CELL are checked.
-    Uses openpyxl data_only=True (read-only, no writing).
-    """
     try:
-        wb = load_workbook(io.BytesIO(excel_bytes), data_only=True, keep_links=False)
-    except Exception as exc:
-        print(f"[conflict-check] cannot read Excel for conflict detection: {exc}", flush=True)
-        return {}
+        msg = await _claude_create(
+            "prefill",
+            max_tokens=8192,
+            system=_PREFILL_SYSTEM,
+            messages=[{"role": "user", "content": user_msg}],
+        )
+        raw_text = msg.content[0].text.strip()
+        log.debug("prefill: raw_text=%r", raw_text[:600])
+        raw_text = re.sub(r'^```(?:json)?\s*', '', raw_text)
+        raw_text = re.sub(r'\s*```$', '', raw_text).strip()
+        json_match = re.search(r"\[.*\]", raw_text, re.DOTALL)
+        if not json_match:
+            raise ValueError("Aucun tableau JSON trouvé dans la réponse Claude")
+        actions: List[Dict[str, Any]] = json.loads(json_match.group(0))
+        log.info("prefill: %d action(s) proposée(s)", len(actions), extra={"project_id": project_id})
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Erreur lors de l'appel à Claude : {e}")
 
-    result: Dict[str, Dict[str, Any]] = {}
-    for i in range(1, 10):
-        sheet_name = f"AA{i}"
-        if sheet_name not in wb.sheetnames:
-            continue
-        ws = wb[sheet_name]
-        sheet_vals: Dict[str, Any] = {}
-        for field, cell_ref in _AA_FIELD_CELL.items():
-            cell = ws[cell_ref]
-            val = cell.value
-            if val is not None and str(val).strip() != "":
-                sheet_vals[field] = val
-        if sheet_vals:
-            result[sheet_name] = sheet_vals
-    return result
+    return project, entity_name, actions, energy_record, audit
 
 
 _KNOWN_DB_SOURCES = {"energy_accounting_db", "audit_data_db"}
@@ -3795,9 +4214,11 @@ async def prefill_preview(
     # Detect conflicts with the current stored Excel (if any)
     existing_vals: Dict[str, Dict[str, Any]] = {}
     current_source = project.current_excel_source or "template"
-    if project.prefilled_excel:
-        print(f"[prefill-preview] running conflict check against {current_source!r} Excel", flush=True)
-        existing_vals = _read_aa_existing_values(project.prefilled_excel)
+    if _has_blob(project, "prefilled_excel_hash", "prefilled_excel"):
+        log.debug("prefill-preview: conflict check against %r Excel", current_source)
+        existing_vals = await run_heavy_async(
+            heavy.read_aa_existing_values, await _get_blob_async(project.prefilled_excel_hash, project.prefilled_excel),
+        )
 
     return {
         "entity_name": entity_name,
@@ -3805,7 +4226,7 @@ async def prefill_preview(
         "has_energy_data": energy_record is not None,
         "energy_year": energy_record.year if energy_record else None,
         "current_excel_source": current_source,
-        "has_existing_excel": project.prefilled_excel is not None,
+        "has_existing_excel": _has_blob(project, "prefilled_excel_hash", "prefilled_excel"),
         "actions": [
             {
                 "sheet": f"AA{i + 1}",
@@ -3828,7 +4249,7 @@ async def prefill_preview(
                         ).strip()
                         else _get_conflict_type(field, f"AA{i + 1}", existing_vals, a.get("sources") or {})
                     )
-                    for field in _AA_FIELD_CELL
+                    for field in heavy.AA_FIELD_CELL
                     if a.get(field) is not None
                 },
             }
@@ -3855,9 +4276,9 @@ async def prefill_improvement_actions_excel(
     if not TEMPLATE_FILE.exists():
         raise HTTPException(status_code=500, detail="Template AMUREBA introuvable")
     try:
-        file_bytes = _write_template_zipfile(
-            TEMPLATE_FILE, entity_name, actions, energy_record
-        )
+        file_bytes = await _write_template_zipfile_async(TEMPLATE_FILE, entity_name, actions, energy_record)
+    except WorkPoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération du fichier: {e}")
 
@@ -3894,7 +4315,8 @@ async def prefill_improvement_actions_excel(
         }
 
     project.prefill_summary = summary
-    project.prefilled_excel  = file_bytes
+    project.prefilled_excel_hash = await _put_blob_async(file_bytes)
+    project.prefilled_excel  = None
     project.prefilled_at     = now
     flag_modified(project, "prefill_summary")
     db.commit()
@@ -3923,7 +4345,7 @@ def get_prefill_status(
         raise HTTPException(status_code=404, detail="Project not found")
 
     return {
-        "has_prefilled_excel": project.prefilled_excel is not None,
+        "has_prefilled_excel": _has_blob(project, "prefilled_excel_hash", "prefilled_excel"),
         "prefilled_at": project.prefilled_at,
         "prefill_summary": project.prefill_summary,
         "current_excel_source": project.current_excel_source or "template",
@@ -3933,6 +4355,7 @@ def get_prefill_status(
 @app.get("/projects/{project_id}/improvement-actions/export-excel")
 def export_improvement_actions_excel(
     project_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
@@ -3950,20 +4373,15 @@ def export_improvement_actions_excel(
     safe_name = _safe_filename(project.project_name)
 
     # Retourner le fichier pré-rempli s'il est sauvegardé
-    if project.prefilled_excel:
-        return StreamingResponse(
-            io.BytesIO(project.prefilled_excel),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f'attachment; filename="AMUREBA_prefill_{safe_name}.xlsx"'},
+    if _has_blob(project, "prefilled_excel_hash", "prefilled_excel"):
+        return _blob_response(
+            request, project.prefilled_excel_hash, project.prefilled_excel,
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            f"AMUREBA_prefill_{safe_name}.xlsx",
         )
 
     # Sinon : modèle actif (officiel sur disque ou custom en DB) avec le nom de l'entité
     source = _resolve_audit_template_source(db, project)
-    if isinstance(source, Path):
-        if not source.exists():
-            raise HTTPException(status_code=500, detail="Template AMUREBA introuvable côté serveur")
-    elif not source:
-        raise HTTPException(status_code=500, detail="Modèle personnalisé introuvable (fichier vide).")
 
     entity_name = project.client_name or project.project_name or ""
     energy_record = (
@@ -3972,15 +4390,19 @@ def export_improvement_actions_excel(
         .order_by(models.EnergyRecord.year.desc())
         .first()
     )
-    try:
-        file_bytes = _write_template_zipfile(source, entity_name, [], energy_record)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération du fichier: {e}")
+    energy_changes = _build_energy_sheet_changes(energy_record) if energy_record else {}
+    sheet_changes = _build_prefill_sheet_changes(entity_name, [], energy_changes)
 
-    return StreamingResponse(
-        io.BytesIO(file_bytes),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="AMUREBA_{safe_name}.xlsx"'},
+    def _build() -> bytes:
+        try:
+            return _apply_changes_to_source(source, sheet_changes)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur lors de la génération du fichier: {e}")
+
+    return _artifact_response(
+        request, db, project_id, "amureba_xlsx", _artifact_key("amureba_xlsx", source.digest, sheet_changes), _build,
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        f"AMUREBA_{safe_name}.xlsx",
     )
 
 
@@ -4034,27 +4456,27 @@ async def apply_prefill(
     # Determine Excel base: use existing stored Excel if available (upload or previous AI),
     # otherwise start from the blank template.
     existing_source = project.current_excel_source or "template"
-    has_existing = project.prefilled_excel is not None
+    has_existing = _has_blob(project, "prefilled_excel_hash", "prefilled_excel")
     if has_existing:
-        print(f"[apply-prefill] base = stored Excel (source={existing_source!r}), "
-              f"{len(selected_actions)} action(s) sélectionnée(s), "
-              f"energy_record={'oui' if energy_record else 'non'}", flush=True)
         new_source = "ai_patched" if existing_source == "manual_upload" else "ai_prefill"
     else:
-        print(f"[apply-prefill] base = template vierge, "
-              f"{len(selected_actions)} action(s) sélectionnée(s), "
-              f"energy_record={'oui' if energy_record else 'non'}", flush=True)
         new_source = "ai_prefill"
+    log.info("apply-prefill: base %s, %d action(s) sélectionnée(s), energy_record=%s",
+             existing_source if has_existing else "template vierge", len(selected_actions),
+             "oui" if energy_record else "non", extra={"project_id": project_id})
 
     try:
         if has_existing:
-            file_bytes = _patch_excel_bytes(
-                project.prefilled_excel, entity_name, selected_actions, energy_record
+            file_bytes = await _patch_excel_bytes_async(
+                await _get_blob_async(project.prefilled_excel_hash, project.prefilled_excel),
+                entity_name, selected_actions, energy_record,
             )
         else:
-            file_bytes = _write_template_zipfile(
+            file_bytes = await _write_template_zipfile_async(
                 TEMPLATE_FILE, entity_name, selected_actions, energy_record
             )
+    except (HTTPException, WorkPoolBusy):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur génération xlsx : {e}")
 
@@ -4062,7 +4484,9 @@ async def apply_prefill(
     all_items = [item.model_dump() for item in payload.changes]
     summary = {"items": all_items, "base_source": existing_source}
 
-    project.prefilled_excel = file_bytes
+    file_hash = await _put_blob_async(file_bytes)
+    project.prefilled_excel_hash = file_hash
+    project.prefilled_excel = None
     project.prefill_summary = summary
     project.prefilled_at = now
     project.current_excel_source = new_source
@@ -4076,7 +4500,7 @@ async def apply_prefill(
         owner_id=current_user.id,
         action_type="AI_PREFILL",
         changes=summary,
-        file_bytes=file_bytes,
+        file_hash=file_hash,
         file_name=xlsx_filename,
         file_mime_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         file_size=len(file_bytes),
@@ -4107,7 +4531,7 @@ def get_prefill_history(
         raise HTTPException(status_code=404, detail="Project not found")
 
     entries = (
-        db.query(models.PlanAmeliorationHistory)
+        db.query(models.PlanAmeliorationHistory, models.PlanAmeliorationHistory.file_bytes.isnot(None).label("has_legacy_file"))
         .filter(models.PlanAmeliorationHistory.project_id == project_id)
         .order_by(models.PlanAmeliorationHistory.created_at.desc())
         .all()
@@ -4117,12 +4541,12 @@ def get_prefill_history(
             "id":          e.id,
             "action_type": e.action_type,
             "changes":     e.changes,
-            "has_file":    e.file_bytes is not None,
+            "has_file":    bool(e.file_hash) or has_legacy_file,
             "file_name":   e.file_name,
             "file_size":   e.file_size,
             "created_at":  e.created_at,
         }
-        for e in entries
+        for e, has_legacy_file in entries
     ]
 
 
@@ -4130,6 +4554,7 @@ def get_prefill_history(
 def download_plan_amelioration_history_file(
     project_id: str,
     history_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
@@ -4147,16 +4572,12 @@ def download_plan_amelioration_history_file(
     ).first()
     if not entry:
         raise HTTPException(status_code=404, detail="History entry not found")
-    if not entry.file_bytes:
+    if not _has_blob(entry, "file_hash", "file_bytes"):
         raise HTTPException(status_code=404, detail="Aucun fichier disponible pour cette entrée")
 
     filename = entry.file_name or f"plan_amelioration_{history_id}.xlsx"
     mime = entry.file_mime_type or "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    return StreamingResponse(
-        io.BytesIO(entry.file_bytes),
-        media_type=mime,
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    return _blob_response(request, entry.file_hash, entry.file_bytes, mime, filename)
 
 
 @app.post("/projects/{project_id}/improvement-actions/import-excel")
@@ -4176,22 +4597,12 @@ async def import_improvement_actions_excel(
 
     content = await file.read()
     try:
-        wb = load_workbook(io.BytesIO(content), data_only=True, keep_links=False)
+        parsed = await run_heavy_async(heavy.parse_aa_workbook, content)
+    except WorkPoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Fichier Excel invalide: {e}")
 
-    parsed: List[Dict[str, Any]] = []
-    for i in range(1, 10):
-        sheet_name = f"AA{i}"
-        if sheet_name not in wb.sheetnames:
-            continue
-        try:
-            data = _parse_aa_sheet(wb[sheet_name])
-        except Exception:
-            continue
-        if data:
-            parsed.append(data)
-
     if not parsed:
         raise HTTPException(
             status_code=422,
@@ -4247,8 +4658,11 @@ async def import_improvement_actions_excel(
 
     # Store raw Excel bytes as the new "current" version so future exports
     # return the uploaded file and future AI patching starts from it.
-    print(f"[import-excel] storing {len(content)} bytes as current Excel (manual_upload)", flush=True)
-    project.prefilled_excel = content
+    log.info("import-excel: %d bytes stored as current Excel (manual_upload)", len(content),
+             extra={"project_id": project_id})
+    content_hash = await _put_blob_async(content)
+    project.prefilled_excel_hash = content_hash
+    project.prefilled_excel = None
     project.prefilled_at = now
     project.current_excel_source = "manual_upload"
     # Use excel_summary as the prefill_summary so prefill-status shows upload info
@@ -4269,7 +4683,7 @@ async def import_improvement_actions_excel(
         owner_id=current_user.id,
         action_type="MANUAL_UPLOAD",
         changes={"excel_summary": excel_summary},
-        file_bytes=content,
+        file_hash=content_hash,
         file_name=file.filename or "AMUREBA.xlsx",
         file_mime_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         file_size=len(content),
@@ -4295,22 +4709,22 @@ async def _parse_uploaded_workbook(file: UploadFile):
     """
     Shared helper: read the uploaded .xlsx file and map all sheets.
 
-    Returns (wb, mapped_sheets, filename) where mapped_sheets is the
+    Returns (mapped_sheets, filename) where mapped_sheets is the
     dict returned by AmurebaMappingService.map_workbook().
 
     Raises HTTPException 400 if the file is not a valid xlsx.
     """
     content = await file.read()
     try:
-        wb = load_workbook(io.BytesIO(content), data_only=True, keep_links=False)
+        mapped = await run_heavy_async(heavy.map_uploaded_workbook, content)
+    except WorkPoolBusy:
+        raise
     except Exception as exc:
         raise HTTPException(
             status_code=400,
             detail=f"Fichier xlsx invalide ou corrompu : {exc}",
         )
-    svc = AmurebaMappingService()
-    mapped = svc.map_workbook(wb)
-    return wb, mapped, file.filename or "fichier.xlsx"
+    return mapped, file.filename or "fichier.xlsx"
 
 
 @app.get(
@@ -4393,7 +4807,7 @@ async def preview_plan_amelioration(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    _, mapped, filename = await _parse_uploaded_workbook(file)
+    mapped, filename = await _parse_uploaded_workbook(file)
 
     sheets_out = []
     total_rows = 0
@@ -4455,7 +4869,7 @@ async def import_plan_amelioration(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
-    _, mapped, filename = await _parse_uploaded_workbook(file)
+    mapped, filename = await _parse_uploaded_workbook(file)
 
     if not mapped:
         raise HTTPException(
@@ -4588,26 +5002,8 @@ def update_project_lca_batiments(
     return {"batiments": lca.batiments}
 
 
-class _LcaOptCachePayload(_PydanticBase):
-    hash: str
-    cache: Dict[str, Any]
-
-
-@app.patch("/projects/{project_id}/lca/optimisation-cache")
-def patch_lca_optimisation_cache(
-    project_id: str,
-    payload: _LcaOptCachePayload,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    """Sauvegarde le hash de configuration et les 5 solutions phares après optimisation."""
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.owner_id == current_user.id,
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
+def _save_lca_optimisation_cache(db: Session, project_id: str, opt_hash: str, cache: Dict[str, Any]) -> None:
+    """Écrit optimisation_hash / optimisation_cache (colonnes migration 010, hors models.py). Pas de commit."""
     now = datetime.now(timezone.utc).isoformat()
 
     existing = db.execute(
@@ -4622,7 +5018,7 @@ def patch_lca_optimisation_cache(
                 "SET optimisation_hash = :h, optimisation_cache = :c::jsonb, updated_at = :now "
                 "WHERE project_id = :pid"
             ),
-            {"h": payload.hash, "c": json.dumps(payload.cache), "now": now, "pid": project_id},
+            {"h": opt_hash, "c": json.dumps(cache), "now": now, "pid": project_id},
         )
     else:
         # No LCA row yet - create a minimal one so the cache isn't lost
@@ -4636,114 +5032,142 @@ def patch_lca_optimisation_cache(
             ),
             {
                 "id": str(uuid4()), "pid": project_id,
-                "h": payload.hash, "c": json.dumps(payload.cache),
+                "h": opt_hash, "c": json.dumps(cache),
                 "now": now,
             },
         )
 
+
+class _LcaOptCachePayload(_PydanticBase):
+    hash: str
+    cache: Dict[str, Any]
+
+
+@app.patch("/projects/{project_id}/lca/optimisation-cache")
+def patch_lca_optimisation_cache(
+    project_id: str,
+    payload: _LcaOptCachePayload,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Sauvegarde le hash de configuration et les 5 solutions phares après optimisation."""
+    project = db.query(models.Project).filter(
+        models.Project.id == project_id,
+        models.Project.owner_id == current_user.id,
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    _save_lca_optimisation_cache(db, project_id, payload.hash, payload.cache)
     db.commit()
     return {"status": "ok"}
 
 
-# ──────────────────────────────────────────────────────────────────────────────
-# HELPER : parseur LCIA-results.xlsx → dict d'impacts EF v3.0
-# ──────────────────────────────────────────────────────────────────────────────
+def _lca_engine_inputs(db: Session, project_id: str, current_user: models.User, batiment_id: Optional[str]):
+    """Bâtiment (défaut : le premier du projet) et bibliothèque de matériaux pour lca_engine."""
+    project = db.query(models.Project).filter(
+        models.Project.id == project_id,
+        models.Project.owner_id == current_user.id,
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
 
-# Patterns ordonnés du plus spécifique au plus général.
-# On cherche chaque sous-chaîne dans le nom de colonne normalisé (lowercase, espaces normalisés).
-# Les sous-catégories (biogenic, fossil…) doivent précéder leur catégorie parente (climate change).
-_EF_COLUMN_PATTERNS: list = [
-    # GWP total EF v3.0 explicite - avant les sous-catégories pour qu'EN 15804+A2
-    # avec colonnes v3.0 ET v3.1 mappe correctement la bonne valeur vers gwp100.
-    ("climate change: total (ef v3.0",                 "gwp100"),
-    # Climate change - sous-catégories d'abord
-    ("climate change: biogenic",                        "climate_biogenic"),
-    ("climate change: fossil",                          "climate_fossil"),
-    ("climate change: land use",                        "climate_landuse"),
-    # Human toxicity - carcinogène avant non-carcinogène (évite faux positif sur "non")
-    ("human toxicity: carcinogenic",                    "human_tox_carc"),
-    ("human toxicity: non-carcinogenic",                "human_tox_noncarc"),
-    # Ecotoxicity freshwater
-    ("ecotoxicity: freshwater",                         "ecotoxicity_fw"),
-    # Eutrophication
-    ("eutrophication: freshwater",                      "eutrophication_fw"),
-    ("eutrophication: marine",                          "eutrophication_marine"),
-    ("eutrophication: terrestrial",                     "eutrophication_terrestrial"),
-    # Autres indicateurs spécifiques
-    ("ionising radiation",                              "ionising_radiation"),
-    ("ionizing radiation",                              "ionising_radiation"),
-    ("photochemical oxidant",                           "photochemical_oxidant"),
-    ("particulate matter",                              "particulate_matter"),
-    ("ozone depletion",                                 "ozone_depletion"),
-    ("energy resources: non-renewable",                 "energy_nonrenewable"),
-    ("material resources: metals/minerals",             "material_resources"),
-    ("material resources",                              "material_resources"),
-    ("| land use |",                                    "land_use"),   # pipes pour éviter collision avec "climate change: land use"
-    ("water use",                                       "water_use"),
-    ("acidification",                                   "acidification"),
-    # Climate change général (GWP100) - en dernier pour ne pas écraser les sous-catégories
-    ("climate change",                                  "gwp100"),
-]
+    lca = db.query(models.LcaProject).filter(models.LcaProject.project_id == project_id).first()
+    batiments = (lca.batiments if lca else None) or []
+    if batiment_id:
+        bat = next((b for b in batiments if b.get("id") == batiment_id), None)
+    else:
+        bat = batiments[0] if batiments else None
+    if bat is None:
+        raise HTTPException(status_code=404, detail="Bâtiment introuvable")
+    if bat.get("dvr_batiment") is None and lca.dvr_batiment is not None:
+        bat = {**bat, "dvr_batiment": lca.dvr_batiment}
+
+    materials = [
+        lca_engine.material_to_dict(m)
+        for m in db.query(models.LcaMaterial).order_by(models.LcaMaterial.category, models.LcaMaterial.name).all()
+    ]
+    return bat, materials
 
 
-def _normalize_col(name: str) -> str:
-    """Normalise un nom de colonne : lowercase + espaces multiples → un seul espace."""
-    import re as _re
-    return _re.sub(r"\s+", " ", name.lower().strip())
+class _LcaOptimisePayload(_PydanticBase):
+    batiment_id: Optional[str] = None   # défaut : premier bâtiment du projet
+    ep_isolant_max: Optional[float] = None
+    prix_kwh: Optional[float] = None
+    persist: bool = True
 
 
-def _is_impact_col(col_name: str) -> bool:
-    """Vrai si la colonne est une colonne d'impact EF v3.0 ou EN 15804+A2."""
-    col_lower = col_name.lower()
-    return "EF v3.0" in col_name or "en15804+a2" in col_lower or "en 15804" in col_lower
+@app.post("/projects/{project_id}/lca/optimise")
+def optimise_project_lca(
+    project_id: str,
+    payload: _LcaOptimisePayload,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Optimisation ACV 2.0 côté serveur (combinaisons + solutions phares) d'un bâtiment.
 
+    Le résultat est écrit dans optimisation_hash / optimisation_cache (même format
+    que PATCH /lca/optimisation-cache) sauf si persist=false. Les phares portent sur
+    toutes les combinaisons ; `combos` n'en renvoie qu'une sélection pour le
+    filtrage interactif côté frontend.
+    """
+    bat, materials = _lca_engine_inputs(db, project_id, current_user, payload.batiment_id)
+    try:
+        with metrics.timed("lca_optimise"):
+            result = lca_engine.optimise_batiment(bat, materials, payload.ep_isolant_max, payload.prix_kwh)
+    except lca_engine.CombinationLimitError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    cache = _sanitize_for_json({
+        "computed_at": datetime.now(timezone.utc).isoformat(),
+        "solutions": result["solutions"],
+        "fixed_components": result["fixed_components"],
+    })
+    if payload.persist:
+        _save_lca_optimisation_cache(db, project_id, result["hash"], cache)
+        db.commit()
 
-def _parse_lcia_xlsx(file_bytes: bytes) -> Dict[str, float]:
-    """Lit un fichier LCIA-results.xlsx (format EF v3.0 ou EN 15804+A2) et retourne {clé_ef: valeur}."""
-    import math
-    import io
-    import pandas as pd
-
-    impacts: Dict[str, float] = {}
-    xl = pd.ExcelFile(io.BytesIO(file_bytes))
-
-    for sheet_name in xl.sheet_names:
-        # Essaie de trouver la ligne d'en-tête contenant des colonnes EF v3.0 ou EN 15804+A2
-        df = None
-        for header_row in range(6):
-            candidate = xl.parse(sheet_name, header=header_row)
-            ef_cols = [
-                c for c in candidate.columns
-                if isinstance(c, str) and _is_impact_col(c)
-            ]
-            if ef_cols:
-                df = candidate
-                break
-
-        if df is None or df.empty:
-            continue
+    return {
+        "optimisation_hash": result["hash"],
+        "optimisation_cache": cache,
+        "combos": _sanitize_for_json(result["combos"]),
+        "combos_evaluated": result["combos_evaluated"],
+        "search": result["search"],
+    }
 
-        ef_cols = [c for c in df.columns if isinstance(c, str) and _is_impact_col(c)]
 
-        for col in ef_cols:
-            col_norm = _normalize_col(col)
-            key = None
-            for substr, k in _EF_COLUMN_PATTERNS:
-                if substr in col_norm:
-                    key = k
-                    break
-            if not key:
-                continue
+class _LcaParetoPayload(_PydanticBase):
+    batiment_id: Optional[str] = None
+    ep_isolant_max: Optional[float] = None
+    offset: int = Field(default=0, ge=0)
+    limit: int = Field(default=500, ge=1, le=5000)
 
-            # Première valeur numérique valide dans la colonne
-            for val in df[col]:
-                if isinstance(val, (int, float)) and not (
-                    isinstance(val, float) and math.isnan(val)
-                ):
-                    impacts[key] = float(val)
-                    break
 
-    return impacts
+@app.post("/projects/{project_id}/lca/pareto")
+def lca_pareto_front(
+    project_id: str,
+    payload: _LcaParetoPayload,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Front de Pareto exact (coût, GWP amorti, énergie) d'un bâtiment, paginé par coût croissant.
+
+    Calculé sans énumérer l'espace des combinaisons ; rien n'est persisté.
+    """
+    bat, materials = _lca_engine_inputs(db, project_id, current_user, payload.batiment_id)
+    try:
+        result = lca_engine.pareto_front(
+            bat, materials, payload.ep_isolant_max, payload.offset, payload.limit,
+        )
+    except lca_engine.CombinationLimitError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return {
+        "optimisation_hash": result["hash"],
+        "pareto_front": _sanitize_for_json(result["front"]),
+        "front_size": result["front_size"],
+        "combos_total": result["combos_total"],
+        "offset": payload.offset,
+    }
 
 
 # ==============================
@@ -4772,7 +5196,10 @@ async def import_lca_material(
     file_bytes = await file.read()
 
     try:
-        impacts = _parse_lcia_xlsx(file_bytes)
+        with metrics.timed("lcia_parse"):
+            impacts = await run_heavy_async(heavy.parse_lcia_xlsx, file_bytes)
+    except WorkPoolBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=422, detail=f"Erreur de lecture du fichier : {str(e)}")
 
@@ -4918,9 +5345,13 @@ _TEMPLATE_MEDIA = {
 _TEMPLATE_EXT = {"audit": ".xlsx", "report": ".docx"}
 
 
-def _template_usage_count(db: Session, tpl) -> int:
-    col = models.Project.active_audit_template_id if tpl.type == "audit" else models.Project.active_report_template_id
-    return db.query(models.Project).filter(col == tpl.id).count()
+def _template_usage_counts(db: Session, type: str, template_ids: List[str]) -> Dict[str, int]:
+    """Nombre de projets utilisant chaque modèle : une requête GROUP BY pour toute la liste."""
+    if not template_ids:
+        return {}
+    col = models.Project.active_audit_template_id if type == "audit" else models.Project.active_report_template_id
+    rows = db.query(col, func.count()).filter(col.in_(template_ids)).group_by(col).all()
+    return dict(rows)
 
 
 @app.get("/templates", response_model=List[schemas.TemplateOut])
@@ -4932,10 +5363,11 @@ def list_templates(type: str = Query(...), db: Session = Depends(get_db),
         models.Template.type == type,
         (models.Template.is_official == True) | (models.Template.owner_id == current_user.id),  # noqa: E712
     ).all()
+    usage = _template_usage_counts(db, type, [t.id for t in rows])
     out = []
     for t in rows:
         item = schemas.TemplateOut.model_validate(t)
-        item.usage_count = _template_usage_count(db, t)
+        item.usage_count = usage.get(t.id, 0)
         out.append(item)
     return out
 
@@ -4952,7 +5384,7 @@ def download_template_file(template_id: str, db: Session = Depends(get_db),
             raise HTTPException(status_code=500, detail="Fichier officiel introuvable côté serveur")
         data = path.read_bytes()
     else:
-        data = tpl.file_bytes or b""
+        data = _get_blob(tpl.file_hash, tpl.file_bytes) or b""
     return StreamingResponse(
         io.BytesIO(data),
         media_type=_TEMPLATE_MEDIA[tpl.type],
@@ -4972,10 +5404,11 @@ async def upload_template(type: str = Form(...), name: str = Form(...), file: Up
 
     if type == "audit":   # structure officielle obligatoire (cf. Q2) : feuilles AA1..AA9 présentes
         try:
-            wb = load_workbook(io.BytesIO(content), data_only=True, keep_links=False)
+            missing = await run_heavy_async(heavy.missing_aa_sheets, content)
+        except WorkPoolBusy:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Fichier Excel invalide : {e}")
-        missing = [f"AA{i}" for i in range(1, 10) if f"AA{i}" not in wb.sheetnames]
         if missing:
             raise HTTPException(
                 status_code=400,
@@ -4987,7 +5420,7 @@ async def upload_template(type: str = Form(...), name: str = Form(...), file: Up
     now = datetime.now(timezone.utc).isoformat()
     tpl = models.Template(
         id=str(uuid4()), type=type, name=(name.strip() or file.filename),
-        file_bytes=content, original_filename=file.filename,
+        file_hash=await _put_blob_async(content), original_filename=file.filename,
         is_official=False, supports_prefill=False,   # custom : remplissage manuel uniquement (MVP)
         owner_id=current_user.id, scope="user", created_at=now,
     )
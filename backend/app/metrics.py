@@ -0,0 +1,218 @@
+"""
+Métriques au format texte Prometheus (exposition 0.0.4), sans dépendance externe.
+
+- http_request_duration_seconds{method, route, status} : latence par modèle de route
+  (« /projects/{project_id}/excel », jamais l'URL brute : cardinalité bornée) ;
+- stage_duration_seconds{stage} : étapes coûteuses (appel Claude, extraction PDF,
+  recalcul soffice, patch xlsx, rendu docx, parsing LCIA, optimisation ACV) ;
+- claude_request_duration_seconds / claude_tokens_total{call_site, direction} ;
+- jauges évaluées à la lecture (`Gauge.set_function`) : files d'attente, pools.
+
+Registre par processus : avec plusieurs workers uvicorn, chaque worker expose ses
+propres séries (à agréger côté Prometheus, label d'instance).
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):   # noqa: A002 - vocabulaire Prometheus
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Jauge lue au moment du scrape : set_function(fn) avec fn() → {valeurs de labels: valeur}."""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fn: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set_function(self, fn: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        self._fn = fn
+
+    def _samples(self) -> List[str]:
+        if self._fn is None:
+            return []
+        try:
+            values = self._fn()
+        except Exception:
+            return []   # une jauge cassée ne doit pas vider tout le scrape
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),   # noqa: A002
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # clé → [compte par bucket (non cumulé, + Inf), somme, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par modèle de route.",
+    ("method", "route", "status"),
+))
+stage_duration = REGISTRY.register(Histogram(
+    "stage_duration_seconds", "Durée des étapes coûteuses (claude, pdf_extract, xlsx_patch, …).",
+    ("stage",),
+))
+claude_duration = REGISTRY.register(Histogram(
+    "claude_request_duration_seconds", "Durée des appels Claude (retries compris) par point d'appel.",
+    ("call_site",),
+))
+claude_tokens = REGISTRY.register(Counter(
+    "claude_tokens_total", "Tokens consommés par point d'appel.", ("call_site", "direction"),
+))
+queue_depth = REGISTRY.register(Gauge(
+    "queue_depth", "Tâches en attente ou en cours par file (lu au scrape).", ("queue", "state"),
+))
+
+
+def timed(stage: str):
+    """`with metrics.timed("xlsx_patch"): …`"""
+    return stage_duration.time(stage=stage)
+
+
+def observe_claude(call_site: str, seconds: float, usage=None) -> None:
+    claude_duration.observe(seconds, call_site=call_site)
+    if usage is not None:
+        claude_tokens.inc(getattr(usage, "input_tokens", 0) or 0, call_site=call_site, direction="input")
+        claude_tokens.inc(getattr(usage, "output_tokens", 0) or 0, call_site=call_site, direction="output")
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : latence par (méthode, modèle de route, statut)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", None) or "<unmatched>",
+                status=str(status["code"]),
+            )
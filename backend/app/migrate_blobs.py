@@ -0,0 +1,171 @@
+"""
+Migration des colonnes bytea legacy vers le blob store, en deux étapes distinctes.
+
+1. copy  : chaque ligne dont la colonne binaire est remplie voit son contenu écrit dans
+   le blob store (clé = SHA-256) et la clé enregistrée dans la colonne *_hash. Le bytea
+   est conservé : l'application lit la colonne legacy tant qu'elle est remplie.
+   Appelée par la migration Alembic 028 si un store durable est configuré.
+2. clear : étape manuelle, une fois le store vérifié. Remet le bytea à NULL seulement
+   si le blob existe dans le store avec la même taille ; les autres lignes sont gardées
+   et comptées.
+
+Les deux refusent de tourner sur le store local par défaut (app/blobs, disque éphémère
+du conteneur) : BLOB_STORE=s3, ou BLOB_STORE=local avec un BLOB_DIR persistant explicite.
+Parcours par lots (pagination sur id), idempotent et reprenable.
+
+  cd backend
+  python -m app.migrate_blobs copy
+  python -m app.migrate_blobs clear
+"""
+
+import sys
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from .blob_store import BlobNotFound, durable_store_configured, get_blob_store
+
+# (table, colonne bytea legacy, colonne clé, colonne taille éventuelle)
+BLOB_COLUMNS = [
+    ("project_documents",         "file_data",       "file_hash",            "file_size"),
+    ("projects",                  "prefilled_excel", "prefilled_excel_hash", None),
+    ("projects",                  "report_docx",     "report_docx_hash",     None),
+    ("report_history",            "file_bytes",      "file_hash",            "file_size"),
+    ("plan_amelioration_history", "file_bytes",      "file_hash",            "file_size"),
+    ("templates",                 "file_bytes",      "file_hash",            None),
+]
+
+
+def require_durable_store() -> None:
+    if not durable_store_configured():
+        raise RuntimeError(
+            "BLOB_STORE=local sans BLOB_DIR : les fichiers iraient dans app/blobs, sur le disque "
+            "éphémère du conteneur. Configurer BLOB_STORE=s3 (S3_BUCKET…) ou un BLOB_DIR persistant."
+        )
+
+
+def copy_batch(conn, table: str, legacy: str, key: str, size: Optional[str],
+               after: str = "", batch: int = 50) -> Tuple[int, str]:
+    """Copie au plus `batch` lignes d'id > after ; renvoie (lignes copiées, dernier id)."""
+    store = get_blob_store()
+    rows = conn.execute(text(
+        f"SELECT id, {legacy} FROM {table} WHERE {legacy} IS NOT NULL AND id > :after ORDER BY id LIMIT :batch"
+    ), {"after": after, "batch": batch}).fetchall()
+    size_set = f", {size} = :size" if size else ""
+    for row_id, data in rows:
+        data = bytes(data)
+        conn.execute(text(f"UPDATE {table} SET {key} = :key{size_set} WHERE id = :id"),
+                     {"key": store.put(data), "size": len(data), "id": row_id})
+    return len(rows), (rows[-1][0] if rows else after)
+
+
+def clear_batch(conn, table: str, legacy: str, key: str,
+                after: str = "", batch: int = 50) -> Tuple[int, int, str]:
+    """
+    Remet à NULL le bytea des lignes dont le blob est présent et de même taille ;
+    renvoie (lignes vidées, lignes gardées, dernier id parcouru).
+    """
+    store = get_blob_store()
+    rows = conn.execute(text(
+        f"SELECT id, {key}, length({legacy}) FROM {table} "
+        f"WHERE {legacy} IS NOT NULL AND id > :after ORDER BY id LIMIT :batch"
+    ), {"after": after, "batch": batch}).fetchall()
+    cleared = kept = 0
+    for row_id, blob_hash, length in rows:
+        try:
+            ok = bool(blob_hash) and store.size(blob_hash) == length
+        except BlobNotFound:
+            ok = False
+        if not ok:
+            kept += 1
+            print(f"[migrate-blobs] {table}.{legacy} id={row_id} : blob absent ou taille différente, bytea conservé",
+                  flush=True)
+            continue
+        conn.execute(text(f"UPDATE {table} SET {legacy} = NULL WHERE id = :id AND {key} = :key"),
+                     {"id": row_id, "key": blob_hash})
+        cleared += 1
+    return cleared, kept, (rows[-1][0] if rows else after)
+
+
+def restore_batch(conn, table: str, legacy: str, key: str, after: str = "", batch: int = 50) -> Tuple[int, str]:
+    """Réécrit le bytea depuis le store (downgrade) ; BlobNotFound si un blob manque."""
+    store = get_blob_store()
+    rows = conn.execute(text(
+        f"SELECT id, {key} FROM {table} WHERE {legacy} IS NULL AND {key} IS NOT NULL "
+        f"AND id > :after ORDER BY id LIMIT :batch"
+    ), {"after": after, "batch": batch}).fetchall()
+    for row_id, blob_hash in rows:
+        conn.execute(text(f"UPDATE {table} SET {legacy} = :data WHERE id = :id"),
+                     {"data": store.get(blob_hash), "id": row_id})
+    return len(rows), (rows[-1][0] if rows else after)
+
+
+def copy_to_store(conn, batch: int = 50) -> dict:
+    """Étape 1, dans la transaction de `conn` : bytea copiés dans le store, clés renseignées."""
+    require_durable_store()
+    copied = {}
+    for table, legacy, key, size in BLOB_COLUMNS:
+        total, after = 0, ""
+        while True:
+            n, after = copy_batch(conn, table, legacy, key, size, after, batch)
+            if not n:
+                break
+            total += n
+        copied[f"{table}.{legacy}"] = total
+    return copied
+
+
+def clear_legacy(conn, batch: int = 50) -> dict:
+    """Étape 2 (manuelle) : bytea vidés là où le store a le blob complet."""
+    require_durable_store()
+    result = {}
+    for table, legacy, key, _ in BLOB_COLUMNS:
+        cleared = kept = 0
+        after = ""
+        while True:
+            c, k, after_next = clear_batch(conn, table, legacy, key, after, batch)
+            if after_next == after:
+                break
+            cleared, kept, after = cleared + c, kept + k, after_next
+        result[f"{table}.{legacy}"] = {"cleared": cleared, "kept": kept}
+    return result
+
+
+def restore_legacy(conn, batch: int = 50) -> dict:
+    """Downgrade de 028 : rapatrie les blobs dans les colonnes bytea avant suppression des clés."""
+    restored = {}
+    for table, legacy, key, _ in BLOB_COLUMNS:
+        total, after = 0, ""
+        while True:
+            n, after = restore_batch(conn, table, legacy, key, after, batch)
+            if not n:
+                break
+            total += n
+        restored[f"{table}.{legacy}"] = total
+    return restored
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    step = sys.argv[1] if len(sys.argv) > 1 else ""
+    if step not in ("copy", "clear"):
+        sys.exit("usage : python -m app.migrate_blobs copy|clear")
+    require_durable_store()
+
+    # Un commit par lot : une interruption ne perd que le lot en cours
+    for table, legacy, key, size in BLOB_COLUMNS:
+        done = kept = 0
+        after = ""
+        while True:
+            with engine.begin() as conn:
+                if step == "copy":
+                    n, after_next = copy_batch(conn, table, legacy, key, size, after)
+                else:
+                    n, k, after_next = clear_batch(conn, table, legacy, key, after)
+                    kept += k
+            if after_next == after:
+                break
+            done, after = done + n, after_next
+        print(f"[migrate-blobs] {step} {table}.{legacy} : {done} ligne(s)"
+              + (f", {kept} conservée(s)" if step == "clear" else ""), flush=True)
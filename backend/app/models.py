@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Float, Integer, Boolean, UniqueConstraint, ForeignKey, LargeBinary
+from sqlalchemy import Column, String, Float, Integer, Boolean, UniqueConstraint, ForeignKey, LargeBinary, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred
 
 from .database import Base
 
@@ -21,6 +22,10 @@ class User(Base):
     current_period_end = Column(String, nullable=True)   # ISO datetime (fin de période payée)
     is_admin = Column(Boolean, nullable=False, default=False)  # accès back-office admin
 
+    __table_args__ = (
+        Index("ix_users_calendar_token", "calendar_token"),   # GET /calendar/{token}.ics
+    )
+
 
 class Project(Base):
     __tablename__ = "projects"
@@ -40,19 +45,26 @@ class Project(Base):
     excel_file = Column(String, nullable=False)
     created_at = Column(String, nullable=False)
     updated_at = Column(String, nullable=True)        # ISO datetime de la dernière activité (touch cross-table)
-    excel_summary = Column(JSONB, nullable=True)      # résumé importé depuis AMUREBA (import-excel)
-    prefill_summary = Column(JSONB, nullable=True)    # actions proposées par Claude (prefill-excel)
-    prefilled_excel = Column(LargeBinary, nullable=True)  # fichier xlsx généré par prefill-excel
+    # Colonnes lourdes différées (hors listes) : chargées au premier accès, par groupe
+    excel_summary = deferred(Column(JSONB, nullable=True), group="summaries")    # résumé importé depuis AMUREBA (import-excel)
+    prefill_summary = deferred(Column(JSONB, nullable=True), group="summaries")  # actions proposées par Claude (prefill-excel)
+    prefilled_excel = deferred(Column(LargeBinary, nullable=True))  # legacy bytea (avant blob store), cf. prefilled_excel_hash
+    prefilled_excel_hash = Column(String, nullable=True)  # clé blob store du xlsx généré par prefill-excel
     prefilled_at = Column(String, nullable=True)      # ISO datetime du dernier prefill
     current_excel_source = Column(String, nullable=True)  # "template"|"ai_prefill"|"manual_upload"|"ai_patched"
-    report_docx = Column(LargeBinary, nullable=True)  # fichier .docx rapport stocké
+    report_docx = deferred(Column(LargeBinary, nullable=True))  # legacy bytea (avant blob store), cf. report_docx_hash
+    report_docx_hash = Column(String, nullable=True)  # clé blob store du .docx rapport stocké
     report_docx_source = Column(String, nullable=True)  # "ai_prefill"|"manual_upload"
-    report_prefill_summary = Column(JSONB, nullable=True)  # champs appliqués par AI prefill
+    report_prefill_summary = deferred(Column(JSONB, nullable=True), group="summaries")  # champs appliqués par AI prefill
     report_prefilled_at = Column(String, nullable=True)  # ISO datetime du dernier prefill rapport
     active_audit_template_id  = Column(String, ForeignKey("templates.id", ondelete="SET NULL"), nullable=True)
     active_report_template_id = Column(String, ForeignKey("templates.id", ondelete="SET NULL"), nullable=True)
     # audit_data, energy_accounting, report_data → tables dédiées
 
+    __table_args__ = (
+        Index("ix_projects_owner_id", "owner_id"),
+    )
+
 
 class Event(Base):
     __tablename__ = "events"
@@ -70,6 +82,11 @@ class Event(Base):
     type = Column(String, nullable=True)            # type d'événement (rdv/visite/call/deadline/autre)
     link = Column(String, nullable=True)            # lien optionnel (ex. visio)
 
+    __table_args__ = (
+        Index("ix_events_owner_id_start", "owner_id", "start"),   # agenda / .ics : filtre + tri
+        Index("ix_events_project_id", "project_id"),
+    )
+
 
 class ClientRequest(Base):
     __tablename__ = "client_requests"
@@ -130,6 +147,44 @@ class Audit(Base):
     field_sources = Column(JSONB, nullable=True)      # { "invoice_meter.field": { source, doc_name, doc_id } }
 
 
+class ExtractionCache(Base):
+    """Résultats d'extraction Claude adressés par contenu : (sha256 du fichier, hash du prompt, modèle).
+
+    Partagé entre projets et utilisateurs : une même facture n'est analysée qu'une fois
+    par version de prompt.
+    """
+    __tablename__ = "extraction_cache"
+
+    file_hash = Column(String, primary_key=True)    # SHA-256 hex du fichier
+    prompt_hash = Column(String, primary_key=True)  # SHA-256 (tronqué) du prompt d'extraction
+    model = Column(String, primary_key=True)
+    extracted_data = Column(JSONB, nullable=False)
+    created_at = Column(String, nullable=False)
+
+
+class Artifact(Base):
+    """Fichier généré (rapport .docx, classeur AMUREBA…) adressé par l'empreinte de ses entrées.
+
+    input_hash = SHA-256(type, version du générateur, empreinte du modèle, données utilisées) :
+    des entrées inchangées resservent le même blob sans relancer la génération. Partagé
+    entre projets (deux projets aux données identiques produisent le même fichier).
+
+    project_id = projet qui l'a généré en dernier : rétention des N plus récents par
+    (projet, type), cf. main._evict_artifacts.
+    """
+    __tablename__ = "artifacts"
+    __table_args__ = (
+        Index("ix_artifacts_project_kind", "project_id", "kind", "created_at"),
+    )
+
+    input_hash = Column(String, primary_key=True)
+    project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)
+    kind = Column(String, nullable=False)           # "report_docx" | "amureba_xlsx"
+    blob_hash = Column(String, nullable=False)      # clé blob store (SHA-256 du contenu)
+    size = Column(Integer, nullable=False)
+    created_at = Column(String, nullable=False)
+
+
 class ProjectDocument(Base):
     """Fichiers uploadés par projet (stockés en bytea pour Render)."""
     __tablename__ = "project_documents"
@@ -141,12 +196,23 @@ class ProjectDocument(Base):
     original_name = Column(String, nullable=False)
     file_type = Column(String, nullable=False)       # mimetype
     doc_type = Column(String, nullable=False, default="autre")
-    file_data = Column(LargeBinary, nullable=False)  # bytea
-    file_hash = Column(String, nullable=True)        # SHA-256 hex digest
+    file_data = deferred(Column(LargeBinary, nullable=True))   # legacy bytea (avant blob store)
+    file_hash = Column(String, nullable=True)        # SHA-256 hex digest = clé blob store
+    file_size = Column(Integer, nullable=True)
     status = Column(String, nullable=False, default="pending")
     extracted_data = Column(JSONB, nullable=True)
+    # texte natif des PDF, extrait une seule fois (NULL = pas encore extrait, "" = rien d'exploitable)
+    pdf_text = deferred(Column(String, nullable=True))
+    pdf_text_status = Column(String, nullable=True)   # ok | truncated | timeout | too_large | error
     created_at = Column(String, nullable=False)
 
+    __table_args__ = (
+        Index("ix_projdoc_project_id", "project_id"),
+        # même fichier déjà analysé (réutilisation du texte PDF) : seules les lignes analysées sont indexées
+        Index("ix_projdoc_file_hash_analyzed", "file_hash",
+              postgresql_where=text("status = 'analyzed'"), sqlite_where=text("status = 'analyzed'")),
+    )
+
 
 class Report(Base):
     """Une ligne = le rapport d'un projet (unique par projet)."""
@@ -194,6 +260,10 @@ class ImprovementAction(Base):
     situation_existante = Column(String, nullable=True)
     created_at = Column(String, nullable=False)
 
+    __table_args__ = (
+        Index("ix_improvement_actions_project_id", "project_id", "created_at"),
+    )
+
 
 class ReportHistory(Base):
     """Un event du rapport : pré-remplissage IA ou upload manuel."""
@@ -204,12 +274,17 @@ class ReportHistory(Base):
     owner_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     action_type = Column(String, nullable=False)  # "AI_PREFILL" | "MANUAL_UPLOAD"
     changes = Column(JSONB, nullable=True)         # { items:[...], sections_applied:[...] } ou { filename, size }
-    file_bytes = Column(LargeBinary, nullable=True)   # snapshot du .docx associé à cette action
+    file_bytes = deferred(Column(LargeBinary, nullable=True))   # legacy bytea (avant blob store)
+    file_hash = Column(String, nullable=True)         # clé blob store du snapshot .docx associé à cette action
     file_name = Column(String, nullable=True)
     file_mime_type = Column(String, nullable=True)
     file_size = Column(Integer, nullable=True)
     created_at = Column(String, nullable=False)
 
+    __table_args__ = (
+        Index("ix_report_history_project_id", "project_id", "created_at"),
+    )
+
 
 class PlanAmeliorationHistory(Base):
     """Un event du plan d'amélioration : pré-remplissage IA ou upload manuel."""
@@ -220,12 +295,17 @@ class PlanAmeliorationHistory(Base):
     owner_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     action_type = Column(String, nullable=False)  # "AI_PREFILL" | "MANUAL_UPLOAD"
     changes = Column(JSONB, nullable=True)         # { items:[...] } ou { excel_summary:{...} }
-    file_bytes = Column(LargeBinary, nullable=True)   # snapshot du .xlsx associé à cette action
+    file_bytes = deferred(Column(LargeBinary, nullable=True))   # legacy bytea (avant blob store)
+    file_hash = Column(String, nullable=True)         # clé blob store du snapshot .xlsx associé à cette action
     file_name = Column(String, nullable=True)
     file_mime_type = Column(String, nullable=True)
     file_size = Column(Integer, nullable=True)
     created_at = Column(String, nullable=False)
 
+    __table_args__ = (
+        Index("ix_plan_amelioration_history_project_id", "project_id", "created_at"),
+    )
+
 
 class AmeliorationAction(Base):
     """
@@ -262,6 +342,10 @@ class LcaMaterial(Base):
     dvr_materiau = Column(Integer, nullable=True)    # durée de vie de référence, années
     poids_unite  = Column(Float,   nullable=True)    # masse par unité fonctionnelle (kg/unité) - Module C déconstruction
 
+    __table_args__ = (
+        Index("ix_lca_materials_category_name", "category", "name"),   # bibliothèque triée
+    )
+
 
 class LcaProject(Base):
     """Éléments de construction ACV d'un projet (unique par projet)."""
@@ -288,10 +372,30 @@ class Template(Base):
     id = Column(String, primary_key=True)
     type = Column(String, nullable=False)                 # "audit" | "report"
     name = Column(String, nullable=False)
-    file_bytes = Column(LargeBinary, nullable=True)       # bytea ; NULL pour l'officiel (résolu depuis le disque)
+    file_bytes = deferred(Column(LargeBinary, nullable=True))   # legacy bytea (avant blob store)
+    file_hash = Column(String, nullable=True)             # clé blob store ; NULL pour l'officiel (résolu depuis le disque)
     original_filename = Column(String, nullable=True)
     is_official = Column(Boolean, nullable=False, default=False, server_default="false")       # protégé : non supprimable
     supports_prefill = Column(Boolean, nullable=False, default=False, server_default="false")  # IA prefill (officiel only au MVP)
     owner_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)       # NULL = officiel
     scope = Column(String, nullable=False, default="user", server_default="user")              # "official" | "user" (futur "org")
     created_at = Column(String, nullable=False)
+
+
+class Job(Base):
+    """Tâche de fond persistée (ex. analyse groupée des documents), suivie via GET /jobs/{id}."""
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)                 # "analyze_documents"
+    project_id = Column(String, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    owner_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued/running/done/error
+    items = Column(JSONB, nullable=False, default=list)   # [{id, name, status, error}] (progression par document)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(String, nullable=False)
+    started_at = Column(String, nullable=True)
+    updated_at = Column(String, nullable=True)            # ISO datetime, rafraîchi à chaque document (reprise des jobs orphelins)
+    finished_at = Column(String, nullable=True)
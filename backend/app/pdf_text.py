@@ -0,0 +1,218 @@
+"""
+Extraction du texte natif des PDF dans des processus tuables.
+
+pdfplumber peut boucler plusieurs minutes sur un PDF pathologique (flux corrompus,
+milliers d'objets par page). Un thread avec `future.result(timeout=…)` rend la main
+mais continue de parser en arrière-plan : CPU brûlé, et la sortie du `with
+ThreadPoolExecutor` attend quand même la fin du parsing.
+
+Ici chaque slot du pool est un processus longue durée (import de pdfplumber payé une
+fois) relié par un pipe. Au-delà de PDF_TIMEOUT secondes le processus est tué et
+relancé au job suivant ; PDF_MAX_BYTES refuse les fichiers trop lourds sans les ouvrir,
+PDF_MAX_PAGES borne le nombre de pages lues.
+
+Les pages du texte extrait sont séparées par un saut de page (\\f, convention
+pdftotext) : `select_pages` s'en sert pour ne transmettre au modèle, en vision, que
+les pages les plus pertinentes d'une longue facture.
+"""
+
+import io
+import logging
+import multiprocessing
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+PAGE_BREAK = "\f"
+
+# mêmes indices que main._has_useful_text : montants/index (≥ 3 chiffres) et unités
+_NUMBER_RE  = re.compile(r"\d{3,}")
+_KEYWORD_RE = re.compile(
+    r"kwh|mwh|m³|m3\b|€|\beur\b|litres?\b|consommation|montant|total|index|compteur|période|\bean\b",
+    re.IGNORECASE,
+)
+
+
+class PdfText(NamedTuple):
+    text: str
+    status: str     # ok | truncated | timeout | too_large | error
+    pages: int      # pages effectivement lues
+
+
+def score_page(text: str) -> float:
+    """Pertinence d'une page de facture : mots-clés énergie/montants, puis densité de nombres."""
+    if not text.strip():
+        return 0.0
+    numbers = len(_NUMBER_RE.findall(text))
+    return 3.0 * len(_KEYWORD_RE.findall(text)) + min(numbers, 40) + numbers / max(len(text), 1) * 100
+
+
+def _extract(data: bytes, max_pages: int) -> tuple:
+    import pdfplumber
+
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        total = len(pdf.pages)
+        texts: List[str] = []
+        for page in pdf.pages[:max_pages]:
+            texts.append((page.extract_text() or "").strip())
+            page.close()   # libère le cache d'objets de la page
+    return PAGE_BREAK.join(texts).strip(), min(total, max_pages), total
+
+
+def _select(data: bytes, scores: Sequence[float], keep: int) -> tuple:
+    """(PDF réduit aux `keep` pages les mieux notées, ordre d'origine ; None si rien à retirer, nb de pages)."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    if total <= keep:
+        return None, total
+    # pages non lues (au-delà de PDF_MAX_PAGES) ou sans texte : score nul, la première l'emporte
+    padded = list(scores[:total]) + [0.0] * max(0, total - len(scores))
+    chosen = sorted(sorted(range(total), key=lambda i: (-padded[i], i))[:keep])
+    writer = PdfWriter()
+    for i in chosen:
+        writer.add_page(reader.pages[i])
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue(), total
+
+
+def _serve(conn, max_pages: int) -> None:
+    """Boucle du processus worker : (opération, PDF, argument) → (statut, résultat, pages)."""
+    while True:
+        try:
+            op, data, arg = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if op == "text":
+                text, read, total = _extract(data, max_pages)
+                conn.send(("truncated" if total > read else "ok", text, read))
+            else:
+                pdf, total = _select(data, *arg)
+                conn.send(("ok", pdf, total))
+        except Exception as exc:
+            conn.send(("error", f"{type(exc).__name__}: {exc}", 0))
+
+
+class _Slot:
+    def __init__(self, pool: "PdfTextPool"):
+        self.pool = pool
+        self.proc: Optional[multiprocessing.Process] = None
+        self.conn = None
+
+    def ensure(self) -> None:
+        if self.proc is not None and self.proc.is_alive():
+            return
+        self.stop()
+        parent, child = self.pool.ctx.Pipe()
+        self.proc = self.pool.ctx.Process(target=_serve, args=(child, self.pool.max_pages), daemon=True)
+        self.proc.start()
+        child.close()
+        self.conn = parent
+        self.pool._count("spawned")
+
+    def stop(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.proc is not None:
+            if self.proc.is_alive():
+                self.proc.kill()
+            self.proc.join(5)
+            self.proc = None
+
+
+class PdfTextPool:
+    def __init__(self, size: int = 2, timeout: float = 10.0, max_pages: int = 50,
+                 max_bytes: int = 20 * 1024 * 1024, start_method: str = "spawn"):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_pages = max(1, max_pages)
+        self.max_bytes = max_bytes
+        self.ctx = multiprocessing.get_context(start_method)
+        self._slots: "queue.Queue[_Slot]" = queue.Queue()
+        for _ in range(self.size):
+            self._slots.put(_Slot(self))
+        self._all: List[_Slot] = list(self._slots.queue)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "calls": 0, "ok": 0, "truncated": 0, "timeout": 0, "too_large": 0, "error": 0,
+            "spawned": 0, "duration_ms_total": 0.0, "duration_ms_max": 0.0,
+            "selections": 0, "pages_dropped": 0,
+        }
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def extract(self, data: bytes) -> PdfText:
+        """Texte natif de `data` ; en cas d'échec texte vide et statut explicite, jamais d'exception."""
+        self._count("calls")
+        if len(data) > self.max_bytes:
+            self._count("too_large")
+            return PdfText("", "too_large", 0)
+
+        started = time.perf_counter()
+        status, payload, pages = self._call("text", data)
+        result = PdfText(payload if status in ("ok", "truncated") else "", status, pages)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats[result.status] += 1
+            self._stats["duration_ms_total"] += elapsed
+            self._stats["duration_ms_max"] = max(self._stats["duration_ms_max"], elapsed)
+        return result
+
+    def select_pages(self, data: bytes, text: str, keep: int) -> bytes:
+        """
+        `data` réduit aux `keep` pages les plus pertinentes d'après `text` (texte extrait,
+        pages séparées par PAGE_BREAK ; vide pour un scan : premières pages). En cas de
+        souci (PDF chiffré, timeout…) le PDF complet est renvoyé.
+        """
+        scores = [score_page(page) for page in text.split(PAGE_BREAK)] if text else []
+        keep = max(1, keep)
+        status, payload, total = self._call("pages", data, (scores, keep))
+        if status != "ok" or payload is None:
+            return data
+        with self._lock:
+            self._stats["selections"] += 1
+            self._stats["pages_dropped"] += total - keep
+        return payload
+
+    def _call(self, op: str, data: bytes, arg: Any = None) -> tuple:
+        slot = self._slots.get()
+        try:
+            slot.ensure()
+            slot.conn.send((op, data, arg))
+            if not slot.conn.poll(self.timeout):
+                slot.stop()   # parsing interrompu : le processus est tué, relancé au job suivant
+                return "timeout", None, 0
+            status, payload, pages = slot.conn.recv()
+            if status == "error":
+                log.warning("pdf-text: échec %s: %s", op, payload)
+            return status, payload, pages
+        except (EOFError, OSError):
+            slot.stop()       # worker mort (mémoire, segfault dans une dépendance native)
+            return "error", None, 0
+        finally:
+            self._slots.put(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+        parsed = s["calls"] - s["too_large"]
+        s["avg_ms"] = round(s.pop("duration_ms_total") / parsed, 1) if parsed else None
+        s["duration_ms_max"] = round(s["duration_ms_max"], 1)
+        s.update(size=self.size, timeout_s=self.timeout, max_pages=self.max_pages, max_bytes=self.max_bytes,
+                 alive=sum(1 for slot in self._all if slot.proc is not None and slot.proc.is_alive()))
+        return s
+
+    def shutdown(self) -> None:
+        for slot in self._all:
+            slot.stop()
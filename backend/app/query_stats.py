@@ -0,0 +1,102 @@
+"""
+Compteur de requêtes SQL par requête HTTP, exposé dans l'en-tête Server-Timing.
+
+Les événements `before/after_cursor_execute` de SQLAlchemy (tous les Engine) cumulent
+nombre de requêtes et temps base de données dans un `QueryStats` porté par une
+ContextVar. Les endpoints synchrones tournent dans le threadpool anyio avec une copie
+du contexte : ils alimentent le même objet. Les threads lancés hors requête (jobs,
+analyse parallèle) n'ont pas de compteur et ne sont pas comptés.
+
+    Server-Timing: db;dur=4.2;desc="6 queries", app;dur=31.0
+
+Visible dans l'onglet Réseau des DevTools (Timing) ; en test, cf. la fixture
+`query_budget` (tests/conftest.py) pour plafonner le nombre de requêtes d'un endpoint.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    __slots__ = ("count", "duration_ms")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration_ms = 0.0
+
+    def server_timing(self, total_ms: float) -> str:
+        return f'db;dur={self.duration_ms:.1f};desc="{self.count} queries", app;dur={total_ms:.1f}'
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_stats_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration_ms += (time.perf_counter() - started) * 1000
+
+
+def _handle_error(exception_context):
+    # requête en échec : pas d'after_cursor_execute, on dépile quand même
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_stats_start"):
+        conn.info["query_stats_start"].pop()
+
+
+def install() -> None:
+    """Branche les écouteurs sur tous les Engine (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _installed = True
+
+
+@contextmanager
+def track() -> Iterator[QueryStats]:
+    """Compte les requêtes exécutées dans ce contexte (et les contextes qui en dérivent)."""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class ServerTimingMiddleware:
+    """Middleware ASGI : un QueryStats par requête HTTP, ajouté aux en-têtes de la réponse."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        with track() as stats:
+
+            async def _send(message):
+                if message["type"] == "http.response.start":
+                    total_ms = (time.perf_counter() - started) * 1000
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing(total_ms).encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, _send)
@@ -0,0 +1,68 @@
+"""
+Balayage du blob store : supprime les blobs qu'aucune ligne ne référence plus
+(document supprimé, livrable remplacé, artefact évincé…).
+
+Le store est adressé par contenu et un même blob peut être partagé par plusieurs
+lignes : rien n'est supprimé au fil de l'eau. Un blob n'est supprimé que s'il n'est
+référencé par aucune colonne de clé (BLOB_REFERENCES) et s'il n'a pas été écrit
+depuis `grace` secondes ; les références sont revérifiées juste avant chaque
+suppression (une écriture peut précéder de peu le commit de sa ligne).
+
+  cd backend
+  python -m app.sweep_blobs [--grace-hours 24] [--dry-run]
+"""
+
+import argparse
+import time
+from typing import Dict, Set
+
+from sqlalchemy import text
+
+from .blob_store import get_blob_store
+from .migrate_blobs import BLOB_COLUMNS
+
+# (table, colonne clé) : toute colonne pouvant contenir une clé du store
+BLOB_REFERENCES = [(table, key) for table, _, key, _ in BLOB_COLUMNS] + [("artifacts", "blob_hash")]
+
+
+def referenced_keys(conn) -> Set[str]:
+    keys: Set[str] = set()
+    for table, column in BLOB_REFERENCES:
+        keys.update(r[0] for r in conn.execute(text(f"SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL")))
+    return keys
+
+
+def _is_referenced(conn, key: str) -> bool:
+    return any(
+        conn.execute(text(f"SELECT 1 FROM {table} WHERE {column} = :key LIMIT 1"), {"key": key}).first()
+        for table, column in BLOB_REFERENCES
+    )
+
+
+def sweep(engine, grace: float = 24 * 3600, dry_run: bool = False) -> Dict[str, int]:
+    """Supprime les blobs orphelins plus vieux que `grace` ; renvoie les compteurs."""
+    store = get_blob_store()
+    cutoff = time.time() - grace
+    with engine.connect() as conn:
+        live = referenced_keys(conn)
+        candidates = [k for k, mtime in store.iter_keys() if k not in live and mtime < cutoff]
+        deleted = 0
+        for key in candidates:
+            if _is_referenced(conn, key):
+                continue
+            if not dry_run:
+                store.delete(key)
+            deleted += 1
+    return {"referenced": len(live), "deleted": deleted}
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Supprime les blobs non référencés.")
+    parser.add_argument("--grace-hours", type=float, default=24.0)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    result = sweep(engine, grace=args.grace_hours * 3600, dry_run=args.dry_run)
+    print(f"[sweep-blobs] {result['referenced']} blob(s) référencé(s), "
+          f"{result['deleted']} orphelin(s) {'à supprimer' if args.dry_run else 'supprimé(s)'}", flush=True)
@@ -0,0 +1,162 @@
+"""
+Pool de processus pour le travail CPU lourd des requêtes (lecture openpyxl, parsing
+pandas, rendu docx…).
+
+Exécutées dans le threadpool anyio ou directement dans un endpoint `async def`, ces
+opérations se disputent le GIL avec tout le reste du worker : un import volumineux
+suffit à dégrader /auth/me pour tous les utilisateurs. Ici elles tournent dans des
+processus dédiés, derrière une admission bornée (taille du pool + WORK_QUEUE_SIZE
+tâches en attente, au-delà WorkPoolBusy → 503 + Retry-After).
+
+Les fonctions soumises doivent être picklables (définies au niveau module) ainsi que
+leurs arguments et résultats ; celles de l'application sont dans app/heavy.py, seul
+module importé par les workers. Taille 0 : exécution en ligne dans le thread appelant
+(mêmes compteurs), utile en test ou sur une instance à un seul cœur.
+"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+
+class WorkPoolBusy(RuntimeError):
+    """File pleine : la tâche est refusée plutôt que mise en attente sans borne."""
+
+
+def _timed_call(fn: Callable[..., Any], args: tuple, kwargs: dict) -> tuple:
+    """Exécuté dans le processus worker : (résultat, durée d'exécution en ms)."""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+class WorkPool:
+    def __init__(self, size: int = 2, queue_size: int = 8, start_method: str = "spawn"):
+        self.size = max(0, size)
+        self.start_method = start_method
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        # tâches admises (en cours + en attente d'un worker)
+        self._admission = threading.BoundedSemaphore(max(1, self.size) + max(0, queue_size))
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "rejected": 0, "failed": 0, "restarts": 0, "in_flight": 0}
+        self._tasks: Dict[str, Dict[str, float]] = {}
+
+    # ── exécution ─────────────────────────────────────────────────────────────
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.size, mp_context=multiprocessing.get_context(self.start_method),
+                )
+            return self._executor
+
+    def _mark_broken(self, executor: concurrent.futures.ProcessPoolExecutor) -> None:
+        """Un worker mort (OOM, segfault) casse tout l'executor : le suivant en recrée un."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._stats["restarts"] += 1
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "concurrent.futures.Future":
+        """Future du résultat de fn(*args) ; WorkPoolBusy immédiatement si la file est pleine."""
+        name = getattr(fn, "__name__", repr(fn))
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+                self._task(name)["rejected"] += 1
+            raise WorkPoolBusy("pool de calcul saturé")
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["in_flight"] += 1
+        submitted_at = time.perf_counter()
+        result: "concurrent.futures.Future" = concurrent.futures.Future()
+        executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+        def _done(inner: "concurrent.futures.Future") -> None:
+            total_ms = (time.perf_counter() - submitted_at) * 1000
+            self._admission.release()
+            exc = concurrent.futures.CancelledError() if inner.cancelled() else inner.exception()
+            if isinstance(exc, BrokenProcessPool) and executor is not None:
+                self._mark_broken(executor)
+            self._record(name, total_ms, None if exc is not None else inner.result()[1])
+            if exc is not None:
+                result.set_exception(exc)
+            else:
+                result.set_result(inner.result()[0])
+
+        if self.size == 0:
+            inner: "concurrent.futures.Future" = concurrent.futures.Future()
+            try:
+                inner.set_result(_timed_call(fn, args, kwargs))
+            except Exception as exc:
+                inner.set_exception(exc)
+            _done(inner)
+            return result
+
+        try:
+            executor = self._get_executor()
+            try:
+                inner = executor.submit(_timed_call, fn, args, kwargs)
+            except BrokenProcessPool:
+                self._mark_broken(executor)
+                executor = self._get_executor()
+                inner = executor.submit(_timed_call, fn, args, kwargs)
+        except BaseException:
+            self._admission.release()
+            with self._lock:
+                self._stats["in_flight"] -= 1
+            raise
+        inner.add_done_callback(_done)
+        return result
+
+    def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Exécution bloquante (endpoints `def`, déjà dans le threadpool)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Exécution sans bloquer la boucle asyncio (endpoints `async def`)."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    # ── métriques ─────────────────────────────────────────────────────────────
+
+    def _task(self, name: str) -> Dict[str, float]:
+        return self._tasks.setdefault(name, {
+            "calls": 0, "failed": 0, "rejected": 0,
+            "run_ms_total": 0.0, "run_ms_max": 0.0, "wait_ms_total": 0.0,
+        })
+
+    def _record(self, name: str, total_ms: float, run_ms: Optional[float]) -> None:
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            task = self._task(name)
+            task["calls"] += 1
+            if run_ms is None:
+                self._stats["failed"] += 1
+                task["failed"] += 1
+                return
+            task["run_ms_total"] += run_ms
+            task["run_ms_max"] = max(task["run_ms_max"], run_ms)
+            task["wait_ms_total"] += max(0.0, total_ms - run_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s: Dict[str, Any] = dict(self._stats)
+            tasks = {k: dict(v) for k, v in self._tasks.items()}
+        for t in tasks.values():
+            ok = t["calls"] - t["failed"]
+            t["avg_run_ms"] = round(t.pop("run_ms_total") / ok, 1) if ok else None
+            t["avg_wait_ms"] = round(t.pop("wait_ms_total") / ok, 1) if ok else None
+            t["run_ms_max"] = round(t["run_ms_max"], 1)
+        s.update(size=self.size, started=self._executor is not None, tasks=tasks)
+        return s
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
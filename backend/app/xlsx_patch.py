@@ -0,0 +1,333 @@
+"""
+Patch des feuilles xlsx au niveau XML (valeurs écrites dans les cellules ciblées, reste
+du classeur copié octet pour octet) et squelette de classeur réutilisable.
+
+Sans dépendance à l'application (FastAPI, base, clients Claude) : importé aussi par
+les workers du pool de calcul (app/heavy.py).
+"""
+
+import bisect
+import hashlib
+import logging
+import re
+import threading
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import escape as _xml_escape
+from zipfile import ZipFile
+
+from . import logs
+from .xlsx_zip import ZipSkeleton
+
+log = logging.getLogger(__name__)
+
+_NS_MAIN  = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_R     = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_MC    = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+_NS_RELS  = "http://schemas.openxmlformats.org/package/2006/relationships"
+_NS_X14AC = "http://schemas.microsoft.com/office/spreadsheetml/2009/9/ac"
+_NS_XR    = "http://schemas.microsoft.com/office/spreadsheetml/2014/revision"
+_NS_XR2   = "http://schemas.microsoft.com/office/spreadsheetml/2015/revision2"
+_NS_XR3   = "http://schemas.microsoft.com/office/spreadsheetml/2016/revision3"
+
+_NS_X14 = "http://schemas.microsoft.com/office/spreadsheetml/2009/9/main"
+_NS_XM  = "http://schemas.microsoft.com/office/excel/2006/main"
+
+for _pfx, _uri in [
+    ("",      _NS_MAIN),
+    ("r",     _NS_R),
+    ("mc",    _NS_MC),
+    ("x14ac", _NS_X14AC),
+    ("x14",   _NS_X14),
+    ("xm",    _NS_XM),
+    ("xr",    _NS_XR),
+    ("xr2",   _NS_XR2),
+    ("xr3",   _NS_XR3),
+]:
+    ET.register_namespace(_pfx, _uri)
+
+
+def _build_sheet_path_map(zf: ZipFile) -> Dict[str, str]:
+    """Return {sheet_name: 'xl/worksheets/sheetN.xml'} from workbook.xml + rels."""
+    wb_root = ET.fromstring(zf.read("xl/workbook.xml"))
+    name_to_rid: Dict[str, str] = {}
+    for el in wb_root.iter(f"{{{_NS_MAIN}}}sheet"):
+        name = el.get("name")
+        rid  = el.get(f"{{{_NS_R}}}id")
+        if name and rid:
+            name_to_rid[name] = rid
+
+    rels_root = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    rid_to_path: Dict[str, str] = {}
+    for rel in rels_root.iter(f"{{{_NS_RELS}}}Relationship"):
+        rid    = rel.get("Id")
+        target = rel.get("Target", "")
+        if rid:
+            if target.startswith("/"):
+                path = target[1:]   # absolute target (files re-saved by openpyxl / LibreOffice)
+            else:
+                path = target if target.startswith("xl/") else f"xl/{target}"
+            rid_to_path[rid] = path
+
+    return {n: rid_to_path[r] for n, r in name_to_rid.items() if r in rid_to_path}
+
+
+def _col_num(col: str) -> int:
+    """'A'→1, 'B'→2, 'AA'→27"""
+    n = 0
+    for c in col.upper():
+        n = n * 26 + (ord(c) - 64)
+    return n
+
+
+def _cell_col_num(ref: str) -> int:
+    m = re.match(r'([A-Z]+)', str(ref).upper())
+    return _col_num(m.group(1)) if m else 0
+
+
+_XML_ATTR_RE = re.compile(rb'([\w:.-]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+_CELL_REF_RE = re.compile(r'([A-Z]+)(\d+)')
+
+
+def _xml_attr(attrs: bytes, name: bytes) -> Optional[bytes]:
+    for key, quoted in _XML_ATTR_RE.findall(attrs):
+        if key == name:
+            return quoted[1:-1]
+    return None
+
+
+def _render_patched_cell(pfx: bytes, attrs: Optional[bytes], ref: str, value: Any) -> bytes:
+    """
+    Serialise one targeted cell. Existing attributes (s=, cm=…) are kept except t;
+    children (formula + cached value) are dropped so our constant is not overwritten.
+    """
+    kept = [(k, v) for k, v in _XML_ATTR_RE.findall(attrs or b"") if k != b"t"]
+    if not any(k == b"r" for k, _ in kept):
+        kept.insert(0, (b"r", f'"{ref}"'.encode()))
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        body = b"<" + pfx + b"v>" + str(value).encode() + b"</" + pfx + b"v>"
+    elif value is not None and str(value).strip():
+        text = str(value)
+        space = b' xml:space="preserve"' if text != text.strip() else b""
+        kept.append((b"t", b'"inlineStr"'))
+        body = (b"<" + pfx + b"is><" + pfx + b"t" + space + b">"
+                + _xml_escape(text).encode("utf-8") + b"</" + pfx + b"t></" + pfx + b"is>")
+    else:
+        body = b""
+    start = b"<" + pfx + b"c " + b" ".join(k + b"=" + v for k, v in kept)
+    if not body:
+        return start + b"/>"
+    return start + b">" + body + b"</" + pfx + b"c>"
+
+
+def _patch_row_xml(pfx: bytes, row: bytes, open_end: int, cells: Dict[int, Tuple[str, Any]]) -> bytes:
+    """Patch one <row> (open tag ends at open_end) ; cells = {col_num: (ref, value)}."""
+    if row.endswith(b"/>") and open_end == len(row):
+        row = row[:-2] + b"></" + pfx + b"row>"
+        open_end = len(row) - len(b"</" + pfx + b"row>")
+    close = row.rfind(b"</" + pfx + b"row>")
+    pending = sorted(cells.items())
+    out: List[bytes] = [row[:open_end]]
+    cursor = last_cell_end = open_end
+    prev_col = 0
+    i = 0
+    for cm in re.compile(rb"<" + re.escape(pfx) + rb"c\b([^>]*?)(/?)>").finditer(row, open_end, close):
+        if i == len(pending):
+            break
+        ref = _xml_attr(cm.group(1), b"r")
+        col = _cell_col_num(ref.decode()) if ref else prev_col + 1
+        prev_col = col
+        cell_end = cm.end() if cm.group(2) else row.index(b"</" + pfx + b"c>", cm.end()) + len(pfx) + 4
+        while i < len(pending) and pending[i][0] < col:
+            out += [row[cursor:cm.start()], _render_patched_cell(pfx, None, *pending[i][1])]
+            cursor = cm.start()
+            i += 1
+        if i < len(pending) and pending[i][0] == col:
+            out += [row[cursor:cm.start()], _render_patched_cell(pfx, cm.group(1), *pending[i][1])]
+            cursor = cell_end
+            i += 1
+        last_cell_end = cell_end
+    if i < len(pending):
+        # remaining cells go after the last existing cell (before any row-level extLst)
+        split = max(cursor, last_cell_end)
+        out.append(row[cursor:split])
+        out += [_render_patched_cell(pfx, None, *cell) for _, cell in pending[i:]]
+        cursor = split
+    out.append(row[cursor:])
+    return b"".join(out)
+
+
+class _SheetIndex(NamedTuple):
+    """Row offsets of a worksheet XML: <sheetData> bounds + one entry per <row> start tag."""
+    pfx: bytes
+    body_start: int
+    body_end: int
+    self_closing: bool          # <sheetData/>
+    rows: List[int]             # row numbers, ascending (OOXML order)
+    starts: List[int]           # offset of each '<row'
+    open_ends: List[int]        # offset just past each row start tag
+    empty: List[bool]           # self-closing <row …/>
+
+
+def _index_sheet_xml(xml_bytes: bytes) -> Optional[_SheetIndex]:
+    """Scan <row> start tags once; None when the sheet has no usable <sheetData>."""
+    sd = re.search(rb"<(\w+:)?sheetData\b[^>]*?(/?)>", xml_bytes)
+    if sd is None:
+        return None
+    pfx = sd.group(1) or b""
+    if sd.group(2):
+        return _SheetIndex(pfx, sd.end(), sd.end(), True, [], [], [], [])
+    body_end = xml_bytes.find(b"</" + pfx + b"sheetData>", sd.end())
+    if body_end == -1:
+        return None
+    rows: List[int] = []
+    starts: List[int] = []
+    open_ends: List[int] = []
+    empty: List[bool] = []
+    prev_r = 0
+    for rm in re.compile(rb"<" + re.escape(pfx) + rb"row\b([^>]*?)(/?)>").finditer(xml_bytes, sd.end(), body_end):
+        r_attr = _xml_attr(rm.group(1), b"r")
+        prev_r = int(r_attr) if r_attr else prev_r + 1
+        rows.append(prev_r)
+        starts.append(rm.start())
+        open_ends.append(rm.end())
+        empty.append(bool(rm.group(2)))
+    return _SheetIndex(pfx, sd.end(), body_end, False, rows, starts, open_ends, empty)
+
+
+def patch_sheet_xml(xml_bytes: bytes, changes: Dict[str, Any], index: Optional[_SheetIndex] = None) -> bytes:
+    """
+    Write cell values into a worksheet XML without parsing it as a tree.
+    Rows are located through the <row> start-tag index (built here, or reused from a
+    template skeleton); just the targeted rows are parsed cell by cell and the
+    targeted cells rewritten or inserted in column order. Everything else - every
+    other row, namespace declarations, mc:Ignorable, extLst, x14/xm blocks - is
+    copied byte-for-byte, so the ET namespace-prefix bug (x14→ns4, xm→ns5) cannot occur.
+
+    - Numbers  → plain <v>N</v>, t attribute removed (default numeric type).
+    - Strings  → t="inlineStr" + <is><t>text</t></is>  (no sharedStrings.xml change).
+    - Formulas on targeted cells are removed so our constants are not overwritten.
+    - Style (s=) attribute on existing cells is preserved.
+    - Rows / cells without r= are numbered implicitly, as Excel does.
+    """
+    targets: Dict[int, Dict[int, Tuple[str, Any]]] = {}
+    for cell_ref, value in changes.items():
+        m = _CELL_REF_RE.match(str(cell_ref).upper())
+        if not m:
+            continue
+        targets.setdefault(int(m.group(2)), {})[_col_num(m.group(1))] = (m.group(0), value)
+    if not targets:
+        return xml_bytes
+
+    if index is None:
+        index = _index_sheet_xml(xml_bytes)
+        if index is None:
+            return xml_bytes
+    pfx = index.pfx
+    if index.self_closing:
+        # self-closing <sheetData/> : reopen it
+        head = xml_bytes[:index.body_start].rstrip(b"/>") + b">"
+        tail = b"</" + pfx + b"sheetData>" + xml_bytes[index.body_end:]
+    else:
+        head, tail = xml_bytes[:index.body_start], xml_bytes[index.body_end:]
+
+    out: List[bytes] = [head]
+    cursor = index.body_start
+    row_close = b"</" + pfx + b"row>"
+    for r, cells in sorted(targets.items()):
+        k = bisect.bisect_left(index.rows, r)
+        if k < len(index.rows) and index.rows[k] == r:
+            start, open_end = index.starts[k], index.open_ends[k]
+            row_end = open_end if index.empty[k] else xml_bytes.index(row_close, open_end) + len(row_close)
+            out += [xml_bytes[cursor:start], _patch_row_xml(pfx, xml_bytes[start:row_end], open_end - start, cells)]
+            cursor = row_end
+        else:
+            pos = index.starts[k] if k < len(index.rows) else index.body_end
+            out += [xml_bytes[cursor:pos], _new_row_xml(pfx, r, cells)]
+            cursor = pos
+    out.append(xml_bytes[cursor:index.body_end])
+    out.append(tail)
+
+    if log.isEnabledFor(logging.DEBUG):   # une entrée par cellule : rien n'est construit à INFO
+        log.debug("xlsx-patch cells: %s", ", ".join(f"{ref}={v!r}" for ref, v in changes.items()), extra=logs.SAMPLED)
+    return b"".join(out)
+
+
+def _new_row_xml(pfx: bytes, row_num: int, cells: Dict[int, Tuple[str, Any]]) -> bytes:
+    return (b"<" + pfx + b'row r="' + str(row_num).encode() + b'">'
+            + b"".join(_render_patched_cell(pfx, None, *cell) for _, cell in sorted(cells.items()))
+            + b"</" + pfx + b"row>")
+
+
+def _drop_calc_chain_from_rels(rels_xml: bytes) -> bytes:
+    """Remove the calcChain Relationship entry from workbook.xml.rels."""
+    return re.sub(rb'<Relationship\b[^>]*calcChain[^>]*/>', b'', rels_xml)
+
+
+def _drop_calc_chain_from_content_types(ct_xml: bytes) -> bytes:
+    """Remove the calcChain Override entry from [Content_Types].xml."""
+    return re.sub(rb'<Override\b[^>]*calcChain[^>]*/>', b'', ct_xml)
+
+
+def _force_full_calc_on_load(wb_xml: bytes) -> bytes:
+    """
+    Ensure <calcPr> has fullCalcOnLoad="1" so Excel rebuilds the calculation
+    chain on open instead of relying on the (now absent) calcChain.xml.
+    """
+    if b'<calcPr' not in wb_xml:
+        return wb_xml
+    if b'fullCalcOnLoad' in wb_xml:
+        return re.sub(rb'fullCalcOnLoad="[^"]*"', b'fullCalcOnLoad="1"', wb_xml)
+    return re.sub(rb'(<calcPr\b)', rb'\1 fullCalcOnLoad="1"', wb_xml)
+
+
+class WorkbookSkeleton:
+    """
+    An xlsx analysed once and patched many times: raw compressed members (ZipSkeleton),
+    sheet name → part path, the calcChain fixes (identical for every patch) and, per
+    sheet, the decompressed XML with its row index, built the first time that sheet
+    is patched. A patch then only touches the changed sheets.
+    """
+
+    def __init__(self, source):
+        self.zip = ZipSkeleton(source)
+        self.digest = hashlib.sha256(self.zip.data).hexdigest()
+        self.names = set(self.zip.namelist())
+        self.sheet_paths = _build_sheet_path_map(self.zip)
+
+        self.base_edits: Dict[str, Optional[bytes]] = {}
+        if "xl/calcChain.xml" in self.names:
+            self.base_edits["xl/calcChain.xml"] = None
+        for name, fix in (
+            ("xl/_rels/workbook.xml.rels", _drop_calc_chain_from_rels),
+            ("[Content_Types].xml",        _drop_calc_chain_from_content_types),
+            ("xl/workbook.xml",            _force_full_calc_on_load),
+        ):
+            if name in self.names:
+                self.base_edits[name] = fix(self.zip.read(name))
+
+        self._sheets: Dict[str, Tuple[bytes, Optional[_SheetIndex]]] = {}
+        self._lock = threading.Lock()
+
+    def sheet(self, path: str) -> Tuple[bytes, Optional[_SheetIndex]]:
+        with self._lock:
+            if path not in self._sheets:
+                xml_bytes = self.zip.read(path)
+                self._sheets[path] = (xml_bytes, _index_sheet_xml(xml_bytes))
+            return self._sheets[path]
+
+    def patch(self, sheet_changes: Dict[str, Dict[str, Any]]) -> bytes:
+        edits = dict(self.base_edits)
+        for sheet_name, changes in sheet_changes.items():
+            path = self.sheet_paths.get(sheet_name)
+            if path not in self.names:
+                continue
+            try:
+                xml_bytes, index = self.sheet(path)
+                data = patch_sheet_xml(xml_bytes, changes, index)
+                log.debug("xlsx-patch sheet %r (%s) patched, %d bytes", sheet_name, path, len(data))
+                edits[path] = data
+            except Exception:
+                log.exception("xlsx-patch: échec du patch de %s", path)
+        return self.zip.patch(edits)
+
@@ -0,0 +1,209 @@
+"""
+Réécriture incrémentale d'une archive zip (xlsx / docx).
+
+Un classeur AMUREBA pré-rempli ne diffère du modèle que par quelques parties XML
+(feuilles patchées, workbook.xml, rels, [Content_Types].xml). `patch_zip` recopie
+donc chaque membre inchangé tel quel - octets compressés, sans cycle
+inflate/deflate - et ne compresse que les membres remplacés. Les caches de
+tableaux croisés dynamiques, images et styles ne sont plus jamais recompressés.
+
+`ZipSkeleton` conserve cette analyse (en-têtes prêts à l'emploi, vues sur les
+données compressées) pour les archives patchées de nombreuses fois, typiquement
+les modèles de classeur.
+
+Les archives zip64 ou chiffrées (jamais produites par Excel pour ces modèles)
+passent par une réécriture complète via zipfile.
+"""
+
+import io
+import struct
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+
+_LOCAL_HEADER   = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_OF_CENTRAL = struct.Struct("<4s4H2LH")
+
+_SIG_LOCAL   = b"PK\x03\x04"
+_SIG_CENTRAL = b"PK\x01\x02"
+_SIG_END     = b"PK\x05\x06"
+
+_FLAG_ENCRYPTED       = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8            = 0x800
+_ZIP32_LIMIT          = 0xFFFFFFFF
+
+Source = Union[bytes, bytearray, str, Path, BinaryIO]
+
+
+def _dos_datetime(date_time) -> tuple:
+    y, mo, d, h, mi, s = date_time
+    return (h << 11) | (mi << 5) | (s // 2), ((y - 1980) << 9) | (mo << 5) | d
+
+
+def _encoded_name(info: ZipInfo) -> tuple:
+    try:
+        return info.filename.encode("ascii"), info.flag_bits & ~_FLAG_UTF8
+    except UnicodeEncodeError:
+        return info.filename.encode("utf-8"), info.flag_bits | _FLAG_UTF8
+
+
+def _needs_full_rewrite(infos) -> bool:
+    return len(infos) >= 0xFFFF or any(
+        i.flag_bits & _FLAG_ENCRYPTED
+        or i.file_size >= _ZIP32_LIMIT
+        or i.compress_size >= _ZIP32_LIMIT
+        or i.header_offset >= _ZIP32_LIMIT
+        for i in infos
+    )
+
+
+def _rewrite_full(zf: ZipFile, edits: Dict[str, Optional[bytes]]) -> bytes:
+    out = io.BytesIO()
+    with ZipFile(out, "w", compression=ZIP_DEFLATED) as zf_out:
+        for info in zf.infolist():
+            if info.filename in edits:
+                data = edits[info.filename]
+                if data is not None:
+                    zf_out.writestr(info, data)
+            else:
+                zf_out.writestr(info, zf.read(info))
+        for name in edits.keys() - set(zf.namelist()):
+            if edits[name] is not None:
+                zf_out.writestr(name, edits[name])
+    return out.getvalue()
+
+
+def _read_source(source: Source) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, Path)):
+        return Path(source).read_bytes()
+    source.seek(0)
+    return source.read()
+
+
+class ZipSkeleton:
+    """
+    Archive analysée une fois, patchable N fois : pour chaque membre, les en-têtes
+    local et central (offset excepté) sont pré-calculés et les données compressées
+    restent des vues sur l'archive source. Un patch se réduit à compresser les
+    membres remplacés et à concaténer le reste.
+    """
+
+    def __init__(self, source: Source, compresslevel: int = 6, date_time: Optional[tuple] = None):
+        """date_time : horodatage imposé à tous les membres (archive reproductible)."""
+        self.data = _read_source(source)
+        self.compresslevel = compresslevel
+        view = memoryview(self.data)
+        with ZipFile(io.BytesIO(self.data), "r") as zf:
+            self.infos: List[ZipInfo] = zf.infolist()
+        if date_time is not None:
+            for info in self.infos:
+                info.date_time = date_time
+        self.full_rewrite = _needs_full_rewrite(self.infos)
+        # nom → (en-tête local, en-tête central sans offset, nom encodé, données compressées)
+        self._members: Dict[str, tuple] = {}
+        if self.full_rewrite:
+            return
+        for info in self.infos:
+            local = _LOCAL_HEADER.unpack_from(self.data, info.header_offset)
+            if local[0] != _SIG_LOCAL:
+                raise ValueError(f"en-tête local invalide pour {info.filename!r}")
+            start = info.header_offset + _LOCAL_HEADER.size + local[-2] + local[-1]
+            payload = view[start:start + info.compress_size]
+            if len(payload) != info.compress_size:
+                raise ValueError(f"membre tronqué : {info.filename!r}")
+            self._members[info.filename] = (
+                *_headers(info, info.compress_type, info.CRC, info.compress_size, info.file_size,
+                          info.extract_version),
+                payload,
+            )
+
+    def namelist(self) -> List[str]:
+        return [i.filename for i in self.infos]
+
+    def read(self, name: str) -> bytes:
+        with ZipFile(io.BytesIO(self.data), "r") as zf:
+            return zf.read(name)
+
+    def patch(self, edits: Dict[str, Optional[bytes]]) -> bytes:
+        """Même contrat que `patch_zip`."""
+        if self.full_rewrite:
+            with ZipFile(io.BytesIO(self.data), "r") as zf:
+                return _rewrite_full(zf, edits)
+
+        chunks: List[Any] = []
+        central: List[bytes] = []
+        offset = 0
+
+        def emit(local: bytes, central_prefix: bytes, name: bytes, payload) -> None:
+            nonlocal offset
+            chunks.append(local)
+            chunks.append(payload)
+            central.append(central_prefix + struct.pack("<L", offset) + name)
+            offset += len(local) + len(payload)
+
+        for info in self.infos:
+            if info.filename not in edits:
+                emit(*self._members[info.filename])
+            elif edits[info.filename] is not None:
+                emit(*_compressed_member(info, edits[info.filename], self.compresslevel))
+
+        now = datetime.now().timetuple()[:6]
+        for name, data in edits.items():
+            if data is not None and name not in self._members:
+                info = ZipInfo(name, date_time=now)
+                info.external_attr = 0o600 << 16
+                emit(*_compressed_member(info, data, self.compresslevel))
+
+        if offset >= _ZIP32_LIMIT or len(central) >= 0xFFFF:
+            raise ValueError("archive trop volumineuse pour un zip non-zip64")
+        cd_size = sum(len(c) for c in central)
+        chunks.extend(central)
+        chunks.append(_END_OF_CENTRAL.pack(_SIG_END, 0, 0, len(central), len(central), cd_size, offset, 0))
+        return b"".join(chunks)
+
+
+def patch_zip(source: Source, edits: Dict[str, Optional[bytes]], compresslevel: int = 6) -> bytes:
+    """
+    Renvoie une copie de l'archive `source` où :
+      - edits[name] = bytes : le membre est remplacé (recompressé, DEFLATE) ;
+      - edits[name] = None  : le membre est supprimé ;
+      - tout autre membre est recopié brut, dans l'ordre d'origine.
+    Un nom absent de l'archive est ajouté en fin d'archive.
+    """
+    return ZipSkeleton(source, compresslevel).patch(edits)
+
+
+def _headers(info: ZipInfo, method: int, crc: int, compress_size: int, file_size: int,
+             extract_version: int) -> tuple:
+    """(en-tête local, en-tête central privé de son offset final, nom encodé).
+
+    `info` n'est que lu : les ZipInfo d'un squelette sont partagés entre patchs."""
+    name, flags = _encoded_name(info)
+    # tailles connues d'avance : pas de data descriptor ni de champ extra
+    flags &= ~_FLAG_DATA_DESCRIPTOR
+    dos_time, dos_date = _dos_datetime(info.date_time)
+    local = _LOCAL_HEADER.pack(
+        _SIG_LOCAL, extract_version, flags, method, dos_time, dos_date,
+        crc, compress_size, file_size, len(name), 0,
+    ) + name
+    central_prefix = _CENTRAL_HEADER.pack(
+        _SIG_CENTRAL, (info.create_system << 8) | info.create_version, extract_version,
+        flags, method, dos_time, dos_date, crc, compress_size, file_size,
+        len(name), 0, 0, 0, info.internal_attr, info.external_attr, 0,
+    )[:-4]
+    return local, central_prefix, name
+
+
+def _compressed_member(info: ZipInfo, data: bytes, compresslevel: int) -> tuple:
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    payload = compressor.compress(data) + compressor.flush()
+    # deflate : version 2.0 minimale pour l'extraction
+    headers = _headers(info, ZIP_DEFLATED, zlib.crc32(data), len(payload), len(data),
+                       max(info.extract_version, 20))
+    return (*headers, payload)
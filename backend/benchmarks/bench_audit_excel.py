@@ -0,0 +1,95 @@
+"""
+Benchmark - write_audit_to_excel : patch zip contre l'ancien chemin openpyxl
+(load_workbook + wb.save), sur le modèle AMUREBA réel.
+
+Chaque variante tourne dans un processus neuf (spawn) pour mesurer son pic RSS
+propre ; le RSS après simple import de l'application est donné comme référence.
+Chronométrage et pic RSS : helpers de benchmarks/suite.py.
+
+  cd backend
+  DATABASE_URL=sqlite:///:memory: python -m benchmarks.bench_audit_excel [--repeat 5]
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import warnings
+from pathlib import Path
+from shutil import copyfile
+from typing import Any, Dict
+
+AUDIT = {"year2023": {
+    "utility_headers": {"util1_name": "Vapeur", "util1_unit": "t", "util2_name": "Froid", "util2_unit": "MWh"},
+    "operational": [{"name": "Atelier", "electricity": 120000, "gas": 80000, "process": 300},
+                    {"name": "Four", "fuel": 2500, "biogas": 1000}],
+    "buildings": [{"name": "Bureaux", "electricity": 45000, "gas": 30000}],
+    "transport": [{"name": "Flotte", "fuel": 8000}],
+    "utility": [{"name": "Chaudière", "gas": 50000}, {"name": "Groupe froid", "electricity": 20000}],
+    "influence_factors": [{"description": f"Facteur {i}", "value": 10 + i, "unit": "t"} for i in range(6)],
+    "invoice_meter": {"electricity": 190000, "gas": 165000, "fuel": 10500, "biogas": 1000, "process": 300},
+}}
+
+
+def _write_audit_openpyxl(excel_path: Path, audit_data: Dict[str, Any]) -> None:
+    """Ancienne implémentation (load_workbook + wb.save), référence du benchmark."""
+    from openpyxl import load_workbook
+    from app import heavy, main
+
+    def _set_cell(ws, addr, value, numeric=False):
+        if numeric:
+            n = heavy.to_number(value)
+            ws[addr].value = n
+            if n is not None:
+                ws[addr].number_format = "0.00"
+        else:
+            ws[addr].value = value if value is not None else ""
+
+    copyfile(main.TEMPLATE_FILE, excel_path)
+    wb = load_workbook(excel_path, keep_links=False)
+    ws = main._get_sheet(wb)
+    for addr, value in main._build_audit_sheet_changes(audit_data)[main.SHEET_NAME].items():
+        _set_cell(ws, addr, value, numeric=not isinstance(value, str))
+    wb.calculation.calcMode = "auto"
+    wb.calculation.fullCalcOnLoad = True
+    wb.save(excel_path)
+
+
+def _write_audit_zip(excel_path: Path, audit_data: Dict[str, Any]) -> None:
+    from app import heavy, main
+    main.write_audit_to_excel(None, audit_data, excel_path=excel_path)
+
+
+def _run(variant: str, repeat: int, results) -> None:
+    from app import main  # noqa: F401  (référence « import » : RSS de l'application chargée)
+    from .suite import measure, peak_rss_mib
+    warnings.simplefilter("ignore")   # openpyxl : extensions de validation non supportées
+    baseline = peak_rss_mib()
+    fn = {"openpyxl": _write_audit_openpyxl, "zip-patch": _write_audit_zip, "import": None}[variant]
+    elapsed_ms = 0.0
+    if fn is not None:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "audit.xlsx"
+            elapsed_ms = measure(lambda: fn(out, AUDIT), repeat)["median_ms"]
+    results.put((variant, elapsed_ms, baseline, peak_rss_mib()))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    for variant in ("import", "openpyxl", "zip-patch"):
+        p = ctx.Process(target=_run, args=(variant, args.repeat, results))
+        p.start()
+        variant, elapsed_ms, baseline, peak = results.get()
+        p.join()
+        if variant == "import":
+            print(f"{'import':>10} :                 pic RSS {peak:7.1f} Mio")
+        else:
+            print(f"{variant:>10} : {elapsed_ms:8.1f} ms   pic RSS {peak:7.1f} Mio (+{peak - baseline:.1f} Mio)")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,77 @@
+"""
+Benchmark - _generate_report_docx_bytes : rendu en mémoire sur modèle pré-traité
+contre l'ancien chemin (DocxTemplate depuis le disque, sauvegarde dans REPORT_DIR,
+réouverture python-docx pour les sections supplémentaires, relecture du fichier).
+Chronométrage : benchmarks/suite.measure.
+
+  cd backend
+  DATABASE_URL=sqlite:///:memory: python -m benchmarks.bench_report_docx [--repeat 10]
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+REPORT = SimpleNamespace(
+    audit_type="Audit GLOBAL", theme="Audit énergétique global", provider_name="Heat Sight",
+    auditor_name="A. Auditeur", competences="Audit global (AG)",
+    extra_sections={
+        "description_batiment": {"batiment_usage": "Bureaux", "batiment_surface": "1 200 m²",
+                                 "batiment_description": "Bâtiment des années 1970, façade rideau."},
+        "plan_amelioration": {"actions_nb": "6", "actions_synthese": "Isolation, PV et relighting."},
+    },
+)
+PROJECT = SimpleNamespace(id="bench", audit_type="Audit GLOBAL")
+
+
+def _generate_on_disk(report_dir: Path, project, report) -> bytes:
+    """Ancienne implémentation (aller-retour disque), référence du benchmark."""
+    from docx import Document
+    from docxtpl import DocxTemplate
+    from app import heavy, main
+
+    audit_type = (report.audit_type or project.audit_type or "").strip()
+    extra = report.extra_sections or {}
+    context = {
+        "audit_type": audit_type, "audit_theme": report.theme, "provider_company": report.provider_name,
+        "auditor_name": report.auditor_name, "amureba_skills": report.competences,
+        "audit_global_box": "☑" if audit_type.lower() == "audit global" else "☐",
+        "audit_partiel_box": "☑" if audit_type.lower() == "audit partiel" else "☐",
+        **extra.get("description_batiment", {}), **extra.get("synthese_energetique", {}),
+        **extra.get("plan_amelioration", {}),
+    }
+    out_path = report_dir / f"{project.id}_report.docx"
+    doc = DocxTemplate(str(main.REPORT_TEMPLATE_FILE))
+    doc.render(context)
+    doc.save(str(out_path))
+    d2 = Document(str(out_path))
+    for sec_id, sec_label, fields in heavy._EXTRA_SECTIONS_META:
+        sec_data = extra.get(sec_id, {})
+        non_empty = [(fl, sec_data[fk]) for fk, fl in fields if sec_data.get(fk)]
+        if non_empty:
+            d2.add_heading(sec_label, level=1)
+            for fl, val in non_empty:
+                p = d2.add_paragraph()
+                p.add_run(f"{fl} : ").bold = True
+                p.add_run(val)
+    d2.save(str(out_path))
+    return out_path.read_bytes()
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    from app import main
+    from .suite import measure
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = measure(lambda: _generate_on_disk(Path(tmp), PROJECT, REPORT), args.repeat)
+    memory = measure(lambda: main._generate_report_docx_bytes(PROJECT, REPORT), args.repeat)
+    for label, r in (("disque", disk), ("mémoire", memory)):
+        print(f"{label:>9} : {r['median_ms']:8.1f} ms   pic mémoire {r['peak_mib']:6.1f} Mio")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,147 @@
+"""
+Benchmark - patch_sheet_xml (patch streaming) contre l'ancienne implémentation ElementTree.
+
+Feuille synthétique de la taille des onglets '2023' / AA (plusieurs dizaines de
+milliers de cellules), ~150 cellules ciblées comme un pré-remplissage AMUREBA.
+Mesure le temps médian et le pic mémoire (tracemalloc, via benchmarks/suite.measure)
+et vérifie que les deux implémentations écrivent les mêmes valeurs.
+
+  cd backend
+  DATABASE_URL=sqlite:///:memory: python -m benchmarks.bench_sheet_patch [--rows 20000] [--repeat 3]
+"""
+
+import argparse
+import re
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Optional
+
+from app.xlsx_patch import _NS_MAIN, _cell_col_num, patch_sheet_xml
+
+from .suite import measure
+
+
+def _patch_sheet_xml_etree(xml_bytes: bytes, changes: Dict[str, Any]) -> bytes:
+    """Implémentation ElementTree d'origine (référence du benchmark, logs retirés)."""
+    root = ET.fromstring(xml_bytes)
+    NS = _NS_MAIN
+    sheet_data = root.find(f"{{{NS}}}sheetData")
+    if sheet_data is None:
+        return xml_bytes
+    row_map: Dict[int, ET.Element] = {}
+    for row_el in sheet_data:
+        try:
+            row_map[int(row_el.get("r", 0))] = row_el
+        except (ValueError, TypeError):
+            pass
+    for cell_ref, value in changes.items():
+        m = re.match(r'([A-Z]+)(\d+)', str(cell_ref).upper())
+        if not m:
+            continue
+        row_num = int(m.group(2))
+        if row_num not in row_map:
+            row_el = ET.SubElement(sheet_data, f"{{{NS}}}row")
+            row_el.set("r", str(row_num))
+            row_map[row_num] = row_el
+        else:
+            row_el = row_map[row_num]
+        cell_el: Optional[ET.Element] = None
+        for c in row_el:
+            if c.get("r") == cell_ref:
+                cell_el = c
+                break
+        if cell_el is None:
+            cell_el = ET.SubElement(row_el, f"{{{NS}}}c")
+            cell_el.set("r", cell_ref)
+        for child in list(cell_el):
+            cell_el.remove(child)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cell_el.attrib.pop("t", None)
+            ET.SubElement(cell_el, f"{{{NS}}}v").text = str(value)
+        elif value is not None and str(value).strip():
+            cell_el.set("t", "inlineStr")
+            is_el = ET.SubElement(cell_el, f"{{{NS}}}is")
+            ET.SubElement(is_el, f"{{{NS}}}t").text = str(value)
+        else:
+            cell_el.attrib.pop("t", None)
+    sorted_rows = sorted(list(sheet_data), key=lambda e: int(e.get("r") or 0))
+    for child in list(sheet_data):
+        sheet_data.remove(child)
+    for row_el in sorted_rows:
+        cells = sorted(list(row_el), key=lambda e: _cell_col_num(e.get("r") or "A0"))
+        for child in list(row_el):
+            row_el.remove(child)
+        for cell in cells:
+            row_el.append(cell)
+        sheet_data.append(row_el)
+    new_sd_bytes = ET.tostring(sheet_data, encoding="unicode").encode("utf-8")
+    sd_start = xml_bytes.find(b"<sheetData")
+    tag_close = xml_bytes.find(b">", sd_start)
+    sd_end = xml_bytes.find(b"</sheetData>", tag_close) + len(b"</sheetData>")
+    return xml_bytes[:sd_start] + new_sd_bytes + xml_bytes[sd_end:]
+
+
+def _col(n: int) -> str:
+    s = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def build_sheet(rows: int, cols: int = 24) -> bytes:
+    parts = [
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{_NS_MAIN}">'
+        '<dimension ref="A1"/><sheetData>'
+    ]
+    for r in range(1, rows + 1):
+        cells = "".join(
+            f'<c r="{_col(c)}{r}" s="{c % 7}"><f>{_col(c)}{r - 1}*1.05</f><v>{r * c}</v></c>'
+            if c % 5 == 0 else f'<c r="{_col(c)}{r}" s="{c % 7}"><v>{r * c}</v></c>'
+            for c in range(1, cols + 1)
+        )
+        parts.append(f'<row r="{r}" spans="1:{cols}">{cells}</row>')
+    parts.append('</sheetData><pageMargins left="0.7" right="0.7" top="0.75" bottom="0.75" header="0.3" footer="0.3"/></worksheet>')
+    return "".join(parts).encode()
+
+
+def build_changes(rows: int) -> Dict[str, Any]:
+    changes: Dict[str, Any] = {}
+    for i in range(50):
+        r = 4 + i * max(rows // 60, 1)
+        changes[f"B{r}"] = f"Action {i}"
+        changes[f"E{r}"] = 1000.0 + i
+        changes[f"AB{r}"] = i   # colonne hors plage existante → insertion
+    return changes
+
+
+def _values(xml: bytes, refs) -> Dict[str, Optional[str]]:
+    root = ET.fromstring(xml)
+    found = {}
+    for c in root.iter(f"{{{_NS_MAIN}}}c"):
+        if c.get("r") in refs:
+            found[c.get("r")] = "".join(c.itertext())
+    return found
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    xml = build_sheet(args.rows)
+    changes = build_changes(args.rows)
+    print(f"feuille : {len(xml) / 1e6:.1f} Mo, {args.rows} lignes, {len(changes)} cellules ciblées")
+
+    results = {}
+    for name, fn in (("etree", _patch_sheet_xml_etree), ("streaming", patch_sheet_xml)):
+        r = measure(lambda: fn(xml, changes), args.repeat)
+        results[name] = fn(xml, changes)
+        print(f"{name:>10} : {r['median_ms']:8.1f} ms   pic mémoire {r['peak_mib']:7.1f} Mio")
+
+    assert _values(results["etree"], changes) == _values(results["streaming"], changes)
+    print("valeurs identiques")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,339 @@
+"""
+Suite de benchmarks des chemins critiques du backend, sur fixtures générées (aucun réseau).
+
+Pour chaque cas : préparation hors mesure, une exécution de chauffe, `--repeat`
+exécutions chronométrées, puis une exécution sous tracemalloc pour le pic mémoire
+Python. Les résultats sont comparés à benchmarks/baseline.json ; une régression
+au-delà de la tolérance fait échouer la commande (code 1).
+
+Les temps dépendent de la machine et de sa charge du moment : chaque exécution
+chronométrée est précédée d'une boucle Python fixe (calibration) et c'est la médiane
+des rapports cas / calibration, mesurés côte à côte dans le même processus, qui est
+comparée à la baseline. Une dérive de fréquence ou un voisin bruyant touche les deux
+mesures de la paire et s'annule. Après une optimisation, `--update-baseline` et
+commit du fichier.
+
+Les scripts bench_*.py (comparaisons avant / après d'une optimisation) réutilisent
+`measure` et `peak_rss_mib`.
+
+  cd backend
+  DATABASE_URL=sqlite:///:memory: python -m benchmarks.suite                 # compare à la baseline
+  DATABASE_URL=sqlite:///:memory: python -m benchmarks.suite -k xlsx --repeat 10
+  DATABASE_URL=sqlite:///:memory: python -m benchmarks.suite --update-baseline
+"""
+
+import os
+
+os.environ.setdefault("WORK_POOL_SIZE", "0")   # rendu docx mesuré en ligne, sans aller-retour worker
+os.environ.setdefault("LOG_LEVEL", "ERROR")     # feuilles graphiques du modèle ignorées par le mapper (WARNING)
+
+import argparse
+import gc
+import io
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+BASELINE_FILE = Path(__file__).with_name("baseline.json")
+
+warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
+
+
+class Case(NamedTuple):
+    name: str
+    description: str
+    setup: Callable[[], Callable[[], object]]
+
+
+CASES: List[Case] = []
+
+
+def case(name: str, description: str):
+    """Enregistre un cas : la fonction décorée prépare les fixtures et renvoie l'appel mesuré."""
+    def register(setup):
+        CASES.append(Case(name, description, setup))
+        return setup
+    return register
+
+
+# ── Fixtures ─────────────────────────────────────────────────────────────────
+
+ACTIONS = [{
+    "intitule": f"Action {i} : remplacement de l'éclairage par LED, zone {i}",
+    "type_amelioration": "Electricité", "classification": "A" if i % 2 else "B",
+    "situation_existante": "Tubes fluorescents T8, ballasts ferromagnétiques. " * 3,
+    "description": "Relighting complet avec détection de présence et gradation. " * 3,
+    "investissement_k_eur": 12.5 * i, "economie_energie_mwh_an": 4.2 * i,
+    "economie_co2_kg_an": 850 * i, "duree_amortissement": 3 + i,
+    "conditions_prealables": "Étude d'éclairement; accord du propriétaire; budget validé",
+} for i in range(1, 10)]
+
+
+def _prefill_changes():
+    from app import main
+    return main._build_prefill_sheet_changes("Entité benchmark", ACTIONS, {})
+
+
+def _lcia_workbook(sheets: int = 4, rows: int = 400) -> bytes:
+    """Classeur LCIA-results : préambule, en-tête EF v3.0 / EN 15804+A2, lignes de résultats."""
+    from openpyxl import Workbook
+    from app.heavy import EF_COLUMN_PATTERNS
+
+    headers = ["Process", "Unit"] + [f"{pattern.title()}) [unit]" if "ef v3.0" in pattern
+                                     else f"EN15804+A2 {pattern.capitalize()} [unit]"
+                                     for pattern, _ in EF_COLUMN_PATTERNS]
+    wb = Workbook()
+    wb.remove(wb.active)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"LCIA {s}")
+        ws.append(["LCIA results", "generated"])
+        ws.append([])
+        ws.append(headers)
+        for r in range(rows):
+            ws.append([f"process {r}", "kg"] + [(r + 1) * (c + 1) * 1e-3 for c in range(len(headers) - 2)])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _row(table, **values):
+    """Ligne minimale : colonnes obligatoires sans défaut remplies d'une valeur neutre."""
+    from sqlalchemy import Boolean, Float, Integer, JSON
+    neutral = {Integer: 0, Float: 0.0, Boolean: False, JSON: {}}
+    row = {c.name: neutral.get(type(c.type), f"{c.name}") for c in table.columns
+           if not c.nullable and c.default is None and c.server_default is None}
+    row.update(values)
+    return row
+
+
+def _lca_batiment(materials, parois_count: int = 3):
+    by_category = {}
+    for m in materials:
+        by_category.setdefault(m["category"], []).append(m)
+
+    def composant(m, comp_id, **extra):
+        return {"id": comp_id, "material_id": m["id"], "material_name": m["name"],
+                "category": "Isolant" if m["category"] == "isolant" else m["category"].capitalize(),
+                "impacts": m["impacts"], "prix_unit": m["prix"], "dvr_materiau": m["dvr_materiau"],
+                "flux_reference": m["flux_reference"], "poids_unite": m["poids_unite"],
+                "lambda_lib": m["valeur_r"], "efficacite": 100, "r_local": "", **extra}
+
+    isolants = by_category["isolant"]
+    structure = next(m for cat, ms in by_category.items() if cat != "isolant" for m in ms)
+    parois = [{
+        "id": f"p-{i}", "nom": f"Paroi {i}", "type": kind, "surface_totale": str(60 + 20 * i),
+        "composantsOpaques": [composant(structure, f"co-s{i}"),
+                              composant(isolants[i % len(isolants)], f"co-i{i}", r_cible="2.5")],
+        "baiesVitrees": [],
+    } for i, kind in enumerate(("mur", "toiture", "plancher") * (parois_count // 3))]
+    return {"id": "bat-bench", "nom": "Bâtiment benchmark", "type_batiment": "renovation",
+            "moyen_chauffage": "gaz", "degres_jours": 2100, "dvr_batiment": 60, "parois": parois}
+
+
+# ── Cas ──────────────────────────────────────────────────────────────────────
+
+@case("xlsx_apply_changes_cold", "_apply_changes_to_source : modèle AMUREBA depuis le disque, 9 fiches AA")
+def _xlsx_cold():
+    from app import main
+    changes = _prefill_changes()
+    return lambda: main._apply_changes_to_source(main.TEMPLATE_FILE, changes)
+
+
+@case("xlsx_apply_changes_warm", "_apply_changes_to_source : squelette du modèle en cache, 9 fiches AA")
+def _xlsx_warm():
+    from app import main
+    from app.xlsx_patch import WorkbookSkeleton
+    changes = _prefill_changes()
+    skeleton = WorkbookSkeleton(main.TEMPLATE_FILE)
+    return lambda: main._apply_changes_to_source(skeleton, changes)
+
+
+@case("patch_sheet_xml_large", "patch_sheet_xml : feuille synthétique de 20 000 lignes × 24 colonnes")
+def _sheet_patch():
+    from app.xlsx_patch import patch_sheet_xml
+    from .bench_sheet_patch import build_changes, build_sheet
+    xml, changes = build_sheet(20000), build_changes(20000)
+    return lambda: patch_sheet_xml(xml, changes)
+
+
+@case("amureba_map_workbook", "AmurebaMappingService.map_workbook : modèle pré-rempli (AA1-AA9)")
+def _map_workbook():
+    from openpyxl import load_workbook
+    from app import main
+    from app.amureba_mapper import AmurebaMappingService
+    content = main._apply_changes_to_source(main.TEMPLATE_FILE, _prefill_changes())
+    wb = load_workbook(io.BytesIO(content), data_only=True, keep_links=False)
+    return lambda: AmurebaMappingService().map_workbook(wb)
+
+
+@case("parse_lcia_xlsx", "parse_lcia_xlsx : 4 feuilles × 400 lignes, en-tête en ligne 3")
+def _lcia():
+    from app import heavy
+    content = _lcia_workbook()
+    return lambda: heavy.parse_lcia_xlsx(content)
+
+
+@case("report_docx", "_generate_report_docx_bytes : rendu en mémoire, sections supplémentaires")
+def _report():
+    from app import main
+    from .bench_report_docx import PROJECT, REPORT
+    return lambda: main._generate_report_docx_bytes(PROJECT, REPORT)
+
+
+@case("build_ics_5000_events", "_build_ics_for_user : 5 000 événements sur 50 projets (SQLite mémoire)")
+def _ics():
+    from sqlalchemy import JSON, create_engine
+    from sqlalchemy.dialects.postgresql import JSONB
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+    from app import main, models
+
+    for table in models.Base.metadata.tables.values():   # JSONB → JSON (SQLite), cf. tests/conftest.py
+        for column in table.columns:
+            if isinstance(column.type, JSONB):
+                column.type = JSON()
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    t = models.Base.metadata.tables
+    with engine.begin() as conn:
+        conn.execute(t["users"].insert(), [_row(t["users"], id="u-bench")])
+        conn.execute(t["projects"].insert(), [
+            _row(t["projects"], id=f"p-{i}", project_name=f"Projet {i}", owner_id="u-bench") for i in range(50)
+        ])
+        conn.execute(t["events"].insert(), [_row(
+            t["events"], id=f"e-{i}", owner_id="u-bench", title=f"Visite technique, bâtiment {i % 37}",
+            start=f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}T{8 + i % 9:02d}:30", duration_min=30 + i % 4 * 30,
+            location="Rue de la Loi 16, 1000 Bruxelles" if i % 3 else None,
+            project_id=f"p-{i % 50}" if i % 4 else None, notes="notes privées",
+        ) for i in range(5000)])
+    user = models.User(id="u-bench")
+
+    def run():
+        with Session(engine) as db:
+            return main._build_ics_for_user(db, user)
+    return run
+
+
+@case("lca_optimise", "lca_engine.optimise_batiment : 6 parois, bibliothèque de référence")
+def _lca():
+    from app import lca_engine
+    from app.lca_reference_data import LCA_REFERENCE_MATERIALS
+    materials = sorted((dict(m) for m in LCA_REFERENCE_MATERIALS), key=lambda m: (m["category"], m["name"]))
+    bat = _lca_batiment(materials, parois_count=6)
+    return lambda: lca_engine.optimise_batiment(bat, materials)
+
+
+# ── Mesure ───────────────────────────────────────────────────────────────────
+
+def _calibration_loop() -> int:
+    """Boucle Python fixe (~30 ms) : unité de vitesse de la machine à l'instant de la mesure."""
+    total = 0
+    for i in range(300_000):
+        total += i * i % 7
+    return total
+
+
+def _timed_ms(fn: Callable[[], object]) -> float:
+    gc.collect()
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def peak_rss_mib() -> float:
+    """Pic RSS du processus (ru_maxrss : Ko sous Linux, octets sous macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Chauffe, puis `repeat` paires (calibration, cas) chronométrées côte à côte ; la
+    médiane des rapports est la mesure comparée. Pic tracemalloc sur une exécution à part.
+    """
+    fn()   # chauffe : imports paresseux, caches de modèles
+    _calibration_loop()
+    times, calibrations, ratios = [], [], []
+    for _ in range(repeat):
+        calibration = _timed_ms(_calibration_loop)
+        elapsed = _timed_ms(fn)
+        times.append(elapsed)
+        calibrations.append(calibration)
+        ratios.append(elapsed / calibration)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"median_ms": round(statistics.median(times), 2), "min_ms": round(min(times), 2),
+            "calibration_ms": round(statistics.median(calibrations), 2),
+            "ratio": round(statistics.median(ratios), 3), "peak_mib": round(peak / 2**20, 2)}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict,
+            tolerance: float, mem_tolerance: float) -> List[str]:
+    """Régressions (messages) par rapport à la baseline : rapports cas / calibration."""
+    regressions = []
+    for name, r in results.items():
+        ref = baseline["cases"].get(name)
+        if ref is None:
+            continue
+        if r["ratio"] > ref["ratio"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {r['ratio']:.2f} > {ref['ratio']:.2f} unités de calibration (+{tolerance:.0%}), "
+                f"soit {r['median_ms']:.1f} ms pour {ref['ratio'] * r['calibration_ms']:.1f} ms attendus"
+            )
+        if r["peak_mib"] > ref["peak_mib"] * (1 + mem_tolerance) + 1:
+            regressions.append(f"{name}: pic {r['peak_mib']:.1f} Mio > {ref['peak_mib']:.1f} Mio (+{mem_tolerance:.0%})")
+    return regressions
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques du backend.")
+    parser.add_argument("-k", dest="pattern", default="", help="ne lance que les cas dont le nom contient ce texte")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="enregistre les résultats comme baseline")
+    parser.add_argument("--tolerance", type=float, default=0.30, help="écart de temps toléré (0.30 = +30 %%)")
+    parser.add_argument("--mem-tolerance", type=float, default=0.20, help="écart de pic mémoire toléré")
+    args = parser.parse_args()
+
+    selected = [c for c in CASES if args.pattern in c.name]
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    if baseline is None:
+        print("aucune baseline")
+
+    results: Dict[str, Dict[str, float]] = {}
+    for c in selected:
+        r = results[c.name] = measure(c.setup(), args.repeat)
+        ref = (baseline or {}).get("cases", {}).get(c.name)
+        delta = f"  {r['ratio'] / ref['ratio'] - 1:+6.1%} vs baseline" if ref else ""
+        print(f"{c.name:<26} {r['median_ms']:9.1f} ms  ({r['ratio']:6.2f} × calib. {r['calibration_ms']:.1f} ms)"
+              f"   pic {r['peak_mib']:7.1f} Mio{delta}")
+
+    if args.update_baseline:
+        cases = {**(baseline or {}).get("cases", {}), **results} if args.pattern else results
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(), "machine": platform.machine(),
+            "cases": dict(sorted(cases.items())),
+        }, indent=2, ensure_ascii=False) + "\n")
+        print(f"baseline enregistrée : {args.baseline}")
+        return 0
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance, args.mem_tolerance)
+    for line in regressions:
+        print(f"RÉGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
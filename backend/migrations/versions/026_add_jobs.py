@@ -0,0 +1,45 @@
+"""add jobs table (background document analysis)
+
+Revision ID: 026_add_jobs
+Revises: 025_drop_lca_v1_legacy_columns
+Create Date: 2026-10-18
+
+- table jobs : tâches de fond persistées (analyze-all), progression par document
+  dans items (JSONB), suivies via GET /jobs/{id}
+- index sur status (reprise des jobs en file au démarrage)
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision: str = "026_add_jobs"
+down_revision: Union[str, None] = "025_drop_lca_v1_legacy_columns"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("project_id", sa.String(), sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("owner_id", sa.String(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="queued"),
+        sa.Column("items", JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.String(), nullable=False),
+        sa.Column("started_at", sa.String(), nullable=True),
+        sa.Column("updated_at", sa.String(), nullable=True),
+        sa.Column("finished_at", sa.String(), nullable=True),
+    )
+    op.create_index("ix_jobs_status", "jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_status", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,34 @@
+"""add extraction_cache table (Claude extraction results by content)
+
+Revision ID: 027_add_extraction_cache
+Revises: 026_add_jobs
+Create Date: 2026-10-18
+
+- table extraction_cache : clé primaire composite (file_hash, prompt_hash, model),
+  partagée entre projets ; un changement de prompt ou de modèle invalide le cache
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision: str = "027_add_extraction_cache"
+down_revision: Union[str, None] = "026_add_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "extraction_cache",
+        sa.Column("file_hash", sa.String(), primary_key=True),
+        sa.Column("prompt_hash", sa.String(), primary_key=True),
+        sa.Column("model", sa.String(), primary_key=True),
+        sa.Column("extracted_data", JSONB(), nullable=False),
+        sa.Column("created_at", sa.String(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("extraction_cache")
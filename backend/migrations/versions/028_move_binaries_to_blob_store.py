@@ -0,0 +1,55 @@
+"""move document binaries from bytea to the blob store
+
+Revision ID: 028_move_binaries_to_blob_store
+Revises: 027_add_extraction_cache
+Create Date: 2026-10-18
+
+- colonnes de clé blob (SHA-256) : projects.prefilled_excel_hash / report_docx_hash,
+  report_history.file_hash, plan_amelioration_history.file_hash, templates.file_hash,
+  project_documents.file_size (project_documents.file_hash existe déjà)
+- project_documents.file_data devient nullable
+- copie des bytea existants dans le blob store, par lots, seulement si un store
+  durable est configuré (BLOB_STORE=s3, ou BLOB_DIR persistant explicite) ; sinon
+  copie différée (`python -m app.migrate_blobs copy`). Les bytea sont conservés :
+  leur remise à NULL est une étape manuelle et vérifiée (`python -m app.migrate_blobs
+  clear`), jamais exécutée au déploiement.
+- downgrade : les blobs dont le bytea a été vidé sont rapatriés avant la suppression
+  des colonnes de clé (échoue si un blob manque au store)
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "028_move_binaries_to_blob_store"
+down_revision: Union[str, None] = "027_add_extraction_cache"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("projects", sa.Column("prefilled_excel_hash", sa.String(), nullable=True))
+    op.add_column("projects", sa.Column("report_docx_hash", sa.String(), nullable=True))
+    op.add_column("report_history", sa.Column("file_hash", sa.String(), nullable=True))
+    op.add_column("plan_amelioration_history", sa.Column("file_hash", sa.String(), nullable=True))
+    op.add_column("templates", sa.Column("file_hash", sa.String(), nullable=True))
+    op.add_column("project_documents", sa.Column("file_size", sa.Integer(), nullable=True))
+    op.alter_column("project_documents", "file_data", existing_type=sa.LargeBinary(), nullable=True)
+
+    from app.migrate_blobs import copy_to_store, durable_store_configured
+    if durable_store_configured():
+        copy_to_store(op.get_bind())
+    else:
+        print("[028] store local par défaut (éphémère) : copie des fichiers différée, "
+              "lancer `python -m app.migrate_blobs copy` une fois BLOB_STORE/BLOB_DIR configurés", flush=True)
+
+
+def downgrade() -> None:
+    from app.migrate_blobs import restore_legacy
+    restore_legacy(op.get_bind())
+    op.drop_column("project_documents", "file_size")
+    op.drop_column("templates", "file_hash")
+    op.drop_column("plan_amelioration_history", "file_hash")
+    op.drop_column("report_history", "file_hash")
+    op.drop_column("projects", "report_docx_hash")
+    op.drop_column("projects", "prefilled_excel_hash")
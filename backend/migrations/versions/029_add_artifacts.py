@@ -0,0 +1,34 @@
+"""add artifacts table (generated files addressed by input hash)
+
+Revision ID: 029_add_artifacts
+Revises: 028_move_binaries_to_blob_store
+Create Date: 2026-10-18
+
+- table artifacts : input_hash (empreinte des entrées du générateur) → blob_hash ;
+  rapport .docx et classeur AMUREBA resservis sans régénération tant que les
+  données et le modèle sont inchangés
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "029_add_artifacts"
+down_revision: Union[str, None] = "028_move_binaries_to_blob_store"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "artifacts",
+        sa.Column("input_hash", sa.String(), primary_key=True),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("blob_hash", sa.String(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.String(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("artifacts")
@@ -0,0 +1,29 @@
+"""add project_documents.pdf_text / pdf_text_status (persisted native PDF text)
+
+Revision ID: 030_add_document_pdf_text
+Revises: 029_add_artifacts
+Create Date: 2026-10-18
+
+- pdf_text : texte natif extrait une seule fois par document (NULL = pas encore
+  extrait) ; ré-analyses et relances ne re-parsent plus le PDF
+- pdf_text_status : issue de l'extraction (ok, truncated, timeout, too_large, error)
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "030_add_document_pdf_text"
+down_revision: Union[str, None] = "029_add_artifacts"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("project_documents", sa.Column("pdf_text", sa.Text(), nullable=True))
+    op.add_column("project_documents", sa.Column("pdf_text_status", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("project_documents", "pdf_text_status")
+    op.drop_column("project_documents", "pdf_text")
@@ -0,0 +1,55 @@
+"""add indexes on hot foreign-key and lookup columns
+
+Revision ID: 031_add_lookup_indexes
+Revises: 030_add_document_pdf_text
+Create Date: 2026-10-18
+
+- projects(owner_id) : filtre de quasiment toutes les routes
+- project_documents(file_hash) WHERE status = 'analyzed' : réutilisation du texte
+  d'un fichier déjà analysé (_analyze_one) ; project_documents(project_id) existe
+  depuis 004 (créé ici s'il manque, bases initialisées hors Alembic)
+- events(owner_id, start) : agenda et flux .ics (filtre + tri), events(project_id)
+- improvement_actions, report_history, plan_amelioration_history :
+  (project_id, created_at), listes triées par date
+- users(calendar_token) : résolution du flux .ics public
+- lca_materials(category, name) : bibliothèque triée
+- energy_accounting(project_id) déjà couvert par uq_energy_project_year
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "031_add_lookup_indexes"
+down_revision: Union[str, None] = "030_add_document_pdf_text"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = [
+    ("ix_projects_owner_id", "projects", ["owner_id"]),
+    ("ix_projdoc_project_id", "project_documents", ["project_id"]),
+    ("ix_events_owner_id_start", "events", ["owner_id", "start"]),
+    ("ix_events_project_id", "events", ["project_id"]),
+    ("ix_improvement_actions_project_id", "improvement_actions", ["project_id", "created_at"]),
+    ("ix_report_history_project_id", "report_history", ["project_id", "created_at"]),
+    ("ix_plan_amelioration_history_project_id", "plan_amelioration_history", ["project_id", "created_at"]),
+    ("ix_users_calendar_token", "users", ["calendar_token"]),
+    ("ix_lca_materials_category_name", "lca_materials", ["category", "name"]),
+]
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS : certaines bases ont reçu ces index via le DDL de démarrage
+    for name, table, columns in _INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+    op.create_index(
+        "ix_projdoc_file_hash_analyzed", "project_documents", ["file_hash"],
+        postgresql_where=sa.text("status = 'analyzed'"), if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_projdoc_file_hash_analyzed", table_name="project_documents")
+    for name, table, _ in reversed(_INDEXES):
+        if name != "ix_projdoc_project_id":   # créé par 004
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,37 @@
+"""attach artifacts to a project for retention
+
+Revision ID: 032_add_artifact_project
+Revises: 031_add_lookup_indexes
+Create Date: 2026-10-18
+
+- artifacts.project_id : projet qui a généré l'artefact (NULL pour les lignes
+  antérieures) ; au-delà de ARTIFACT_KEEP_PER_PROJECT artefacts par (projet, type),
+  les plus anciens sont supprimés, leurs blobs sont ensuite repris par app.sweep_blobs
+- suppression en cascade avec le projet
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "032_add_artifact_project"
+down_revision: Union[str, None] = "031_add_lookup_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("artifacts", sa.Column("project_id", sa.String(), nullable=True))
+    op.create_foreign_key(
+        "fk_artifacts_project_id",
+        "artifacts", "projects",
+        ["project_id"], ["id"],
+        ondelete="CASCADE",
+    )
+    op.create_index("ix_artifacts_project_kind", "artifacts", ["project_id", "kind", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_artifacts_project_kind", table_name="artifacts")
+    op.drop_constraint("fk_artifacts_project_id", "artifacts", type_="foreignkey")
+    op.drop_column("artifacts", "project_id")
@@ -0,0 +1,319 @@
+"""
+Régénère tests/fixtures/indices_formula_eval.json : indices AMUREBA obtenus en évaluant
+les formules du classeur réel (write_audit_to_excel), référence des tests de app/indices.py.
+
+L'évaluateur ci-dessous (SUM, SUMPRODUCT, IF, IFERROR, CONCATENATE) est interne au projet :
+il reproduit les valeurs en cache du template, mais ce n'est PAS un recalcul LibreOffice.
+La parité LibreOffice se vérifie à part, sur une machine où soffice est installé :
+--check-soffice recalcule chaque cas avec LibreOffice (read_indices_from_excel) et le
+compare au fichier, sans le réécrire.
+
+Usage :
+    cd backend
+    python scripts/regen_indices_fixtures.py                  # réécrit le fichier
+    python scripts/regen_indices_fixtures.py --check-soffice  # code retour 1 si écart
+"""
+import argparse
+import io
+import json
+import operator
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from openpyxl import load_workbook
+from openpyxl.formula.tokenizer import Token, Tokenizer
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("DATABASE_URL", "sqlite://")   # app.main crée un engine à l'import
+
+from app import main  # noqa: E402
+
+FIXTURE = BACKEND_DIR / "tests" / "fixtures" / "indices_formula_eval.json"
+
+
+# ─── Évaluation des formules (sous-ensemble utilisé par la feuille '2023') ──────
+
+class XlError(str):
+    pass
+
+
+VALUE, DIV0 = XlError("#VALUE!"), XlError("#DIV/0!")
+
+
+def _num(v):
+    """Conversion arithmétique LibreOffice : vide → 0, texte non numérique (dont "") → #VALUE!."""
+    if isinstance(v, XlError):
+        raise _Raise(v)
+    if v is None:
+        return 0.0
+    if isinstance(v, bool):
+        return float(v)
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(str(v).replace(",", "."))
+    except ValueError:
+        raise _Raise(VALUE)
+
+
+class _Raise(Exception):
+    def __init__(self, err):
+        self.err = err
+
+
+def _div(a, b):
+    if b == 0:
+        raise _Raise(DIV0)
+    return a / b
+
+
+def _cmp(op):
+    def _f(a, b):
+        # cellule vide : "" face à du texte, 0 face à un nombre (mais 0 = "" est FAUX)
+        if a is None:
+            a = "" if isinstance(b, str) or b is None else 0.0
+        if b is None:
+            b = "" if isinstance(a, str) else 0.0
+        if isinstance(a, str) != isinstance(b, str):
+            return op(isinstance(a, str), isinstance(b, str))   # texte > nombre
+        return op(a, b)
+    return _f
+
+
+_BINARY = {
+    "+": lambda a, b: _num(a) + _num(b),
+    "-": lambda a, b: _num(a) - _num(b),
+    "*": lambda a, b: _num(a) * _num(b),
+    "/": lambda a, b: _div(_num(a), _num(b)),
+    "^": lambda a, b: _num(a) ** _num(b),
+    "&": lambda a, b: f"{'' if a is None else a}{'' if b is None else b}",
+    "=": _cmp(operator.eq), "<>": _cmp(operator.ne),
+    "<": _cmp(operator.lt), ">": _cmp(operator.gt),
+    "<=": _cmp(operator.le), ">=": _cmp(operator.ge),
+}
+_PRECEDENCE = {"=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1, "&": 2, "+": 3, "-": 3, "*": 4, "/": 4, "^": 5}
+
+
+def _flatten(values):
+    for v in values:
+        if isinstance(v, list):
+            yield from _flatten(v)
+        else:
+            yield v
+
+
+def _sum(*args):
+    total = 0.0
+    for arg in args:
+        for v in (_flatten(arg) if isinstance(arg, list) else [arg]):
+            if isinstance(v, XlError):
+                raise _Raise(v)
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                total += v                                   # texte et vides ignorés dans une plage
+            elif not isinstance(arg, list) and v is not None:
+                total += _num(v)
+    return total
+
+
+def _sumproduct(*arrays):
+    flat = [list(_flatten(a if isinstance(a, list) else [a])) for a in arrays]
+    if len({len(f) for f in flat}) != 1:
+        raise _Raise(VALUE)
+    total = 0.0
+    for values in zip(*flat):
+        product = 1.0
+        for v in values:
+            if isinstance(v, XlError):
+                raise _Raise(v)
+            product *= v if isinstance(v, (int, float)) and not isinstance(v, bool) else 0.0
+        total += product
+    return total
+
+
+class Evaluator:
+    def __init__(self, wb):
+        self.wb = wb
+        self.cache = {}
+
+    def cell(self, sheet: str, addr: str):
+        key = (sheet, addr)
+        if key not in self.cache:
+            self.cache[key] = None   # garde-fou contre les références circulaires
+            raw = self.wb[sheet][addr].value
+            self.cache[key] = self.formula(sheet, raw) if isinstance(raw, str) and raw.startswith("=") else raw
+        return self.cache[key]
+
+    def formula(self, sheet: str, text: str):
+        tokens = [t for t in Tokenizer(text).items if t.type != Token.WSPACE]
+        try:
+            value, pos = self._expr(sheet, tokens, 0, 0)
+        except _Raise as e:
+            return e.err
+        assert pos == len(tokens), text
+        return 0.0 if value is None else value   # =A1 sur une cellule vide affiche 0
+
+    # analyse descendante sur les jetons openpyxl
+    def _expr(self, sheet, tokens, pos, min_prec):
+        lhs, pos = self._unary(sheet, tokens, pos)
+        while pos < len(tokens) and tokens[pos].type == Token.OP_IN and _PRECEDENCE[tokens[pos].value] > min_prec:
+            op = tokens[pos].value
+            rhs, pos = self._expr(sheet, tokens, pos + 1, _PRECEDENCE[op])
+            lhs = _BINARY[op](lhs, rhs)
+        return lhs, pos
+
+    def _unary(self, sheet, tokens, pos):
+        tok = tokens[pos]
+        if tok.type == Token.OP_PRE:
+            value, pos = self._unary(sheet, tokens, pos + 1)
+            return (-_num(value) if tok.value == "-" else _num(value)), pos
+        value, pos = self._operand(sheet, tokens, pos)
+        while pos < len(tokens) and tokens[pos].type == Token.OP_POST:   # %
+            value, pos = _num(value) / 100, pos + 1
+        return value, pos
+
+    def _operand(self, sheet, tokens, pos):
+        tok = tokens[pos]
+        if tok.type == Token.OPERAND:
+            if tok.subtype == Token.NUMBER:
+                return float(tok.value), pos + 1
+            if tok.subtype == Token.TEXT:
+                return tok.value[1:-1].replace('""', '"'), pos + 1
+            if tok.subtype == Token.LOGICAL:
+                return tok.value.upper() == "TRUE", pos + 1
+            if tok.subtype == Token.ERROR:
+                raise _Raise(XlError(tok.value))
+            return self._range(sheet, tok.value), pos + 1
+        if tok.type == Token.PAREN and tok.subtype == Token.OPEN:
+            value, pos = self._expr(sheet, tokens, pos + 1, 0)
+            return value, pos + 1
+        if tok.type == Token.FUNC and tok.subtype == Token.OPEN:
+            return self._call(sheet, tok.value[:-1].upper(), tokens, pos + 1)
+        raise ValueError(f"jeton non géré : {tok.value!r}")
+
+    def _call(self, sheet, name, tokens, pos):
+        args = []
+        if tokens[pos].type == Token.FUNC and tokens[pos].subtype == Token.CLOSE:
+            return self._apply(name, args), pos + 1
+        while True:
+            try:
+                value, pos = self._expr(sheet, tokens, pos, 0)
+            except _Raise as e:
+                value, pos = e.err, self._skip_arg(tokens, pos)
+            args.append(value)
+            tok = tokens[pos]
+            pos += 1
+            if tok.type == Token.FUNC and tok.subtype == Token.CLOSE:
+                return self._apply(name, args), pos
+
+    @staticmethod
+    def _skip_arg(tokens, pos):
+        # argument en erreur : avance jusqu'au séparateur ou à la parenthèse fermante de même niveau
+        depth = 0
+        while True:
+            tok = tokens[pos]
+            if tok.subtype == Token.OPEN:
+                depth += 1
+            elif tok.subtype == Token.CLOSE:
+                if depth == 0:
+                    return pos
+                depth -= 1
+            elif tok.type == Token.SEP and tok.subtype == Token.ARG and depth == 0:
+                return pos
+            pos += 1
+
+    @staticmethod
+    def _apply(name, args):
+        if name == "IFERROR":
+            return args[1] if isinstance(args[0], XlError) else args[0]
+        for a in args if name != "IF" else args[:1]:
+            if isinstance(a, XlError):
+                raise _Raise(a)
+        if name == "IF":
+            cond = args[0]
+            chosen = args[1] if (cond if isinstance(cond, bool) else _num(cond) != 0) else (args[2] if len(args) > 2 else False)
+            if isinstance(chosen, XlError):
+                raise _Raise(chosen)
+            return chosen
+        if name == "SUM":
+            return _sum(*args)
+        if name == "SUMPRODUCT":
+            return _sumproduct(*args)
+        if name == "CONCATENATE":
+            return "".join(_BINARY["&"](a, "") for a in args)
+        raise ValueError(f"fonction non gérée : {name}")
+
+    def _range(self, sheet, ref):
+        if "!" in ref:
+            sheet, ref = ref.rsplit("!", 1)
+            sheet = sheet.strip("'")
+        ref = ref.replace("$", "")
+        if ":" not in ref:
+            return self.cell(sheet, ref)
+        first, last = ref.split(":")
+        c1, r1 = _split(first)
+        c2, r2 = _split(last)
+        return [[self.cell(sheet, f"{get_column_letter(c)}{r}") for c in range(c1, c2 + 1)] for r in range(r1, r2 + 1)]
+
+
+def _split(addr):
+    col = addr.rstrip("0123456789")
+    return column_index_from_string(col), int(addr[len(col):])
+
+
+# ─── Moteurs ───────────────────────────────────────────────────────────────────
+
+def _clean(v):
+    return None if isinstance(v, XlError) else v
+
+
+def indices_by_formulas(audit_data) -> dict:
+    data = main._apply_changes_to_source(main._get_template_skeleton(), main._build_audit_sheet_changes(audit_data))
+    evaluator = Evaluator(load_workbook(io.BytesIO(data)))
+    return {k: _clean(evaluator.cell(main.SHEET_NAME, addr))
+            for group in main.INDICES_CELLS.values() for k, addr in group.items()}
+
+
+def indices_by_soffice(audit_data) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "case.xlsx"
+        main.write_audit_to_excel(None, audit_data, excel_path=path)
+        result = main.read_indices_from_excel(path)
+    return {**result["primary"], **result["secondary"]}
+
+
+def _close(a, b) -> bool:
+    if a is None or b is None:
+        return a is b
+    return abs(a - b) <= 1e-9 * max(1.0, abs(a), abs(b))
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Valeurs de référence des indices AMUREBA.")
+    parser.add_argument("--check-soffice", action="store_true",
+                        help="compare le fichier à un recalcul LibreOffice, sans l'écrire")
+    args = parser.parse_args()
+
+    cases = json.loads(FIXTURE.read_text(encoding="utf-8"))
+    if args.check_soffice:
+        if not main.SOFFICE:
+            sys.exit("LibreOffice introuvable")
+        mismatches = 0
+        for case in cases:
+            recalculated = indices_by_soffice(case["audit_data"])
+            diff = {k: (case["indices"][k], v) for k, v in recalculated.items() if not _close(case["indices"][k], v)}
+            mismatches += bool(diff)
+            print(f"{case['id']}: {'OK' if not diff else f'écarts (fichier, LibreOffice) {diff}'}")
+        sys.exit(1 if mismatches else 0)
+
+    for case in cases:
+        case["indices"] = indices_by_formulas(case["audit_data"])
+        print(f"{case['id']}: {case['indices']}")
+    FIXTURE.write_text(json.dumps(cases, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -11,18 +11,23 @@ Lancement :
 import io
 import os
 import sys
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from uuid import uuid4
 
 import pytest
 from fastapi.testclient import TestClient
 from openpyxl import Workbook
-from sqlalchemy import create_engine, JSON
+from sqlalchemy import create_engine, event, JSON
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# calcul lourd exécuté en ligne : les tests n'attendent pas le démarrage des workers (cf. test_work_pool.py)
+os.environ.setdefault("WORK_POOL_SIZE", "0")
+# /metrics et /health/* fermés sans METRICS_TOKEN : ouverts ici (cf. test_metrics.py::test_metrics_token)
+os.environ.setdefault("METRICS_PUBLIC", "1")
 
 from app.database import get_db
 from app.main import app, get_current_user
@@ -55,6 +60,17 @@ def test_engine():
     engine.dispose()
 
 
+# ── Blob store : répertoire temporaire (jamais backend/app/blobs) ────────────
+
+@pytest.fixture(scope="session", autouse=True)
+def blob_store(tmp_path_factory):
+    from app.blob_store import LocalBlobStore, set_blob_store
+    store = LocalBlobStore(tmp_path_factory.mktemp("blobs"))
+    set_blob_store(store)
+    yield store
+    set_blob_store(None)
+
+
 # ── Session DB (function-scope) ───────────────────────────────────────────────
 
 @pytest.fixture(scope="function")
@@ -108,6 +124,33 @@ def client(db_session, test_user):
     app.dependency_overrides.clear()
 
 
+# ── Budget de requêtes SQL (garde-fou N+1) ────────────────────────────────────
+
+@pytest.fixture
+def query_budget(test_engine):
+    """
+    `with query_budget(4): client.get(...)` échoue si le bloc exécute plus de 4 requêtes
+    SQL. Compte au niveau de l'engine (le TestClient sert l'app dans un autre thread).
+    """
+    @contextmanager
+    def _budget(limit: int):
+        statements: list = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(test_engine, "before_cursor_execute", _record)
+        assert len(statements) <= limit, (
+            f"{len(statements)} requêtes SQL, budget {limit} :\n" + "\n".join(f"  {s}" for s in statements)
+        )
+
+    return _budget
+
+
 # ── Seed : projet minimal (function-scope, UUID unique) ───────────────────────
 
 @pytest.fixture(scope="function")
@@ -155,7 +198,7 @@ def seed_legacy_material(db_session):
 
 def make_lcia_xlsx(gwp100: float = 100.0) -> bytes:
     """
-    Fichier XLSX minimal reconnu par _parse_lcia_xlsx.
+    Fichier XLSX minimal reconnu par heavy.parse_lcia_xlsx.
     Contient l'indicateur GWP100 (EF v3.0) avec une valeur numérique.
     """
     wb = Workbook()
@@ -0,0 +1,121 @@
+"""
+Tests - cache d'artefacts générés (table artifacts) et revalidation ETag / 304.
+
+- GET report/docx et improvement-actions/export-excel : génération unique tant que
+  les entrées (modèle + données) sont inchangées, régénération après modification.
+- ETag fort = SHA-256 du contenu ; If-None-Match correspondant → 304 sans corps.
+- Blob disparu du store : l'artefact est régénéré.
+- Rétention : ARTIFACT_KEEP_PER_PROJECT artefacts par (projet, type).
+- GET /excel : ETag = empreinte des données d'audit, 304 sans génération du classeur.
+"""
+
+import hashlib
+from uuid import uuid4
+
+import pytest
+
+from app import main, models
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    calls = []
+    real_docx, real_xlsx = main._generate_report_docx_bytes, main._apply_changes_to_source
+
+    def _docx(*args, **kwargs):
+        calls.append("docx")
+        return real_docx(*args, **kwargs)
+
+    def _xlsx(*args, **kwargs):
+        calls.append("xlsx")
+        return real_xlsx(*args, **kwargs)
+
+    monkeypatch.setattr(main, "_generate_report_docx_bytes", _docx)
+    monkeypatch.setattr(main, "_apply_changes_to_source", _xlsx)
+    return calls
+
+
+def _report(db_session, project, **fields):
+    report = models.Report(id=f"r-{uuid4().hex[:8]}", project_id=project.id, **fields)
+    db_session.add(report)
+    db_session.commit()
+    return report
+
+
+def test_report_docx_served_from_artifact_cache(client, db_session, seed_project, builds):
+    report = _report(db_session, seed_project, auditor_name=f"Auditeur {uuid4().hex[:6]}")
+    url = f"/projects/{seed_project.id}/report/docx"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers["etag"] == f'"{hashlib.sha256(first.content).hexdigest()}"'
+    second = client.get(url)
+    assert second.content == first.content and builds == ["docx"]
+
+    revalidated = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["etag"] == first.headers["etag"] and builds == ["docx"]
+
+    report.extra_sections = {"synthese_energetique": {"energie_gaz_kwh": "80 000 kWh/an"}}
+    db_session.commit()
+    changed = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200 and changed.headers["etag"] != first.headers["etag"]
+    assert builds == ["docx", "docx"]
+
+
+def test_export_excel_regenerated_only_when_inputs_change(client, db_session, seed_project, builds):
+    seed_project.client_name = f"Entité {uuid4().hex[:6]}"   # artefacts partagés entre projets
+    db_session.commit()
+    url = f"/projects/{seed_project.id}/improvement-actions/export-excel"
+    first = client.get(url)
+    assert first.status_code == 200 and first.content[:2] == b"PK"
+    assert client.get(url).content == first.content
+    assert client.get(url, headers={"If-None-Match": f'W/"x", {first.headers["etag"]}'}).status_code == 304
+    assert builds == ["xlsx"]
+
+    seed_project.client_name += " bis"
+    db_session.commit()
+    assert client.get(url).headers["etag"] != first.headers["etag"]
+    assert builds == ["xlsx", "xlsx"]
+
+
+def test_missing_blob_is_regenerated(client, db_session, seed_project, builds, blob_store):
+    _report(db_session, seed_project, theme=f"Portée {uuid4().hex[:6]}")
+    url = f"/projects/{seed_project.id}/report/docx"
+    etag = client.get(url).headers["etag"]
+    blob_store._path(etag.strip('"')).unlink()
+
+    again = client.get(url)
+    assert again.status_code == 200 and again.headers["etag"] == etag
+    assert builds == ["docx", "docx"]
+
+
+def test_artifacts_evicted_beyond_keep(client, db_session, seed_project, builds, monkeypatch):
+    monkeypatch.setattr(main, "ARTIFACT_KEEP_PER_PROJECT", 2)
+    report = _report(db_session, seed_project)
+    url = f"/projects/{seed_project.id}/report/docx"
+    etags = []
+    for i in range(4):
+        report.auditor_name = f"Auditeur {i} {uuid4().hex[:6]}"
+        db_session.commit()
+        etags.append(client.get(url).headers["etag"].strip('"'))
+
+    db_session.expire_all()
+    kept = db_session.query(models.Artifact).filter(
+        models.Artifact.project_id == seed_project.id, models.Artifact.kind == "report_docx",
+    ).all()
+    assert sorted(a.blob_hash for a in kept) == sorted(etags[-2:])
+    assert builds == ["docx"] * 4
+
+
+def test_project_excel_etag(client, seed_project, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "EXCEL_DIR", tmp_path)
+    url = f"/projects/{seed_project.id}/excel"
+    r = client.get(url)
+    assert r.status_code == 200 and r.headers["etag"].startswith('"')
+
+    # 304 : l'empreinte est comparée avant de matérialiser le classeur
+    for f in tmp_path.glob("*.xlsx"):
+        f.unlink()
+    assert client.get(url, headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert list(tmp_path.glob("*.xlsx")) == []
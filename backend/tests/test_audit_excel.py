@@ -0,0 +1,121 @@
+"""
+Tests - matérialisation paresseuse du classeur audit.
+
+- PATCH /audit n'écrit que la base (aucune génération de classeur).
+- GET /excel génère le classeur une seule fois par état des données (empreinte),
+  le régénère après une modification ; la version périmée n'est supprimée qu'après
+  le délai de grâce (un téléchargement concurrent peut encore la lire).
+- write_audit_to_excel passe par le patch zip : valeurs mappées sur '2023',
+  autres parties du template (noms définis, autres feuilles) inchangées.
+"""
+
+import io
+import os
+import time
+from zipfile import ZipFile
+
+import pytest
+from openpyxl import load_workbook
+
+from app import main, xlsx_patch
+
+
+def _audit(electricity):
+    return {"audit_data": {"year2023": {
+        "operational": [{"name": "Atelier", "electricity": electricity}],
+        "buildings": [], "transport": [], "utility": [],
+        "influence_factors": [{"description": "Production", "value": 12, "unit": "t"}],
+        "invoice_meter": {"electricity": electricity},
+    }}}
+
+
+@pytest.fixture
+def generations(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "EXCEL_DIR", tmp_path)
+    calls = []
+    real = main.write_audit_to_excel
+
+    def _counting(project, audit_data, excel_path=None):
+        calls.append(excel_path)
+        return real(project, audit_data, excel_path=excel_path)
+
+    monkeypatch.setattr(main, "write_audit_to_excel", _counting)
+    return calls
+
+
+def _download(client, project_id):
+    r = client.get(f"/projects/{project_id}/excel")
+    assert r.status_code == 200
+    return load_workbook(io.BytesIO(r.content), read_only=True)[main.SHEET_NAME]
+
+
+def test_patch_audit_does_not_write_workbook(client, seed_project, generations):
+    for _ in range(3):
+        r = client.patch(f"/projects/{seed_project.id}/audit", json=_audit(1000))
+        assert r.status_code == 200, r.text
+    assert generations == []
+
+
+def test_workbook_generated_once_per_audit_state(client, seed_project, generations, tmp_path):
+    client.patch(f"/projects/{seed_project.id}/audit", json=_audit(1000))
+    assert _download(client, seed_project.id)["C6"].value == 1000
+    assert _download(client, seed_project.id)["C6"].value == 1000
+    assert len(generations) == 1
+
+    # autosave sans changement : toujours en cache
+    client.patch(f"/projects/{seed_project.id}/audit", json=_audit(1000))
+    _download(client, seed_project.id)
+    assert len(generations) == 1
+
+    client.patch(f"/projects/{seed_project.id}/audit", json=_audit(2500))
+    assert _download(client, seed_project.id)["C6"].value == 2500
+    assert len(generations) == 2
+
+
+def test_stale_workbook_kept_during_grace_period(client, seed_project, generations, tmp_path):
+    client.patch(f"/projects/{seed_project.id}/audit", json=_audit(1000))
+    _download(client, seed_project.id)
+    (old,) = tmp_path.glob(f"{seed_project.id}-*.xlsx")
+
+    # version périmée récente : peut encore être servie, conservée
+    client.patch(f"/projects/{seed_project.id}/audit", json=_audit(2500))
+    _download(client, seed_project.id)
+    assert old.exists()
+
+    # au-delà du délai : supprimée à la génération suivante
+    past = time.time() - main.EXCEL_STALE_GRACE_SECONDS - 60
+    os.utime(old, (past, past))
+    client.patch(f"/projects/{seed_project.id}/audit", json=_audit(4000))
+    assert _download(client, seed_project.id)["C6"].value == 4000
+    remaining = set(tmp_path.glob(f"{seed_project.id}-*.xlsx"))
+    assert old not in remaining and len(remaining) == 2
+
+
+def test_write_audit_patches_template(tmp_path):
+    out = tmp_path / "audit.xlsx"
+    main.write_audit_to_excel(None, {"year2023": {
+        "utility_headers": {"util1_name": "Vapeur", "util1_unit": "t"},
+        "operational": [{"name": "Atelier", "electricity": 1000, "gas": "abc"},
+                        {"name": "Four", "fuel": "1 000,5"}],
+        "utility": [{"name": "Chaudière", "gas": 300}],
+        "influence_factors": [{"description": "Production", "value": "12", "unit": "t"}],
+        "invoice_meter": {"electricity": 1100, "process": 40},
+    }}, excel_path=out)
+
+    ws = load_workbook(out, read_only=True)[main.SHEET_NAME]
+    assert ws["B6"].value == "Atelier" and ws["C6"].value == 1000 and ws["D6"].value is None
+    assert ws["E7"].value == 1000.5
+    assert ws["B15"].value == "Chaudière" and ws["D15"].value == 300
+    assert ws["G3"].value == "Vapeur" and ws["H3"].value is None
+    assert ws["L6"].value == "Production" and ws["M6"].value == 12 and ws["L7"].value is None
+    assert ws["C19"].value == 1100 and ws["I19"].value == 40
+    assert ws["AD6"].value == '=IF($M6="","",SUM(W6:AB6))'   # formules hors cellules ciblées conservées
+
+    with ZipFile(out) as patched, ZipFile(main.TEMPLATE_FILE) as template:
+        sheet_path = xlsx_patch._build_sheet_path_map(template)[main.SHEET_NAME]
+        rewritten = {sheet_path, "xl/workbook.xml", "xl/_rels/workbook.xml.rels", "[Content_Types].xml"}
+        for info in template.infolist():
+            if info.filename not in rewritten and info.filename != "xl/calcChain.xml":
+                assert patched.getinfo(info.filename).CRC == info.CRC, info.filename
+        wb_xml, tpl_xml = patched.read("xl/workbook.xml"), template.read("xl/workbook.xml")
+        assert wb_xml.count(b"<definedName") == tpl_xml.count(b"<definedName")
@@ -0,0 +1,39 @@
+"""
+Tests - comparaison à la baseline des benchmarks (benchmarks/suite.py).
+
+Les cas eux-mêmes ne tournent pas ici (plusieurs secondes) : seuls l'enregistrement
+des cas, la mesure par paires (calibration, cas) et la détection de régression sur
+les rapports cas / calibration sont vérifiés.
+"""
+
+from benchmarks import suite
+
+BASELINE = {"cases": {"demo": {"median_ms": 100.0, "ratio": 3.0, "peak_mib": 10.0}}}
+
+
+def _result(ratio, calibration_ms=30.0, peak_mib=10.0):
+    return {"median_ms": ratio * calibration_ms, "ratio": ratio, "calibration_ms": calibration_ms, "peak_mib": peak_mib}
+
+
+def test_cases_registered_with_unique_names():
+    names = [c.name for c in suite.CASES]
+    assert len(names) == len(set(names)) >= 8
+
+
+def test_measure_reports_ratio_to_calibration():
+    r = suite.measure(suite._calibration_loop, repeat=3)
+    assert 0.5 < r["ratio"] < 2.0
+    assert r["median_ms"] > 0 and r["calibration_ms"] > 0
+
+
+def test_compare_uses_ratio_not_wall_time():
+    # machine deux fois plus lente : temps doublé, rapport inchangé → pas de régression
+    assert suite.compare({"demo": _result(3.2, calibration_ms=60.0)}, BASELINE, 0.3, 0.2) == []
+    regressions = suite.compare({"demo": _result(4.2)}, BASELINE, 0.3, 0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("demo: 4.20 > 3.00")
+
+
+def test_compare_flags_memory_and_ignores_new_cases():
+    results = {"demo": _result(3.0, peak_mib=14.0), "new": _result(1e6, peak_mib=1e3)}
+    regressions = suite.compare(results, BASELINE, 0.3, 0.2)
+    assert len(regressions) == 1 and "pic 14.0 Mio" in regressions[0]
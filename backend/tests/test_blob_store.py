@@ -0,0 +1,268 @@
+"""
+Tests - blob store (app/blob_store.py) et téléchargements streamés.
+
+- LocalBlobStore / S3BlobStore : adressage par contenu, lecture par plage, suppression
+  (S3 testé contre un client en mémoire de même interface que boto3) ; interface
+  abstraite : un backend incomplet ne s'instancie pas
+- GET documents/{id}/file : stream complet, Range → 206, plage hors fichier → 416,
+  plage invalide ignorée → 200, blob absent du store → 404
+- migrate_blobs : copie vers le store (bytea conservé), remise à NULL vérifiée en
+  étape séparée, refus sur le store local éphémère, rapatriement au downgrade
+- get_blob_store : store local par défaut refusé sans BLOB_DIR (sauf BLOB_ALLOW_EPHEMERAL)
+- sweep_blobs : seuls les blobs non référencés et plus vieux que le délai de grâce
+"""
+
+import hashlib
+import io
+import os
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from app import blob_store as blob_store_module
+from app import models
+from app.blob_store import BlobNotFound, BlobStore, LocalBlobStore, S3BlobStore, blob_key
+from app.migrate_blobs import clear_legacy, copy_to_store, restore_legacy
+from app.sweep_blobs import sweep
+
+_PDF = b"%PDF-1.4\n" + bytes(range(256)) * 300
+
+
+class _ClientError(Exception):
+    def __init__(self, code):
+        self.response = {"Error": {"Code": code}}
+
+
+class _InMemoryS3:
+    """Stand-in local du client boto3 "s3" (put / head / get + Range / delete / list_objects_v2)."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise _ClientError("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def get_object(self, Bucket, Key, Range=None):
+        if (Bucket, Key) not in self.objects:
+            raise _ClientError("NoSuchKey")
+        data = self.objects[(Bucket, Key)]
+        if Range:
+            first, _, last = Range[len("bytes="):].partition("-")
+            data = data[int(first):(int(last) + 1 if last else None)]
+        return {"Body": io.BytesIO(data)}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None):
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + 2]   # pages de 2 : la pagination est exercée
+        now = datetime.now(timezone.utc)
+        result = {"Contents": [{"Key": k, "LastModified": now} for k in page],
+                  "IsTruncated": start + 2 < len(keys)}
+        if result["IsTruncated"]:
+            result["NextContinuationToken"] = str(start + 2)
+        return result
+
+
+@pytest.fixture(params=["local", "s3"])
+def store(request, tmp_path):
+    if request.param == "local":
+        return LocalBlobStore(tmp_path)
+    return S3BlobStore("bucket", prefix="blobs", client=_InMemoryS3())
+
+
+def test_store_is_content_addressed(store):
+    key = store.put(_PDF)
+    assert key == hashlib.sha256(_PDF).hexdigest()
+    assert store.put(_PDF) == key
+    assert store.get(key) == _PDF
+    assert store.size(key) == len(_PDF)
+    assert b"".join(store.iter_range(key, 100, 70_000)) == _PDF[100:70_001]
+    assert b"".join(store.iter_range(key, 70_000)) == _PDF[70_000:]
+
+
+def test_store_missing_key(store):
+    assert not store.exists("0" * 64)
+    with pytest.raises(BlobNotFound):
+        store.get("0" * 64)
+
+
+def test_store_delete(store):
+    key = store.put(_PDF)
+    assert store.exists(key)
+    store.delete(key)
+    assert not store.exists(key)
+    store.delete(key)   # idempotent
+
+
+def test_store_iter_keys(store):
+    keys = {store.put(_PDF[:n]) for n in (10, 20, 30)}
+    listed = dict(store.iter_keys())
+    assert set(listed) == keys
+    assert all(abs(mtime - time.time()) < 60 for mtime in listed.values())
+
+
+@pytest.fixture
+def default_store(blob_store):
+    """get_blob_store() reconstruit depuis l'environnement, store de session restauré ensuite."""
+    blob_store_module.set_blob_store(None)
+    yield blob_store_module.get_blob_store
+    blob_store_module.set_blob_store(blob_store)
+
+
+def test_ephemeral_local_store_refused(default_store, monkeypatch, tmp_path):
+    monkeypatch.setenv("BLOB_STORE", "local")
+    monkeypatch.delenv("BLOB_DIR", raising=False)
+    monkeypatch.delenv("BLOB_ALLOW_EPHEMERAL", raising=False)
+    with pytest.raises(RuntimeError, match="BLOB_DIR"):
+        default_store()
+
+    monkeypatch.setenv("BLOB_DIR", str(tmp_path))
+    assert default_store().root == tmp_path
+
+
+def test_ephemeral_local_store_dev_flag(default_store, monkeypatch):
+    monkeypatch.setenv("BLOB_STORE", "local")
+    monkeypatch.delenv("BLOB_DIR", raising=False)
+    monkeypatch.setenv("BLOB_ALLOW_EPHEMERAL", "1")
+    assert default_store().root.name == "blobs"
+
+
+def test_incomplete_backend_is_rejected():
+    class _PutOnly(BlobStore):
+        def put(self, data):
+            return blob_key(data)
+
+    with pytest.raises(TypeError):
+        _PutOnly()
+
+
+def _upload(client, project_id):
+    r = client.post(
+        f"/projects/{project_id}/documents",
+        files={"file": ("facture.pdf", _PDF, "application/pdf")},
+        data={"doc_type": "facture"},
+    )
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def test_upload_stores_hash_only(client, db_session, seed_project, blob_store):
+    doc_id = _upload(client, seed_project.id)
+    doc = db_session.get(models.ProjectDocument, doc_id)
+    assert doc.file_data is None
+    assert doc.file_size == len(_PDF)
+    assert blob_store.get(doc.file_hash) == _PDF
+
+
+def test_document_download_full_and_range(client, seed_project):
+    doc_id = _upload(client, seed_project.id)
+    url = f"/projects/{seed_project.id}/documents/{doc_id}/file"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.content == _PDF
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["etag"] == f'"{hashlib.sha256(_PDF).hexdigest()}"'
+
+    part = client.get(url, headers={"Range": "bytes=10-99"})
+    assert part.status_code == 206
+    assert part.content == _PDF[10:100]
+    assert part.headers["content-range"] == f"bytes 10-99/{len(_PDF)}"
+
+    tail = client.get(url, headers={"Range": "bytes=-16"})
+    assert tail.status_code == 206 and tail.content == _PDF[-16:]
+
+    assert client.get(url, headers={"Range": f"bytes={len(_PDF)}-"}).status_code == 416
+    reversed_range = client.get(url, headers={"Range": "bytes=5-2"})
+    assert reversed_range.status_code == 200 and reversed_range.content == _PDF
+
+
+def test_download_missing_blob_is_404(client, db_session, seed_project, blob_store):
+    doc_id = _upload(client, seed_project.id)
+    doc = db_session.get(models.ProjectDocument, doc_id)
+    blob_store._path(doc.file_hash).unlink()   # store local perdu
+    r = client.get(f"/projects/{seed_project.id}/documents/{doc_id}/file")
+    assert r.status_code == 404 and r.json()["detail"] == "Fichier introuvable"
+
+
+def _legacy_doc(db_session, project):
+    doc = models.ProjectDocument(
+        id=f"doc-{uuid4().hex[:12]}", project_id=project.id, owner_id=project.owner_id,
+        filename="old.pdf", original_name="old.pdf", file_type="application/pdf", doc_type="facture",
+        file_data=_PDF, status="pending", created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    db_session.add(doc)
+    return doc
+
+
+def test_migration_refuses_ephemeral_local_store(test_engine, monkeypatch, blob_store):
+    monkeypatch.setenv("BLOB_STORE", "local")
+    monkeypatch.delenv("BLOB_DIR", raising=False)
+    with test_engine.begin() as conn:
+        with pytest.raises(RuntimeError, match="BLOB_DIR"):
+            copy_to_store(conn)
+        with pytest.raises(RuntimeError, match="BLOB_DIR"):
+            clear_legacy(conn)
+
+
+def test_copy_then_verified_clear(client, db_session, test_engine, seed_project, blob_store, monkeypatch):
+    monkeypatch.setenv("BLOB_DIR", str(blob_store.root))
+    doc = _legacy_doc(db_session, seed_project)
+    seed_project.report_docx = b"docx-legacy"
+    db_session.commit()
+    url = f"/projects/{seed_project.id}/documents/{doc.id}/file"
+    assert client.get(url).content == _PDF
+
+    # étape 1 : copie, bytea conservé
+    with test_engine.begin() as conn:
+        copied = copy_to_store(conn, batch=1)
+    assert copied["project_documents.file_data"] >= 1 and copied["projects.report_docx"] >= 1
+    db_session.expire_all()
+    doc = db_session.get(models.ProjectDocument, doc.id)
+    assert doc.file_data == _PDF and doc.file_size == len(_PDF)
+    assert blob_store.get(doc.file_hash) == _PDF
+
+    # étape 2 : un blob manquant garde son bytea, les autres sont vidés
+    project = db_session.get(models.Project, seed_project.id)
+    blob_store._path(project.report_docx_hash).unlink()
+    with test_engine.begin() as conn:
+        result = clear_legacy(conn, batch=1)
+    assert result["projects.report_docx"]["kept"] >= 1
+    db_session.expire_all()
+    doc = db_session.get(models.ProjectDocument, doc.id)
+    project = db_session.get(models.Project, seed_project.id)
+    assert doc.file_data is None
+    assert project.report_docx == b"docx-legacy"
+    assert client.get(url).content == _PDF
+
+    # downgrade : bytea rapatrié depuis le store
+    with test_engine.begin() as conn:
+        restore_legacy(conn)
+    db_session.expire_all()
+    assert db_session.get(models.ProjectDocument, doc.id).file_data == _PDF
+
+
+def test_sweep_deletes_old_orphans_only(client, db_session, test_engine, seed_project, blob_store):
+    referenced = db_session.get(models.ProjectDocument, _upload(client, seed_project.id)).file_hash
+    old_orphan = blob_store.put(b"remplace depuis longtemps")
+    new_orphan = blob_store.put(b"ecrit juste avant le commit de sa ligne")
+    past = time.time() - 2 * 24 * 3600
+    for key in (referenced, old_orphan):
+        os.utime(blob_store._path(key), (past, past))
+
+    assert sweep(test_engine, dry_run=True)["deleted"] >= 1
+    assert blob_store.exists(old_orphan)
+
+    sweep(test_engine)
+    assert not blob_store.exists(old_orphan)
+    assert blob_store.exists(referenced) and blob_store.exists(new_orphan)
@@ -0,0 +1,76 @@
+"""
+Tests - client Claude asynchrone partagé (_claude_create).
+
+- Les erreurs transitoires (529, 429, réseau) sont réessayées avec asyncio.sleep,
+  en respectant l'en-tête retry-after.
+- Les erreurs définitives (400…) remontent immédiatement.
+"""
+
+import asyncio
+
+import anthropic
+import httpx
+import pytest
+
+from app import main
+
+
+def _status_error(code, headers=None):
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(code, headers=headers or {}, request=request)
+    return anthropic.APIStatusError(f"HTTP {code}", response=response, body=None)
+
+
+class _FakeMessages:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def fake_claude(monkeypatch):
+    sleeps = []
+
+    async def _sleep(delay):
+        sleeps.append(delay)
+
+    def install(*outcomes):
+        messages = _FakeMessages(outcomes)
+        monkeypatch.setattr(main, "_get_async_claude", lambda: type("C", (), {"messages": messages})())
+        return messages
+
+    monkeypatch.setattr(main.asyncio, "sleep", _sleep)
+    install.sleeps = sleeps
+    return install
+
+
+def test_retries_transient_errors_with_backoff(fake_claude):
+    messages = fake_claude(_status_error(529), _status_error(429, {"retry-after": "2"}), "ok")
+    assert asyncio.run(main._claude_create("test", max_tokens=10, messages=[])) == "ok"
+    assert len(messages.calls) == 3
+    assert messages.calls[0]["model"] == main.CLAUDE_MODEL
+    assert fake_claude.sleeps[0] >= main._CLAUDE_BACKOFF_BASE
+    assert fake_claude.sleeps[1] == 2.0
+
+
+def test_permanent_error_is_not_retried(fake_claude):
+    messages = fake_claude(_status_error(400), "ok")
+    with pytest.raises(anthropic.APIStatusError):
+        asyncio.run(main._claude_create("test", max_tokens=10, messages=[]))
+    assert len(messages.calls) == 1
+    assert fake_claude.sleeps == []
+
+
+def test_gives_up_after_max_attempts(fake_claude):
+    messages = fake_claude(*[_status_error(529)] * main._CLAUDE_MAX_ATTEMPTS)
+    with pytest.raises(anthropic.APIStatusError):
+        asyncio.run(main._claude_create("test", max_tokens=10, messages=[]))
+    assert len(messages.calls) == main._CLAUDE_MAX_ATTEMPTS
+    assert len(fake_claude.sleeps) == main._CLAUDE_MAX_ATTEMPTS - 1
@@ -0,0 +1,98 @@
+"""
+Tests - cache d'extraction Claude (table extraction_cache).
+
+- Clé (sha256 du fichier, hash du prompt, modèle) : un changement de prompt invalide le cache.
+- _analyze_one consulte le cache avant Claude et l'alimente après une extraction.
+- import_client_file crée directement un document analysé si l'extraction est en cache.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app import main, models
+
+_PNG = b"\x89PNG\r\n\x1a\n" + b"facture-fournisseur"
+_PNG_HASH = hashlib.sha256(_PNG).hexdigest()
+_EXTRACTED = {"type_document": "facture_gaz", "energie": "gaz", "consommation": 1234, "cout_total": 99.5}
+
+
+class _FakeClaude:
+    def __init__(self):
+        self.calls = 0
+        self.messages = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=json.dumps(_EXTRACTED))],
+            usage=SimpleNamespace(input_tokens=1, output_tokens=1),
+        )
+
+
+@pytest.fixture
+def fake_claude(monkeypatch):
+    fake = _FakeClaude()
+    monkeypatch.setattr(main, "_get_sync_claude", lambda: fake)
+    return fake
+
+
+def _doc(db_session, project):
+    doc = models.ProjectDocument(
+        id=f"doc-{uuid4().hex[:12]}", project_id=project.id, owner_id=project.owner_id,
+        filename="f.png", original_name="f.png", file_type="image/png", doc_type="autre",
+        file_data=_PNG, file_hash=_PNG_HASH, status="pending",
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    db_session.add(doc)
+    db_session.commit()
+    return doc
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache(db_session):
+    db_session.query(models.ExtractionCache).delete()
+    db_session.commit()
+
+
+def test_analyze_fills_then_reuses_cache(db_session, seed_project, fake_claude):
+    first = _doc(db_session, seed_project)
+    main._analyze_one(first, db_session=db_session)
+    db_session.commit()
+    assert fake_claude.calls == 1
+    assert main._extraction_cache_get(db_session, _PNG_HASH, main._ANALYZE_PROMPT) == _EXTRACTED
+
+    second = _doc(db_session, seed_project)
+    main._analyze_one(second, db_session=db_session)
+    assert fake_claude.calls == 1
+    assert second.status == "analyzed"
+    assert second.extracted_data == _EXTRACTED
+    assert second.doc_type == "facture_gaz"
+
+
+def test_prompt_change_misses_cache(db_session, seed_project, fake_claude, monkeypatch):
+    main._analyze_one(_doc(db_session, seed_project), db_session=db_session)
+    db_session.commit()
+    monkeypatch.setattr(main, "_ANALYZE_PROMPT", main._ANALYZE_PROMPT + " (v2)")
+    main._analyze_one(_doc(db_session, seed_project), db_session=db_session)
+    assert fake_claude.calls == 2
+
+
+def test_import_client_file_uses_cache(client, db_session, seed_project, test_user):
+    main._extraction_cache_put(db_session, _PNG_HASH, main._ANALYZE_PROMPT, _EXTRACTED)
+    cr = models.ClientRequest(id=f"cr-{uuid4().hex[:12]}", project_id=seed_project.id,
+                              client_email="client@test.com", documents=[], received_files=[])
+    db_session.add(cr)
+    db_session.commit()
+
+    r = client.post(
+        f"/client-requests/{cr.id}/import-file",
+        files={"file": ("facture.png", _PNG, "image/png")},
+    )
+    assert r.status_code == 200, r.text
+    assert r.json()["status"] == "analyzed"
+    assert r.json()["extracted_data"] == _EXTRACTED
@@ -0,0 +1,150 @@
+"""
+Tests - calcul natif des indices AMUREBA (app/indices.py).
+
+- Facteurs identiques à ceux du modèle (valeurs en cache de '2023'!C30:F31).
+- Cas de référence : valeurs attendues dérivées à la main des formules de la feuille
+  (les expressions sont laissées en clair), erreurs #VALUE! / #DIV/0! → None.
+- Évaluation des formules : valeurs obtenues en évaluant les formules du classeur
+  généré par write_audit_to_excel avec l'évaluateur interne de
+  scripts/regen_indices_fixtures.py (tests/fixtures/indices_formula_eval.json).
+  Ce n'est pas une parité LibreOffice : celle-ci se vérifie hors CI avec
+  `python scripts/regen_indices_fixtures.py --check-soffice`.
+- GET /projects/{id}/indices ne lance plus LibreOffice.
+"""
+
+import json
+from pathlib import Path
+from uuid import uuid4
+
+import pytest
+from openpyxl import load_workbook
+
+from app import main, models
+from app.indices import CO2_FACTORS, FINAL_ENERGY_FACTORS, SUPPLIED, compute_indices
+
+
+def _case(rows=None, influence=(), invoice=None):
+    year = {"operational": [], "buildings": [], "transport": [], "utility": []}
+    for section, entries in (rows or {}).items():
+        year[section] = entries
+    year["influence_factors"] = [{"description": f"FI {i}", "value": v, "unit": "u"} for i, v in enumerate(influence)]
+    year["invoice_meter"] = invoice or {}
+    return {"year2023": year}
+
+
+_INVOICE = {"electricity": 120000, "gas": 60000, "fuel": 1200, "biogas": 10000, "process": 500}
+_H35 = (120000 + 60000 + 1200 * 10.6 + 10000) / 1000
+_H36 = 120000 * 0.216 + 60000 * 0.218 + 1200 * 3.2569 + 500
+
+GOLDEN = [
+    pytest.param(
+        _case(), {"IEE": None, "IC": None, "iSER": None, "AEE": None, "iCO2": None, "ACO2": None},
+        id="modele-vierge",
+    ),
+    pytest.param(
+        _case(
+            rows={"operational": [{"name": "Atelier", "electricity": 100000, "gas": 50000},
+                                  {"name": "Four", "fuel": "1 000"}]},
+            influence=[10, 20],
+            invoice=_INVOICE,
+        ),
+        {
+            "IEE": _H35 / (150 + 10.6),
+            "IC": _H36 / _H35,
+            "iSER": 10 / _H35,
+            "AEE": 1 - _H35 / (150 + 10.6),
+            "iCO2": _H36 / (100000 * 0.216 + 50000 * 0.218 + 1000 * 3.2569),
+            "ACO2": 1 - _H36 / (100000 * 0.216 + 50000 * 0.218 + 1000 * 3.2569),
+        },
+        id="operationnel-complet",
+    ),
+    pytest.param(
+        _case(
+            rows={
+                "operational": [{"name": "Ligne", "util1": 40000, "process": 250}, {"name": "Vide"}],
+                "buildings": [{"name": "Bureaux", "electricity": 999999}],   # ligne 9 : P9 vide → T9 = 0
+                "utility": [{"name": "Vapeur", "electricity": 20000, "gas": 30000}],
+            },
+            influence=[4, 0],
+            invoice={"electricity": 20000, "gas": 30000},
+        ),
+        {
+            # G30 = (20000×1 + 30000×1) / 40000 ; AD6 = 40000 × G30 / 1000 ; T7 = 0 (M7 = 0)
+            "IEE": 50 / 50,
+            "IC": (20000 * 0.216 + 30000 * 0.218) / 50,
+            "iSER": 0.0,
+            "AEE": 0.0,
+            # G31 = (20000×0.216 + 30000×0.218) / 40000 ; AS6 = 40000 × G31 + 250
+            "iCO2": (20000 * 0.216 + 30000 * 0.218) / (20000 * 0.216 + 30000 * 0.218 + 250),
+            "ACO2": 1 - (20000 * 0.216 + 30000 * 0.218) / (20000 * 0.216 + 30000 * 0.218 + 250),
+        },
+        id="utilites-ponderees",
+    ),
+    pytest.param(
+        _case(rows={"operational": [{"electricity": 1000}]}, influence=[0, 0], invoice={"electricity": 1000}),
+        {"IEE": None, "IC": 0.216 * 1000, "iSER": 0.0, "AEE": None, "iCO2": None, "ACO2": None},
+        id="reference-nulle-div0",
+    ),
+    pytest.param(
+        _case(rows={"operational": [{"electricity": 1000}]}, influence=[5], invoice={"electricity": 1000}),
+        {"IEE": None, "IC": 0.216 * 1000, "iSER": 0.0, "AEE": None, "iCO2": None, "ACO2": None},
+        id="facteur-influence-manquant",
+    ),
+]
+
+
+def _flat(result):
+    return {**result["primary"], **result["secondary"]}
+
+
+def test_factors_match_template():
+    ws = load_workbook(main.TEMPLATE_FILE, data_only=True)[main.SHEET_NAME]
+    for col, carrier in zip("CDEF", SUPPLIED):
+        assert ws[f"{col}30"].value == pytest.approx(FINAL_ENERGY_FACTORS[carrier])
+        assert ws[f"{col}31"].value == pytest.approx(CO2_FACTORS[carrier])
+
+
+@pytest.mark.parametrize("audit_data, expected", GOLDEN)
+def test_golden_indices(audit_data, expected):
+    result = compute_indices(audit_data)
+    assert _flat(result) == pytest.approx(expected)
+    assert result["formulas_calculated"] == any(v is not None for v in expected.values())
+
+
+FORMULA_EVAL = json.loads(
+    (Path(__file__).parent / "fixtures" / "indices_formula_eval.json").read_text(encoding="utf-8")
+)
+
+
+@pytest.mark.parametrize("case", FORMULA_EVAL, ids=[c["id"] for c in FORMULA_EVAL])
+def test_matches_workbook_formula_evaluation(case):
+    assert _flat(compute_indices(case["audit_data"])) == pytest.approx(case["indices"])
+
+
+def test_blank_fixture_matches_template_cache():
+    # valeurs en cache du template (dernier enregistrement par le tableur) : toutes en erreur
+    ws = load_workbook(main.TEMPLATE_FILE, data_only=True)[main.SHEET_NAME]
+    cached = {k: ws[addr].value for group in main.INDICES_CELLS.values() for k, addr in group.items()}
+    assert all(str(v).startswith("#") for v in cached.values())
+    blank = next(c for c in FORMULA_EVAL if c["id"] == "modele-vierge")
+    assert blank["indices"] == dict.fromkeys(cached)
+
+
+def test_indices_endpoint_does_not_shell_out(client, db_session, seed_project, monkeypatch):
+    def _no_soffice(*args, **kwargs):
+        raise AssertionError("LibreOffice ne doit plus être appelé")
+    monkeypatch.setattr(main, "recalc_excel_in_place", _no_soffice)
+
+    audit_data = GOLDEN[1].values[0]["year2023"]
+    db_session.add(models.Audit(
+        id=f"audit-{uuid4().hex[:12]}", project_id=seed_project.id,
+        energies={"year2023": {k: audit_data[k] for k in ("operational", "buildings", "transport", "utility")}},
+        influence_factors={"year2023": audit_data["influence_factors"]},
+        invoices={"year2023": audit_data["invoice_meter"]},
+    ))
+    db_session.commit()
+
+    r = client.get(f"/projects/{seed_project.id}/indices")
+    assert r.status_code == 200, r.text
+    assert _flat(r.json()) == pytest.approx(GOLDEN[1].values[1])
+    assert r.json()["formulas_calculated"] is True
@@ -0,0 +1,101 @@
+"""
+Tests - analyse groupée des documents en tâche de fond (table jobs, GET /jobs/{id}).
+
+- POST analyze-all rend la main tout de suite (202) avec un job en file.
+- Le worker écrit la progression document par document, sans réanalyser
+  les documents déjà traités (reprise).
+- GET /jobs/{id} est limité au propriétaire du job.
+"""
+
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from sqlalchemy.orm import sessionmaker
+
+from app import main, models
+
+
+def _add_doc(db_session, project, name):
+    doc = models.ProjectDocument(
+        id=f"doc-{uuid4().hex[:12]}",
+        project_id=project.id,
+        owner_id=project.owner_id,
+        filename=name,
+        original_name=name,
+        file_type="application/pdf",
+        doc_type="facture",
+        file_data=b"%PDF-1.4",
+        status="pending",
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    db_session.add(doc)
+    db_session.commit()
+    return doc
+
+
+def test_analyze_all_returns_queued_job(client, db_session, seed_project, monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(main, "_enqueue_job", enqueued.append)
+    docs = [_add_doc(db_session, seed_project, f"facture-{i}.pdf") for i in range(3)]
+
+    r = client.post(f"/projects/{seed_project.id}/documents/analyze-all")
+    assert r.status_code == 202, r.text
+    job = r.json()
+    assert enqueued == [job["job_id"]]
+    assert job["status"] == "queued"
+    assert job["total"] == 3 and job["completed"] == 0
+    assert {it["id"] for it in job["items"]} == {d.id for d in docs}
+
+    polled = client.get(f"/jobs/{job['job_id']}")
+    assert polled.status_code == 200
+    assert polled.json()["items"] == job["items"]
+
+
+def test_get_job_other_owner_is_404(client, db_session, seed_project, test_user):
+    other = models.User(id=f"u-{uuid4().hex[:8]}", full_name="Autre", email=f"{uuid4().hex[:8]}@x.test",
+                        hashed_password="x")
+    db_session.add(other)
+    db_session.commit()
+    job = models.Job(id=str(uuid4()), kind="analyze_documents", project_id=seed_project.id,
+                     owner_id=other.id, items=[], created_at=datetime.now(timezone.utc).isoformat())
+    db_session.add(job)
+    db_session.commit()
+    assert client.get(f"/jobs/{job.id}").status_code == 404
+
+
+def test_worker_records_progress_and_skips_finished_items(db_session, test_engine, seed_project, monkeypatch):
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=test_engine))
+    analysed = []
+
+    def fake_analyze(doc_id):
+        analysed.append(doc_id)
+        if doc_id == "d-bad":
+            return {"id": doc_id, "status": "error", "error": "illisible"}
+        return {"id": doc_id, "status": "analyzed"}
+
+    monkeypatch.setattr(main, "_analyze_one_by_id", fake_analyze)
+    job = models.Job(
+        id=str(uuid4()), kind="analyze_documents", project_id=seed_project.id,
+        owner_id=seed_project.owner_id, status="queued", total=3, completed=1,
+        items=[
+            {"id": "d-old", "name": "a.pdf", "status": "done", "error": None},
+            {"id": "d-ok", "name": "b.pdf", "status": "queued", "error": None},
+            {"id": "d-bad", "name": "c.pdf", "status": "queued", "error": None},
+        ],
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    db_session.add(job)
+    db_session.commit()
+
+    main._run_analysis_job(job.id)
+
+    db_session.expire_all()
+    job = db_session.get(models.Job, job.id)
+    assert sorted(analysed) == ["d-bad", "d-ok"]
+    assert job.status == "done" and job.completed == 3 and job.finished_at
+    assert [(it["id"], it["status"], it["error"]) for it in job.items] == [
+        ("d-old", "done", None), ("d-ok", "done", None), ("d-bad", "error", "illisible"),
+    ]
+    # un second passage ne reprend pas un job terminé
+    main._run_analysis_job(job.id)
+    assert len(analysed) == 2
@@ -0,0 +1,338 @@
+"""
+Tests unitaires - Moteur d'optimisation ACV 2.0 (app/lca_engine.py)
+===================================================================
+
+Couvre :
+  - conversions « à la JS » (String(number), djb2) utilisées par le hash de configuration
+  - calc_paroi_stats / calc_batiment_stats sur une paroi simple
+  - build_combinations : statu quo en tête, ajout d'isolant, parois figées
+  - CombinationSpace : évaluation vectorisée identique au calcul bâtiment par bâtiment
+  - pareto_front : front exact (coût, GWP amorti, énergie) sans énumération
+  - compute_phares : profils phares présents et cohérents
+
+Lancement :
+  cd backend
+  pytest tests/test_lca_engine.py -v
+"""
+
+import numpy as np
+import pytest
+
+from app import lca_engine
+from app.lca_reference_data import LCA_REFERENCE_MATERIALS
+
+
+MATERIALS = sorted(
+    (dict(m) for m in LCA_REFERENCE_MATERIALS),
+    key=lambda m: (m["category"], m["name"]),
+)
+_BY_NAME = {m["name"]: m for m in MATERIALS}
+
+
+# ── Helpers : bâtiment synthétique à partir de la bibliothèque de référence ───
+
+def _composant(name, comp_id, **overrides):
+    m = _BY_NAME[name]
+    co = {
+        "id": comp_id,
+        "material_id": m["id"],
+        "material_name": m["name"],
+        "category": "Isolant" if m["category"] == "isolant" else m["category"].capitalize(),
+        "impacts": m["impacts"],
+        "prix_unit": m["prix"],
+        "dvr_materiau": m["dvr_materiau"],
+        "flux_reference": m["flux_reference"],
+        "poids_unite": m["poids_unite"],
+        "lambda_lib": m["valeur_r"],
+        "efficacite": 100,
+        "r_local": "",
+    }
+    co.update(overrides)
+    return co
+
+
+def _baie(vitrage, cadre, bv_id="bv-1"):
+    v, c = _BY_NAME[vitrage], _BY_NAME[cadre]
+    return {
+        "id": bv_id,
+        "material_id": v["id"], "material_name": v["name"], "vitrage_name": v["name"],
+        "valeur_r_vitrage": v["valeur_r"], "impacts": v["impacts"],
+        "dvr_materiau_vitrage": v["dvr_materiau"], "poids_unite_vitrage": v["poids_unite"],
+        "prix_unit_vitrage": v["prix"],
+        "cadre_id": c["id"], "cadre_name": c["name"], "valeur_r_cadre": c["valeur_r"],
+        "impacts_cadre": c["impacts"], "dvr_materiau_cadre": c["dvr_materiau"],
+        "poids_unite_cadre": c["poids_unite"], "prix_unit_cadre": c["prix"],
+        "quantite": "4", "s_vitrage_unit": "1.2", "s_cadre_unit": "0.3", "efficacite": 100,
+    }
+
+
+def _batiment(type_batiment="neuf"):
+    return {
+        "id": "bat-1",
+        "nom": "Bâtiment test",
+        "type_batiment": type_batiment,
+        "moyen_chauffage": "gaz",
+        "degres_jours": 2100,
+        "dvr_batiment": 60,
+        "parois": [
+            {
+                "id": "p-mur", "nom": "Mur extérieur", "type": "mur", "surface_totale": "120",
+                "composantsOpaques": [
+                    _composant("Brique de parement", "co-brique"),
+                    _composant("Laine de Verre Vrac", "co-laine", r_cible="2.5"),
+                ],
+                "baiesVitrees": [_baie("Simple Vitrage", "Cadre en Aluminium")],
+            },
+            {
+                "id": "p-toit", "nom": "Toiture", "type": "toiture", "surface_totale": 80.5,
+                "composantsOpaques": [_composant("Tuile en béton", "co-tuile")],
+                "baiesVitrees": [],
+            },
+            {
+                "id": "p-sol", "nom": "Plancher", "type": "plancher", "surface_totale": "95",
+                "is_fixed": True,
+                "composantsOpaques": [_composant("Béton précontraint, dalle alvéolée", "co-dalle")],
+                "baiesVitrees": [],
+            },
+        ],
+    }
+
+
+# ── Conversions JS ────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("value, expected", [
+    (85.0, "85"),
+    (12.5, "12.5"),
+    (1e-7, "1e-7"),
+    (-0.000001, "-0.000001"),
+    (0.1 + 0.2, "0.30000000000000004"),
+    (1e21, "1e+21"),
+])
+def test_js_num_str_matches_javascript(value, expected):
+    assert lca_engine.js_num_str(value) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", "000015"),
+    ("abc", "0B8732"),
+    ("bâtiment é 😀", "86A55C"),
+])
+def test_djb2_hash_matches_frontend(text, expected):
+    """Valeurs de référence calculées avec djb2Hash() de ProjectLCA2.jsx."""
+    assert lca_engine._djb2_hash(text) == expected
+
+
+def test_config_hash_ignores_fixed_parois():
+    bat = _batiment()
+    h = lca_engine.compute_config_hash(bat, MATERIALS)
+    bat["parois"][2]["composantsOpaques"][0]["surface_m2"] = "999"
+    assert lca_engine.compute_config_hash(bat, MATERIALS) == h
+    bat["parois"][0]["composantsOpaques"][0]["surface_m2"] = "999"
+    assert lca_engine.compute_config_hash(bat, MATERIALS) != h
+
+
+# ── Stats paroi / bâtiment ────────────────────────────────────────────────────
+
+def test_calc_paroi_stats_surfaces_and_u():
+    stats = lca_engine.calc_paroi_stats(_batiment()["parois"][0])
+    # 4 baies × (1.2 + 0.3) m² = 6 m² vitrés sur 120 m²
+    assert stats["s_vitree"] == pytest.approx(6.0)
+    assert stats["s_opaque"] == pytest.approx(114.0)
+    assert stats["u_opaque"] == pytest.approx(1 / (0.14 + 2.5 + 0.17))
+    assert stats["dep_wk"] == pytest.approx(stats["u_moyen"] * 120)
+
+
+def test_calc_paroi_stats_invalid_surface_returns_none():
+    assert lca_engine.calc_paroi_stats({"surface_totale": "", "composantsOpaques": [], "baiesVitrees": []}) is None
+
+
+def test_calc_batiment_stats_energy_from_dep():
+    bat = _batiment()
+    st = lca_engine.calc_batiment_stats(bat)
+    assert st["energy_kwh"] == pytest.approx(st["dep_wk"] * 2100 * 24 / 1000 / 0.90)
+    assert st["co2_exploitation"] == pytest.approx(st["energy_kwh"] * 0.205)
+
+
+# ── Combinaisons ──────────────────────────────────────────────────────────────
+
+def test_build_combinations_statu_quo_first():
+    bat = _batiment()
+    combos = lca_engine.build_combinations(bat, MATERIALS)["combos"]
+    assert combos
+    sq = combos[0]
+    assert all(c["material_id"] == _original_id(bat, c) for c in sq["choices"] if not c["isAdded"])
+    assert sq["renovation_cost"] == 0
+    # l'épaisseur statu quo est arrondie au mm → R cible quasi identique
+    sq_st = lca_engine.calc_batiment_stats(bat)
+    assert sq["energy_kwh"] == pytest.approx(sq_st["energy_kwh"], rel=1e-3)
+
+
+def _original_id(bat, choice):
+    for p in bat["parois"]:
+        for co in p["composantsOpaques"]:
+            if co["id"] == choice["compId"]:
+                return co["material_id"]
+        for bv in p["baiesVitrees"]:
+            if bv["id"] == choice["compId"]:
+                return bv["cadre_id"] if choice["type"] == "vitree_cadre" else bv["material_id"]
+    return None
+
+
+def test_build_combinations_adds_insulation_to_bare_roof():
+    combos = lca_engine.build_combinations(_batiment(), MATERIALS)["combos"]
+    added = {
+        (c["material_id"], c["epaisseur_cm"])
+        for combo in combos for c in combo["choices"]
+        if c["compId"] == "p-toit__ADDED_ISOLANT"
+    }
+    assert (None, None) in added                      # option « Pas d'ajout »
+    assert any(mat_id is not None for mat_id, _ in added)
+
+
+def test_build_combinations_skips_fixed_paroi():
+    combos = lca_engine.build_combinations(_batiment(), MATERIALS)["combos"]
+    assert not any(c["paroiId"] == "p-sol" for combo in combos for c in combo["choices"])
+
+
+def test_build_combinations_without_slots():
+    bat = _batiment()
+    for p in bat["parois"]:
+        p["is_fixed"] = True
+    assert lca_engine.build_combinations(bat, MATERIALS) == {"combos": [], "fixed_components": []}
+
+
+# ── Évaluation vectorisée ─────────────────────────────────────────────────────
+
+def _apply(bat, slot, cand):
+    """Bâtiment avec le candidat appliqué (référence scalaire, comme la récursion d'origine)."""
+    parois = []
+    for p in bat["parois"]:
+        if p.get("id") == slot["paroiId"]:
+            if slot.get("isAdded"):
+                added = lca_engine._added_composant(slot, cand)
+                p = {**p, "composantsOpaques": p["composantsOpaques"] + ([added] if added else [])}
+            elif slot["type"] == "opaque":
+                p = {**p, "composantsOpaques": [
+                    cand if c.get("id") == slot["compId"] else c for c in p["composantsOpaques"]
+                ]}
+            else:
+                p = {**p, "baiesVitrees": [
+                    lca_engine._patch_bv(bv, slot, cand) if bv.get("id") == slot["compId"] else bv
+                    for bv in p["baiesVitrees"]
+                ]}
+        parois.append(p)
+    return {**bat, "parois": parois}
+
+
+@pytest.mark.parametrize("by_wall", [True, False])
+def test_combination_space_matches_scalar_stats(by_wall):
+    bat = _batiment("renovation")
+    space, _ = lca_engine.evaluate_combinations(bat, MATERIALS)
+    space._by_wall = by_wall   # False : parcours par indices (cas des parois de même id)
+    chunks = {k: np.concatenate([m[k] for _s, m in space.chunks()]) for k in ("cost", "gwp_amorti", "energy_kwh")}
+    assert len(chunks["cost"]) == space.size
+
+    for i in np.random.default_rng(0).choice(space.size, 25, replace=False):
+        combo = space.combos([i])[0]
+        cur = bat
+        for slot, d in zip(space.slots, space.digits(np.array([i]))):
+            cur = _apply(cur, slot, slot["candidates"][int(d[0])])
+        st = lca_engine.calc_batiment_stats(cur)
+        assert combo["cost"] == lca_engine._nz(st["total_cout"]) == chunks["cost"][i]
+        assert combo["gwp_amorti"] == st["gwp_amorti"] == chunks["gwp_amorti"][i]
+        assert combo["energy_kwh"] == st["energy_kwh"] == chunks["energy_kwh"][i]
+
+
+def test_optimise_phares_cover_whole_space():
+    """Les phares sont choisis sur toutes les combinaisons, pas sur la sélection renvoyée."""
+    bat = _batiment()
+    space, _ = lca_engine.evaluate_combinations(bat, MATERIALS)
+    assert space.size > lca_engine.COMBOS_LIST_MAX
+
+    everything = list(range(space.size))
+    everything.insert(0, everything.pop(space.statu_quo))
+    expected = lca_engine.compute_phares(space.combos(everything), bat)
+    result = lca_engine.optimise_batiment(bat, MATERIALS)
+    assert result["combos_evaluated"] == space.size
+    assert len(result["combos"]) <= 3 * lca_engine.COMBOS_PER_AXIS
+    for profile in ("economique", "ecologique", "roi", "topsis2"):
+        assert result["solutions"][profile] == expected[profile]
+
+
+def test_combination_limit(monkeypatch):
+    monkeypatch.setattr(lca_engine, "MAX_COMBOS", 100)
+    space, _ = lca_engine.evaluate_combinations(_batiment(), MATERIALS)
+    with pytest.raises(lca_engine.CombinationLimitError):
+        next(space.chunks())
+    monkeypatch.setattr(lca_engine, "MAX_PARETO_CANDIDATES", 1)
+    with pytest.raises(lca_engine.CombinationLimitError, match="Pareto"):
+        lca_engine.optimise_batiment(_batiment(), MATERIALS)
+
+
+# ── Front de Pareto ───────────────────────────────────────────────────────────
+
+def _brute_front(space, cost_key):
+    m = {k: np.concatenate([c[k] for _s, c in space.chunks()]) for k in (cost_key, "gwp_amorti", "energy_kwh")}
+    pts = np.stack([m[cost_key], m["gwp_amorti"], np.nan_to_num(m["energy_kwh"], nan=np.inf)], axis=1)
+    return {tuple(p) for p in pts[lca_engine._pareto_mask(pts)]}
+
+
+@pytest.mark.parametrize("type_batiment, cost_key", [("neuf", "cost"), ("renovation", "renovation_cost")])
+def test_pareto_front_matches_brute_force(type_batiment, cost_key):
+    bat = _batiment(type_batiment)
+    space, _ = lca_engine.evaluate_combinations(bat, MATERIALS)
+    result = lca_engine.pareto_front(bat, MATERIALS)
+    front = {(c[cost_key], c["gwp_amorti"], c["energy_kwh"]) for c in result["front"]}
+    assert result["front_size"] == len(result["front"]) == len(front)
+    assert front == _brute_front(space, cost_key)
+    assert [c[cost_key] for c in result["front"]] == sorted(c[cost_key] for c in result["front"])
+
+
+def test_pareto_front_pagination():
+    bat = _batiment()
+    full = lca_engine.pareto_front(bat, MATERIALS)["front"]
+    page = lca_engine.pareto_front(bat, MATERIALS, offset=3, limit=4)
+    assert page["front"] == full[3:7]
+    assert page["front_size"] == len(full)
+
+
+def test_pareto_mask_keeps_first_duplicate_drops_dominated():
+    pts = np.array([[1, 1, 1], [1, 1, 1], [1, 2, 1], [2, 0, 3], [0, 3, 3], [2, 2, 2]], dtype=float)
+    assert lca_engine._pareto_mask(pts).tolist() == [True, False, False, True, True, False]
+
+
+def test_optimise_falls_back_to_pareto_front(monkeypatch):
+    """Au-delà de MAX_COMBOS, les profils mono-critère restent exacts (optimum sur le front)."""
+    bat = _batiment()
+    exhaustive = lca_engine.optimise_batiment(bat, MATERIALS)
+    monkeypatch.setattr(lca_engine, "MAX_COMBOS", 100)
+    result = lca_engine.optimise_batiment(bat, MATERIALS)
+    assert exhaustive["search"] == "exhaustive" and result["search"] == "pareto"
+    assert result["combos_evaluated"] == lca_engine.pareto_front(bat, MATERIALS)["front_size"]
+    # critère de chaque profil (à coût égal, le front retient une combinaison non dominée)
+    for profile, keys in (("economique", ["cost"]),
+                          ("ecologique", ["gwp_amorti", "energy_kwh"]),
+                          ("roi", ["cost", "energy_kwh"])):
+        for key in keys:
+            assert result["solutions"][profile][key] == exhaustive["solutions"][profile][key]
+
+
+# ── Solutions phares ──────────────────────────────────────────────────────────
+
+def test_optimise_batiment_returns_all_profiles():
+    result = lca_engine.optimise_batiment(_batiment(), MATERIALS)
+    sol = result["solutions"]
+    assert set(sol) == {"statuQuo", "economique", "ecologique", "roi", "topsis2"}
+    assert sol["economique"]["cost"] == min(c["cost"] for c in result["combos"])
+    assert len(result["hash"]) == 6
+
+
+def test_compute_phares_renovation_economique_has_renovation_cost():
+    bat = _batiment("renovation")
+    combos = lca_engine.build_combinations(bat, MATERIALS)["combos"]
+    sol = lca_engine.compute_phares(combos, bat)
+    assert sol["statuQuo"]["cost"] == 0
+    assert sol["economique"]["renovation_cost"] > 0
+    assert sol["economique"]["renovation_cost"] == min(
+        c["renovation_cost"] for c in combos if c["renovation_cost"] > 0
+    )
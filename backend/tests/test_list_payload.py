@@ -0,0 +1,131 @@
+"""
+Tests de régression - volume lu en base par les endpoints de liste.
+
+Les colonnes lourdes (bytea legacy, résumés JSONB) sont différées : les listes
+(projets, documents, historiques) ne doivent jamais les rapatrier. Le volume est
+mesuré au niveau DBAPI (curseur sqlite3 instrumenté) sur une base seedée avec
+des binaires de plusieurs Mo.
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.database import get_db
+from app.main import app, get_current_user
+from app.models import Base
+
+_MB = 1024 * 1024
+_LIST_BUDGET = 64 * 1024   # octets lus en base par appel de liste
+
+
+class _Meter:
+    fetched = 0
+
+
+def _row_bytes(row) -> int:
+    if row is None:
+        return 0
+    return sum(len(v) if isinstance(v, (bytes, str)) else 8 for v in row)
+
+
+class _CountingCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        _Meter.fetched += _row_bytes(row)
+        return row
+
+    def fetchmany(self, *args):
+        rows = super().fetchmany(*args)
+        _Meter.fetched += sum(map(_row_bytes, rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _Meter.fetched += sum(map(_row_bytes, rows))
+        return rows
+
+
+class _CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+
+@pytest.fixture
+def metered(test_engine):   # test_engine : JSONB → JSON déjà patché
+    engine = create_engine(
+        "sqlite://",
+        creator=lambda: sqlite3.connect(":memory:", check_same_thread=False, factory=_CountingConnection),
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    now = datetime.now(timezone.utc).isoformat()
+    user = models.User(id="u-heavy", full_name="Power user", email="heavy@test.internal", hashed_password="x")
+    db.add(user)
+    db.commit()
+    for p in range(3):
+        pid = f"p-heavy-{p}"
+        db.add(models.Project(
+            id=pid, owner_id=user.id, project_name=f"Projet {p}", client_name="C", client_email="c@test.com",
+            building_address="Rue", building_type="Bureaux", audit_type="Complet", excel_file=f"{pid}.xlsx",
+            created_at=now, prefilled_excel=b"x" * (2 * _MB), report_docx=b"d" * _MB,
+            excel_summary={"actions": ["a" * 1000] * 200},
+        ))
+        db.commit()
+        for i in range(4):
+            db.add(models.ProjectDocument(
+                id=f"{pid}-doc-{i}", project_id=pid, owner_id=user.id, filename="f.pdf", original_name="f.pdf",
+                file_type="application/pdf", doc_type="facture", file_data=b"%PDF" + b"0" * _MB,
+                status="analyzed", extracted_data={"consommation": 1}, created_at=now,
+            ))
+            for model in (models.ReportHistory, models.PlanAmeliorationHistory):
+                db.add(model(
+                    id=f"{pid}-{model.__tablename__}-{i}", project_id=pid, owner_id=user.id,
+                    action_type="MANUAL_UPLOAD", changes={"filename": "f"}, file_bytes=b"h" * _MB,
+                    file_name="f", file_size=_MB, created_at=now,
+                ))
+        db.commit()
+
+    app.dependency_overrides[get_db] = lambda: (yield db)
+    app.dependency_overrides[get_current_user] = lambda: models.User(
+        id=user.id, full_name="Power user", email="heavy@test.internal", hashed_password="x",
+    )
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+    db.close()
+    engine.dispose()
+
+
+def _fetched(client, url):
+    _Meter.fetched = 0
+    r = client.get(url)
+    assert r.status_code == 200, r.text
+    return _Meter.fetched
+
+
+@pytest.mark.parametrize("url", [
+    "/projects",
+    "/projects/p-heavy-0/documents",
+    "/projects/p-heavy-0/report/history",
+    "/projects/p-heavy-0/improvement-actions/history",
+])
+def test_list_endpoints_skip_heavy_columns(metered, url):
+    assert _fetched(metered, url) < _LIST_BUDGET
+
+
+def test_history_list_reports_legacy_files(metered):
+    entries = metered.get("/projects/p-heavy-0/report/history").json()
+    assert entries and all(e["has_file"] for e in entries)
+
+
+def test_download_still_loads_the_file(metered):
+    # contrôle du compteur : le téléchargement lit bien le binaire
+    assert _fetched(metered, "/projects/p-heavy-0/documents/p-heavy-0-doc-0/file") > _MB
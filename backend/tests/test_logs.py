@@ -0,0 +1,52 @@
+"""
+Tests - journalisation structurée (app/logs.py).
+
+- Format JSON : niveau, logger, message, request_id, champs `extra`, trace d'exception.
+- Échantillonnage des lignes DEBUG marquées SAMPLED, les autres toujours gardées.
+- X-Request-ID : repris de la requête ou généré, renvoyé dans la réponse.
+"""
+
+import json
+import logging
+import sys
+
+from app import logs
+
+
+def _record(msg="hello %s", args=("world",), level=logging.INFO, **extra):
+    record = logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_fields():
+    record = _record(request_id="abc123", doc_id="d-1", duration_ms=12)
+    entry = json.loads(logs.JsonFormatter().format(record))
+    assert entry["level"] == "INFO" and entry["logger"] == "app.test"
+    assert entry["msg"] == "hello world" and entry["request_id"] == "abc123"
+    assert entry["doc_id"] == "d-1" and entry["duration_ms"] == 12
+    assert entry["ts"].endswith("Z")
+
+
+def test_queue_handler_keeps_exception_text():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("app.test", logging.ERROR, __file__, 1, "échec %d", (3,), sys.exc_info())
+    prepared = logs._QueueHandler(None).prepare(record)
+    entry = json.loads(logs.JsonFormatter().format(prepared))
+    assert entry["msg"] == "échec 3" and "ValueError: boom" in entry["exc"]
+
+
+def test_sampling_only_drops_marked_records():
+    drop_all = logs._ContextFilter(sample_rate=0.0)
+    assert drop_all.filter(_record(level=logging.DEBUG, **logs.SAMPLED)) is False
+    assert drop_all.filter(_record(level=logging.DEBUG)) is True
+    assert logs._ContextFilter(sample_rate=1.0).filter(_record(level=logging.DEBUG, **logs.SAMPLED)) is True
+
+
+def test_request_id_header(client):
+    r = client.get("/metrics", headers={"X-Request-ID": "req-42"})
+    assert r.headers["x-request-id"] == "req-42"
+    generated = client.get("/metrics").headers["x-request-id"]
+    assert len(generated) == 16 and generated != "req-42"
@@ -0,0 +1,109 @@
+"""
+Tests - métriques Prometheus (app/metrics.py) et endpoint GET /metrics.
+
+- Histogramme : buckets cumulés, somme, compte, échappement des labels.
+- Middleware : latence indexée par modèle de route, pas par URL.
+- Étapes et appels Claude : durées et tokens par point d'appel.
+- Jauges de files d'attente lues au scrape, comptées par l'application.
+- /metrics et /health/* : fermés sans METRICS_TOKEN, Bearer exigé sinon.
+"""
+
+import re
+import threading
+from types import SimpleNamespace
+
+from app import main, metrics
+
+
+def _sample(text, name, **labels):
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            if all(f'{k}="{v}"' in line for k, v in labels.items()):
+                return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_exposition():
+    h = metrics.Histogram("demo_seconds", "Démo.", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        h.observe(value, kind='a"b')
+    lines = h.render()
+    assert lines[:2] == ["# HELP demo_seconds Démo.", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{kind="a\\"b",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{kind="a\\"b",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{kind="a\\"b",le="+Inf"} 4' in lines
+    assert 'demo_seconds_sum{kind="a\\"b"} 4.05' in lines
+    assert 'demo_seconds_count{kind="a\\"b"} 4' in lines
+
+
+def test_broken_gauge_does_not_break_scrape():
+    g = metrics.Gauge("demo_depth", "Démo.", ("queue",))
+    g.set_function(lambda: 1 / 0)
+    assert g.render() == ["# HELP demo_depth Démo.", "# TYPE demo_depth gauge"]
+
+
+def test_route_template_latency(client, seed_project):
+    for _ in range(2):
+        assert client.get(f"/projects/{seed_project.id}/energy-accounting").status_code == 200
+    text = client.get("/metrics").text
+    count = _sample(text, "http_request_duration_seconds_count",
+                    method="GET", route="/projects/{project_id}/energy-accounting", status="200")
+    assert count is not None and count >= 2
+    assert seed_project.id not in text
+
+
+def test_unmatched_route_bucketed(client):
+    client.get("/no-such-route-xyz")
+    text = client.get("/metrics").text
+    assert _sample(text, "http_request_duration_seconds_count", route="<unmatched>", status="404") >= 1
+    assert "no-such-route-xyz" not in text
+
+
+def test_stage_and_claude_metrics(client):
+    with metrics.timed("lcia_parse"):
+        pass
+    metrics.observe_claude("prefill", 1.5, SimpleNamespace(input_tokens=1200, output_tokens=300))
+    text = client.get("/metrics").text
+    assert _sample(text, "stage_duration_seconds_count", stage="lcia_parse") >= 1
+    assert _sample(text, "claude_request_duration_seconds_count", call_site="prefill") >= 1
+    assert _sample(text, "claude_tokens_total", call_site="prefill", direction="input") >= 1200
+    assert _sample(text, "claude_tokens_total", call_site="prefill", direction="output") >= 300
+
+
+def test_queue_depth_gauges(client):
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert _sample(r.text, "queue_depth", queue="claude_semaphore", state="in_use") == 0
+    assert _sample(r.text, "queue_depth", queue="threadpool", state="waiting") == 0
+    assert _sample(r.text, "queue_depth", queue="analysis_executor", state="queued") == 0
+
+
+def test_counted_queues():
+    executor = main._CountingExecutor(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    try:
+        running = executor.submit(lambda: started.set() or release.wait(5))
+        queued = executor.submit(int)
+        started.wait(5)
+        assert executor.counts() == {"queued": 1, "in_use": 1}
+        with main._claude_slot():
+            assert main._claude_slots == {"waiting": 0, "in_use": 1}
+        assert main._claude_slots == {"waiting": 0, "in_use": 0}
+    finally:
+        release.set()
+    running.result(), queued.result()
+    assert executor.counts() == {"queued": 0, "in_use": 0}
+    executor.shutdown()
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.delenv("METRICS_PUBLIC")
+    for path in ("/metrics", "/health/work-pool", "/health/pdf"):
+        assert client.get(path).status_code == 403   # fermé par défaut
+
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    for path in ("/metrics", "/health/work-pool", "/health/pdf"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer s3cret"}).status_code == 200
+    r = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200 and re.search(r"^# TYPE queue_depth gauge$", r.text, re.M)
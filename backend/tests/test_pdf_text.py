@@ -0,0 +1,197 @@
+"""
+Tests - extraction du texte PDF (app/pdf_text.py) et persistance sur ProjectDocument.
+
+- vrais processus : texte extrait, limite de pages (truncated), taille refusée sans parsing ;
+- timeout : le worker est tué puis relancé au job suivant ;
+- _analyze_one : le texte est persisté, une ré-analyse ne re-parse pas le PDF ;
+- vision : seules les pages les plus pertinentes sont transmises au modèle.
+"""
+
+import base64
+import hashlib
+import io
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from pypdf import PdfReader
+
+from app import main, models
+from app.pdf_text import PAGE_BREAK, PdfText, PdfTextPool, score_page
+
+
+def _pdf(*pages: str) -> bytes:
+    """PDF minimal (Helvetica, une ligne de texte par page) avec table xref exacte."""
+    n = len(pages)
+    font_id = 3 + 2 * n
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (3 + 2 * i) for i in range(n)) + b"] /Count %d >>" % n,
+    ]
+    for i, text in enumerate(pages):
+        stream = b"BT /F1 12 Tf 72 720 Td (" + text.encode("latin-1") + b") Tj ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (4 + 2 * i, font_id)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+@pytest.fixture
+def pool():
+    p = PdfTextPool(size=1, timeout=30, max_pages=2)
+    yield p
+    p.shutdown()
+
+
+def test_extracts_text_with_page_limit(pool):
+    assert pool.extract(_pdf("Facture gaz 2023")) == PdfText("Facture gaz 2023", "ok", 1)
+
+    result = pool.extract(_pdf("page un", "page deux", "page trois"))
+    assert result.status == "truncated" and result.pages == 2
+    assert "page deux" in result.text and "page trois" not in result.text
+    assert pool.extract(b"pas un pdf").status == "error"
+    assert pool.stats()["spawned"] == 1   # un seul processus pour tous ces jobs
+
+
+def test_too_large_is_refused_without_parsing():
+    p = PdfTextPool(size=1, max_bytes=10)
+    assert p.extract(_pdf("Facture")) == PdfText("", "too_large", 0)
+    assert p.stats()["alive"] == 0 and p.stats()["spawned"] == 0
+
+
+def test_timeout_kills_worker(pool):
+    pool.timeout = 0.001   # le worker n'a même pas fini de démarrer
+    assert pool.extract(_pdf("Facture")).status == "timeout"
+    assert pool.stats()["alive"] == 0
+
+    pool.timeout = 30
+    assert pool.extract(_pdf("Facture")).text == "Facture"
+    stats = pool.stats()
+    assert stats["spawned"] == 2 and stats["timeout"] == 1 and stats["alive"] == 1
+
+
+def _page_count(data: bytes) -> int:
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+
+_FILLER = ["Conditions generales de vente", "Mentions legales", "Lexique", "Page blanche"]
+_SUMMARY = "Total consommation 12 345 kWh - montant 1 234,56 EUR"
+
+
+def test_score_prefers_invoice_summary():
+    assert score_page(_SUMMARY) > score_page("Conditions generales, article 123") > score_page("  ") == 0
+
+
+def test_select_pages_keeps_most_relevant(pool):
+    data = _pdf(_FILLER[0], _FILLER[1], _SUMMARY, _FILLER[2], _FILLER[3])
+    text = pool.extract(data).text   # max_pages=2 : la page résumé n'est pas lue
+    assert text.count(PAGE_BREAK) == 1
+
+    full = PAGE_BREAK.join([_FILLER[0], _FILLER[1], _SUMMARY, _FILLER[2], _FILLER[3]])
+    selected = pool.select_pages(data, full, 2)
+    assert _page_count(selected) == 2
+    assert pool.extract(selected).text == PAGE_BREAK.join([_FILLER[0], _SUMMARY])
+
+    assert _page_count(pool.select_pages(data, "", 2)) == 2          # scan : premières pages
+    assert pool.select_pages(data, full, 5) is data                  # rien à retirer
+    assert pool.select_pages(b"pas un pdf", "", 2) == b"pas un pdf"  # échec : PDF complet
+    assert pool.stats()["pages_dropped"] == 6
+
+
+def test_vision_fallback_sends_selected_pages(db_session, seed_project, monkeypatch, pool):
+    monkeypatch.setattr(main, "_get_pdf_pool", lambda: pool)
+    monkeypatch.setenv("PDF_VISION_PAGES", "1")
+    sent = []
+
+    def _create(**kw):
+        sent.append(kw["messages"][0]["content"][0]["source"]["data"])
+        return SimpleNamespace(content=[SimpleNamespace(text=json.dumps({"consommation": 1}))],
+                               usage=SimpleNamespace(input_tokens=1, output_tokens=1))
+
+    monkeypatch.setattr(main, "_get_sync_claude", lambda: SimpleNamespace(messages=SimpleNamespace(create=_create)))
+    data = _pdf(*[f"{line} {uuid4().hex[:6]}" for line in _FILLER])   # texte inexploitable → vision
+    doc = models.ProjectDocument(
+        id=f"doc-{uuid4().hex[:12]}", project_id=seed_project.id, owner_id=seed_project.owner_id,
+        filename="f.pdf", original_name="f.pdf", file_type="application/pdf", doc_type="autre",
+        file_data=data, file_hash=hashlib.sha256(data).hexdigest(), status="pending",
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    main._analyze_one(doc)
+    assert doc.status == "analyzed" and len(sent) == 1
+    assert _page_count(base64.standard_b64decode(sent[0])) == 1
+
+
+class _CountingPool:
+    def __init__(self):
+        self.calls = 0
+
+    def extract(self, data):
+        self.calls += 1
+        return PdfText("Facture gaz 2023 - consommation 12345 kWh " * 10, "ok", 1)
+
+
+def test_analyze_persists_pdf_text(db_session, seed_project, monkeypatch):
+    pdf_pool = _CountingPool()
+    monkeypatch.setattr(main, "_get_pdf_pool", lambda: pdf_pool)
+    replies = iter(["pas du json", json.dumps({"type_document": "facture_gaz", "consommation": 12345})])
+    fake = SimpleNamespace(create=lambda **kw: SimpleNamespace(
+        content=[SimpleNamespace(text=next(replies))], usage=SimpleNamespace(input_tokens=1, output_tokens=1),
+    ))
+    monkeypatch.setattr(main, "_get_sync_claude", lambda: SimpleNamespace(messages=fake))
+
+    data = _pdf(f"Facture {uuid4().hex}")
+    doc = models.ProjectDocument(
+        id=f"doc-{uuid4().hex[:12]}", project_id=seed_project.id, owner_id=seed_project.owner_id,
+        filename="f.pdf", original_name="f.pdf", file_type="application/pdf", doc_type="autre",
+        file_data=data, file_hash=hashlib.sha256(data).hexdigest(), status="pending",
+        created_at=datetime.now(timezone.utc).isoformat(),
+    )
+    db_session.add(doc)
+    db_session.commit()
+
+    main._analyze_one(doc, db_session=db_session)     # réponse Claude invalide → erreur
+    db_session.commit()
+    assert doc.status == "error" and doc.pdf_text_status == "ok" and pdf_pool.calls == 1
+
+    db_session.expire_all()
+    main._analyze_one(db_session.get(models.ProjectDocument, doc.id), db_session=db_session)
+    assert pdf_pool.calls == 1
+    assert db_session.get(models.ProjectDocument, doc.id).status == "analyzed"
+
+
+def test_same_file_reuses_analyzed_text(db_session, seed_project, monkeypatch):
+    pdf_pool = _CountingPool()
+    monkeypatch.setattr(main, "_get_pdf_pool", lambda: pdf_pool)
+    data = _pdf(f"Facture {uuid4().hex}")
+    file_hash = hashlib.sha256(data).hexdigest()
+
+    def _doc(status, **fields):
+        doc = models.ProjectDocument(
+            id=f"doc-{uuid4().hex[:12]}", project_id=seed_project.id, owner_id=seed_project.owner_id,
+            filename="f.pdf", original_name="f.pdf", file_type="application/pdf", doc_type="autre",
+            file_data=data, file_hash=file_hash, status=status,
+            created_at=datetime.now(timezone.utc).isoformat(), **fields,
+        )
+        db_session.add(doc)
+        db_session.commit()
+        return doc
+
+    _doc("analyzed", pdf_text="Texte déjà extrait", pdf_text_status="ok")
+    twin = _doc("pending")
+    assert main._document_pdf_text(twin, data, db_session) == "Texte déjà extrait"
+    assert twin.pdf_text_status == "ok" and pdf_pool.calls == 0
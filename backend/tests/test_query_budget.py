@@ -0,0 +1,65 @@
+"""
+Tests - instrumentation SQL par requête (app/query_stats.py) et budgets de requêtes.
+
+- En-tête Server-Timing : temps base, nombre de requêtes, durée totale.
+- GET /templates : comptage d'usage en une requête GROUP BY, quel que soit le nombre de modèles.
+- PATCH energy-accounting : lignes existantes chargées en une fois, pas un SELECT par année.
+"""
+
+import re
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app import models, query_stats
+
+_SERVER_TIMING = re.compile(r'^db;dur=\d+\.\d;desc="(\d+) queries", app;dur=\d+\.\d$')
+
+
+def test_server_timing_header(client, seed_project, query_budget):
+    with query_budget(10) as statements:
+        r = client.get("/projects")
+    match = _SERVER_TIMING.match(r.headers["server-timing"])
+    assert match and int(match.group(1)) == len(statements) > 0
+
+
+def test_track_counts_only_inside_context(db_session):
+    query_stats.install()
+    with query_stats.track() as stats:
+        db_session.query(models.User).count()
+        db_session.query(models.Project).count()
+    db_session.query(models.User).count()
+    assert stats.count == 2 and stats.duration_ms > 0
+
+
+def test_list_templates_single_usage_query(client, db_session, seed_project, test_user, query_budget):
+    now = datetime.now(timezone.utc).isoformat()
+    ids = [f"tpl-{uuid4().hex[:10]}" for _ in range(6)]
+    for tid in ids:
+        db_session.add(models.Template(id=tid, type="audit", name=tid, owner_id=test_user,
+                                       scope="user", created_at=now))
+    db_session.commit()
+    seed_project.active_audit_template_id = ids[0]
+    db_session.commit()
+
+    with query_budget(2):
+        r = client.get("/templates", params={"type": "audit"})
+    usage = {t["id"]: t["usage_count"] for t in r.json()}
+    assert usage[ids[0]] == 1 and usage[ids[1]] == 0
+
+
+def _energy_payload(years):
+    return {"energy_accounting": {"years": {
+        y: {"totals": {"electricity": 1000 + i, "gas": 10}, "details": {}, "notes": ""} for i, y in enumerate(years)
+    }}}
+
+
+def test_energy_update_budget_independent_of_years(client, seed_project, query_budget):
+    url = f"/projects/{seed_project.id}/energy-accounting"
+    years = [str(y) for y in range(2015, 2023)]
+    # propriété + lignes existantes + INSERT groupé + touch + relecture
+    with query_budget(5):
+        assert client.patch(url, json=_energy_payload(years)).status_code == 200
+    # mise à jour des 8 années : UPDATE groupés (executemany), pas de SELECT par année
+    with query_budget(5):
+        r = client.patch(url, json=_energy_payload(years))
+    assert r.json()["energy_accounting"]["years"]["2022"]["totals"]["electricity"] == 1007
@@ -0,0 +1,185 @@
+"""
+Tests - plans d'exécution des requêtes principales (index de la migration 031).
+
+Base SQLite dédiée, peuplée à des volumes réalistes (centaines d'utilisateurs, milliers
+de projets, dizaines de milliers de documents) puis ANALYZE : chaque requête doit
+passer par son index (SEARCH … USING INDEX) et non par un parcours complet de table.
+
+Ce sont les plans de SQLite, pas ceux de Postgres (production) : ils montrent qu'un
+index couvre la requête, pas que le planificateur Postgres le choisira (statistiques,
+coûts différents). Les index eux-mêmes viennent des modèles ; la migration 031 est
+vérifiée à part : exécutée sur SQLite, et son DDL Postgres comparé à celui des modèles.
+"""
+
+import importlib.util
+import io
+import random
+from pathlib import Path
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Boolean, Float, Integer, JSON, String, create_engine, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+
+from app import models
+from app.models import Base
+
+_MIGRATION_031 = Path(__file__).resolve().parent.parent / "migrations" / "versions" / "031_add_lookup_indexes.py"
+
+_USERS, _PROJECTS, _DOCS, _ROWS = 200, 3000, 20000, 6000
+
+
+def _rows(table, n, **columns):
+    """n lignes minimales (colonnes obligatoires remplies) ; columns : valeur ou fonction de l'indice."""
+    filler = {String: lambda c, i: f"{c.name}-{i}", Integer: lambda c, i: 0, Float: lambda c, i: 0.0,
+              Boolean: lambda c, i: False, JSON: lambda c, i: {}}
+    required = [c for c in table.columns if not c.nullable and c.default is None and c.server_default is None]
+    rows = []
+    for i in range(n):
+        row = {c.name: filler[type(c.type)](c, i) for c in required}
+        row.update({k: v(i) if callable(v) else v for k, v in columns.items()})
+        rows.append(row)
+    return rows
+
+
+@pytest.fixture(scope="module")
+def session(test_engine):   # test_engine : colonnes JSONB déjà converties pour SQLite
+    rnd = random.Random(31)
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    user = lambda i: f"user-{rnd.randrange(_USERS)}"          # noqa: E731
+    project = lambda i: f"project-{rnd.randrange(_PROJECTS)}"  # noqa: E731
+    with engine.begin() as conn:
+        t = Base.metadata.tables
+        conn.execute(t["users"].insert(), _rows(t["users"], _USERS, id=lambda i: f"user-{i}",
+                                                calendar_token=lambda i: f"tok-{i}"))
+        conn.execute(t["projects"].insert(), _rows(t["projects"], _PROJECTS, id=lambda i: f"project-{i}",
+                                                   owner_id=user, archived=False))
+        conn.execute(t["project_documents"].insert(), _rows(
+            t["project_documents"], _DOCS, project_id=project, owner_id=user,
+            file_hash=lambda i: f"{i % 15000:064x}", created_at=lambda i: f"2026-01-01T00:00:{i:05d}",
+            status=lambda i: "analyzed" if i % 10 == 0 else "pending",
+        ))
+        conn.execute(t["events"].insert(), _rows(t["events"], _ROWS, owner_id=user, project_id=project,
+                                                 start=lambda i: f"2026-{i % 12 + 1:02d}-01T09:00"))
+        for name in ("improvement_actions", "report_history", "plan_amelioration_history"):
+            conn.execute(t[name].insert(), _rows(t[name], _ROWS, project_id=project, owner_id=user))
+        conn.execute(t["lca_materials"].insert(), _rows(t["lca_materials"], 1500,
+                                                        category=lambda i: f"cat-{i % 6}"))
+        conn.execute(text("ANALYZE"))
+    with Session(engine) as s:
+        yield s
+    engine.dispose()
+
+
+def _plan(session, query) -> str:
+    sql = query.statement.compile(session.bind, compile_kwargs={"literal_binds": True})
+    return "\n".join(row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def _assert_index(session, query, index):
+    plan = _plan(session, query)
+    assert f"INDEX {index}" in plan, plan
+
+
+def test_projects_by_owner(session):
+    q = session.query(models.Project).filter(models.Project.owner_id == "user-7")
+    _assert_index(session, q, "ix_projects_owner_id")
+
+
+def test_documents_by_project(session):
+    q = session.query(models.ProjectDocument).filter(
+        models.ProjectDocument.project_id == "project-12",
+    ).order_by(models.ProjectDocument.created_at.desc())
+    _assert_index(session, q, "ix_projdoc_project_id")
+
+
+def test_analyzed_twin_lookup_uses_partial_index(session):
+    q = session.query(models.ProjectDocument.pdf_text).filter(
+        models.ProjectDocument.file_hash == f"{40:064x}",
+        models.ProjectDocument.status == "analyzed",
+        models.ProjectDocument.pdf_text.isnot(None),
+    )
+    _assert_index(session, q, "ix_projdoc_file_hash_analyzed")
+
+
+def test_events_by_owner_sorted_without_temp_sort(session):
+    q = session.query(models.Event).filter(models.Event.owner_id == "user-3").order_by(models.Event.start)
+    _assert_index(session, q, "ix_events_owner_id_start")
+    assert "TEMP B-TREE" not in _plan(session, q)
+    _assert_index(session, session.query(models.Event).filter(models.Event.project_id == "project-9"),
+                  "ix_events_project_id")
+
+
+@pytest.mark.parametrize("model, index", [
+    (models.ImprovementAction, "ix_improvement_actions_project_id"),
+    (models.ReportHistory, "ix_report_history_project_id"),
+    (models.PlanAmeliorationHistory, "ix_plan_amelioration_history_project_id"),
+])
+def test_project_children_sorted_by_date(session, model, index):
+    q = session.query(model).filter(model.project_id == "project-5").order_by(model.created_at.desc())
+    _assert_index(session, q, index)
+    assert "TEMP B-TREE" not in _plan(session, q)
+
+
+def test_calendar_token_lookup(session):
+    _assert_index(session, session.query(models.User).filter(models.User.calendar_token == "tok-42"),
+                  "ix_users_calendar_token")
+
+
+def test_material_library_order(session):
+    q = session.query(models.LcaMaterial).order_by(models.LcaMaterial.category, models.LcaMaterial.name)
+    _assert_index(session, q, "ix_lca_materials_category_name")
+
+
+# ─── Migration 031 ────────────────────────────────────────────────────────────
+
+def _migration_031():
+    spec = importlib.util.spec_from_file_location("migration_031", _MIGRATION_031)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _migration_031_indexes():
+    """Index créés par la migration : ceux de _INDEXES plus l'index partiel."""
+    return [name for name, _, _ in _migration_031()._INDEXES] + ["ix_projdoc_file_hash_analyzed"]
+
+
+def _model_indexes(names):
+    by_name = {ix.name: ix for table in Base.metadata.tables.values() for ix in table.indexes}
+    assert set(names) <= set(by_name), set(names) - set(by_name)
+    return [by_name[n] for n in names]
+
+
+def test_migration_031_upgrade_creates_model_indexes(test_engine):   # JSONB → JSON pour SQLite
+    names = _migration_031_indexes()
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in names:
+            conn.execute(text(f"DROP INDEX {name}"))
+        with Operations.context(MigrationContext.configure(conn)):
+            _migration_031().upgrade()
+            _migration_031().upgrade()   # IF NOT EXISTS : bases déjà indexées par le DDL de démarrage
+
+    inspector = inspect(engine)
+    for index in _model_indexes(names):
+        created = {ix["name"]: ix["column_names"] for ix in inspector.get_indexes(index.table.name)}
+        assert created.get(index.name) == [c.name for c in index.columns], index.name
+    engine.dispose()
+
+
+def test_migration_031_matches_models_on_postgres():
+    buf = io.StringIO()
+    context = MigrationContext.configure(dialect_name="postgresql", opts={"as_sql": True, "output_buffer": buf})
+    with Operations.context(context):
+        _migration_031().upgrade()
+    emitted = {" ".join(stmt.split()) for stmt in buf.getvalue().split(";") if stmt.strip()}
+
+    for index in _model_indexes(_migration_031_indexes()):
+        expected = str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect()))
+        assert " ".join(expected.split()) in emitted, expected
@@ -0,0 +1,63 @@
+"""
+Tests - rendu du rapport Word en mémoire (app/docx_render.py, _generate_report_docx_bytes).
+
+- Même document.xml qu'un rendu docxtpl classique du modèle.
+- Pré-traitement (patch_xml) et compilation Jinja faits une seule fois par modèle.
+- Sections supplémentaires ajoutées dans la même passe, sans fichier sur disque.
+"""
+
+import io
+from types import SimpleNamespace
+from zipfile import ZipFile
+
+from docx import Document
+from docxtpl import DocxTemplate
+
+from app import docx_render, heavy, main
+
+_REPORT = SimpleNamespace(
+    audit_type="Audit GLOBAL", theme="Portée globale", provider_name="Heat Sight",
+    auditor_name="A. Auditeur", competences="Audit global (AG)",
+    extra_sections={"synthese_energetique": {"energie_gaz_kwh": "80 000 kWh/an"}},
+)
+_PROJECT = SimpleNamespace(id="p-docx", audit_type=None)
+
+
+def _document_xml(data: bytes) -> bytes:
+    with ZipFile(io.BytesIO(data)) as zf:
+        return zf.read("word/document.xml")
+
+
+def test_prepared_render_matches_docxtpl():
+    context = {"audit_type": "Audit Partiel", "audit_theme": "Éclairage & <HVAC>", "auditor_name": "B"}
+    reference = DocxTemplate(str(main.REPORT_TEMPLATE_FILE))
+    reference.render(context)
+    prepared = docx_render.PreparedDocxTemplate(main.REPORT_TEMPLATE_FILE.read_bytes())
+    assert _document_xml(prepared.render_bytes(context)) == _document_xml(docx_render.to_bytes(reference))
+
+
+def test_template_preprocessed_once(monkeypatch):
+    calls = []
+    real = DocxTemplate.patch_xml
+    monkeypatch.setattr(DocxTemplate, "patch_xml", lambda self, xml: calls.append(1) or real(self, xml))
+    prepared = docx_render.PreparedDocxTemplate(main.REPORT_TEMPLATE_FILE.read_bytes())
+
+    first = prepared.render_bytes({"auditor_name": "Premier"})
+    parts = len(calls)
+    second = prepared.render_bytes({"auditor_name": "Second"})
+    assert parts > 0 and len(calls) == parts
+    assert b"Premier" in _document_xml(first) and b"Second" in _document_xml(second)
+
+
+def test_generate_report_in_memory_with_extra_sections(monkeypatch):
+    monkeypatch.setattr(heavy, "_report_templates", {})
+    written = []
+    monkeypatch.setattr(main.Path, "write_bytes", lambda self, data: written.append(self))
+
+    data = main._generate_report_docx_bytes(_PROJECT, _REPORT)
+    assert main._generate_report_docx_bytes(_PROJECT, _REPORT) == data
+    assert len(heavy._report_templates) == 1 and written == []
+
+    texts = [p.text for p in Document(io.BytesIO(data)).paragraphs]
+    assert "Situation énergétique" in texts and "Gaz : 80 000 kWh/an" in texts
+    assert "Heat Sight" in _document_xml(data).decode("utf-8")
@@ -0,0 +1,112 @@
+"""
+Tests - pool de calcul (app/work_pool.py) et contre-pression côté API.
+
+- vrais processus : résultat, exception propagée, métriques par tâche ;
+- fonctions de app/heavy.py exécutées dans un worker (picklables, sans importer app.main) ;
+- file pleine → WorkPoolBusy, traduit en 503 + Retry-After par l'API ;
+- GET /health/work-pool.
+"""
+
+import asyncio
+import io
+import math
+import operator
+import subprocess
+import sys
+import time
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from app import heavy, main
+from app.work_pool import WorkPool, WorkPoolBusy
+
+
+def _xlsx(*sheets: str) -> bytes:
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name in sheets:
+        wb.create_sheet(name)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def process_pool():
+    pool = WorkPool(size=1, queue_size=0)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_in_worker_process(process_pool):
+    assert process_pool.run(math.factorial, 20) == 2432902008176640000
+    with pytest.raises(ZeroDivisionError):
+        process_pool.run(operator.truediv, 1, 0)
+
+    stats = process_pool.stats()
+    assert stats["started"] and stats["submitted"] == 2 and stats["failed"] == 1 and stats["in_flight"] == 0
+    assert stats["tasks"]["factorial"]["calls"] == 1 and stats["tasks"]["factorial"]["avg_run_ms"] is not None
+    assert stats["tasks"]["truediv"]["failed"] == 1
+
+
+def test_app_task_runs_in_worker(process_pool):
+    assert process_pool.run(heavy.missing_aa_sheets, _xlsx("AA1", "AA2")) == [f"AA{i}" for i in range(3, 10)]
+
+
+def test_full_queue_rejects(process_pool):
+    running = process_pool.submit(time.sleep, 0.5)
+    with pytest.raises(WorkPoolBusy):
+        process_pool.submit(math.factorial, 5)
+    running.result()
+    assert process_pool.run(math.factorial, 5) == 120
+    assert process_pool.stats()["rejected"] == 1
+
+
+def test_run_async_inline():
+    pool = WorkPool(size=0)
+    assert asyncio.run(pool.run_async(math.factorial, 6)) == 720
+    assert pool.stats()["tasks"]["factorial"]["calls"] == 1
+
+
+def test_busy_pool_returns_503(client, monkeypatch):
+    saturated = WorkPool(size=0, queue_size=0)
+    saturated._admission.acquire()
+    monkeypatch.setattr(main, "_work_pool", saturated)
+    monkeypatch.setenv("WORK_RETRY_AFTER", "7")
+
+    r = client.post(
+        "/templates",
+        data={"type": "audit", "name": "Occupé"},
+        files={"file": ("m.xlsx", _xlsx("AA1"), "application/octet-stream")},
+    )
+    assert r.status_code == 503 and r.headers["retry-after"] == "7"
+
+    health = client.get("/health/work-pool").json()
+    assert health["rejected"] == 1 and health["tasks"]["missing_aa_sheets"]["rejected"] == 1
+
+
+def test_worker_module_does_not_import_app():
+    code = ("import sys, app.heavy; "
+            "print([m for m in ('app.main', 'app.database', 'fastapi', 'sqlalchemy', 'anthropic') if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+
+def test_apply_prefill_patches_in_work_pool(client, seed_project, monkeypatch):
+    calls = []
+    real = main.run_heavy_async
+
+    async def _recording(fn, *args):
+        calls.append((fn.__name__, type(args[0]).__name__))
+        return await real(fn, *args)
+
+    monkeypatch.setattr(main, "run_heavy_async", _recording)
+    change = {"sheet": "AA1", "cell": "B9", "field": "intitule", "label": "AA1 → Intitulé",
+              "value": "Isolation toiture", "is_numeric": False, "selected": True}
+    url = f"/projects/{seed_project.id}/improvement-actions/apply-prefill"
+    assert client.post(url, json={"changes": [change]}).status_code == 200
+    r = client.post(url, json={"changes": [{**change, "value": "Relighting"}]})   # patch du fichier enregistré
+    assert r.status_code == 200
+    assert calls == [("patch_workbook", "PosixPath"), ("patch_workbook", "bytes")]
+    assert load_workbook(io.BytesIO(r.content))["AA1"]["B9"].value == "Relighting"
@@ -0,0 +1,205 @@
+"""
+Tests - patch incrémental des classeurs (app/xlsx_zip.py, _apply_changes_to_source).
+
+- Les membres non modifiés sont recopiés bruts (octets compressés identiques).
+- Les feuilles patchées, workbook.xml et les rels sont réencodés ; calcChain.xml supprimé.
+- L'archive produite reste lisible par zipfile et openpyxl.
+- patch_sheet_xml : octets identiques hors des cellules ciblées, insertion de
+  lignes / cellules dans l'ordre, lignes auto-fermantes, r= implicites.
+- Squelettes de modèle : même sortie que le chemin sans cache, un squelette par
+  (modèle, empreinte), blob du modèle custom lu une seule fois.
+"""
+
+import io
+import os
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from types import SimpleNamespace
+
+from openpyxl import Workbook, load_workbook
+
+from app import main
+from app.main import _apply_changes_to_source
+from app.xlsx_patch import WorkbookSkeleton, patch_sheet_xml
+from app.xlsx_zip import ZipSkeleton, patch_zip
+
+_MEDIA = os.urandom(200_000)
+_CALC_CHAIN = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<calcChain xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><c r="B2" i="1"/></calcChain>'
+)
+
+
+def _raw_member(data: bytes, name: str) -> bytes:
+    with ZipFile(io.BytesIO(data)) as zf:
+        info = zf.getinfo(name)
+        start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+        return data[start:start + info.compress_size]
+
+
+def _template() -> bytes:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "AA1"
+    ws["A1"] = "Titre"
+    ws["B2"] = "=1+1"
+    wb.create_sheet("Energie")["C3"] = 42
+    buf = io.BytesIO()
+    wb.save(buf)
+
+    # ajoute un média (compressé niveau 1 : un re-deflate en niveau 6 changerait les octets),
+    # un membre stocké et une calcChain référencée comme dans un vrai modèle
+    out = io.BytesIO()
+    with ZipFile(io.BytesIO(buf.getvalue())) as src, ZipFile(out, "w") as dst:
+        for item in src.infolist():
+            data = src.read(item)
+            if item.filename == "xl/_rels/workbook.xml.rels":
+                data = data.replace(b"</Relationships>", (
+                    b'<Relationship Id="rIdCalc" Target="calcChain.xml" Type="http://schemas.openxmlformats.'
+                    b'org/officeDocument/2006/relationships/calcChain"/></Relationships>'
+                ))
+            elif item.filename == "[Content_Types].xml":
+                data = data.replace(b"</Types>", (
+                    b'<Override PartName="/xl/calcChain.xml" ContentType="application/vnd.openxmlformats-'
+                    b'officedocument.spreadsheetml.calcChain+xml"/></Types>'
+                ))
+            dst.writestr(item, data, compress_type=ZIP_DEFLATED)
+        dst.writestr("xl/media/image1.png", _MEDIA * 2, compress_type=ZIP_DEFLATED, compresslevel=1)
+        dst.writestr("xl/media/stored.bin", b"stored" * 1000, compress_type=ZIP_STORED)
+        dst.writestr("xl/calcChain.xml", _CALC_CHAIN, compress_type=ZIP_DEFLATED)
+    return out.getvalue()
+
+
+def test_untouched_members_are_copied_raw():
+    template = _template()
+    patched = _apply_changes_to_source(template, {"AA1": {"B2": 1234.5, "A3": "Isolation"}})
+
+    with ZipFile(io.BytesIO(patched)) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert "xl/calcChain.xml" not in names
+        assert b"calcChain" not in zf.read("xl/_rels/workbook.xml.rels")
+        assert b"calcChain" not in zf.read("[Content_Types].xml")
+        assert b'fullCalcOnLoad="1"' in zf.read("xl/workbook.xml") or b"<calcPr" not in zf.read("xl/workbook.xml")
+        assert zf.read("xl/media/image1.png") == _MEDIA * 2
+
+    for name in ("xl/media/image1.png", "xl/media/stored.bin", "xl/styles.xml", "xl/worksheets/sheet2.xml"):
+        assert _raw_member(patched, name) == _raw_member(template, name), name
+
+    wb = load_workbook(io.BytesIO(patched))
+    assert wb["AA1"]["B2"].value == 1234.5
+    assert wb["AA1"]["A3"].value == "Isolation"
+    assert wb["AA1"]["A1"].value == "Titre"
+    assert wb["Energie"]["C3"].value == 42
+
+
+def test_patch_zip_replace_drop_and_add(tmp_path):
+    src = io.BytesIO()
+    with ZipFile(src, "w", compression=ZIP_DEFLATED) as zf:
+        zf.writestr("a.txt", b"a" * 1000)
+        zf.writestr("b.txt", b"b")
+        zf.writestr("dossier/é.txt", "accentué".encode())
+    path = tmp_path / "src.zip"
+    path.write_bytes(src.getvalue())
+
+    out = patch_zip(path, {"a.txt": b"nouveau", "b.txt": None, "c.txt": b"ajout"})
+    with ZipFile(io.BytesIO(out)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ["a.txt", "dossier/é.txt", "c.txt"]
+        assert zf.read("a.txt") == b"nouveau"
+        assert zf.read("dossier/é.txt") == "accentué".encode()
+        assert zf.read("c.txt") == b"ajout"
+
+
+def test_deflated_replacement_leaves_skeleton_infos_untouched():
+    src = io.BytesIO()
+    with ZipFile(src, "w") as zf:
+        zf.writestr("stored.txt", b"s" * 100, compress_type=ZIP_STORED)
+    skeleton = ZipSkeleton(src.getvalue())
+    before = [(i.extract_version, i.compress_type, i.CRC) for i in skeleton.infos]
+
+    out = skeleton.patch({"stored.txt": b"d" * 1000})
+    with ZipFile(io.BytesIO(out)) as zf:
+        assert zf.testzip() is None
+        info = zf.getinfo("stored.txt")
+        assert info.compress_type == ZIP_DEFLATED and info.extract_version == 20
+    assert [(i.extract_version, i.compress_type, i.CRC) for i in skeleton.infos] == before
+    with ZipFile(io.BytesIO(skeleton.patch({}))) as zf:   # membre copié tel quel : en-tête d'origine
+        assert zf.getinfo("stored.txt").extract_version == before[0][0]
+
+
+_SHEET = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    b'xmlns:x14ac="http://schemas.microsoft.com/office/spreadsheetml/2009/9/ac" mc:Ignorable="x14ac">'
+    b'<sheetData>'
+    b'<row r="1" spans="1:4" x14ac:dyDescent="0.25"><c r="A1" t="s"><v>0</v></c></row>'
+    b'<row r="2" spans="1:3"/>'
+    b'<row r="4"><c r="B4" s="2"/><c r="D4" s="3" t="str"><f>X1</f><v>y</v></c><extLst><ext/></extLst></row>'
+    b'</sheetData>'
+    b'<extLst><ext uri="{78C0D931}" xmlns:x14="http://schemas.microsoft.com/office/spreadsheetml/2009/9/main"/></extLst>'
+    b'</worksheet>'
+)
+
+
+def test_patch_sheet_xml_is_byte_identical_outside_targets():
+    out = patch_sheet_xml(_SHEET, {
+        "B2": 1234.5, "A3": " Iso & <b> ", "A4": 1, "D4": "texte", "E4": None, "E9": 2,
+    })
+    assert out == _SHEET.replace(
+        b'<row r="2" spans="1:3"/>',
+        b'<row r="2" spans="1:3"><c r="B2"><v>1234.5</v></c></row>'
+        b'<row r="3"><c r="A3" t="inlineStr"><is><t xml:space="preserve"> Iso &amp; &lt;b&gt; </t></is></c></row>',
+    ).replace(
+        b'<row r="4"><c r="B4" s="2"/><c r="D4" s="3" t="str"><f>X1</f><v>y</v></c>',
+        b'<row r="4"><c r="A4"><v>1</v></c><c r="B4" s="2"/>'
+        b'<c r="D4" s="3" t="inlineStr"><is><t>texte</t></is></c><c r="E4"/>',
+    ).replace(
+        b'</sheetData>',
+        b'<row r="9"><c r="E9"><v>2</v></c></row></sheetData>',
+    )
+
+
+def test_patch_sheet_xml_implicit_refs_and_prefix():
+    xml = b'<x:worksheet xmlns:x="ns"><x:sheetData><x:row><x:c><x:v>1</x:v></x:c><x:c/></x:row><x:row/></x:sheetData></x:worksheet>'
+    out = patch_sheet_xml(xml, {"B2": 5, "A1": 9})
+    assert out == (
+        b'<x:worksheet xmlns:x="ns"><x:sheetData><x:row><x:c r="A1"><x:v>9</x:v></x:c><x:c/></x:row>'
+        b'<x:row><x:c r="B2"><x:v>5</x:v></x:c></x:row></x:sheetData></x:worksheet>'
+    )
+    assert patch_sheet_xml(b"<worksheet><sheetData/></worksheet>", {"A1": "a"}) == (
+        b'<worksheet><sheetData><row r="1"><c r="A1" t="inlineStr"><is><t>a</t></is></c></row></sheetData></worksheet>'
+    )
+
+
+def test_template_skeleton_matches_uncached_patch():
+    changes = {"Energie": {"C3": 7, "D9": "neuf"}, "AA1": {"A1": "Entité"}}
+    template = _template()
+    skeleton = WorkbookSkeleton(template)
+    first = skeleton.patch(changes)
+    assert first == _apply_changes_to_source(template, changes)
+    # réutilisation : index de lignes en cache, sortie identique
+    assert skeleton.patch(changes) == first
+    assert skeleton.patch({"Energie": {"C3": 8}}) != first
+
+
+def test_template_skeleton_cache_keys(monkeypatch):
+    monkeypatch.setattr(main, "_template_skeletons", main.OrderedDict())
+    official = main._get_template_skeleton()
+    assert main._get_template_skeleton() is official
+
+    blob_reads = []
+
+    def _fake_blob(key, legacy=None):
+        blob_reads.append(key)
+        return _template()
+
+    monkeypatch.setattr(main, "_get_blob", _fake_blob)
+    tpl = SimpleNamespace(id="tpl-1", is_official=False, file_hash="h1", file_bytes=None)
+    custom = main._get_template_skeleton(tpl)
+    assert main._get_template_skeleton(tpl) is custom and blob_reads == ["h1"]
+    assert custom.sheet_paths.keys() == {"AA1", "Energie"}
+
+    tpl.file_hash = "h2"   # modèle remplacé : nouvelle empreinte, nouveau squelette
+    assert main._get_template_skeleton(tpl) is not custom
+    assert blob_reads == ["h1", "h2"]
@@ -88,6 +88,7 @@ export default function ProjectDocuments() {
   const dragCounter = useRef(0);
 
   const [analyzingAll, setAnalyzingAll] = useState(false);
+  const [analyzeProgress, setAnalyzeProgress] = useState(null); // { completed, total } du job en cours
   const [analyzingId, setAnalyzingId] = useState(null);
   const [viewDoc, setViewDoc] = useState(null); // doc à visualiser
 
@@ -242,20 +243,37 @@ export default function ProjectDocuments() {
     }
   }
 
+  async function refreshDocuments() {
+    const listRes = await apiFetch(`/projects/${projectId}/documents`).catch(() => null);
+    if (listRes?.ok) setDocuments(await listRes.json());
+  }
+
   async function handleAnalyzeAll() {
     setAnalyzingAll(true);
+    setAnalyzeProgress(null);
     try {
       const res = await apiFetch(`/projects/${projectId}/documents/analyze-all`, { method: "POST" });
       if (!res.ok) throw new Error(`Analyze-all échoué (${res.status})`);
-      const data = await res.json();
-      const updatedMap = {};
-      for (const d of data.documents || []) updatedMap[d.id] = d;
-      const merged = documents.map((d) => updatedMap[d.id] || d);
-      setDocuments(merged);
+      let job = await res.json();
+      // Le backend traite le lot en tâche de fond : on suit GET /jobs/{id}
+      let completed = 0;
+      while (job.status === "queued" || job.status === "running") {
+        setAnalyzeProgress({ completed: job.completed, total: job.total });
+        await new Promise((r) => setTimeout(r, 1500));
+        const poll = await apiFetch(`/jobs/${job.id}`);
+        if (!poll.ok) throw new Error(`Suivi de l'analyse échoué (${poll.status})`);
+        job = await poll.json();
+        if (job.completed !== completed) {
+          completed = job.completed;
+          await refreshDocuments();
+        }
+      }
+      await refreshDocuments();
     } catch {
       // keep
     } finally {
       setAnalyzingAll(false);
+      setAnalyzeProgress(null);
     }
   }
 
@@ -389,7 +407,7 @@ export default function ProjectDocuments() {
               disabled={analyzingAll}
               onClick={handleAnalyzeAll}
             >
-              {analyzingAll ? "Analyse en cours…" : <><Sparkles size={14} style={{ verticalAlign: "-2px", marginRight: 5 }} /> Tout analyser ({pendingCount})</>}
+              {analyzingAll ? `Analyse en cours…${analyzeProgress ? ` (${analyzeProgress.completed}/${analyzeProgress.total})` : ""}` : <><Sparkles size={14} style={{ verticalAlign: "-2px", marginRight: 5 }} /> Tout analyser ({pendingCount})</>}
             </button>
           )}
         </div>
@@ -5,8 +5,7 @@ import { Plus, Trash2, ChevronDown, ChevronUp, Pencil, X, Info, Lock, LockOpen,
 import { apiFetch } from "../api";
 import {
   normStr, isFenetreCategory, isIsolantCategory, isCadreCategory,
-  getLambda, isParoiExterieure, isParoiEligibleAjoutIsolant,
-  getComposantR, generateEpaisseurPaliers, makeComboKey,
+  getLambda, isParoiExterieure, getComposantR,
 } from "../utils/lca2-helpers.js";
 
 // ─── Constants ────────────────────────────────────────────────────────────────
@@ -137,459 +136,6 @@ function computeConfigHash(bat, materials) {
   return djb2Hash(JSON.stringify({ changeables, matLib, energy }));
 }
 
-// Génération des combinaisons - stratégie 3 listes (ACV 2.0)
-function buildCombinations(bat, materials, epIsolantMaxRaw) {
-  const PER_SLOT    = 5;      // max candidats par slot opaque/vitrage/cadre
-  const SAFETY_CAP  = 50_000; // plafond de sécurité pour l'énumération
-  const EP_ISO_STEP = 2.5;    // pas des paliers d'épaisseur isolant (cm), dimensions commerciales
-  const epIsoMax = (isFinite(parseFloat(epIsolantMaxRaw)) && parseFloat(epIsolantMaxRaw) > 0)
-    ? parseFloat(epIsolantMaxRaw)
-    : 20;
-
-  const slots = [];
-  const fixedDueToConstraint = [];
-
-  for (const paroi of bat.parois) {
-    if (paroi.is_fixed) continue;
-    const sOpaqueParoi = calcParoiStats(paroi)?.s_opaque ?? parseFloat(paroi.surface_totale) ?? 0;
-    for (const co of paroi.composantsOpaques) {
-      if (co.is_fixed) continue;
-      const curMat = materials.find(m => m.id === co.material_id);
-      const curCat = curMat ? (curMat.category || "Autre") : "Autre";
-
-      let allCatMats = materials
-        .filter(m => !isFenetreCategory(m.category || "Autre") && (m.category || "Autre") === curCat)
-        .sort((a, b) => (parseFloat(a.prix) || 0) - (parseFloat(b.prix) || 0));
-
-      const hadAlternatives = allCatMats.some(m => m.id !== co.material_id);
-
-      // Filtre de non-dégradation thermique : U_alternatif ≤ U_effectif_actuel
-      const rCurrentEff = getComposantREffectif(co);
-      if (rCurrentEff != null && rCurrentEff > 0) {
-        allCatMats = allCatMats.filter(m => {
-          if (m.id === co.material_id) return true;
-          // Isolants : R thermique calculé via r_cible (préservé par ...co), pas via m.valeur_r.
-          // Accepter si le candidat a un flux_reference valide pour le calcul ACV.
-          if (isIsolantCategory(co.category)) {
-            return m.flux_reference != null && m.flux_reference > 0;
-          }
-          const r_candidat = parseFloat(m.valeur_r);
-          if (!isFinite(r_candidat) || r_candidat <= 0) return false;
-          return r_candidat >= rCurrentEff;
-        });
-        if (hadAlternatives && !allCatMats.some(m => m.id !== co.material_id)) {
-          fixedDueToConstraint.push({ compName: co.material_name || (curMat?.name ?? "?"), paroiNom: paroi.nom });
-        }
-      }
-
-      let altMats = allCatMats.slice(0, PER_SLOT);
-      if (!altMats.find(m => m.id === co.material_id) && curMat) {
-        altMats = [curMat, ...altMats].slice(0, PER_SLOT);
-      }
-
-      // originalEp : épaisseur statu quo du composant isolant (cm), pour sqKey
-      const originalEp = (() => {
-        if (!isIsolantCategory(co.category)) return null;
-        const rCo = parseFloat(co.r_cible);
-        const lambda = getLambda(curMat);
-        if (!isFinite(rCo) || rCo <= 0 || !isFinite(lambda) || lambda <= 0) return null;
-        return Math.round(rCo * lambda * 100 * 10) / 10;
-      })();
-
-      let candidates;
-      if (isIsolantCategory(co.category)) {
-        // ── Isolants : paliers d'épaisseur par matériau candidat (Approche C) ──
-        candidates = [];
-        for (const m of altMats) {
-          const lambda = getLambda(m);
-          if (!isFinite(lambda) || lambda <= 0) continue;
-
-          // Épaisseur statu quo pour ce matériau (r_cible × lambda × 100)
-          const sqEp = (() => {
-            const rCo = parseFloat(co.r_cible);
-            if (!isFinite(rCo) || rCo <= 0) return null;
-            return Math.round(rCo * lambda * 100 * 10) / 10;
-          })();
-
-          // Borne inférieure : épaisseur effective actuelle arrondie au palier sup.
-          const epActuelle = rCurrentEff != null && rCurrentEff > 0
-            ? rCurrentEff * lambda * 100
-            : (sqEp ?? EP_ISO_STEP);
-          let paliers = generateEpaisseurPaliers(epActuelle, epIsoMax, EP_ISO_STEP);
-          if (paliers.length === 0) continue;
-
-          // Insertion forcée du statu quo si même matériau et pas déjà présent
-          if (m.id === co.material_id && sqEp != null) {
-            if (!paliers.some(ep => Math.abs(ep - sqEp) < 0.01)) {
-              paliers.unshift(sqEp);
-              paliers = [...new Set(paliers.map(ep => Math.round(ep * 100) / 100))]
-                .filter(ep => ep <= epIsoMax + 0.01);
-            }
-          }
-
-          for (const ep_cm of paliers) {
-            candidates.push({
-              ...co,
-              material_id:    m.id,
-              material_name:  m.name,
-              lambda_lib:     lambda,
-              r_local:        "",
-              lambda_local:   "",
-              r_cible:        String((ep_cm / 100) / lambda),
-              epaisseur_cm:   String(ep_cm),
-              prix_unit:      parseFloat(m.prix) || 0,
-              gwp100_unit:    extractImpact(m.impacts, "gwp100", "gwp_100") || 0,
-              impacts:        m.impacts || {},
-              dvr_materiau:   m.dvr_materiau ?? co.dvr_materiau ?? null,
-              flux_reference: m.flux_reference ?? co.flux_reference ?? null,
-              efficacite:     100,
-            });
-          }
-        }
-        if (import.meta.env.DEV && candidates.length > 0) {
-          console.log(`Variation épaisseur [${co.material_name}] : ${candidates.length} candidats générés`);
-        }
-      } else {
-        // ── Non-isolants : 1 candidat par matériau (logique inchangée) ─────────
-        candidates = altMats.map(m => {
-          const m_r = parseFloat(m.valeur_r);
-          const r_from_lib = isFinite(m_r) && m_r > 0 ? m_r : null;
-          const isStatuQuo = m.id === co.material_id;
-          const r_local_value = isStatuQuo
-            ? (co.r_local || (r_from_lib != null ? String(r_from_lib) : ""))
-            : (r_from_lib != null ? String(r_from_lib) : (co.r_local || ""));
-          return {
-            ...co,
-            material_id:    m.id,
-            material_name:  m.name,
-            lambda_lib:     parseFloat(m.valeur_r) ?? null,
-            r_local:        r_local_value,
-            lambda_local:   "",
-            prix_unit:      parseFloat(m.prix) || 0,
-            gwp100_unit:    extractImpact(m.impacts, "gwp100", "gwp_100") || 0,
-            impacts:        m.impacts || {},
-            dvr_materiau:   m.dvr_materiau ?? co.dvr_materiau ?? null,
-            flux_reference: m.flux_reference ?? co.flux_reference ?? null,
-            poids_unite:    m.poids_unite ?? co.poids_unite ?? null,
-            efficacite:     100,
-          };
-        });
-      }
-
-      if (candidates.length > 0) {
-        slots.push({ paroiId: paroi.id, compId: co.id, type: "opaque", candidates, originalId: co.material_id, originalEp, sOpaque: sOpaqueParoi });
-      }
-    }
-
-    for (const bv of paroi.baiesVitrees) {
-      if (bv.is_fixed) continue;
-      const bvQuantite = parseFloat(bv.quantite) || 1;
-      const bvVitId   = bv.material_id ?? bv.vitrage_id;
-      const bvVitName = bv.vitrage_name ?? bv.material_name;
-
-      // ── Slot vitrage ──────────────────────────────────────────────────────────
-      let allFenMats = materials
-        .filter(m => isFenetreCategory(m.category || "Autre"))
-        .sort((a, b) => (parseFloat(a.prix) || 0) - (parseFloat(b.prix) || 0));
-
-      const hadVitAlternatives = allFenMats.some(m => m.id !== bvVitId);
-
-      // Filtre de non-dégradation thermique vitrage
-      const bvRLocal = parseFloat(bv.r_vitrage_local) > 0 ? parseFloat(bv.r_vitrage_local)
-        : parseFloat(bv.r_local);
-      const bvR = (isFinite(bvRLocal) && bvRLocal > 0) ? bvRLocal
-        : (parseFloat(bv.valeur_r_vitrage) || parseFloat(bv.valeur_r) || 0);
-      const bvEff = (parseFloat(bv.efficacite) || 100) / 100;
-      const bvREff = (isFinite(bvR) && bvR > 0) ? bvR * bvEff : null;
-      if (bvREff != null && bvREff > 0) {
-        allFenMats = allFenMats.filter(m => {
-          if (m.id === bvVitId) return true;
-          const r = parseFloat(m.valeur_r);
-          return isFinite(r) && r > 0 && r >= bvREff;
-        });
-        if (hadVitAlternatives && !allFenMats.some(m => m.id !== bvVitId)) {
-          fixedDueToConstraint.push({ compName: bvVitName, paroiNom: paroi.nom });
-        }
-      }
-
-      let vitAltMats = allFenMats.slice(0, PER_SLOT);
-      if (!vitAltMats.find(m => m.id === bvVitId)) {
-        const curVit = materials.find(m => m.id === bvVitId);
-        if (curVit) vitAltMats = [curVit, ...vitAltMats].slice(0, PER_SLOT);
-      }
-
-      const vitageCandidates = vitAltMats.map(m => ({
-        material_id:           m.id,
-        material_name:         m.name,
-        valeur_r_vitrage:      parseFloat(m.valeur_r) || 0,
-        impacts:               m.impacts || {},
-        dvr_materiau_vitrage:  m.dvr_materiau ?? bv.dvr_materiau_vitrage ?? null,
-        poids_unite_vitrage:   m.poids_unite ?? bv.poids_unite_vitrage ?? null,
-        prix_unit:             parseFloat(m.prix) || 0,
-      }));
-
-      if (vitageCandidates.length > 0) {
-        slots.push({ paroiId: paroi.id, compId: bv.id, type: "vitree_vitrage", candidates: vitageCandidates, originalId: bv.material_id, bvQuantite, sVitrageUnit: parseFloat(bv.s_vitrage_unit) || 0 });
-      }
-
-      // ── Slot cadre (seulement si le BV a déjà un cadre) ───────────────────────
-      if (bv.cadre_id) {
-        let cadreMats = materials
-          .filter(m => (m.category || "").toLowerCase() === "cadre")
-          .sort((a, b) => (parseFloat(a.prix) || 0) - (parseFloat(b.prix) || 0));
-
-        // Filtre de non-dégradation thermique cadre
-        const bvRCadre = parseFloat(bv.r_cadre_local) > 0
-          ? parseFloat(bv.r_cadre_local)
-          : parseFloat(bv.valeur_r_cadre);
-        if (isFinite(bvRCadre) && bvRCadre > 0) {
-          cadreMats = cadreMats.filter(m => {
-            if (m.id === bv.cadre_id) return true;
-            const r = parseFloat(m.valeur_r);
-            return isFinite(r) && r > 0 && r >= bvRCadre;
-          });
-        }
-
-        let cadreAltMats = cadreMats.slice(0, PER_SLOT);
-        if (!cadreAltMats.find(m => m.id === bv.cadre_id)) {
-          const curCad = materials.find(m => m.id === bv.cadre_id);
-          if (curCad) cadreAltMats = [curCad, ...cadreAltMats].slice(0, PER_SLOT);
-        }
-
-        const cadreCandidates = cadreAltMats.map(m => ({
-          material_id:         m.id,
-          material_name:       m.name,
-          valeur_r_cadre:      parseFloat(m.valeur_r) || null,
-          dvr_materiau_cadre:  m.dvr_materiau ?? bv.dvr_materiau_cadre ?? null,
-          poids_unite_cadre:   m.poids_unite ?? bv.poids_unite_cadre ?? null,
-          impacts_cadre:       m.impacts || {},
-          prix_unit:           parseFloat(m.prix) || 0,
-        }));
-
-        if (cadreCandidates.length > 0) {
-          slots.push({ paroiId: paroi.id, compId: bv.id, type: "vitree_cadre", candidates: cadreCandidates, originalId: bv.cadre_id, bvQuantite, sCadreUnit: parseFloat(bv.s_cadre_unit) || 0 });
-        }
-      }
-    }
-
-    // ── Ajout d'isolant sur parois extérieures sans isolant ──────────────────
-    // LIMITATION : l'ajout d'isolant peut faire exploser l'espace combinatoire.
-    // Sur un bâtiment avec N parois éligibles et K candidats par paroi (K ≈ 10
-    // typiquement avec 3 isolants × 3 paliers + no-op), l'espace augmente d'un
-    // facteur K^N. Le SAFETY_CAP à 50 000 et la stratégie 3-listes gèrent ce cas,
-    // mais l'auditeur peut perdre en diversité. Recommandation : réduire epIsoMax
-    // ou marquer certaines parois comme "Fixe" si nécessaire.
-    if (isParoiEligibleAjoutIsolant(paroi)) {
-      const isoMats = materials.filter(m => isIsolantCategory(m.category) && m.flux_reference > 0);
-      const addedCandidates = [];
-      for (const m of isoMats) {
-        const lambda = getLambda(m);
-        if (!isFinite(lambda) || lambda <= 0) continue;
-        const epMin = EP_ISO_STEP;
-        const epMax = epIsoMax;
-        if (epMin > epMax) continue;
-        const epMid = Math.round(((epMin + epMax) / 2) / EP_ISO_STEP) * EP_ISO_STEP;
-        const paliers = [...new Set([epMin, epMid, epMax].map(ep => Math.round(ep * 100) / 100))]
-          .filter(ep => ep <= epMax + 0.01);
-        for (const ep_cm of paliers) {
-          addedCandidates.push({
-            material_id:    m.id,
-            material_name:  m.name,
-            category:       "Isolant",
-            r_cible:        String((ep_cm / 100) / lambda),
-            epaisseur_cm:   String(ep_cm),
-            surface_m2:     paroi.surface_totale,
-            efficacite:     100,
-            flux_reference: m.flux_reference,
-            dvr_materiau:   m.dvr_materiau ?? null,
-            impacts:        m.impacts || {},
-            prix_unit:      parseFloat(m.prix) || 0,
-            lambda_lib:     lambda,
-            r_local:        "",
-            lambda_local:   "",
-            is_added:       true,
-          });
-        }
-      }
-      addedCandidates.push({ material_id: null, material_name: "Pas d'ajout", is_added: true, is_noop: true, r_cible: null, epaisseur_cm: null, surface_m2: 0, prix_unit: 0 });
-      if (addedCandidates.filter(c => !c.is_noop).length > 0) {
-        slots.push({
-          paroiId:    paroi.id,
-          compId:     `${paroi.id}__ADDED_ISOLANT`,
-          type:       "opaque",
-          isAdded:    true,
-          originalId: null,
-          originalEp: null,
-          candidates: addedCandidates,
-          sOpaque:    sOpaqueParoi,
-        });
-        if (import.meta.env.DEV) {
-          console.log(`Paroi éligible ajout isolant : ${paroi.nom || paroi.id} - ${addedCandidates.length - 1} candidats`);
-        }
-      }
-    }
-  }
-
-  if (slots.length === 0) return [];
-
-  function applyChoice(b, slot, cand) {
-    if (slot.isAdded) {
-      if (cand.is_noop) return b;
-      return {
-        ...b,
-        parois: b.parois.map(p => {
-          if (p.id !== slot.paroiId) return p;
-          return {
-            ...p,
-            composantsOpaques: [
-              ...p.composantsOpaques,
-              {
-                id:             newId(),
-                material_id:    cand.material_id,
-                material_name:  cand.material_name,
-                category:       "Isolant",
-                r_cible:        cand.r_cible,
-                epaisseur_cm:   cand.epaisseur_cm,
-                surface_m2:     cand.surface_m2,
-                efficacite:     100,
-                flux_reference: cand.flux_reference,
-                dvr_materiau:   cand.dvr_materiau,
-                impacts:        cand.impacts,
-                prix_unit:      cand.prix_unit,
-                lambda_lib:     cand.lambda_lib,
-                r_local:        "",
-                lambda_local:   "",
-                is_added_by_optimisation: true,
-              },
-            ],
-          };
-        }),
-      };
-    }
-    return {
-      ...b,
-      parois: b.parois.map(p => {
-        if (p.id !== slot.paroiId) return p;
-        if (slot.type === "opaque") {
-          return { ...p, composantsOpaques: p.composantsOpaques.map(c => c.id === slot.compId ? cand : c) };
-        } else if (slot.type === "vitree_vitrage") {
-          return { ...p, baiesVitrees: p.baiesVitrees.map(bv => bv.id !== slot.compId ? bv : {
-            ...bv,
-            material_id:          cand.material_id,
-            material_name:        cand.material_name,
-            valeur_r_vitrage:     cand.valeur_r_vitrage,
-            impacts:              cand.impacts,
-            dvr_materiau_vitrage: cand.dvr_materiau_vitrage,
-            prix_unit_vitrage:    cand.prix_unit,
-            gwp100_unit_vitrage:  extractImpact(cand.impacts, "gwp100", "gwp_100") ?? null,
-          })};
-        } else { // vitree_cadre
-          return { ...p, baiesVitrees: p.baiesVitrees.map(bv => bv.id !== slot.compId ? bv : {
-            ...bv,
-            cadre_id:            cand.material_id,
-            cadre_name:          cand.material_name,
-            valeur_r_cadre:      cand.valeur_r_cadre,
-            dvr_materiau_cadre:  cand.dvr_materiau_cadre,
-            impacts_cadre:       cand.impacts_cadre,
-            prix_unit_cadre:     cand.prix_unit,
-          })};
-        }
-      }),
-    };
-  }
-
-  const allCombos = [];
-
-  function enumerate(idx, curBat, choices, accRenovCost) {
-    if (allCombos.length >= SAFETY_CAP) return;
-    if (idx === slots.length) {
-      const st = calcBatimentStats(curBat);
-      allCombos.push({
-        cost:           st.total_cout    ?? 0,
-        renovation_cost: accRenovCost,
-        gwp:            st.total_gwp     ?? 0,
-        gwp_amorti:     st.gwp_amorti    ?? 0,
-        energy_amorti:  st.energy_amorti ?? 0,
-        sante_amorti:   st.sante_amorti  ?? 0,
-        energy_kwh:     st.energy_kwh    ?? null,
-        dep_wk:         st.dep_wk        ?? null,
-        choices,
-        paroi_u_moyens: curBat.parois.map(p => calcParoiStats(p)?.u_moyen ?? null),
-      });
-      return;
-    }
-    const slot = slots[idx];
-    for (const cand of slot.candidates) {
-      const qty = slot.type === "opaque"
-        ? (() => {
-            const s = slot.sOpaque ?? 0;
-            if (isIsolantCategory(cand.category)) {
-              const rc = parseFloat(cand.r_cible);
-              const fr = parseFloat(cand.flux_reference);
-              return (isFinite(rc) && rc > 0 && isFinite(fr) && fr > 0) ? rc * fr * s : 0;
-            }
-            return s;
-          })()
-        : (slot.bvQuantite ?? 1);
-      const renovQty = slot.type === "vitree_vitrage" ? (slot.sVitrageUnit ?? 0) * (slot.bvQuantite ?? 1)
-        : slot.type === "vitree_cadre"                ? (slot.sCadreUnit   ?? 0) * (slot.bvQuantite ?? 1)
-        : qty;
-      const isChanged = cand.material_id !== slot.originalId;
-      enumerate(
-        idx + 1,
-        applyChoice(curBat, slot, cand),
-        [...choices, {
-          paroiId: slot.paroiId, compId: slot.compId, type: slot.type,
-          material_id: cand.material_id, material_name: cand.material_name,
-          prix_unit: cand.prix_unit,
-          epaisseur_cm: slot.type === "opaque" ? (cand.epaisseur_cm ?? null) : null,
-          r_cible:      slot.type === "opaque" ? (cand.r_cible      ?? null) : null,
-          isAdded:      !!(slot.isAdded),
-          is_noop:      !!(cand.is_noop),
-        }],
-        accRenovCost + (isChanged ? (cand.prix_unit || 0) * renovQty : 0),
-      );
-    }
-  }
-
-  enumerate(0, bat, [], 0);
-
-  // ── Stratégie 3 listes - évite le biais de sélection sur critère unique ──────
-  const makeKey = (combo) => makeComboKey(combo.choices);
-
-  let finalCombos;
-  if (allCombos.length <= 2000) {
-    finalCombos = allCombos;
-  } else {
-    const sqEnergy = calcBatimentStats(bat).energy_kwh;
-    const listA = [...allCombos].sort((a, b) => a.cost !== b.cost ? a.cost - b.cost : a.gwp - b.gwp).slice(0, 500);
-    const listB = [...allCombos].sort((a, b) => a.gwp  !== b.gwp  ? a.gwp  - b.gwp  : a.cost - b.cost).slice(0, 500);
-    const listC = [...allCombos]
-      .filter(c => c.energy_kwh != null && sqEnergy != null)
-      .sort((a, b) => {
-        const d = (sqEnergy - b.energy_kwh) - (sqEnergy - a.energy_kwh);
-        return d !== 0 ? d : a.cost - b.cost;
-      }).slice(0, 500);
-    const seen = new Set();
-    finalCombos = [];
-    for (const c of [...listA, ...listB, ...listC]) {
-      const k = makeKey(c);
-      if (!seen.has(k)) { seen.add(k); finalCombos.push(c); }
-    }
-    console.log(`Optimisation 3-listes: A=${listA.length} B=${listB.length} C=${listC.length} doublons=${listA.length + listB.length + listC.length - finalCombos.length} final=${finalCombos.length}`);
-  }
-
-  // Forcer le statu quo en position 0
-  const sqKey = slots
-    .slice().sort((a, b) => (a.compId + a.type).localeCompare(b.compId + b.type))
-    .map(s => `${s.compId}:${s.type}:${s.originalId}${s.originalEp != null ? `:e${s.originalEp}` : ""}`)
-    .join("|");
-  const sqIdx = finalCombos.findIndex(c => makeKey(c) === sqKey);
-  if (sqIdx > 0) { const [sq] = finalCombos.splice(sqIdx, 1); finalCombos.unshift(sq); }
-
-  return { combos: finalCombos, fixedDueToConstraint };
-}
-
 function computePhares(combos, bat, materials, prixKwhOverride) {
   const sqSt        = calcBatimentStats(bat);
   const isRenovation = bat.type_batiment === "renovation";
@@ -2834,6 +2380,7 @@ function OptimisationPanel({ bat, materials, projectId, onClose, cachedHash, cac
   const [uMoyenMax, setUMoyenMax] = useState("");
   const [epIsolantMax, setEpIsolantMax] = useState("20");
   const [rawCombos, setRawCombos] = useState(null);
+  const [computeError, setComputeError] = useState(null);
 
   const filteredPhares = useMemo(() => {
     if (rawCombos === null) return null;
@@ -2901,35 +2448,48 @@ function OptimisationPanel({ bat, materials, projectId, onClose, cachedHash, cac
       setComputedAt(cachedResult.computed_at ?? null);
       setIsStale(cachedHash !== configHash);
       setPhase("done");
-      // Calcul async des combos bruts pour permettre le filtrage CSP en temps réel
-      setTimeout(() => {
-        const { combos } = buildCombinations(bat, materials, parseFloat(epIsolantMax) || 20);
-        setRawCombos(combos);
-      }, 0);
+      // Combos bruts recalculés côté serveur (sans écraser le cache) pour le filtrage CSP en temps réel
+      fetchOptimisation(false)
+        .then(data => setRawCombos(data.combos))
+        .catch(() => setRawCombos(null));
     } else {
       runCompute();
     }
   }, [materials.length, phase]); // eslint-disable-line react-hooks/exhaustive-deps
 
+  async function fetchOptimisation(persist) {
+    const res = await apiFetch(`/projects/${projectId}/lca/optimise`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        batiment_id: bat.id,
+        ep_isolant_max: parseFloat(epIsolantMax) || 20,
+        prix_kwh: prixKwh,
+        persist,
+      }),
+    });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+    return res.json();
+  }
+
   function runCompute() {
     setPhase("computing");
-    setTimeout(() => {
-      const { combos, fixedDueToConstraint } = buildCombinations(bat, materials, parseFloat(epIsolantMax) || 20);
-      setRawCombos(combos);
-      const result = computePhares(combos, bat, materials, prixKwh);
-      const now = new Date().toISOString();
-      setPhares(result);
-      setFixedComponents(fixedDueToConstraint);
-      setComputedAt(now);
-      setIsStale(false);
-      setPhase("done");
-      const payload = { hash: configHash, cache: { computed_at: now, solutions: result, fixed_components: fixedDueToConstraint } };
-      apiFetch(`/projects/${projectId}/lca/optimisation-cache?version=v2`, {
-        method: "PATCH",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(payload),
-      }).then(() => onCacheSaved && onCacheSaved(configHash, payload.cache));
-    }, 80);
+    setComputeError(null);
+    fetchOptimisation(true)
+      .then(data => {
+        const cache = data.optimisation_cache;
+        setRawCombos(data.combos);
+        setPhares(cache.solutions);
+        setFixedComponents(cache.fixed_components ?? []);
+        setComputedAt(cache.computed_at);
+        setIsStale(data.optimisation_hash !== configHash);
+        setPhase("done");
+        onCacheSaved && onCacheSaved(data.optimisation_hash, cache);
+      })
+      .catch(err => {
+        setComputeError(err.message);
+        setPhase("done");
+      });
   }
 
   function fmtDate(iso) {
@@ -3271,6 +2831,13 @@ function OptimisationPanel({ bat, materials, projectId, onClose, cachedHash, cac
             </div>
           )}
 
+          {phase === "done" && computeError && (
+            <div style={{ textAlign: "center", padding: "24px 0", color: "#b91c1c", fontSize: 13 }}>
+              Échec de l'optimisation ({computeError}).{" "}
+              <button type="button" onClick={runCompute} style={{ ...smallBtn, fontSize: 11 }}>Réessayer</button>
+            </div>
+          )}
+
           {phase === "done" && phares && (
             <>
               {isStale && (